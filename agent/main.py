@@ -1,13 +1,33 @@
+import logging
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, WebSocket  # 添加 WebSocket 导入
 from fastapi.middleware.cors import CORSMiddleware
 from agent.routers import agent_router
 from common.config.common_database import engine, Base
 from common.utils.service_registry import service_registry
+from common.utils.profiler_util import setup_profiler
+from common.utils.metrics_util import setup_metrics
+from common.utils.redis_util import REDIS  # 注册进程级共享 Redis 连接池
+from common.utils.service_container import service_container
+
+logger = logging.getLogger(__name__)
 
 # 创建数据库表（如果 agent 模块有独立模型，否则可以省略）
 # Base.metadata.create_all(bind=engine)
 
-app = FastAPI(title="Agent Service", version="1.0.0")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    logger.info("Agent Service启动中...")
+    service_container.warm_up(REDIS)
+    yield
+    # 释放进程级共享资源
+    service_container.shutdown()
+    logger.info("Agent Service关闭...")
+
+
+app = FastAPI(title="Agent Service", version="1.0.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -19,6 +39,12 @@ app.add_middleware(
 
 app.include_router(agent_router.router)
 
+# 采样分析器（ENABLE_PROFILER=True 时启用）
+setup_profiler(app, "agent")
+
+# 进程内指标（Prometheus 文本格式）
+setup_metrics(app, "agent")
+
 
 @app.get("/")
 async def root():
@@ -2,11 +2,14 @@
 from sqlalchemy.orm import Session
 from sqlalchemy import desc, func, text
 from typing import List, Optional, Dict, Any
-from datetime import datetime
+import asyncio
 import logging
 import re
 
 from agent.schemas.agent_schema import ChatHistorySchema, ChatModelSchema
+from chat.utils.history_writer_util import HISTORY_WRITER, history_row
+from common.utils.count_cache_util import get_cached_count
+from common.utils.service_container import service_container
 
 logger = logging.getLogger(__name__)
 
@@ -44,30 +47,15 @@ class AgentRepository:
             return None
 
     async def save_chat_history(self, chat_data: ChatHistorySchema) -> bool:
-        """保存聊天记录到数据库"""
+        """保存聊天记录（与 chat 服务共用后台写入队列，批量写入数据库）"""
         try:
-            from chat.models.chat_model import ChatHistory
-            
-            db_chat = ChatHistory(
-                user_id=chat_data.user_id,
-                tenant_id=chat_data.tenant_id or "music",
-                model_id=chat_data.model_id,
-                files=chat_data.files,
-                chat_id=chat_data.chat_id,
-                prompt=chat_data.prompt,
-                system_prompt=chat_data.system_prompt,
-                think_content=chat_data.think_content,
-                response_content=chat_data.response_content,
-                content=chat_data.content,
-                create_time=datetime.now()
-            )
-            
-            self.db.add(db_chat)
-            self.db.commit()
-            logger.info(f"聊天记录保存成功: user_id={chat_data.user_id}, chat_id={chat_data.chat_id}")
-            return True
+            writer = service_container.get(HISTORY_WRITER)
+            row = history_row(chat_data, "agent", default_tenant_id="music")
+            if writer.submit(row):
+                return True
+            logger.warning(f"聊天记录写入队列已满，直接写入: user_id={chat_data.user_id}, chat_id={chat_data.chat_id}")
+            return await asyncio.to_thread(writer.write_now, row)
         except Exception as e:
-            self.db.rollback()
             logger.error(f"保存聊天记录失败: {str(e)}", exc_info=True)
             return False
 
@@ -121,11 +109,15 @@ class AgentRepository:
         try:
             from chat.models.chat_model import ChatHistory
             
-            count = self.db.query(func.count(ChatHistory.id)).filter(
-                ChatHistory.user_id == user_id,
-                ChatHistory.tenant_id == "music"
-            ).scalar()
-            return count or 0
+            # 与 chat 服务共用同一个缓存命名空间，任一服务写入聊天记录都会使其失效
+            return get_cached_count(
+                f"chat_history:{user_id}",
+                {"tenant_id": "music"},
+                lambda: self.db.query(func.count(ChatHistory.id)).filter(
+                    ChatHistory.user_id == user_id,
+                    ChatHistory.tenant_id == "music"
+                ).scalar() or 0
+            )
         except Exception as e:
             logger.error(f"查询聊天历史总数失败: {str(e)}")
             return 0
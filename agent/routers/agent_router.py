@@ -1,9 +1,12 @@
 # agent/routers/agent_router.py
+from collections import deque
+
 from fastapi import APIRouter, Depends, Query, Header, HTTPException, WebSocket, WebSocketDisconnect
 import json
 import logging
 
 from common.utils.result_util import ResultEntity, ResultUtil
+from common.utils.stream_util import WebSocketDisconnectWatcher
 from agent.services.agent_service import AgentService
 from agent.schemas.agent_schema import AgentParamsEntity
 
@@ -27,6 +30,7 @@ async def websocket_chat(
 ):
     """
     WebSocket聊天接口
+    回答过程中客户端断开时立即取消模型请求；回答结束前收到的下一条消息在本轮结束后处理
     """
     if not X_User_Id:
         logger.warning("[AgentWebSocket] 未提供用户ID")
@@ -43,10 +47,12 @@ async def websocket_chat(
         logger.error(f"[AgentWebSocket] 接受连接失败: {str(e)}")
         return
     
+    # 流式输出期间由断开检测读取到的后续消息
+    pending = deque()
     try:
         while True:
             # 接收客户端发送的消息
-            data = await websocket.receive_text()
+            data = pending.popleft() if pending else await websocket.receive_text()
             logger.info(f"[AgentWebSocket] 收到消息: {data[:100]}...")
             
             try:
@@ -77,14 +83,27 @@ async def websocket_chat(
                     await websocket.send_text("[completed]")
                     continue
                 
-                # 处理聊天请求
-                async for response in agent_service.chat_with_websocket(user_id, chat_params):
+                # 处理聊天请求（客户端断开时取消生成；发送失败时关闭生成器，排队中的请求随之出队）
+                async with WebSocketDisconnectWatcher(websocket, pending) as watcher:
+                    stream = agent_service.chat_with_websocket(
+                        user_id, chat_params, cancel_event=watcher.cancel_event
+                    )
                     try:
-                        await websocket.send_text(response)
-                    except Exception as e:
-                        logger.error(f"[AgentWebSocket] 发送响应失败: {str(e)}")
-                        break
+                        async for response in stream:
+                            if watcher.disconnected:
+                                break
+                            try:
+                                await websocket.send_text(response)
+                            except Exception as e:
+                                logger.error(f"[AgentWebSocket] 发送响应失败: {str(e)}")
+                                break
+                    finally:
+                        await stream.aclose()
+                if watcher.disconnected:
+                    raise WebSocketDisconnect()
                     
+            except WebSocketDisconnect:
+                raise
             except json.JSONDecodeError as e:
                 logger.error(f"[AgentWebSocket] JSON解析错误: {str(e)}")
                 await websocket.send_text(f"Error: Invalid JSON format - {str(e)}")
@@ -7,26 +7,28 @@ from typing import Optional, AsyncGenerator, Any, List, Dict
 
 from fastapi import Depends, HTTPException
 from sqlalchemy.orm import Session
-from langchain_community.chat_models import ChatOpenAI
-from langchain_ollama import OllamaLLM
 from langchain.prompts.chat import ChatPromptTemplate
 
 from common.config.common_database import get_db
 from common.utils.result_util import ResultUtil
+from common.utils.redis_util import get_redis
+from common.utils.chat_memory_util import ChatMemory
+from common.utils.admission_util import ADMISSION, AdmissionRejected, queue_message
+from common.utils.llm_client_util import LLM_CLIENTS, MODEL_CONFIGS
+from common.utils.stream_util import PARTIAL_RESPONSE_MARKER, ClientDisconnected, until_cancelled
+from common.utils.service_container import service_container
 from agent.repositories.agent_repository import AgentRepository
 from agent.schemas.agent_schema import AgentParamsEntity, ChatHistorySchema, ChatModelSchema, MusicSchema
-import os
-import redis
 
 logger = logging.getLogger(__name__)
-REDIS_URL = os.getenv("REDIS_URL")
 
 class AgentService:
     """Agent服务业务逻辑层"""
 
     def __init__(self, db: Session = Depends(get_db)):
         self.agent_repository = AgentRepository(db)
-        self.redis = redis.Redis.from_url(REDIS_URL)
+        self.redis = get_redis()
+        self.chat_memory = ChatMemory("agent", self.redis)
         self.db = db
 
     def get_music_system_prompt(self, user_id: str) -> str:
@@ -106,7 +108,8 @@ class AgentService:
     async def chat_with_websocket(
             self,
             user_id: str,
-            chat_params: AgentParamsEntity
+            chat_params: AgentParamsEntity,
+            cancel_event: Optional[asyncio.Event] = None
     ) -> AsyncGenerator[str, None]:
         """
         WebSocket聊天处理
@@ -114,6 +117,8 @@ class AgentService:
         Args:
             user_id: 用户ID（由网关验证后传递）
             chat_params: 聊天参数
+            cancel_event: 客户端断开时由路由设置；设置后立即取消排队与意图提取的模型请求，
+                回答输出到一半时保存已发送部分并加上中断标记
         """
         logger.info(f"[AgentService] ========== 开始处理聊天请求 ==========")
         logger.info(f"[AgentService] user_id={user_id}")
@@ -137,8 +142,8 @@ class AgentService:
         )
 
         try:
-            # 1. 从数据库获取模型配置
-            model_config = await self.agent_repository.get_model_by_id(chat_params.modelId)
+            # 1. 获取模型配置（进程内缓存，模型变更时失效）
+            model_config = await self._get_model_config(chat_params.modelId)
             if not model_config:
                 logger.error(f"[AgentService] 未找到模型配置: {chat_params.modelId}")
                 yield f"Error: 未找到模型配置 {chat_params.modelId}"
@@ -147,13 +152,35 @@ class AgentService:
 
             logger.info(f"[AgentService] 获取到模型配置: id={model_config.id}, type={model_config.type}, model_name={model_config.model_name}")
 
-            # 2. 使用AI提取音乐意图并生成SQL
-            intent_result = await self._extract_music_intent(
-                chat_params.prompt,
-                model_config,
-                chat_params.showThink,
-                user_id
-            )
+            # 2. 使用AI提取音乐意图并生成SQL（带上本会话最近的问答，支持"换一首他的歌"这类追问）
+            try:
+                history = self.chat_memory.load(user_id, chat_params.chatId)
+            except Exception as e:
+                logger.warning(f"[AgentService] 读取会话记忆失败: {str(e)}")
+                history = []
+
+            # 按模型准入（与 chat 服务使用同一套限制），排队期间向客户端报告排位
+            ticket = service_container.get(ADMISSION).ticket(model_config, user_id)
+            try:
+                try:
+                    async for position in ticket.wait(cancel_event):
+                        yield queue_message(position)
+                except AdmissionRejected as e:
+                    logger.warning(f"[AgentService] 推理准入被拒绝: model={model_config.model_name}, {str(e)}")
+                    yield f"Error: {str(e)}"
+                    yield "[completed]"
+                    return
+
+                # 客户端断开时立即取消模型请求
+                intent_result = await until_cancelled(self._extract_music_intent(
+                    chat_params.prompt,
+                    model_config,
+                    chat_params.showThink,
+                    user_id,
+                    history
+                ), cancel_event)
+            finally:
+                ticket.release()
 
             if not intent_result.get("is_music_related", False):
                 yield "抱歉，我只能回答与音乐相关的问题。请尝试询问关于歌曲、歌手、专辑或音乐标签的问题。"
@@ -175,35 +202,71 @@ class AgentService:
 
             # 5. 流式返回结果
             chunk_size = 50
-            for i in range(0, len(response_text), chunk_size):
-                chunk = response_text[i:i + chunk_size]
-                yield chunk
-                await asyncio.sleep(0.01)
+            sent = 0
+            try:
+                for i in range(0, len(response_text), chunk_size):
+                    if cancel_event is not None and cancel_event.is_set():
+                        raise ClientDisconnected()
+                    chunk = response_text[i:i + chunk_size]
+                    yield chunk
+                    sent = i + len(chunk)
+                    await asyncio.sleep(0.01)
+            finally:
+                # 客户端断开（或生成器被关闭）时只保存已发送的部分
+                if sent < len(response_text):
+                    self._save_partial_response(chat_entity, response_text[:sent])
 
             # 发送完成标识
             yield "[completed]"
 
-            # 6. 保存聊天记录
+            # 6. 保存会话记忆与聊天记录
+            # 记忆中保存意图提取的输入输出（而非格式化后的歌曲列表），与系统提示词要求的 JSON 输出保持一致
+            try:
+                self.chat_memory.append(
+                    user_id,
+                    chat_params.chatId,
+                    ("human", f"用户输入: {chat_params.prompt}"),
+                    ("ai", json.dumps(intent_result, ensure_ascii=False))
+                )
+            except Exception as e:
+                logger.warning(f"[AgentService] 保存会话记忆失败: {str(e)}")
+
             chat_entity.content = response_text
             chat_entity.response_content = response_text
             chat_entity.create_time = datetime.now()
 
             asyncio.create_task(self.save_chat_history_async(chat_entity))
 
+        except ClientDisconnected:
+            logger.info(f"[AgentService] 客户端已断开，停止处理: chatId={chat_params.chatId}")
         except Exception as e:
             logger.error(f"[AgentService] WebSocket chat error: {str(e)}", exc_info=True)
             yield f"Error occurred: {str(e)}"
             yield "[completed]"
 
+    def _save_partial_response(self, chat_entity: ChatHistorySchema, sent_text: str) -> None:
+        """保存输出到一半被中断的回答（已发送部分 + 中断标记）"""
+        if not sent_text:
+            return
+        content = sent_text + PARTIAL_RESPONSE_MARKER
+        chat_entity.content = content
+        chat_entity.response_content = content
+        chat_entity.create_time = datetime.now()
+        asyncio.create_task(self.save_chat_history_async(chat_entity))
+
     async def _extract_music_intent(
             self,
             prompt: str,
             model_config: ChatModelSchema,
             show_think: bool,
-            user_id: str
+            user_id: str,
+            history: Optional[List[tuple]] = None
     ) -> Dict[str, Any]:
         """
         使用AI提取音乐意图并生成查询SQL条件
+
+        Args:
+            history: 本会话最近的问答消息 [(role, content), ...]
         
         Returns:
             {
@@ -219,6 +282,7 @@ class AgentService:
             
             messages = [
                 ("system", self.get_music_system_prompt(user_id)),
+                *(history or []),
                 ("human", f"用户输入: {prompt}")
             ]
             
@@ -322,34 +386,20 @@ class AgentService:
         
         return "\n".join(response_lines)
 
+    async def _get_model_config(self, model_id: str) -> Optional[ChatModelSchema]:
+        """获取模型配置（与 chat 服务共用缓存失效机制，模型变更时跨进程失效）"""
+        configs = service_container.get(MODEL_CONFIGS)
+        key = ("agent", model_id)
+        model_config = configs.get(key)
+        if model_config is None:
+            model_config = await self.agent_repository.get_model_by_id(model_id)
+            configs.put(key, model_config)
+        return model_config
+
     async def _create_chat_model(self, model_config: ChatModelSchema, show_think: bool) -> Any:
-        """根据模型配置创建对应的聊天模型实例"""
+        """获取模型配置对应的聊天模型实例（与 chat 服务共用的客户端池）"""
         try:
-            if model_config.type == "ollama":
-                logger.info(f"[AgentService] 创建Ollama模型: {model_config.model_name}")
-                return OllamaLLM(
-                    model=model_config.model_name,
-                    base_url=model_config.base_url or "http://localhost:11434",
-                    model_kwargs={"options": {"think": show_think}}
-                )
-            elif model_config.type in ["deepseek", "tongyi"]:
-                base_url = model_config.base_url
-                if model_config.type == "deepseek":
-                    base_url = base_url or "https://api.deepseek.com/v1"
-                elif model_config.type == "tongyi":
-                    base_url = base_url or "https://dashscope.aliyuncs.com/compatible-mode/v1"
-                
-                logger.info(f"[AgentService] 创建在线模型: {model_config.type}, base_url={base_url}")
-                return ChatOpenAI(
-                    model=model_config.model_name,
-                    api_key=model_config.api_key,
-                    base_url=base_url,
-                    streaming=True,
-                    temperature=0.7
-                )
-            else:
-                logger.error(f"[AgentService] 不支持的模型类型: {model_config.type}")
-                return None
+            return service_container.get(LLM_CLIENTS).get(model_config, show_think)
         except Exception as e:
             logger.error(f"[AgentService] 创建聊天模型失败: {str(e)}")
             return None
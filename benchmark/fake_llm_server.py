@@ -0,0 +1,259 @@
+# benchmark/fake_llm_server.py
+"""
+压测用的假大模型服务
+
+同时模拟 Ollama 与 OpenAI 兼容接口，按可配置的速率流式输出 token，
+让压测不依赖真实的 GPU / 在线大模型，结果只反映本项目自身的开销。
+
+支持的接口:
+    Ollama:  POST /api/generate   POST /api/chat   POST /api/embed   POST /api/embeddings   GET /api/tags
+    OpenAI:  POST /v1/chat/completions（stream=true 时为 SSE）   POST /v1/embeddings
+    统计:    GET /stats（流式回答数：进行中 / 正常结束 / 被客户端中途断开，用于验证断开后生成随即停止）
+
+配置（环境变量或命令行参数）:
+    FAKE_LLM_TOKENS_PER_SEC   每秒输出的 token 数，默认 50；<=0 表示不限速
+    FAKE_LLM_RESPONSE_TOKENS  每次回答的 token 数，默认 200
+    FAKE_LLM_FIRST_TOKEN_MS   首 token 延迟（毫秒），默认 100
+    FAKE_LLM_EMBED_DIM        嵌入向量维度，默认 768
+    FAKE_LLM_EMBED_MS         每次嵌入请求的延迟（毫秒），默认 5
+
+运行方式:
+    python -m benchmark.fake_llm_server --port 11500 --tokens-per-sec 50
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import os
+import struct
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import AsyncIterator, List
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+TOKENS_PER_SEC = float(os.getenv("FAKE_LLM_TOKENS_PER_SEC", "50"))
+RESPONSE_TOKENS = int(os.getenv("FAKE_LLM_RESPONSE_TOKENS", "200"))
+FIRST_TOKEN_MS = float(os.getenv("FAKE_LLM_FIRST_TOKEN_MS", "100"))
+EMBED_DIM = int(os.getenv("FAKE_LLM_EMBED_DIM", "768"))
+EMBED_MS = float(os.getenv("FAKE_LLM_EMBED_MS", "5"))
+
+# 用于拼接回答的词表，中英混排以接近真实回答的字节分布
+_VOCAB = [
+    "小吴同学", "认为", "这个", "问题", "可以", "从", "以下", "几个", "方面", "来看",
+    "首先", "其次", "最后", "总之", "the", "answer", "is", "based", "on", "context",
+    "，", "。", "\n", "数据", "模型", "服务", "性能", "缓存", "请求", "响应",
+]
+
+app = FastAPI(title="Fake LLM Server", version="1.0.0")
+
+# 流式回答统计：active 进行中，completed 正常结束，aborted 被客户端中途断开
+STREAM_STATS = {"active": 0, "completed": 0, "aborted": 0, "tokens": 0}
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _tokens(seed: str, count: int) -> List[str]:
+    """根据输入确定性地生成 token 序列（同样的问题得到同样的回答，便于对比）"""
+    digest = hashlib.sha256(seed.encode("utf-8")).digest()
+    return [_VOCAB[(digest[i % len(digest)] + i) % len(_VOCAB)] for i in range(count)]
+
+
+async def _paced(tokens: List[str]) -> AsyncIterator[str]:
+    """按首 token 延迟与 token 速率逐个产出 token"""
+    if FIRST_TOKEN_MS > 0:
+        await asyncio.sleep(FIRST_TOKEN_MS / 1000)
+    interval = 1.0 / TOKENS_PER_SEC if TOKENS_PER_SEC > 0 else 0
+    start = time.perf_counter()
+    for index, token in enumerate(tokens):
+        if interval:
+            # 以起始时间为基准计算，避免 sleep 误差累积导致速率偏低
+            delay = start + index * interval - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        yield token
+
+
+async def _tracked(stream: AsyncIterator[str]) -> AsyncIterator[str]:
+    """统计流式回答：客户端断开时 StreamingResponse 取消生成，计入 aborted"""
+    STREAM_STATS["active"] += 1
+    finished = False
+    try:
+        async for item in stream:
+            STREAM_STATS["tokens"] += 1
+            yield item
+        finished = True
+    finally:
+        STREAM_STATS["active"] -= 1
+        STREAM_STATS["completed" if finished else "aborted"] += 1
+
+
+def _embed(text: str) -> List[float]:
+    """确定性的伪嵌入：按文本哈希展开为单位向量"""
+    values = []
+    counter = 0
+    while len(values) < EMBED_DIM:
+        block = hashlib.sha256(f"{counter}:{text}".encode("utf-8")).digest()
+        values.extend(v / 2147483648.0 for v in struct.unpack("<8i", block))
+        counter += 1
+    values = values[:EMBED_DIM]
+    norm = math.sqrt(sum(v * v for v in values)) or 1.0
+    return [v / norm for v in values]
+
+
+def _prompt_of_messages(messages: list) -> str:
+    return "\n".join(str(m.get("content", "")) for m in messages or [])
+
+
+@app.get("/stats")
+async def stream_stats():
+    return STREAM_STATS
+
+
+# ==================== Ollama ====================
+
+@app.get("/api/tags")
+async def ollama_tags():
+    return {"models": [{"name": "bench-llm", "model": "bench-llm", "modified_at": _now(), "size": 0}]}
+
+
+@app.post("/api/generate")
+async def ollama_generate(request: Request):
+    body = await request.json()
+    model = body.get("model", "bench-llm")
+    tokens = _tokens(body.get("prompt", ""), RESPONSE_TOKENS)
+
+    async def stream():
+        async for token in _paced(tokens):
+            yield json.dumps({"model": model, "created_at": _now(), "response": token, "done": False},
+                             ensure_ascii=False) + "\n"
+        yield json.dumps({
+            "model": model, "created_at": _now(), "response": "", "done": True, "done_reason": "stop",
+            "prompt_eval_count": len(body.get("prompt", "")), "eval_count": len(tokens)
+        }) + "\n"
+
+    if body.get("stream", True):
+        return StreamingResponse(_tracked(stream()), media_type="application/x-ndjson")
+    text = "".join([token async for token in _paced(tokens)])
+    return {"model": model, "created_at": _now(), "response": text, "done": True, "done_reason": "stop"}
+
+
+@app.post("/api/chat")
+async def ollama_chat(request: Request):
+    body = await request.json()
+    model = body.get("model", "bench-llm")
+    tokens = _tokens(_prompt_of_messages(body.get("messages")), RESPONSE_TOKENS)
+
+    async def stream():
+        async for token in _paced(tokens):
+            yield json.dumps({
+                "model": model, "created_at": _now(),
+                "message": {"role": "assistant", "content": token}, "done": False
+            }, ensure_ascii=False) + "\n"
+        yield json.dumps({
+            "model": model, "created_at": _now(), "message": {"role": "assistant", "content": ""},
+            "done": True, "done_reason": "stop", "eval_count": len(tokens)
+        }) + "\n"
+
+    if body.get("stream", True):
+        return StreamingResponse(_tracked(stream()), media_type="application/x-ndjson")
+    text = "".join([token async for token in _paced(tokens)])
+    return {"model": model, "created_at": _now(), "message": {"role": "assistant", "content": text},
+            "done": True, "done_reason": "stop"}
+
+
+@app.post("/api/embed")
+async def ollama_embed(request: Request):
+    body = await request.json()
+    inputs = body.get("input", [])
+    if isinstance(inputs, str):
+        inputs = [inputs]
+    if EMBED_MS > 0:
+        await asyncio.sleep(EMBED_MS / 1000)
+    return {"model": body.get("model", "bench-embed"), "embeddings": [_embed(text) for text in inputs]}
+
+
+@app.post("/api/embeddings")
+async def ollama_embeddings(request: Request):
+    body = await request.json()
+    if EMBED_MS > 0:
+        await asyncio.sleep(EMBED_MS / 1000)
+    return {"embedding": _embed(body.get("prompt", ""))}
+
+
+# ==================== OpenAI 兼容 ====================
+
+@app.post("/v1/chat/completions")
+async def openai_chat_completions(request: Request):
+    body = await request.json()
+    model = body.get("model", "bench-llm")
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    created = int(time.time())
+    tokens = _tokens(_prompt_of_messages(body.get("messages")), RESPONSE_TOKENS)
+
+    def chunk(delta: dict, finish_reason=None) -> str:
+        payload = {
+            "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+        }
+        return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+    async def stream():
+        yield chunk({"role": "assistant", "content": ""})
+        async for token in _paced(tokens):
+            yield chunk({"content": token})
+        yield chunk({}, "stop")
+        yield "data: [DONE]\n\n"
+
+    if body.get("stream"):
+        return StreamingResponse(_tracked(stream()), media_type="text/event-stream")
+
+    text = "".join([token async for token in _paced(tokens)])
+    return JSONResponse({
+        "id": completion_id, "object": "chat.completion", "created": created, "model": model,
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": 0, "completion_tokens": len(tokens), "total_tokens": len(tokens)}
+    })
+
+
+@app.post("/v1/embeddings")
+async def openai_embeddings(request: Request):
+    body = await request.json()
+    inputs = body.get("input", [])
+    if isinstance(inputs, str):
+        inputs = [inputs]
+    if EMBED_MS > 0:
+        await asyncio.sleep(EMBED_MS / 1000)
+    return {
+        "object": "list",
+        "model": body.get("model", "bench-embed"),
+        "data": [{"object": "embedding", "index": i, "embedding": _embed(text)} for i, text in enumerate(inputs)]
+    }
+
+
+def main():
+    global TOKENS_PER_SEC, RESPONSE_TOKENS, FIRST_TOKEN_MS
+
+    parser = argparse.ArgumentParser(description="压测用的假大模型服务（Ollama / OpenAI 兼容）")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11500)
+    parser.add_argument("--tokens-per-sec", type=float, default=TOKENS_PER_SEC)
+    parser.add_argument("--response-tokens", type=int, default=RESPONSE_TOKENS)
+    parser.add_argument("--first-token-ms", type=float, default=FIRST_TOKEN_MS)
+    args = parser.parse_args()
+
+    TOKENS_PER_SEC = args.tokens_per_sec
+    RESPONSE_TOKENS = args.response_tokens
+    FIRST_TOKEN_MS = args.first_token_ms
+
+    import uvicorn
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
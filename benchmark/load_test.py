@@ -0,0 +1,326 @@
+# benchmark/load_test.py
+"""
+端到端压测：所有请求都经过网关（鉴权、日志中间件、转发）
+
+场景（按权重随机混合）:
+    music_classify  音乐分类列表分页   GET  /service/music/getMusicListByClassifyId
+    music_search    音乐关键词搜索     GET  /service/music/searchMusic
+    movie_search    电影搜索           GET  /service/movie/search
+    circle_feed     朋友圈动态分页     GET  /service/circle/getCircleListByType
+    chat_http       HTTP 流式聊天      POST /service/chat/chat
+    chat_ws         WebSocket 聊天     WS   /service/chat/ws/chat
+
+输出每个场景的吞吐量与 p50/p95/p99 延迟（聊天场景额外统计首包时间 ttft），
+可保存为基线文件，后续运行与基线对比，p95 或吞吐量超出容忍度时以非 0 状态码退出。
+
+运行方式:
+    python -m benchmark.load_test --duration 60 --concurrency 50 --save-baseline benchmark/baseline.json
+    python -m benchmark.load_test --duration 60 --concurrency 50 --baseline benchmark/baseline.json
+    python -m benchmark.load_test --scenarios music_search,chat_ws --duration 30
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+import uuid
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+import websockets
+from dotenv import load_dotenv
+
+# ============ 重要：添加项目根目录到 Python 路径 ============
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+# ============================================================
+
+# jwt_util 在导入时读取 SECRET_KEY，需先加载 .env（与网关使用同一密钥）
+load_dotenv(project_root / ".env")
+from common.utils.jwt_util import create_access_token  # noqa: E402
+
+SEED_FILE = project_root / "benchmark" / ".data" / "seed.json"
+
+DEFAULT_WEIGHTS = {
+    "music_classify": 30,
+    "music_search": 20,
+    "movie_search": 20,
+    "circle_feed": 20,
+    "chat_http": 5,
+    "chat_ws": 5,
+}
+
+
+class Stats:
+    """单个场景的统计：延迟（毫秒）、首包时间、错误数"""
+
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.ttft: List[float] = []
+        self.errors = 0
+        self.error_samples: List[str] = []
+
+    def fail(self, reason: str):
+        self.errors += 1
+        if len(self.error_samples) < 5:
+            self.error_samples.append(reason[:200])
+
+
+def percentile(values: List[float], p: float) -> float:
+    """最近秩百分位"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(p / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+class LoadTest:
+    def __init__(self, args, seed: dict):
+        self.args = args
+        self.seed = seed
+        self.http_base = args.gateway.rstrip("/")
+        self.ws_base = self.http_base.replace("http://", "ws://").replace("https://", "wss://")
+        self.stats: Dict[str, Stats] = defaultdict(Stats)
+        self.rnd = random.Random(args.random_seed)
+        self.tokens = {uid: self._token(uid) for uid in seed["user_ids"][:args.users]}
+        self.model_id = seed["model_ids"][args.model]
+
+        weights = dict(DEFAULT_WEIGHTS)
+        if args.scenarios:
+            selected = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+            weights = {name: weight for name, weight in weights.items() if name in selected}
+        self.scenarios = list(weights)
+        self.weights = [weights[name] for name in self.scenarios]
+
+    @staticmethod
+    def _token(user_id: str) -> str:
+        # 与 AuthService.login 一致：sub 为用户信息（驼峰字段）
+        return create_access_token(data={"sub": {"id": user_id, "userAccount": user_id, "username": user_id}})
+
+    def _user(self):
+        user_id = self.rnd.choice(list(self.tokens))
+        return user_id, self.tokens[user_id]
+
+    # ==================== 场景 ====================
+
+    async def music_classify(self, client: httpx.AsyncClient, token: str):
+        return await client.get("/service/music/getMusicListByClassifyId", params={
+            "classifyId": self.rnd.choice(self.seed["classify_ids"]),
+            "pageNum": self.rnd.randint(1, self.args.max_page),
+            "pageSize": 20,
+        }, headers={"Authorization": f"Bearer {token}"})
+
+    async def music_search(self, client: httpx.AsyncClient, token: str):
+        return await client.get("/service/music/searchMusic", params={
+            "keyword": self.rnd.choice(self.seed["keywords"]),
+            "pageNum": self.rnd.randint(1, self.args.max_page),
+            "pageSize": 20,
+        }, headers={"Authorization": f"Bearer {token}"})
+
+    async def movie_search(self, client: httpx.AsyncClient, token: str):
+        return await client.get("/service/movie/search", params={
+            "keyword": self.rnd.choice(self.seed["keywords"]),
+            "classify": self.rnd.choice(self.seed["movie_classifies"]),
+            "pageNum": self.rnd.randint(1, self.args.max_page),
+            "pageSize": 20,
+        }, headers={"Authorization": f"Bearer {token}"})
+
+    async def circle_feed(self, client: httpx.AsyncClient, token: str):
+        return await client.get("/service/circle/getCircleListByType", params={
+            "type": self.rnd.choice(["MUSIC", "MOVIE"]),
+            "pageNum": self.rnd.randint(1, self.args.max_page),
+            "pageSize": 10,
+        }, headers={"Authorization": f"Bearer {token}"})
+
+    def _chat_params(self) -> dict:
+        return {
+            "prompt": f"请介绍一下{self.rnd.choice(self.seed['keywords'])}",
+            "chatId": uuid.uuid4().hex,
+            "modelId": self.model_id,
+            "companyId": self.seed["company_id"],
+            "showThink": False,
+        }
+
+    async def chat_http(self, client: httpx.AsyncClient, token: str, stats: Stats, start: float):
+        async with client.stream("POST", "/service/chat/chat", json=self._chat_params(),
+                                 headers={"Authorization": f"Bearer {token}"}) as response:
+            if response.status_code != 200:
+                raise RuntimeError(f"HTTP {response.status_code}")
+            body = []
+            async for chunk in response.aiter_text():
+                if not body:
+                    stats.ttft.append((time.perf_counter() - start) * 1000)
+                body.append(chunk)
+            text = "".join(body)
+            if "[completed]" not in text or text.startswith("Error"):
+                raise RuntimeError(f"聊天未正常结束: {text[:100]}")
+
+    async def chat_ws(self, token: str, stats: Stats, start: float):
+        url = f"{self.ws_base}/service/chat/ws/chat?token=Bearer%20{token}"
+        async with websockets.connect(url, open_timeout=self.args.timeout) as ws:
+            await ws.send(json.dumps(self._chat_params(), ensure_ascii=False))
+            first = True
+            while True:
+                message = await asyncio.wait_for(ws.recv(), timeout=self.args.timeout)
+                if message.startswith("[queue:"):
+                    # 排队等待推理准入的排位消息，不算首包
+                    continue
+                if first:
+                    stats.ttft.append((time.perf_counter() - start) * 1000)
+                    first = False
+                if message.startswith("Error"):
+                    raise RuntimeError(message[:100])
+                if message == "[completed]":
+                    return
+
+    # ==================== 执行 ====================
+
+    async def _run_one(self, client: httpx.AsyncClient, name: str):
+        _, token = self._user()
+        stats = self.stats[name]
+        start = time.perf_counter()
+        try:
+            if name == "chat_http":
+                await self.chat_http(client, token, stats, start)
+            elif name == "chat_ws":
+                await self.chat_ws(token, stats, start)
+            else:
+                response = await getattr(self, name)(client, token)
+                if response.status_code != 200:
+                    raise RuntimeError(f"HTTP {response.status_code}: {response.text[:100]}")
+                payload = response.json()
+                if payload.get("status") != "SUCCESS":
+                    raise RuntimeError(f"业务失败: {payload.get('msg')}")
+        except Exception as e:
+            stats.fail(f"{type(e).__name__}: {e}")
+            return
+        stats.latencies.append((time.perf_counter() - start) * 1000)
+
+    async def _worker(self, client: httpx.AsyncClient, deadline: float):
+        while time.perf_counter() < deadline:
+            name = self.rnd.choices(self.scenarios, weights=self.weights)[0]
+            await self._run_one(client, name)
+
+    async def run(self) -> float:
+        limits = httpx.Limits(max_connections=self.args.concurrency, max_keepalive_connections=self.args.concurrency)
+        async with httpx.AsyncClient(base_url=self.http_base, timeout=self.args.timeout, limits=limits) as client:
+            if self.args.warmup > 0:
+                print(f"[load] 预热 {self.args.warmup}s ...")
+                warm_deadline = time.perf_counter() + self.args.warmup
+                await asyncio.gather(*(self._worker(client, warm_deadline) for _ in range(self.args.concurrency)))
+                self.stats.clear()
+
+            print(f"[load] 压测 {self.args.duration}s，并发 {self.args.concurrency}，场景 {self.scenarios}")
+            start = time.perf_counter()
+            deadline = start + self.args.duration
+            await asyncio.gather(*(self._worker(client, deadline) for _ in range(self.args.concurrency)))
+            return time.perf_counter() - start
+
+
+def build_report(test: LoadTest, elapsed: float) -> dict:
+    scenarios = {}
+    for name in test.scenarios:
+        stats = test.stats.get(name) or Stats()
+        total = len(stats.latencies) + stats.errors
+        scenarios[name] = {
+            "requests": total,
+            "errors": stats.errors,
+            "error_rate": round(stats.errors / total, 4) if total else 0.0,
+            "throughput": round(len(stats.latencies) / elapsed, 2),
+            "p50_ms": round(percentile(stats.latencies, 50), 2),
+            "p95_ms": round(percentile(stats.latencies, 95), 2),
+            "p99_ms": round(percentile(stats.latencies, 99), 2),
+            "max_ms": round(max(stats.latencies), 2) if stats.latencies else 0.0,
+        }
+        if stats.ttft:
+            scenarios[name]["ttft_p50_ms"] = round(percentile(stats.ttft, 50), 2)
+            scenarios[name]["ttft_p95_ms"] = round(percentile(stats.ttft, 95), 2)
+        if stats.error_samples:
+            scenarios[name]["error_samples"] = stats.error_samples
+
+    return {
+        "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "config": {
+            "duration": test.args.duration,
+            "concurrency": test.args.concurrency,
+            "model": test.args.model,
+            "seed_counts": test.seed.get("counts"),
+        },
+        "elapsed": round(elapsed, 2),
+        "scenarios": scenarios,
+    }
+
+
+def print_report(report: dict):
+    print()
+    print(f"{'scenario':<16}{'req':>8}{'err':>6}{'rps':>9}{'p50':>10}{'p95':>10}{'p99':>10}{'ttft95':>10}")
+    for name, s in report["scenarios"].items():
+        ttft = f"{s['ttft_p95_ms']:.1f}" if "ttft_p95_ms" in s else "-"
+        print(f"{name:<16}{s['requests']:>8}{s['errors']:>6}{s['throughput']:>9.1f}"
+              f"{s['p50_ms']:>10.1f}{s['p95_ms']:>10.1f}{s['p99_ms']:>10.1f}{ttft:>10}")
+        for sample in s.get("error_samples", []):
+            print(f"    ! {sample}")
+
+
+def compare_baseline(report: dict, baseline: dict, tolerance: float) -> bool:
+    """与基线对比：p95 变慢或吞吐量下降超过容忍度视为回归"""
+    ok = True
+    print()
+    print(f"与基线对比（{baseline.get('created_at')}，容忍度 {tolerance:.0%}）:")
+    for name, current in report["scenarios"].items():
+        base = baseline.get("scenarios", {}).get(name)
+        if not base:
+            print(f"  {name:<16} 基线中无此场景，跳过")
+            continue
+        p95_delta = (current["p95_ms"] - base["p95_ms"]) / base["p95_ms"] if base["p95_ms"] else 0.0
+        rps_delta = (current["throughput"] - base["throughput"]) / base["throughput"] if base["throughput"] else 0.0
+        regressed = p95_delta > tolerance or rps_delta < -tolerance
+        ok = ok and not regressed
+        print(f"  {name:<16} p95 {base['p95_ms']:.1f} -> {current['p95_ms']:.1f}ms ({p95_delta:+.1%})  "
+              f"rps {base['throughput']:.1f} -> {current['throughput']:.1f} ({rps_delta:+.1%})"
+              f"{'  <-- 回归' if regressed else ''}")
+    return ok
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="经网关的端到端压测")
+    parser.add_argument("--gateway", default="http://127.0.0.1:4009", help="网关地址")
+    parser.add_argument("--duration", type=float, default=60, help="压测时长（秒）")
+    parser.add_argument("--warmup", type=float, default=5, help="预热时长（秒），不计入统计")
+    parser.add_argument("--concurrency", type=int, default=50, help="并发虚拟用户数")
+    parser.add_argument("--users", type=int, default=100, help="参与压测的种子用户数")
+    parser.add_argument("--scenarios", default=None, help=f"逗号分隔的场景，默认全部: {','.join(DEFAULT_WEIGHTS)}")
+    parser.add_argument("--model", choices=["ollama", "openai"], default="ollama", help="聊天场景使用的模型类型")
+    parser.add_argument("--max-page", type=int, default=20, help="分页场景随机访问的最大页码（深分页）")
+    parser.add_argument("--timeout", type=float, default=60, help="单个请求超时（秒）")
+    parser.add_argument("--random-seed", type=int, default=1)
+    parser.add_argument("--seed-file", default=str(SEED_FILE), help="seed_data.py 生成的清单")
+    parser.add_argument("--output", default=None, help="报告输出路径（JSON）")
+    parser.add_argument("--save-baseline", default=None, help="把本次结果保存为基线")
+    parser.add_argument("--baseline", default=None, help="与指定基线对比")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="回归判定容忍度")
+    args = parser.parse_args(argv)
+
+    seed = json.loads(Path(args.seed_file).read_text(encoding="utf-8"))
+    test = LoadTest(args, seed)
+    elapsed = asyncio.run(test.run())
+    report = build_report(test, elapsed)
+    print_report(report)
+
+    for path in filter(None, [args.output, args.save_baseline]):
+        Path(path).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"\n报告已保存: {path}")
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        if not compare_baseline(report, baseline, args.tolerance):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
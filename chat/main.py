@@ -1,12 +1,43 @@
+import logging
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from chat.routers.chat_router import router
 from common.config.common_database import engine, Base
 from common.utils.service_registry import service_registry
+from common.utils.profiler_util import setup_profiler
+from common.utils.metrics_util import setup_metrics
+from common.utils.redis_util import REDIS  # 注册进程级共享 Redis 连接池
+from common.utils.service_container import service_container
+from chat.utils.chroma_util import VECTOR_STORE
+from chat.utils.ingestion_util import INGESTION
+from chat.utils.vector_maintenance_util import VECTOR_MAINTENANCE
+
+logger = logging.getLogger(__name__)
 
 Base.metadata.create_all(bind=engine)
 
-app = FastAPI(title="Chat Service", version="1.0.0")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    logger.info("Chat Service启动中...")
+    # 预热进程级共享资源：Redis连接池与Chroma向量存储（含客户端、嵌入模型）
+    service_container.warm_up(REDIS, VECTOR_STORE)
+    # 恢复上次退出时未完成的文档入库任务
+    try:
+        service_container.get(INGESTION).resume_pending()
+    except Exception as e:
+        logger.warning(f"恢复文档入库任务失败: {str(e)}")
+    # 向量库定时维护（VECTOR_MAINTENANCE_INTERVAL_HOURS > 0 时启用）
+    service_container.get(VECTOR_MAINTENANCE).start_schedule()
+    yield
+    # 释放进程级共享资源
+    service_container.shutdown()
+    logger.info("Chat Service关闭...")
+
+
+app = FastAPI(title="Chat Service", version="1.0.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -18,6 +49,12 @@ app.add_middleware(
 
 app.include_router(router)
 
+# 采样分析器（ENABLE_PROFILER=True 时启用）
+setup_profiler(app, "chat")
+
+# 进程内指标（Prometheus 文本格式）
+setup_metrics(app, "chat")
+
 @app.get("/")
 async def root():
     return {"message": "Chat Service is running"}
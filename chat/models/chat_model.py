@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime, Integer, Text, func
+from sqlalchemy import Column, String, DateTime, Integer, Text, Index, func
 from sqlalchemy.ext.declarative import declarative_base
 
 Base = declarative_base()
@@ -18,6 +18,8 @@ class ChatDocModel(Base):
     ext = Column(String(255), comment='文档格式')
     user_id = Column(String(32), comment='用户id')
     tenant_id = Column(String(32), comment='租户id')
+    content_hash = Column(String(64), index=True, comment='文件内容SHA-256（磁盘路径按哈希命名，同一文件只存一份）')
+    source_doc_id = Column(String(32), index=True, comment='向量所属文档id（内容相同的文档共用一份向量）')
     create_time = Column(DateTime, server_default=func.now(), comment='创建时间')
     update_time = Column(DateTime, server_default=func.now(), onupdate=func.now(), comment='修改时间')
 
@@ -40,12 +42,18 @@ class ChatDocDirectory(Base):
 
 class ChatHistory(Base):
     __tablename__ = 'chat_history'
-    __table_args__ = {
-        'comment': '聊天记录',
-        'mysql_charset': 'utf8',
-        'mysql_collate': 'utf8_general_ci',
-        'mysql_engine': 'InnoDB'
-    }
+    __table_args__ = (
+        # 按用户（+租户）倒序分页、按会话分页的查询都走索引，不再整表排序
+        Index('idx_chat_history_user_tenant_time', 'user_id', 'tenant_id', 'create_time'),
+        Index('idx_chat_history_user_time', 'user_id', 'create_time'),
+        Index('idx_chat_history_user_chat_time', 'user_id', 'chat_id', 'create_time'),
+        {
+            'comment': '聊天记录',
+            'mysql_charset': 'utf8',
+            'mysql_collate': 'utf8_general_ci',
+            'mysql_engine': 'InnoDB'
+        }
+    )
     id = Column(Integer, primary_key=True, autoincrement=True, comment='主键')
     user_id = Column(String(64), nullable=True, comment='用户id')
     tenant_id = Column(String(255), nullable=True, comment='租户id')
@@ -57,7 +65,32 @@ class ChatHistory(Base):
     think_content = Column(Text, nullable=True, comment='思考内容')
     response_content = Column(Text, nullable=True, comment='正文')
     content = Column(Text, nullable=True, comment='回复内容')
-    create_time = Column(DateTime, nullable=True, comment='创建时间')
+    create_time = Column(DateTime, nullable=False, server_default=func.now(), comment='创建时间')
+
+
+class ChatConversation(Base):
+    """会话汇总（每个会话一行），由聊天记录写入线程在写入 chat_history 的同一事务中维护"""
+    __tablename__ = 'chat_conversation'
+    __table_args__ = (
+        Index('uk_chat_conversation_user_chat', 'user_id', 'chat_id', unique=True),
+        Index('idx_chat_conversation_user_tenant_time', 'user_id', 'tenant_id', 'last_message_time', 'id'),
+        Index('idx_chat_conversation_user_time', 'user_id', 'last_message_time', 'id'),
+        {
+            'comment': '会话汇总',
+            'mysql_charset': 'utf8mb4',
+            'mysql_collate': 'utf8mb4_general_ci',
+            'mysql_engine': 'InnoDB'
+        }
+    )
+    id = Column(Integer, primary_key=True, autoincrement=True, comment='主键')
+    user_id = Column(String(64), nullable=False, comment='用户id')
+    tenant_id = Column(String(255), nullable=True, comment='租户id')
+    chat_id = Column(String(128), nullable=False, comment='会话id')
+    title = Column(String(255), nullable=True, comment='标题（会话第一个问题）')
+    model_id = Column(String(64), nullable=True, comment='最近一轮使用的模型ID')
+    turn_count = Column(Integer, nullable=False, default=0, comment='对话轮数')
+    create_time = Column(DateTime, nullable=True, comment='第一条消息时间')
+    last_message_time = Column(DateTime, nullable=False, comment='最后一条消息时间')
 
 
 class ChatModel(Base):
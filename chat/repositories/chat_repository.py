@@ -1,13 +1,18 @@
+import asyncio
 from datetime import datetime
 
 from elasticsearch.esql import and_
 from fastapi.logger import logger
+from sqlalchemy import or_
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import Any, List, Optional, Tuple
 
-from chat.models.chat_model import ChatModel, ChatHistory, ChatDocModel, ChatDocDirectory
-from chat.schemas.chat_schema import ChatModelSchema, ChatSchema, ChatDocSchema
+from chat.models.chat_model import ChatModel, ChatHistory, ChatConversation, ChatDocModel, ChatDocDirectory
+from chat.schemas.chat_schema import ChatModelSchema, ChatSchema, ChatDocSchema, ConversationSchema
 from chat.schemas.chat_schema import DirectorySchema
+from chat.utils.history_writer_util import HISTORY_WRITER, history_row
+from common.utils.pagination_util import SortKey, apply_keyset, build_page
+from common.utils.service_container import service_container
 
 
 class ChatRepository:
@@ -188,35 +193,38 @@ class ChatRepository:
             logger.error(f"检查用户管理员权限失败: {str(e)}", exc_info=True)
             return False
 
-    async def save_chat_history(self, chat_data: ChatSchema) -> bool:
-        """保存聊天记录到数据库"""
+    def is_semantic_cache_enabled(self, tenant_id: str) -> bool:
+        """
+        租户是否启用语义回答缓存（tenant.semantic_cache，默认启用）
+        使用原生SQL查询 tenant 表
+        """
         try:
-            if not self.db:
-                logger.error("数据库会话不可用")
-                return False
+            from sqlalchemy import text
 
-            db_chat = ChatHistory(
-                user_id=chat_data.user_id,
-                tenant_id=chat_data.tenant_id,
-                model_id=chat_data.model_id,
-                chat_id=chat_data.chat_id,
-                prompt=chat_data.prompt,
-                system_prompt=chat_data.system_prompt,
-                think_content=chat_data.think_content,
-                response_content=chat_data.response_content,
-                content=chat_data.content,
-                create_time=datetime.now()
+            result = self.db.execute(
+                text("SELECT semantic_cache FROM tenant WHERE id = :tenant_id"),
+                {"tenant_id": tenant_id}
             )
+            value = result.scalar()
+            return value is None or int(value) == 1
 
-            self.db.add(db_chat)
-            self.db.commit()
-            logger.info(f"聊天记录保存成功: user_id={chat_data.user_id}, chat_id={chat_data.chat_id}")
+        except Exception as e:
+            self.db.rollback()
+            logger.error(f"查询租户语义缓存开关失败: {str(e)}", exc_info=True)
             return True
 
+    async def save_chat_history(self, chat_data: ChatSchema) -> bool:
+        """保存聊天记录（放入后台写入队列，由写入线程批量写入数据库，不使用请求的数据库会话）"""
+        try:
+            writer = service_container.get(HISTORY_WRITER)
+            row = history_row(chat_data, "chat")
+            if writer.submit(row):
+                return True
+            logger.warning(f"聊天记录写入队列已满，直接写入: user_id={chat_data.user_id}, chat_id={chat_data.chat_id}")
+            return await asyncio.to_thread(writer.write_now, row)
+
         except Exception as e:
             logger.error(f"保存聊天记录失败: {str(e)}", exc_info=True)
-            if self.db:
-                self.db.rollback()
             return False
 
     def get_chat_history(
@@ -246,22 +254,126 @@ class ChatRepository:
             .limit(size) \
             .all()
 
-        return [
-            ChatSchema(
-                id=chat.id,
-                user_id=chat.user_id,
-                tenant_id=chat.tenant_id,
-                model_id=chat.model_id,
-                files=chat.files,
-                chat_id=chat.chat_id,
-                prompt=chat.prompt,
-                system_prompt=chat.system_prompt,
-                think_content=chat.think_content,
-                response_content=chat.response_content,
-                content=chat.content,
-                create_time=chat.create_time
-            ) for chat in chat_history_list
-        ]
+        return [self._to_chat_schema(chat) for chat in chat_history_list]
+
+    # 游标分页的排序键：id 保证唯一。create_time 为 NOT NULL（旧数据的空值由 migrations/002 回填），不用 COALESCE 包装，
+    # 排序与游标条件才能直接使用 (user_id, tenant_id, create_time) / (user_id, create_time) 索引（InnoDB 二级索引自带主键）
+    HISTORY_SORT_KEYS = [
+        SortKey(ChatHistory.create_time),
+        SortKey(ChatHistory.id),
+    ]
+
+    def get_chat_history_by_cursor(
+            self,
+            user_id: str,
+            cursor_values: Optional[List[Any]],
+            scope: str,
+            size: int,
+            tenant_id: Optional[str] = None
+    ) -> Tuple[List[ChatSchema], Optional[str]]:
+        """
+        游标分页获取用户的聊天历史记录
+
+        Args:
+            user_id: 用户ID
+            cursor_values: 已解析的游标值，None 表示第一页
+            scope: 游标作用域（由 service 按筛选条件生成）
+            size: 每页数量
+            tenant_id: 租户ID（可选），不传则查询所有租户
+
+        Returns:
+            (聊天记录列表, 下一页游标)
+        """
+        query = self.db.query(ChatHistory).filter(ChatHistory.user_id == user_id)
+
+        if tenant_id is not None:
+            query = query.filter(ChatHistory.tenant_id == tenant_id)
+
+        rows = apply_keyset(query, self.HISTORY_SORT_KEYS, cursor_values).limit(size + 1).all()
+        rows, next_cursor = build_page(
+            rows, size, self.HISTORY_SORT_KEYS, lambda chat: [chat.create_time, chat.id], scope
+        )
+        return [self._to_chat_schema(chat) for chat in rows], next_cursor
+
+    # 会话列表按最后消息时间倒序，走 (user_id, [tenant_id,] last_message_time, id) 索引
+    CONVERSATION_SORT_KEYS = [
+        SortKey(ChatConversation.last_message_time),
+        SortKey(ChatConversation.id),
+    ]
+
+    def get_conversation_list_by_cursor(
+            self,
+            user_id: str,
+            cursor_values: Optional[List[Any]],
+            scope: str,
+            size: int,
+            tenant_id: Optional[str] = None
+    ) -> Tuple[List[ConversationSchema], Optional[str]]:
+        """
+        游标分页获取用户的会话列表（读取会话汇总表，不扫描聊天记录）
+
+        Args:
+            user_id: 用户ID
+            cursor_values: 已解析的游标值，None 表示第一页
+            scope: 游标作用域（由 service 按筛选条件生成）
+            size: 每页数量
+            tenant_id: 租户ID（可选），不传则查询所有租户
+
+        Returns:
+            (会话列表, 下一页游标)
+        """
+        query = self.db.query(ChatConversation).filter(ChatConversation.user_id == user_id)
+
+        if tenant_id is not None:
+            query = query.filter(ChatConversation.tenant_id == tenant_id)
+
+        rows = apply_keyset(query, self.CONVERSATION_SORT_KEYS, cursor_values).limit(size + 1).all()
+        rows, next_cursor = build_page(
+            rows, size, self.CONVERSATION_SORT_KEYS, lambda c: [c.last_message_time, c.id], scope
+        )
+        return [ConversationSchema.model_validate(conversation) for conversation in rows], next_cursor
+
+    def get_conversation_history_by_cursor(
+            self,
+            user_id: str,
+            chat_id: str,
+            cursor_values: Optional[List[Any]],
+            scope: str,
+            size: int
+    ) -> Tuple[List[ChatSchema], Optional[str]]:
+        """
+        游标分页获取一个会话的聊天记录（从最新一轮开始倒序，下一页为更早的记录）
+
+        Returns:
+            (聊天记录列表, 下一页游标)
+        """
+        query = self.db.query(ChatHistory).filter(
+            ChatHistory.user_id == user_id,
+            ChatHistory.chat_id == chat_id
+        )
+
+        rows = apply_keyset(query, self.HISTORY_SORT_KEYS, cursor_values).limit(size + 1).all()
+        rows, next_cursor = build_page(
+            rows, size, self.HISTORY_SORT_KEYS, lambda chat: [chat.create_time, chat.id], scope
+        )
+        return [self._to_chat_schema(chat) for chat in rows], next_cursor
+
+    @staticmethod
+    def _to_chat_schema(chat: ChatHistory) -> ChatSchema:
+        return ChatSchema(
+            id=chat.id,
+            user_id=chat.user_id,
+            tenant_id=chat.tenant_id,
+            model_id=chat.model_id,
+            files=chat.files,
+            chat_id=chat.chat_id,
+            prompt=chat.prompt,
+            system_prompt=chat.system_prompt,
+            think_content=chat.think_content,
+            response_content=chat.response_content,
+            content=chat.content,
+            create_time=chat.create_time
+        )
 
     def get_chat_history_total(
             self,
@@ -292,6 +404,8 @@ class ChatRepository:
                 ext=doc.ext,
                 tenant_id=doc.tenant_id,
                 user_id=doc.user_id,
+                content_hash=doc.content_hash,
+                source_doc_id=doc.source_doc_id,
                 create_time=datetime.now(),
                 update_time=datetime.now()
             )
@@ -328,6 +442,8 @@ class ChatRepository:
                     ext=doc.ext,
                     user_id=doc.user_id,
                     tenant_id=doc.tenant_id,
+                    content_hash=doc.content_hash,
+                    source_doc_id=doc.source_doc_id,
                     create_time=doc.create_time,
                     update_time=doc.update_time
                 )
@@ -336,6 +452,55 @@ class ChatRepository:
             logger.error(f"Failed to get document: {str(e)}")
             raise
 
+    def get_doc_by_hash(self, content_hash: str, user_id: str, tenant_id: Optional[str] = None) -> Optional[ChatDocSchema]:
+        """查找同一用户（租户）下内容相同的文档，tenant_id 为空时只匹配未归属租户的文档"""
+        try:
+            query = self.db.query(ChatDocModel).filter(
+                ChatDocModel.content_hash == content_hash,
+                ChatDocModel.user_id == user_id,
+            )
+            if tenant_id is None:
+                query = query.filter(ChatDocModel.tenant_id.is_(None))
+            else:
+                query = query.filter(ChatDocModel.tenant_id == tenant_id)
+            doc = query.order_by(ChatDocModel.create_time).first()
+            if doc:
+                return ChatDocSchema(
+                    id=doc.id,
+                    directory_id=doc.directory_id,
+                    name=doc.name,
+                    ext=doc.ext,
+                    user_id=doc.user_id,
+                    tenant_id=doc.tenant_id,
+                    content_hash=doc.content_hash,
+                    source_doc_id=doc.source_doc_id,
+                    create_time=doc.create_time,
+                    update_time=doc.update_time
+                )
+            return None
+        except Exception as e:
+            logger.error(f"Failed to get document by hash: {str(e)}", exc_info=True)
+            raise
+
+    def count_docs_by_hash(self, content_hash: str) -> int:
+        """引用同一磁盘文件的文档数（所有用户）"""
+        return self.db.query(ChatDocModel).filter(ChatDocModel.content_hash == content_hash).count()
+
+    def count_docs_by_source(self, source_doc_id: str) -> int:
+        """引用同一份向量的文档数（包括向量所属的文档本身）"""
+        return self.db.query(ChatDocModel).filter(
+            or_(ChatDocModel.source_doc_id == source_doc_id, ChatDocModel.id == source_doc_id)
+        ).count()
+
+    def get_source_doc_ids(self, doc_ids: List[str], user_id: str) -> List[str]:
+        """把文档ID换成向量所属的文档ID（未登记 source_doc_id 的旧文档即其本身），保持顺序并去重"""
+        rows = self.db.query(ChatDocModel.id, ChatDocModel.source_doc_id).filter(
+            ChatDocModel.id.in_(doc_ids),
+            ChatDocModel.user_id == user_id,
+        ).all()
+        mapping = {row.id: row.source_doc_id or row.id for row in rows}
+        return list(dict.fromkeys(mapping.get(doc_id, doc_id) for doc_id in doc_ids))
+
     def delete_doc(
             self,
             doc_id: str,
@@ -354,6 +519,41 @@ class ChatRepository:
             logger.error(f"Failed to delete document {doc_id}: {str(e)}")
             raise
 
+    def get_doc_tenant_ids(self, user_id: str, doc_ids: Optional[List[str]] = None) -> List[Optional[str]]:
+        """用户文档所在的租户（指定 doc_ids 时只看这些文档），用于路由到向量分片集合"""
+        query = self.db.query(ChatDocModel.tenant_id).filter(ChatDocModel.user_id == user_id)
+        if doc_ids:
+            query = query.filter(ChatDocModel.id.in_(doc_ids))
+        return [row.tenant_id for row in query.distinct().all()]
+
+    def get_docs_by_tenant(self, tenant_id: str) -> List[ChatDocSchema]:
+        """租户下所有用户的文档"""
+        return [
+            ChatDocSchema(
+                id=doc.id,
+                directory_id=doc.directory_id,
+                name=doc.name,
+                ext=doc.ext,
+                user_id=doc.user_id,
+                tenant_id=doc.tenant_id,
+                content_hash=doc.content_hash,
+                source_doc_id=doc.source_doc_id,
+                create_time=doc.create_time,
+                update_time=doc.update_time
+            ) for doc in self.db.query(ChatDocModel).filter(ChatDocModel.tenant_id == tenant_id).all()
+        ]
+
+    def delete_docs_by_tenant(self, tenant_id: str) -> int:
+        """删除租户下所有文档记录，返回删除条数"""
+        try:
+            deleted_count = self.db.query(ChatDocModel).filter(ChatDocModel.tenant_id == tenant_id).delete()
+            self.db.commit()
+            return deleted_count
+        except Exception as e:
+            self.db.rollback()
+            logger.error(f"Failed to delete documents of tenant {tenant_id}: {str(e)}")
+            raise
+
     def get_doc_List(self, user_id: str, directory_id: Optional[str] = None) -> List[ChatDocSchema]:
         query = self.db.query(ChatDocModel).filter(
             ChatDocModel.user_id == user_id,
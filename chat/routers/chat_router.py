@@ -1,11 +1,16 @@
 # chat/routers/chat_router.py
+from collections import deque
 from typing import Optional
 
-from fastapi import APIRouter, Depends, UploadFile, Header, HTTPException, WebSocket, WebSocketDisconnect, Query, Body, Path
+from fastapi import APIRouter, Depends, UploadFile, Header, HTTPException, WebSocket, WebSocketDisconnect, Query, Body, Path, Request
 from fastapi.responses import StreamingResponse
+from sse_starlette.sse import EventSourceResponse
 from chat.schemas.chat_schema import ChatParamsEntity, CreateDirectoryShema, RenameDirectorySchema
 from chat.schemas.chat_schema import AddModelSchema, UpdateModelSchema  # 新增导入
 from chat.services.chat_service import ChatService
+from chat.utils.sse_util import SSE_STREAMS, SSEStreams, StreamNotFound, parse_event_id
+from common.utils.service_container import service_container
+from common.utils.stream_util import WebSocketDisconnectWatcher, stream_until_disconnect
 import json
 import logging
 
@@ -25,16 +30,23 @@ def get_user_id_from_header(x_user_id: str = Header(None, alias="X-User-Id")):
 
 @router.post("/chat")
 async def chat(
+        request: Request,
         chat_params: ChatParamsEntity = Body(..., description="聊天参数"),
         current_user_id: str = Depends(get_user_id_from_header),
         chat_service: ChatService = Depends()
 ):
     """
     AI 对话（HTTP 流式）
-    与 WebSocket 聊天逻辑一致，流式返回文本
+    与 WebSocket 聊天逻辑一致，流式返回文本（排队等待推理准入时不返回排位消息）
+    客户端断开时立即取消模型的流式请求，已生成的部分回答加上中断标记保存
     """
     return StreamingResponse(
-        chat_service.chat_with_websocket(current_user_id, chat_params),
+        stream_until_disconnect(
+            request,
+            lambda cancel_event: chat_service.chat_with_websocket(
+                current_user_id, chat_params, report_queue=False, cancel_event=cancel_event
+            )
+        ),
         media_type="text/plain;charset=utf-8"
     )
 
@@ -49,6 +61,38 @@ async def get_chat_history_by_chat_id(
     return await chat_service.get_chat_history_by_chat_id(current_user_id, chatId)
 
 
+@router.get("/getConversationList")
+async def get_conversation_list(
+        cursor: Optional[str] = Query(None, description="上一页返回的游标，第一页不传"),
+        pageSize: int = Query(20, ge=1, le=100, description="每页数量"),
+        tenantId: Optional[str] = Query(None, description="租户ID，可选，不传则查询所有租户"),
+        current_user_id: str = Depends(get_user_id_from_header),
+        chat_service: ChatService = Depends()
+):
+    """
+    游标分页获取会话列表（标题、轮数、最后消息时间），按最后消息时间倒序
+
+    翻页时传入上一页返回的 cursor，cursor 为空表示没有下一页
+    """
+    return await chat_service.get_conversation_list(current_user_id, cursor, pageSize, tenantId)
+
+
+@router.get("/getConversationHistory")
+async def get_conversation_history(
+        chatId: str = Query(..., description="会话ID"),
+        cursor: Optional[str] = Query(None, description="上一页返回的游标，第一页不传"),
+        pageSize: int = Query(20, ge=1, le=100, description="每页数量"),
+        current_user_id: str = Depends(get_user_id_from_header),
+        chat_service: ChatService = Depends()
+):
+    """
+    游标分页获取一个会话的聊天记录，从最新一轮开始倒序，下一页为更早的记录
+
+    与 getChatHistoryByChatId 不同，不会一次加载整个会话
+    """
+    return await chat_service.get_conversation_history(current_user_id, chatId, cursor, pageSize)
+
+
 # ==================== 文档/目录接口 ====================
 
 @router.get("/getDocList")
@@ -132,6 +176,66 @@ async def delete_model(
     return await chat_service.delete_model(modelId, companyId, current_user_id)
 
 
+def _sse_response(events, stream_id: str) -> EventSourceResponse:
+    async def event_generator():
+        async for item in events:
+            yield item.to_sse(stream_id)
+
+    # X-Accel-Buffering: 禁止 Nginx 缓冲事件流
+    return EventSourceResponse(event_generator(), headers={"X-Accel-Buffering": "no"})
+
+
+@router.post("/sse")
+async def chat_sse(
+        chat_params: ChatParamsEntity = Body(..., description="聊天参数"),
+        current_user_id: str = Depends(get_user_id_from_header),
+        last_event_id: Optional[str] = Header(None, alias="Last-Event-ID"),
+        chat_service: ChatService = Depends()
+):
+    """
+    AI 对话（SSE）
+    事件类型: stream（data 为 streamId）、message（回答分片）、queue（排队排位）、error、completed；
+    事件 ID 为 "{streamId}:{序号}"，断线后带 Last-Event-ID 重新请求时从断点继续，不重新生成
+    """
+    streams: SSEStreams = service_container.get(SSE_STREAMS)
+    resume = parse_event_id(last_event_id)
+    if resume is not None:
+        stream_id, after_seq = resume
+    else:
+        buffered = streams.start(
+            current_user_id,
+            lambda cancel_event: chat_service.chat_with_websocket(
+                current_user_id, chat_params, cancel_event=cancel_event
+            )
+        )
+        stream_id, after_seq = buffered.stream_id, 0
+    try:
+        events = await streams.subscribe(stream_id, current_user_id, after_seq)
+    except StreamNotFound:
+        raise HTTPException(status_code=404, detail="流不存在或已过期，请重新提问")
+    return _sse_response(events, stream_id)
+
+
+@router.get("/sse/{streamId}")
+async def resume_chat_sse(
+        streamId: str = Path(..., description="流ID（stream 事件的 data）"),
+        lastEventId: Optional[str] = Query(None, description="最后收到的事件ID，优先使用请求头 Last-Event-ID"),
+        current_user_id: str = Depends(get_user_id_from_header),
+        last_event_id: Optional[str] = Header(None, alias="Last-Event-ID")
+):
+    """
+    续传 SSE 对话（适用于浏览器 EventSource，断线时自动带 Last-Event-ID 重连）
+    从最后收到的事件之后继续；未提供事件ID时从头回放
+    """
+    resume = parse_event_id(last_event_id or lastEventId)
+    after_seq = resume[1] if resume is not None and resume[0] == streamId else 0
+    try:
+        events = await service_container.get(SSE_STREAMS).subscribe(streamId, current_user_id, after_seq)
+    except StreamNotFound:
+        raise HTTPException(status_code=404, detail="流不存在或已过期，请重新提问")
+    return _sse_response(events, streamId)
+
+
 # ==================== 原有的其他接口 ====================
 
 @router.websocket("/ws/chat")
@@ -145,6 +249,7 @@ async def websocket_chat(
 
     用户ID通过URL参数X-User-Id传递（由网关设置）
     其他参数（prompt, chatId, modelId等）通过WebSocket send方法传递
+    回答过程中客户端断开时立即取消模型的流式请求；回答结束前收到的下一条消息在本轮结束后处理
     """
 
     if not X_User_Id:
@@ -156,9 +261,11 @@ async def websocket_chat(
 
     await websocket.accept()
 
+    # 流式输出期间由断开检测读取到的后续消息
+    pending = deque()
     try:
         while True:
-            data = await websocket.receive_text()
+            data = pending.popleft() if pending else await websocket.receive_text()
 
             try:
                 if isinstance(data, str):
@@ -184,9 +291,23 @@ async def websocket_chat(
                     tenantId=chat_params_data.get("tenantId", None)
                 )
 
-                async for response in chat_service.chat_with_websocket(user_id, chat_params):
-                    await websocket.send_text(response)
-
+                # 客户端断开时取消生成；发送失败时关闭生成器，排队中的请求随之出队
+                async with WebSocketDisconnectWatcher(websocket, pending) as watcher:
+                    stream = chat_service.chat_with_websocket(
+                        user_id, chat_params, cancel_event=watcher.cancel_event
+                    )
+                    try:
+                        async for response in stream:
+                            if watcher.disconnected:
+                                break
+                            await websocket.send_text(response)
+                    finally:
+                        await stream.aclose()
+                if watcher.disconnected:
+                    raise WebSocketDisconnect()
+
+            except WebSocketDisconnect:
+                raise
             except json.JSONDecodeError as e:
                 logger.error(f"JSON解析错误: {str(e)}")
                 await websocket.send_text(f"Error: Invalid JSON format - {str(e)}")
@@ -217,6 +338,26 @@ async def upload_doc(
     return await chat_service.upload_doc(file, current_user_id, directoryId, tenantId)
 
 
+@router.get("/getDocStatus")
+async def get_doc_status(
+        docId: str = Query(..., description="文档ID（即上传返回的任务ID）"),
+        current_user_id: str = Depends(get_user_id_from_header),
+        chat_service: ChatService = Depends()
+):
+    """查询文档后台入库进度"""
+    return await chat_service.get_doc_status(docId, current_user_id)
+
+
+@router.post("/retryDoc/{docId}")
+async def retry_doc(
+        docId: str = Path(..., description="文档ID"),
+        current_user_id: str = Depends(get_user_id_from_header),
+        chat_service: ChatService = Depends()
+):
+    """重试入库失败的文档（从已完成的片段继续）"""
+    return await chat_service.retry_doc(docId, current_user_id)
+
+
 @router.delete("/deleteDoc/{doc_id}")
 async def delete_document(
         doc_id: str,
@@ -226,11 +367,22 @@ async def delete_document(
     return await chat_service.delete_document(doc_id, current_user_id)
 
 
+@router.delete("/deleteTenantDocs/{tenantId}")
+async def delete_tenant_docs(
+        tenantId: str,
+        current_user_id: str = Depends(get_user_id_from_header),
+        chat_service: ChatService = Depends()
+):
+    """删除租户的全部文档与向量集合（删除租户时调用，需要超级管理员权限）"""
+    return await chat_service.delete_tenant_docs(tenantId, current_user_id)
+
+
 @router.get("/getChatHistory")
 async def get_history(
         pageNum: int = Query(1, ge=1, description="页码"),
         pageSize: int = Query(10, ge=1, le=100, description="每页数量"),
         tenantId: Optional[str] = Query(None, description="租户ID，可选，不传则查询所有租户"),
+        withTotal: bool = Query(True, description="是否返回总数，不需要时传 false 省去一次统计"),
         current_user_id: str = Depends(get_user_id_from_header),
         chat_service: ChatService = Depends()
 ):
@@ -241,9 +393,28 @@ async def get_history(
         pageNum: 页码，从1开始
         pageSize: 每页数量，最大100
         tenantId: 租户ID（可选），不传则查询该用户所有租户的聊天记录
+        withTotal: 是否返回总数
         current_user_id: 当前登录用户ID
     """
-    return await chat_service.get_chat_history(current_user_id, pageNum, pageSize, tenantId)
+    return await chat_service.get_chat_history(current_user_id, pageNum, pageSize, tenantId, withTotal)
+
+
+@router.get("/getChatHistoryCursor")
+async def get_history_cursor(
+        cursor: Optional[str] = Query(None, description="上一页返回的游标，第一页不传"),
+        pageSize: int = Query(10, ge=1, le=100, description="每页数量"),
+        tenantId: Optional[str] = Query(None, description="租户ID，可选，不传则查询所有租户"),
+        withTotal: bool = Query(True, description="是否返回总数（仅第一页生效）"),
+        current_user_id: str = Depends(get_user_id_from_header),
+        chat_service: ChatService = Depends()
+):
+    """
+    游标分页获取聊天历史记录
+
+    与 getChatHistory 返回相同的数据结构，翻页时传入上一页返回的 cursor，
+    cursor 为空表示没有下一页
+    """
+    return await chat_service.get_chat_history_by_cursor(current_user_id, cursor, pageSize, tenantId, withTotal)
 
 
 @router.get("/getDocListByDirId")
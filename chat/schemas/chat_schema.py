@@ -44,6 +44,26 @@ class ChatSchema(BaseModel):
     )
 
 
+class ConversationSchema(BaseModel):
+    """会话汇总（会话列表的一项）"""
+    id: int
+    user_id: str
+    tenant_id: Optional[str] = None
+    chat_id: str
+    title: Optional[str] = None
+    model_id: Optional[str] = None
+    turn_count: int = 0
+    create_time: Optional[datetime] = None
+    last_message_time: Optional[datetime] = None
+
+    model_config = ConfigDict(
+        from_attributes=True,
+        json_encoders={
+            datetime: lambda v: v.strftime("%Y-%m-%d %H:%M:%S") if v else None
+        }
+    )
+
+
 class ChatParamsEntity(BaseModel):
     """WebSocket消息参数 - 通过send方法传递"""
     prompt: str
@@ -106,6 +126,8 @@ class ChatDocSchema(BaseModel):
     ext: Optional[str] = None
     user_id: Optional[str] = None
     tenant_id: Optional[str] = None
+    content_hash: Optional[str] = None
+    source_doc_id: Optional[str] = None
     create_time: Optional[datetime] = None
     update_time: Optional[datetime] = None
 
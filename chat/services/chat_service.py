@@ -1,11 +1,11 @@
 import os
 import asyncio
 import uuid
+import hashlib
 import logging
-from datetime import datetime, timedelta
-from typing import List, Any, AsyncGenerator, Optional
+from datetime import datetime
+from typing import List, Any, AsyncGenerator, Optional, Tuple
 from fastapi import UploadFile, HTTPException, Depends
-from langchain_community.chat_models import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
 from sqlalchemy.orm import Session
 from chat.repositories.chat_repository import ChatRepository
@@ -14,15 +14,25 @@ from chat.schemas.chat_schema import AddModelSchema, UpdateModelSchema  # 新增
 from chat.utils.chat_util import PromptUtil
 from common.config.common_database import get_db
 from common.utils.result_util import ResultEntity, ResultUtil
-import redis
-from pypdf import PdfReader
-from langchain_ollama import OllamaEmbeddings
-from langchain_ollama import OllamaLLM
-from langchain_core.documents import Document
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from io import BytesIO
+from common.utils.pagination_util import CursorError, decode_cursor
+from common.utils.count_cache_util import fetch_page_with_total
+from common.utils.redis_util import get_redis
+from common.utils.chat_memory_util import ChatMemory
+from common.utils.service_container import service_container
+from common.utils.llm_client_util import LLM_CLIENTS, MODEL_CONFIGS, invalidate_model
+from common.utils.admission_util import ADMISSION, AdmissionRejected, queue_message
+from common.utils.stream_util import PARTIAL_RESPONSE_MARKER, ClientDisconnected, cancellable, coalesce
+from common.utils.stream_util import ErrorMessage, is_error_message
+from chat.utils.context_util import ContextManager, ConversationContext, get_token_budget, get_token_counter
+from chat.utils.chroma_util import CHROMA_CLIENT, CHROMA_COLLECTION_NAME, EMBEDDING, VECTOR_STORE
+from chat.utils.collection_util import COLLECTION_ROUTER, CollectionRouter
+from chat.utils.retrieval_util import CHAT_RETRIEVAL_CANDIDATES, CHAT_RETRIEVAL_TOP_K, RETRIEVER, VectorRetriever
+from chat.utils.lexical_util import get_lexical_index, reciprocal_rank_fusion
+from chat.utils.semantic_cache_util import CACHE_REQUESTS as SEMANTIC_CACHE_REQUESTS
+from chat.utils.semantic_cache_util import SEMANTIC_CACHE, SEMANTIC_CACHE_ENABLED, SemanticCache, cache_scope, replay
+from chat.utils.rerank_util import CHAT_CONTEXT_DOC_TOKENS, CHAT_RERANK_CANDIDATES, get_reranker, pack_documents, rerank
+from chat.utils.ingestion_util import FAILED, INGESTION, PENDING, SUCCESS, IngestionPipeline
 from chat.schemas.chat_schema import DirectorySchema
-from langchain_chroma import Chroma
 
 # ========== 彻底禁用 ChromaDB 遥测（通过环境变量） ==========
 _os = os
@@ -38,13 +48,10 @@ warnings.filterwarnings("ignore", message=".*capture.*")
 logger = logging.getLogger(__name__)
 
 # 直接从环境变量读取配置
-REDIS_URL = os.getenv("REDIS_URL")
 UPLOAD_DIR = os.getenv("UPLOAD_DIR")
-CHROMA_HOST = os.getenv("CHROMA_HOST")
-CHROMA_PORT = int(os.getenv("CHROMA_PORT"))
-CHROMA_COLLECTION_NAME = os.getenv("CHROMA_COLLECTION_NAME")
-OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL")
-EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL")
+
+# 上传文件写入磁盘的分块大小
+UPLOAD_CHUNK_BYTES = 1024 * 1024
 
 
 class ChatService:
@@ -52,146 +59,48 @@ class ChatService:
             self,
             db: Session = Depends(get_db)
     ):
-        self.redis = redis.Redis.from_url(REDIS_URL)
+        # 请求级：数据库会话与仓储；进程级：Redis连接池、Chroma客户端、嵌入模型、向量存储
+        self.redis = get_redis()
+        self.chat_memory = ChatMemory("chat", self.redis)
+        self.context_manager = ContextManager(self.chat_memory)
         self.upload_dir = UPLOAD_DIR
         self.chat_repository = ChatRepository(db)
         self.db = db
-        self._chroma_client = None
-        self._embedding_model = None
-        self._vector_store = None
 
     def _get_chroma_client(self):
-        """获取或创建 Chroma 客户端（修复配置问题）"""
-        if self._chroma_client is None:
-            try:
-                import chromadb
-                from chromadb.config import Settings as ChromaSettings
-
-                # 新版 ChromaDB 配置：只保留允许的字段
-                chroma_settings = ChromaSettings(
-                    anonymized_telemetry=False,
-                    allow_reset=True,
-                )
-
-                try:
-                    # 尝试 HTTP 连接
-                    self._chroma_client = chromadb.HttpClient(
-                        host=CHROMA_HOST,
-                        port=CHROMA_PORT,
-                        settings=chroma_settings
-                    )
-                    self._chroma_client.heartbeat()
-                    logger.info(
-                        f"[ChatService] Chroma HTTP客户端连接成功: {CHROMA_HOST}:{CHROMA_PORT}"
-                    )
-                except Exception as e:
-                    logger.warning(f"[ChatService] HTTP客户端连接失败: {str(e)}，尝试使用持久化方式")
-                    persist_dir = os.path.join(os.path.dirname(__file__), "..", "..", "chroma_db")
-                    os.makedirs(persist_dir, exist_ok=True)
-
-                    # 持久化客户端配置
-                    self._chroma_client = chromadb.PersistentClient(
-                        path=persist_dir,
-                        settings=chroma_settings
-                    )
-                    logger.info(f"[ChatService] Chroma持久化客户端初始化成功: {persist_dir}")
-
-            except Exception as e:
-                logger.error(f"[ChatService] Chroma客户端初始化失败: {str(e)}")
-                try:
-                    from chromadb.config import Settings as ChromaSettings
-                    # 内存模式：使用临时目录
-                    import tempfile
-                    temp_dir = tempfile.mkdtemp(prefix="chroma_")
-
-                    self._chroma_client = chromadb.PersistentClient(
-                        path=temp_dir,
-                        settings=ChromaSettings(
-                            anonymized_telemetry=False,
-                            allow_reset=True,
-                        )
-                    )
-                    logger.info(f"[ChatService] Chroma 临时持久化客户端初始化成功: {temp_dir}")
-                except Exception as e2:
-                    logger.error(f"[ChatService] 所有Chroma客户端初始化方式都失败: {str(e2)}")
-                    raise
-
-        return self._chroma_client
+        """获取进程级共享的 Chroma 客户端"""
+        return service_container.get(CHROMA_CLIENT)
 
     def _get_embedding_model(self):
-        """获取嵌入模型"""
-        if self._embedding_model is None:
-            self._embedding_model = OllamaEmbeddings(
-                model=EMBEDDING_MODEL,
-                base_url=OLLAMA_BASE_URL
-            )
-        return self._embedding_model
+        """获取进程级共享的嵌入模型"""
+        return service_container.get(EMBEDDING)
 
     def _get_chroma_store(self):
-        """获取 Chroma 向量存储（带缓存）"""
-        if self._vector_store is None:
-            try:
-                os.environ["ANONYMIZED_TELEMETRY"] = "False"
-                os.environ["CHROMA_TELEMETRY_DISABLED"] = "true"
+        """获取进程级共享的 Chroma 向量存储"""
+        return service_container.get(VECTOR_STORE)
 
-                client = self._get_chroma_client()
-                embedding = self._get_embedding_model()
+    def _get_ingestion(self) -> IngestionPipeline:
+        """获取进程级共享的文档入库任务"""
+        return service_container.get(INGESTION)
 
-                collection_name = CHROMA_COLLECTION_NAME
+    def _get_retriever(self) -> VectorRetriever:
+        """获取进程级共享的异步向量检索器"""
+        return service_container.get(RETRIEVER)
 
-                try:
-                    collection = client.get_collection(collection_name)
-                    logger.info(f"[ChatService] 使用已存在的集合: {collection_name}")
-                except Exception:
-                    collection = client.create_collection(
-                        name=collection_name,
-                        metadata={"hnsw:space": "cosine"}
-                    )
-                    logger.info(f"[ChatService] 创建新集合: {collection_name}")
+    def _get_collection_router(self) -> CollectionRouter:
+        """获取进程级共享的向量集合路由"""
+        return service_container.get(COLLECTION_ROUTER)
 
-                self._vector_store = Chroma(
-                    client=client,
-                    collection_name=collection_name,
-                    embedding_function=embedding,
-                    collection_metadata={"hnsw:space": "cosine"}
-                )
-                logger.info(f"[ChatService] Chroma 向量存储初始化成功")
-
-            except Exception as e:
-                logger.error(f"[ChatService] 获取Chroma存储失败: {str(e)}")
-                try:
-                    logger.info("[ChatService] 尝试使用本地持久化方式...")
-                    persist_directory = os.path.join(os.path.dirname(__file__), "..", "..", "chroma_db")
-                    os.makedirs(persist_directory, exist_ok=True)
-
-                    self._vector_store = Chroma(
-                        collection_name=CHROMA_COLLECTION_NAME,
-                        embedding_function=self._get_embedding_model(),
-                        persist_directory=persist_directory
-                    )
-                    logger.info(f"[ChatService] 本地持久化方式初始化成功: {persist_directory}")
-                except Exception as e2:
-                    try:
-                        logger.info("[ChatService] 尝试使用内存模式...")
-                        import tempfile
-                        temp_dir = tempfile.mkdtemp(prefix="chroma_")
-
-                        self._vector_store = Chroma(
-                            collection_name=CHROMA_COLLECTION_NAME,
-                            embedding_function=self._get_embedding_model(),
-                            persist_directory=temp_dir
-                        )
-                        logger.info(f"[ChatService] 内存模式初始化成功: {temp_dir}")
-                    except Exception as e3:
-                        logger.error(f"[ChatService] 所有方式都失败: {str(e3)}")
-                        raise
-
-        return self._vector_store
+    def _get_semantic_cache(self) -> SemanticCache:
+        """获取进程级共享的语义回答缓存"""
+        return service_container.get(SEMANTIC_CACHE)
 
     async def chat_with_websocket(
             self,
             user_id: str,
-            chat_params: ChatParamsEntity
+            chat_params: ChatParamsEntity,
+            report_queue: bool = True,
+            cancel_event: Optional[asyncio.Event] = None
     ) -> AsyncGenerator[str, None]:
         """
         WebSocket聊天处理
@@ -199,6 +108,9 @@ class ChatService:
         Args:
             user_id: 用户ID（由网关验证后传递）
             chat_params: 聊天参数
+            report_queue: 排队等待推理准入时是否产出排位消息 "[queue:N]"（HTTP 流式接口不产出）
+            cancel_event: 客户端断开时由路由设置；设置后立即取消排队与模型的流式请求，
+                已生成的部分回答加上中断标记保存（生成器被关闭或任务被取消时同样如此）
         """
         logger.info(f"[ChatService] ========== 开始处理聊天请求 ==========")
         logger.info(f"[ChatService] user_id={user_id}")
@@ -223,15 +135,16 @@ class ChatService:
 
         logger.info(f"[ChatService] chat_entity创建成功: model_id={chat_entity.model_id}")
 
+        # 回答分片（结束后一次拼接，避免逐个 token 拼接字符串）
+        response_parts: List[str] = []
+        # 模型生成进行中（未正常结束）；此时退出说明回答被中断，在 finally 中保存部分回答
+        generating = False
         try:
-            # 从数据库获取模型配置（传入 tenant_id 作为 company_id 筛选条件）
-            model_config = self.chat_repository.get_model_by_id(
-                chat_params.modelId,
-                company_id=chat_params.companyId
-            )
+            # 获取模型配置（传入 companyId 作为筛选条件；进程内缓存，模型变更时失效）
+            model_config = self._get_model_config(chat_params.modelId, chat_params.companyId)
             if not model_config:
                 logger.error(f"[ChatService] 未找到模型配置: {chat_params.modelId}")
-                yield f"Error: 未找到模型配置 {chat_params.modelId}"
+                yield ErrorMessage(f"Error: 未找到模型配置 {chat_params.modelId}")
                 yield "[completed]"
                 return
 
@@ -241,80 +154,121 @@ class ChatService:
             chat_model = await self._create_chat_model(model_config, chat_params.showThink)
             if not chat_model:
                 logger.error(f"[ChatService] 不支持的模型类型: {model_config.type}")
-                yield f"Error: 不支持的模型类型 {model_config.type}"
+                yield ErrorMessage(f"Error: 不支持的模型类型 {model_config.type}")
                 yield "[completed]"
                 return
 
-            chat_history_key = f"chat_history:{user_id}:{chat_params.chatId}"
-            chat_history = self.redis.get(chat_history_key)
-
             system_prompt = chat_params.systemPrompt if chat_params.systemPrompt and chat_params.systemPrompt != '' else "你叫小吴同学，是一个无所不能的AI助手，上知天文下知地理，请用小吴同学的身份回答问题。"
-            messages = [
-                ("system", system_prompt)
-            ]
 
-            if chat_history:
+            # 语义缓存：会话第一轮的问题与已缓存的问题足够相似时直接回放缓存的回答，不调用模型
+            cache_scope_key, cache_vector, cache_hit = await self._lookup_semantic_cache(
+                user_id, chat_params, system_prompt
+            )
+
+            conversation = ConversationContext()
+            if cache_hit is not None:
+                logger.info(f"[ChatService] 命中语义缓存: similarity={cache_hit.similarity:.4f}")
+                stream = coalesce(replay(cache_hit.answer))
                 try:
-                    messages.extend(eval(chat_history.decode('utf-8')))
-                    logger.info(f"[ChatService] 加载了历史会话，共{len(messages)}条消息")
-                except Exception as e:
-                    logger.warning(f"Failed to parse chat history from Redis: {str(e)}")
+                    async for chunk in stream:
+                        response_parts.append(chunk)
+                        yield chunk
+                finally:
+                    await stream.aclose()
+            else:
+                prompt = chat_params.prompt
+                if chat_params.type == "document":
+                    # 使用 docIds 数组调用 build_context
+                    context = await self.build_context(
+                        query=chat_params.prompt,
+                        user_id=user_id,
+                        doc_ids=chat_params.docIds,
+                        tenant_id=chat_params.tenantId,
+                        chat_model=chat_model,
+                        model_config=model_config
+                    )
+                    logger.info(f"[ChatService] 查询到相关文档，长度: {len(context) if context else 0}")
 
-            messages.append(("human", chat_params.prompt))
+                    if context:
+                        prompt = f"请参考以下内容\n: {context}\n\n回答问题: {chat_params.prompt}"
+                        logger.info(f"[ChatService] 已添加文档上下文，长度: {len(context)}")
+                    else:
+                        yield "对不起，没有查询到相关文档！"
+                        yield "[completed]"
+                        return
+                else:
+                    logger.info(f"[ChatService] 不查询文档")
 
-            chat_template = ChatPromptTemplate.from_messages(messages)
+                messages = [
+                    ("system", system_prompt)
+                ]
 
-            prompt = chat_params.prompt
-            if chat_params.type == "document":
-                # 使用 docIds 数组调用 build_context
-                context = await self.build_context(
-                    query=chat_params.prompt,
-                    user_id=user_id,
-                    doc_ids=chat_params.docIds,
-                    tenant_id=chat_params.tenantId
-                )
-                logger.info(f"[ChatService] 查询到相关文档，长度: {len(context) if context else 0}")
+                # 按模型的 token 预算组装历史：滚动摘要 + 最近若干轮原文（本轮问题含文档上下文，先计入预算）
+                try:
+                    conversation = self.context_manager.build(
+                        model_config, user_id, chat_params.chatId, system_prompt, prompt
+                    )
+                    messages.extend(conversation.to_messages())
+                except Exception as e:
+                    logger.warning(f"Failed to load chat history from Redis: {str(e)}")
 
-                if context:
-                    prompt = f"请参考以下内容\n: {context}\n\n回答问题: {chat_params.prompt}"
-                    logger.info(f"[ChatService] 已添加文档上下文，长度: {len(context)}")
-                else:
-                    yield "对不起，没有查询到相关文档！"
-                    yield "[completed]"
-                    return
-            else:
-                logger.info(f"[ChatService] 不查询文档")
+                messages.append(("human", "{prompt}"))
 
-            formatted_prompt = chat_template.format_messages(prompt=prompt)
+                chat_template = ChatPromptTemplate.from_messages(messages)
 
-            full_response = ""
+                formatted_prompt = chat_template.format_messages(prompt=prompt)
 
-            if model_config.type == "ollama":
-                logger.info(f"[ChatService] 使用Ollama模型流式响应")
-                async for chunk in chat_model.astream(
-                        formatted_prompt,
-                        config={"configurable": {"session_id": chat_params.chatId}},
-                ):
-                    chunk_str = str(chunk)
-                    full_response += chunk_str
-                    yield chunk_str
-            else:
-                logger.info(f"[ChatService] 使用在线模型流式响应: {model_config.type}")
-                async for chunk in self._stream_online_model(chat_model, formatted_prompt):
-                    chunk_str = chunk
-                    full_response += chunk_str
-                    yield chunk_str
+                # 按模型准入：超出并发上限时排队，排队期间向客户端报告排位
+                ticket = service_container.get(ADMISSION).ticket(model_config, user_id)
+                try:
+                    try:
+                        async for position in ticket.wait(cancel_event):
+                            if report_queue:
+                                yield queue_message(position)
+                    except AdmissionRejected as e:
+                        logger.warning(f"[ChatService] 推理准入被拒绝: model={model_config.model_name}, {str(e)}")
+                        yield ErrorMessage(f"Error: {str(e)}")
+                        yield "[completed]"
+                        return
+
+                    if model_config.type == "ollama":
+                        logger.info(f"[ChatService] 使用Ollama模型流式响应")
+                        upstream = chat_model.astream(
+                            formatted_prompt,
+                            config={"configurable": {"session_id": chat_params.chatId}},
+                        )
+                    else:
+                        logger.info(f"[ChatService] 使用在线模型流式响应: {model_config.type}")
+                        upstream = self._stream_online_model(chat_model, formatted_prompt)
+
+                    # 客户端断开时立即取消上游的流式请求（而不是读完最后一个 token）；
+                    # token 分片按时间 / 大小合并后输出，减少 WebSocket 帧数（第一个分片立即输出）
+                    generating = True
+                    stream = coalesce(cancellable(upstream, cancel_event))
+                    try:
+                        async for chunk in stream:
+                            response_parts.append(chunk)
+                            yield chunk
+                    finally:
+                        await stream.aclose()
+                    generating = False
+                finally:
+                    ticket.release()
+
+            full_response = "".join(response_parts)
+            failed = any(is_error_message(part) for part in response_parts)
+            if cache_hit is None and cache_scope_key and full_response and not failed:
+                asyncio.create_task(self._get_semantic_cache().store(
+                    cache_scope_key, cache_vector, chat_params.prompt, full_response
+                ))
 
             try:
-                updated_messages = messages.copy()
-                updated_messages.append(("ai", full_response))
-                if len(updated_messages) > 20:
-                    updated_messages = updated_messages[-20:]
-
-                self.redis.setex(
-                    chat_history_key,
-                    timedelta(days=180),
-                    str(updated_messages)
+                # 只追加本轮的问答，历史中保存用户原始问题（不含检索到的文档上下文）
+                self.chat_memory.append(
+                    user_id,
+                    chat_params.chatId,
+                    ("human", chat_params.prompt),
+                    ("ai", full_response)
                 )
                 logger.info(f"[ChatService] 会话已保存到Redis")
             except Exception as e:
@@ -329,10 +283,80 @@ class ChatService:
 
             asyncio.create_task(self.save_chat_history_async(chat_entity, full_response))
 
+            if conversation.needs_compaction:
+                # 更早的消息在回答结束后折叠进滚动摘要，不占用本轮响应时间
+                asyncio.create_task(self.context_manager.compact(
+                    chat_model, model_config, user_id, chat_params.chatId, conversation
+                ))
+
+        except ClientDisconnected:
+            logger.info(f"[ChatService] 客户端已断开，停止生成: chatId={chat_params.chatId}, "
+                        f"已生成 {sum(len(part) for part in response_parts)} 字符")
         except Exception as e:
             logger.error(f"WebSocket chat error: {str(e)}", exc_info=True)
-            yield f"Error occurred: {str(e)}"
+            yield ErrorMessage(f"Error occurred: {str(e)}")
             yield "[completed]"
+        finally:
+            if generating and response_parts:
+                self._save_partial_response(user_id, chat_params, chat_entity, "".join(response_parts))
+
+    def _save_partial_response(
+            self,
+            user_id: str,
+            chat_params: ChatParamsEntity,
+            chat_entity: ChatSchema,
+            partial_response: str
+    ) -> None:
+        """
+        保存被中断的回答（客户端断开、生成器被关闭或生成出错），末尾加上中断标记，不写入语义缓存
+
+        在生成器的 finally 中调用（可能处于 GeneratorExit / CancelledError 处理中），不能 await
+        """
+        content = partial_response + PARTIAL_RESPONSE_MARKER
+        try:
+            self.chat_memory.append(
+                user_id,
+                chat_params.chatId,
+                ("human", chat_params.prompt),
+                ("ai", content)
+            )
+        except Exception as e:
+            logger.error(f"Failed to save chat history to Redis: {str(e)}")
+
+        chat_entity.create_time = datetime.now()
+        logger.info(f"[ChatService] 回答被中断，保存部分回答: chatId={chat_params.chatId}, 长度={len(partial_response)}")
+        asyncio.create_task(self.save_chat_history_async(chat_entity, content))
+
+    async def _lookup_semantic_cache(self, user_id: str, chat_params: ChatParamsEntity, system_prompt: str):
+        """
+        查询语义回答缓存
+
+        Returns:
+            (作用域, 问题向量, 命中结果)；未启用、租户已关闭或不是会话第一轮时作用域为 None（本轮回答也不写入缓存）
+        """
+        if not SEMANTIC_CACHE_ENABLED or not chat_params.prompt:
+            return None, None, None
+        try:
+            cache = self._get_semantic_cache()
+            if not await cache.tenant_enabled(chat_params.tenantId, self.chat_repository.is_semantic_cache_enabled):
+                SEMANTIC_CACHE_REQUESTS.inc(result="skipped")
+                return None, None, None
+            # 多轮对话的回答依赖上下文，只缓存会话的第一轮
+            summary, history = await asyncio.to_thread(self.chat_memory.load_with_summary, user_id, chat_params.chatId)
+            if summary or history:
+                SEMANTIC_CACHE_REQUESTS.inc(result="skipped")
+                return None, None, None
+
+            scope = cache_scope(
+                chat_params.modelId, system_prompt, chat_params.tenantId, chat_params.docIds, user_id,
+                chat_params.type, chat_params.showThink, chat_params.language
+            )
+            # 与文档检索共用嵌入缓存，同一问题只嵌入一次
+            vector = await self._get_retriever().embed(chat_params.prompt)
+            return scope, vector, await cache.lookup(scope, vector)
+        except Exception as e:
+            logger.warning(f"[ChatService] 查询语义缓存失败: {str(e)}")
+            return None, None, None
 
     # ==================== 模型管理方法 ====================
 
@@ -377,6 +401,8 @@ class ChatService:
             if not result:
                 return ResultUtil.fail(data=0, msg="添加模型失败")
 
+            invalidate_model()
+
             return ResultUtil.success(data=1, msg="模型添加成功")
 
         except Exception as e:
@@ -427,6 +453,8 @@ class ChatService:
             if not result:
                 return ResultUtil.fail(data=0, msg="更新模型失败")
 
+            invalidate_model(model_data.id)
+
             return ResultUtil.success(data=1, msg="模型更新成功")
 
         except Exception as e:
@@ -460,43 +488,28 @@ class ChatService:
             if not success:
                 return ResultUtil.fail(data=0, msg="删除模型失败")
 
+            invalidate_model(model_id)
+
             return ResultUtil.success(data=1, msg="模型删除成功")
 
         except Exception as e:
             logger.error(f"删除模型失败: {str(e)}", exc_info=True)
             return ResultUtil.fail(data=0, msg=f"删除模型失败: {str(e)}")
 
+    def _get_model_config(self, model_id: str, company_id: Optional[str] = None) -> Optional[ChatModelSchema]:
+        """获取模型配置（进程内缓存，新增 / 更新 / 删除模型时跨进程失效）"""
+        configs = service_container.get(MODEL_CONFIGS)
+        key = ("chat", model_id, company_id)
+        model_config = configs.get(key)
+        if model_config is None:
+            model_config = self.chat_repository.get_model_by_id(model_id, company_id=company_id)
+            configs.put(key, model_config)
+        return model_config
+
     async def _create_chat_model(self, model_config: ChatModelSchema, show_think: bool) -> Any:
-        """根据模型配置创建对应的聊天模型实例"""
+        """获取模型配置对应的聊天模型实例（进程级客户端池，同一配置共用对象及其 HTTP 连接）"""
         try:
-            if model_config.type == "ollama":
-                logger.info(f"[ChatService] 创建Ollama模型: {model_config.model_name}")
-                return OllamaLLM(
-                    model=model_config.model_name,
-                    base_url=model_config.base_url or "http://localhost:11434",
-                    model_kwargs={"options": {"think": show_think}}
-                )
-
-            elif model_config.type in ["deepseek", "tongyi"]:
-                base_url = model_config.base_url
-                if model_config.type == "deepseek":
-                    base_url = base_url or "https://api.deepseek.com/v1"
-                elif model_config.type == "tongyi":
-                    base_url = base_url or "https://dashscope.aliyuncs.com/compatible-mode/v1"
-
-                logger.info(f"[ChatService] 创建在线模型: {model_config.type}, base_url={base_url}")
-                return ChatOpenAI(
-                    model=model_config.model_name,
-                    api_key=model_config.api_key,
-                    base_url=base_url,
-                    streaming=True,
-                    temperature=0.7
-                )
-
-            else:
-                logger.error(f"不支持的模型类型: {model_config.type}")
-                return None
-
+            return service_container.get(LLM_CLIENTS).get(model_config, show_think)
         except Exception as e:
             logger.error(f"创建聊天模型失败: {str(e)}")
             return None
@@ -511,7 +524,7 @@ class ChatService:
                     yield str(chunk)
         except Exception as e:
             logger.error(f"在线大模型流式处理失败: {str(e)}")
-            yield f"模型响应错误: {str(e)}"
+            yield ErrorMessage(f"模型响应错误: {str(e)}")
 
     async def save_chat_history_async(self, chat_entity: ChatSchema, content: str):
         """异步保存聊天记录的辅助方法"""
@@ -577,230 +590,196 @@ class ChatService:
             query: str,
             user_id: str,
             doc_ids: Optional[List[str]] = None,
-            tenant_id: str = None
+            tenant_id: str = None,
+            chat_model: Any = None,
+            model_config: Optional[ChatModelSchema] = None
     ) -> str:
         """
-        执行 Chroma 向量相似度查询，返回字符串结果
+        混合检索：Chroma 向量相似度查询与关键词（BM25）查询各召回 CHAT_RETRIEVAL_CANDIDATES 个候选，
+        按 RRF 融合后取前 CHAT_RETRIEVAL_TOP_K 个，返回字符串结果
 
+        启用重排（CHAT_RERANKER）时两路各召回 CHAT_RERANK_CANDIDATES 个候选，融合后重排再取前 CHAT_RETRIEVAL_TOP_K 个；
+        llm 重排使用传入的 chat_model。片段全文按 model_config 对应模型的 token 计数装入上下文（见 chat/utils/rerank_util.py）。
+
+        嵌入与查询都不阻塞事件循环（见 chat/utils/retrieval_util.py），各阶段耗时记录在日志与指标中。
+        用户、租户、文档过滤条件在两路查询中都先于排序生效；向量查询只在路由到的租户分片集合中进行。
         修复了 ChromaDB 过滤条件格式问题
         """
         try:
             logger.info(f"[build_context] 开始构建上下文，查询: {query[:50]}...")
 
-            # 确保遥测已禁用
-            _os.environ["ANONYMIZED_TELEMETRY"] = "False"
-            _os.environ["CHROMA_TELEMETRY_DISABLED"] = "true"
+            retriever = self._get_retriever()
+            timer = retriever.timer()
 
-            # 获取 Chroma 向量存储
-            vector_store = self._get_chroma_store()
+            doc_ids, collections = await self._retrieval_scope(user_id, tenant_id, doc_ids)
 
             # 构建过滤条件 - 使用正确的格式
             filter_conditions = self._build_where_filter(user_id, tenant_id, doc_ids)
-            logger.info(f"[build_context] 过滤条件: {filter_conditions}")
+            logger.info(f"[build_context] 过滤条件: {filter_conditions}, 集合: {collections}")
 
-            # 执行相似度搜索
-            try:
-                if filter_conditions:
-                    results = vector_store.similarity_search_with_score(
-                        query,
-                        k=5,
-                        filter=filter_conditions
-                    )
-                else:
-                    results = vector_store.similarity_search_with_score(
-                        query,
-                        k=5
-                    )
-            except Exception as e:
-                # 如果 filter 导致错误，尝试不带 filter 查询
-                if "filter" in str(e).lower() or "where" in str(e).lower() or "metadata" in str(e).lower():
-                    logger.warning(f"[build_context] 带filter查询失败，尝试不带filter: {str(e)}")
-                    results = vector_store.similarity_search_with_score(
-                        query,
-                        k=10  # 增加数量以便后续过滤
-                    )
-                    # 手动过滤结果
-                    filtered_results = []
-                    for doc, score in results:
-                        metadata = doc.metadata
-                        # 检查 user_id
-                        if metadata.get("user_id") != user_id:
-                            continue
-                        # 检查 tenant_id
-                        if tenant_id and metadata.get("tenant_id") != tenant_id:
-                            continue
-                        # 检查 doc_ids
-                        if doc_ids and len(doc_ids) > 0:
-                            doc_id = metadata.get("doc_id")
-                            if doc_id not in doc_ids:
-                                continue
-                        filtered_results.append((doc, score))
-                    results = filtered_results[:5]
-                else:
-                    # 检查是否是遥测相关错误
-                    if "telemetry" in str(e).lower() or "capture" in str(e).lower():
-                        logger.warning(f"[build_context] 遥测相关错误，尝试重新初始化并重试: {str(e)}")
-                        # 重置 vector_store 并重新尝试
-                        self._vector_store = None
-                        vector_store = self._get_chroma_store()
-                        # 不带 filter 重试
-                        results = vector_store.similarity_search_with_score(
-                            query,
-                            k=10
-                        )
-                        # 手动过滤
-                        filtered_results = []
-                        for doc, score in results:
-                            metadata = doc.metadata
-                            if metadata.get("user_id") != user_id:
-                                continue
-                            if tenant_id and metadata.get("tenant_id") != tenant_id:
-                                continue
-                            if doc_ids and len(doc_ids) > 0:
-                                doc_id = metadata.get("doc_id")
-                                if doc_id not in doc_ids:
-                                    continue
-                            filtered_results.append((doc, score))
-                        results = filtered_results[:5]
-                    else:
-                        raise
+            # 查询文本只嵌入一次，带 filter 查询失败后的重试复用同一个向量
+            vector = await retriever.embed(query, timer)
+
+            # 启用重排时多召回候选，由重排器挑出最终的片段
+            reranker = get_reranker(chat_model)
+            candidates = max(CHAT_RETRIEVAL_CANDIDATES, CHAT_RERANK_CANDIDATES) if reranker else CHAT_RETRIEVAL_CANDIDATES
+            fuse_limit = candidates if reranker else CHAT_RETRIEVAL_TOP_K
+
+            # 执行相似度搜索（多个集合时按距离合并）
+            results = []
+            for collection in collections:
+                results.extend(await self._vector_search(
+                    retriever, vector, collection, filter_conditions, user_id, tenant_id, doc_ids, timer, candidates
+                ))
+            if len(collections) > 1:
+                results = sorted(results, key=lambda item: item[1])[:candidates]
+
+            lexical_results = await self._lexical_search(query, user_id, tenant_id, doc_ids, candidates)
+            timer.mark("lexical")
+            if lexical_results:
+                results = reciprocal_rank_fusion([results, lexical_results], limit=fuse_limit)
+                timer.mark("fuse")
+            else:
+                results = results[:fuse_limit]
+
+            if reranker:
+                results = await rerank(reranker, query, results, CHAT_RETRIEVAL_TOP_K)
+                timer.mark("rerank")
 
             logger.info(f"[build_context] 查询到 {len(results)} 条结果")
 
             if not results:
+                logger.info(f"[build_context] 检索耗时: {timer.summary()}")
                 return ""
 
-            output_lines = []
-            for idx, (doc, score) in enumerate(results):
-                metadata = doc.metadata
-                filename = metadata.get('filename', '未知文件')
-                text = doc.page_content
-                # 计算相似度分数
-                if score <= 1:
-                    similarity_score = 1 - score
-                else:
-                    similarity_score = 1 / (1 + score)
-                text_preview = text[:50] + '...' if len(text) > 50 else text
-                output_lines.append(
-                    f"第{idx + 1}段, 文档来源：{filename},  内容：{text_preview}\n\n"
-                )
+            # 片段全文按 token 预算装入（不超过模型 prompt 预算的一半，给历史与回答留出空间）
+            if model_config:
+                token_counter = get_token_counter(model_config.type, model_config.model_name)
+                budget = min(CHAT_CONTEXT_DOC_TOKENS, get_token_budget(model_config.model_name) // 2)
+                context = pack_documents(results, budget, token_counter.count)
+            else:
+                context = pack_documents(results)
 
-            return "\n".join(output_lines)
+            timer.mark("format")
+            logger.info(f"[build_context] 检索耗时: {timer.summary()}")
+            return context
 
         except Exception as e:
             logger.error(f"Chroma 查询失败: {str(e)}", exc_info=True)
             # 返回空字符串而不是抛出异常，让调用方处理
             return ""
 
-    def process_text_content(
+    async def _retrieval_scope(
             self,
-            content: str,
-            filename: str,
             user_id: str,
-            doc_id: str,
-            tenant_id: str = None
-    ):
-        """处理文本内容并存储到向量数据库"""
-        try:
-            if not content.strip():
-                raise ValueError("内容不能为空")
-
-            text_splitter = RecursiveCharacterTextSplitter(
-                chunk_size=1000,
-                chunk_overlap=200
-            )
-
-            texts = text_splitter.split_text(content)
-            if not texts:
-                raise ValueError("分割后无有效文本")
-
-            documents = []
-            for i, text in enumerate(texts):
-                documents.append(Document(
-                    page_content=text,
-                    metadata={
-                        "filename": filename,
-                        "tenant_id": tenant_id,
-                        "page": i + 1,
-                        "user_id": user_id,
-                        "doc_id": doc_id,
-                    }
-                ))
-
-            # 获取 Chroma 向量存储
-            vector_store = self._get_chroma_store()
+            tenant_id: Optional[str],
+            doc_ids: Optional[List[str]]
+    ) -> Tuple[Optional[List[str]], List[str]]:
+        """
+        检索范围：(按向量所属文档过滤的文档ID, 要查询的向量集合)
 
-            # 添加文档到 Chroma
-            vector_store.add_documents(documents)
-            logger.info(f"[ChatService] 文档已索引: {filename}, 共{len(texts)}个片段")
+        内容相同的文档共用一份向量，过滤条件换成向量所属的文档ID；集合按用户选中的文档本身路由，
+        原文档删除后向量所属ID已查不到租户，复用其向量的文档仍能路由到所在分片
+        """
+        collections = await self._route_collections(user_id, tenant_id, doc_ids)
+        if doc_ids:
+            doc_ids = self.chat_repository.get_source_doc_ids(doc_ids, user_id)
+        return doc_ids, collections
 
-        except Exception as e:
-            logger.error(f"处理文本内容失败: {str(e)}", exc_info=True)
-            raise
+    async def _route_collections(
+            self,
+            user_id: str,
+            tenant_id: Optional[str],
+            doc_ids: Optional[List[str]]
+    ) -> List[str]:
+        """
+        路由到需要查询的向量集合
 
-    def process_pdf(
+        指定租户时只查该租户的分片；未指定时按文档（或用户的全部文档）所在的租户确定分片。
+        旧的全局集合仍有数据（尚未迁移）时一并查询。
+        """
+        router = self._get_collection_router()
+        if router.sharding == "global":
+            return [CHROMA_COLLECTION_NAME]
+        tenant_ids = [tenant_id] if tenant_id else self.chat_repository.get_doc_tenant_ids(user_id, doc_ids)
+        collections = list(dict.fromkeys(router.name(tid, user_id) for tid in tenant_ids))
+        if await self._get_retriever().run_in_executor(router.legacy_store) is not None:
+            collections.append(CHROMA_COLLECTION_NAME)
+        return collections
+
+    async def _vector_search(
             self,
-            content: bytes,
-            filename: str,
+            retriever: VectorRetriever,
+            vector: List[float],
+            collection: str,
+            filter_conditions,
             user_id: str,
-            doc_id: str,
-            tenant_id: str
+            tenant_id: Optional[str],
+            doc_ids: Optional[List[str]],
+            timer,
+            k: int = CHAT_RETRIEVAL_CANDIDATES
     ):
-        """处理PDF文件"""
+        """在一个集合中做向量查询，带 filter 查询失败时改为不带 filter 查询后手动过滤"""
         try:
-            pdf_reader = PdfReader(BytesIO(content))
-            full_text = ""
-
-            if not pdf_reader.pages:
-                raise HTTPException(status_code=400, detail="PDF文件无有效内容")
-
-            for page_num, page in enumerate(pdf_reader.pages, start=1):
-                try:
-                    page_text = page.extract_text()
-                    if page_text:
-                        full_text += f"Page {page_num}:\n{page_text}\n\n"
-                except Exception as e:
-                    logger.warning(f"Page {page_num} text extraction failed: {str(e)}")
-                    continue
-
-            if not full_text.strip():
-                raise HTTPException(status_code=400, detail="无法从PDF提取文本内容")
-
-            self.process_text_content(
-                full_text,
-                filename,
-                user_id,
-                doc_id,
-                tenant_id
+            return await retriever.search(
+                vector, k=k, where=filter_conditions or None, timer=timer, collection=collection
             )
-
-        except HTTPException:
-            raise
         except Exception as e:
-            logger.error(f"PDF processing failed: {str(e)}", exc_info=True)
-            raise HTTPException(status_code=500, detail=f"PDF处理失败: {str(e)}")
+            # 如果 filter 导致错误，尝试不带 filter 查询
+            if "filter" in str(e).lower() or "where" in str(e).lower() or "metadata" in str(e).lower():
+                logger.warning(f"[build_context] 带filter查询失败，尝试不带filter: {str(e)}")
+            # 检查是否是遥测相关错误
+            elif "telemetry" in str(e).lower() or "capture" in str(e).lower():
+                logger.warning(f"[build_context] 遥测相关错误，尝试重新初始化并重试: {str(e)}")
+                # 重置 vector_store 并重新尝试
+                service_container.reset(VECTOR_STORE)
+                self._get_collection_router().reset()
+                retriever.reset()
+            else:
+                raise
+            # 不带 filter 查询，增加数量以便后续手动过滤（关键词检索仍按条件过滤，不受影响）
+            results = await retriever.search(vector, k=k * 2, timer=timer, collection=collection)
+            return self._filter_results(results, user_id, tenant_id, doc_ids)
 
-    def process_txt(
+    async def _lexical_search(
             self,
-            content: bytes,
-            filename: str,
+            query: str,
             user_id: str,
-            doc_id: str,
-            tenant_id: str = None
+            tenant_id: Optional[str],
+            doc_ids: Optional[List[str]],
+            k: int = CHAT_RETRIEVAL_CANDIDATES
     ):
-        """处理TXT文件"""
+        """关键词（BM25）检索，未启用或查询失败时返回空列表（只用向量结果）"""
+        lexical = get_lexical_index()
+        if lexical is None:
+            return []
         try:
-            text_content = content.decode('utf-8')
-            self.process_text_content(
-                text_content,
-                filename,
-                user_id,
-                doc_id,
-                tenant_id
+            return await self._get_retriever().run_in_executor(
+                lambda: lexical.search(query, k, user_id, tenant_id, doc_ids or None)
             )
         except Exception as e:
-            logger.error(f"TXT processing failed: {str(e)}")
-            raise HTTPException(status_code=500, detail=f"TXT处理失败: {str(e)}")
+            logger.warning(f"[build_context] 关键词检索失败，只使用向量结果: {str(e)}")
+            return []
+
+    @staticmethod
+    def _filter_results(results, user_id: str, tenant_id: Optional[str], doc_ids: Optional[List[str]]):
+        """不带 filter 查询时手动过滤结果"""
+        filtered_results = []
+        for doc, score in results:
+            metadata = doc.metadata
+            # 检查 user_id
+            if metadata.get("user_id") != user_id:
+                continue
+            # 检查 tenant_id
+            if tenant_id and metadata.get("tenant_id") != tenant_id:
+                continue
+            # 检查 doc_ids
+            if doc_ids and len(doc_ids) > 0:
+                doc_id = metadata.get("doc_id")
+                if doc_id not in doc_ids:
+                    continue
+            filtered_results.append((doc, score))
+        return filtered_results
 
     async def delete_document(self, doc_id: str, user_id: str):
         """删除文档"""
@@ -808,40 +787,193 @@ class ChatService:
         if not doc:
             raise HTTPException(status_code=404, detail="文档不存在或无权删除")
 
-        # 从 Chroma 中删除文档
-        try:
-            vector_store = self._get_chroma_store()
-            # 根据 doc_id 删除
-            vector_store.delete(filter={"doc_id": doc_id})
-            logger.info(f"[ChatService] 从Chroma删除文档: {doc_id}")
-        except Exception as e:
-            logger.error(f"从Chroma删除文档失败: {str(e)}")
-            # 继续执行，不中断删除流程
+        # 向量与磁盘文件按引用计数删除：还有其他文档引用时保留
+        source_doc_id = doc.source_doc_id or doc.id
+        if self.chat_repository.count_docs_by_source(source_doc_id) <= 1:
+            # 停止尚未完成的后台入库任务
+            try:
+                self._get_ingestion().cancel(source_doc_id)
+            except Exception as e:
+                logger.warning(f"取消入库任务失败: {str(e)}")
 
-        file_path = os.path.join(
-            self.upload_dir,
-            f"{doc.id}{'.' + doc.ext if doc.ext else ''}"
-        )
-        if os.path.exists(file_path):
+            # 从 Chroma 中删除文档（文档所属租户的分片集合，以及尚未迁移的全局集合）
+            try:
+                router = self._get_collection_router()
+                for vector_store in (router.get_store_for(doc.tenant_id, doc.user_id, create=False),
+                                     router.legacy_store()):
+                    if vector_store is not None:
+                        # 根据 doc_id 删除
+                        vector_store.delete(where={"doc_id": source_doc_id})
+                lexical = get_lexical_index()
+                if lexical is not None:
+                    lexical.delete_doc(source_doc_id)
+                logger.info(f"[ChatService] 从Chroma删除文档: {source_doc_id}")
+            except Exception as e:
+                # 继续执行，不中断删除流程；残留的向量由向量库维护任务按孤儿向量清理
+                logger.error(f"从Chroma删除文档失败，残留向量待孤儿清理: source_doc_id={source_doc_id}, {str(e)}")
+        else:
+            logger.info(f"[ChatService] 向量仍被其他文档引用，保留: source_doc_id={source_doc_id}")
+
+        if doc.content_hash:
+            file_path = self._content_path(doc.content_hash, doc.ext)
+            remove_file = self.chat_repository.count_docs_by_hash(doc.content_hash) <= 1
+        else:
+            # 按内容哈希存储之前上传的文档
+            file_path = os.path.join(
+                self.upload_dir,
+                f"{doc.id}{'.' + doc.ext if doc.ext else ''}"
+            )
+            remove_file = True
+        if remove_file and os.path.exists(file_path):
             os.remove(file_path)
 
         self.chat_repository.delete_doc(doc_id, user_id)
 
         return ResultUtil.success(msg="文档删除成功")
 
+    async def delete_tenant_docs(self, tenant_id: str, user_id: str) -> ResultEntity:
+        """
+        删除租户的全部文档（删除租户时调用，需要超级管理员权限）
+
+        向量按租户分片存储，直接删除租户的集合，不逐条删除向量
+        """
+        try:
+            from tenant.repositories.tenants_repository import TenantsRepository
+            if not any(tenant.role == 2 for tenant in TenantsRepository(self.db).get_tenant_list(user_id)):
+                return ResultUtil.fail(msg="需要超级管理员权限", data=None)
+
+            docs = self.chat_repository.get_docs_by_tenant(tenant_id)
+            ingestion = self._get_ingestion()
+            for doc in docs:
+                try:
+                    ingestion.cancel(doc.id)
+                except Exception as e:
+                    logger.warning(f"取消入库任务失败: {str(e)}")
+
+            router = self._get_collection_router()
+            retriever = self._get_retriever()
+            dropped = await asyncio.to_thread(router.drop_tenant, tenant_id)
+            for name in dropped:
+                retriever.forget(name)
+            legacy = await asyncio.to_thread(router.legacy_store)
+            if legacy is not None:
+                legacy.delete(where={"tenant_id": tenant_id})
+            lexical = get_lexical_index()
+            if lexical is not None:
+                await asyncio.to_thread(lexical.delete_tenant, tenant_id)
+
+            deleted = self.chat_repository.delete_docs_by_tenant(tenant_id)
+            # 其他租户不再引用的文件才删除
+            for doc in docs:
+                if doc.content_hash:
+                    if self.chat_repository.count_docs_by_hash(doc.content_hash) > 0:
+                        continue
+                    file_path = self._content_path(doc.content_hash, doc.ext)
+                else:
+                    file_path = os.path.join(self.upload_dir, f"{doc.id}{'.' + doc.ext if doc.ext else ''}")
+                if os.path.exists(file_path):
+                    os.remove(file_path)
+
+            logger.info(f"[ChatService] 已删除租户文档: tenant_id={tenant_id}, docs={deleted}, collections={dropped}")
+            return ResultUtil.success(data={"docs": deleted, "collections": dropped}, msg="租户文档删除成功")
+        except Exception as e:
+            logger.error(f"删除租户文档失败: {str(e)}", exc_info=True)
+            return ResultUtil.fail(data=None, msg=f"删除租户文档失败: {str(e)}")
+
     async def get_chat_history(
             self,
             user_id: str,
             page: int = 1,
             size: int = 10,
-            tenant_id: Optional[str] = None
+            tenant_id: Optional[str] = None,
+            with_total: bool = True
     ) -> ResultEntity:
         """获取聊天历史，支持按租户ID过滤"""
         start = (page - 1) * size
-        chat_history_list = self.chat_repository.get_chat_history(user_id, start, size, tenant_id)
-        total = self.chat_repository.get_chat_history_total(user_id, tenant_id)
+        chat_history_list, total = await fetch_page_with_total(
+            lambda: self.chat_repository.get_chat_history(user_id, start, size, tenant_id),
+            **self._history_total_args(user_id, tenant_id),
+            with_total=with_total
+        )
         return ResultUtil.success(data=chat_history_list, total=total)
 
+    @staticmethod
+    def _history_total_args(user_id: str, tenant_id: Optional[str]) -> dict:
+        """聊天历史总数的缓存命名空间（按用户失效）、筛选条件与统计函数"""
+        return {
+            "namespace": f"chat_history:{user_id}",
+            "filters": {"tenant_id": tenant_id},
+            "count": lambda db: ChatRepository(db).get_chat_history_total(user_id, tenant_id),
+        }
+
+    async def get_chat_history_by_cursor(
+            self,
+            user_id: str,
+            cursor: Optional[str] = None,
+            size: int = 10,
+            tenant_id: Optional[str] = None,
+            with_total: bool = True
+    ) -> ResultEntity:
+        """游标分页获取聊天历史（总数只在第一页统计）"""
+        try:
+            scope = f"chat.history:{user_id}:{tenant_id or ''}"
+            cursor_values = decode_cursor(cursor, scope, len(self.chat_repository.HISTORY_SORT_KEYS))
+            (chat_history_list, next_cursor), total = await fetch_page_with_total(
+                lambda: self.chat_repository.get_chat_history_by_cursor(
+                    user_id, cursor_values, scope, size, tenant_id
+                ),
+                **self._history_total_args(user_id, tenant_id),
+                with_total=with_total and cursor_values is None
+            )
+            return ResultUtil.success(data=chat_history_list, total=total, cursor=next_cursor)
+        except CursorError as e:
+            return ResultUtil.fail(data=None, msg=str(e))
+        except Exception as e:
+            logger.error(f"获取聊天历史失败: {str(e)}", exc_info=True)
+            return ResultUtil.fail(data=None, msg=f"获取聊天历史失败: {str(e)}")
+
+    async def get_conversation_list(
+            self,
+            user_id: str,
+            cursor: Optional[str] = None,
+            size: int = 20,
+            tenant_id: Optional[str] = None
+    ) -> ResultEntity:
+        """游标分页获取会话列表（按最后消息时间倒序）"""
+        try:
+            scope = f"chat.conversations:{user_id}:{tenant_id or ''}"
+            cursor_values = decode_cursor(cursor, scope, len(self.chat_repository.CONVERSATION_SORT_KEYS))
+            conversation_list, next_cursor = self.chat_repository.get_conversation_list_by_cursor(
+                user_id, cursor_values, scope, size, tenant_id
+            )
+            return ResultUtil.success(data=conversation_list, cursor=next_cursor)
+        except CursorError as e:
+            return ResultUtil.fail(data=None, msg=str(e))
+        except Exception as e:
+            logger.error(f"获取会话列表失败: {str(e)}", exc_info=True)
+            return ResultUtil.fail(data=None, msg=f"获取会话列表失败: {str(e)}")
+
+    async def get_conversation_history(
+            self,
+            user_id: str,
+            chat_id: str,
+            cursor: Optional[str] = None,
+            size: int = 20
+    ) -> ResultEntity:
+        """游标分页获取一个会话的聊天记录（从最新一轮开始倒序）"""
+        try:
+            scope = f"chat.conversation:{user_id}:{chat_id}"
+            cursor_values = decode_cursor(cursor, scope, len(self.chat_repository.HISTORY_SORT_KEYS))
+            chat_history_list, next_cursor = self.chat_repository.get_conversation_history_by_cursor(
+                user_id, chat_id, cursor_values, scope, size
+            )
+            return ResultUtil.success(data=chat_history_list, cursor=next_cursor)
+        except CursorError as e:
+            return ResultUtil.fail(data=None, msg=str(e))
+        except Exception as e:
+            logger.error(f"获取聊天历史失败: {str(e)}", exc_info=True)
+            return ResultUtil.fail(data=None, msg=f"获取聊天历史失败: {str(e)}")
+
     async def get_chat_history_by_chat_id(self, user_id: str, chat_id: str) -> ResultEntity:
         """根据会话ID获取聊天历史"""
         try:
@@ -878,10 +1010,15 @@ class ChatService:
             return ResultUtil.fail(data=None, msg=f"重命名目录失败: {str(e)}")
 
     async def delete_directory(self, user_id: str, directory_id: str) -> ResultEntity:
-        """删除目录"""
+        """删除目录及其中的文档（向量与磁盘文件按引用计数删除，与 deleteDoc 相同）"""
         try:
+            # 先删除目录（校验归属），再删除其中的文档
             result = self.chat_repository.delete_directory(directory_id, user_id)
             if result:
+                docs = self.chat_repository.get_doc_List(user_id, directory_id)
+                for doc in docs:
+                    await self.delete_document(doc.id, user_id)
+                logger.info(f"[ChatService] 已删除目录: directory_id={directory_id}, docs={len(docs)}")
                 return ResultUtil.success(data=1, msg="目录删除成功")
             return ResultUtil.fail(data=None, msg="删除目录失败")
         except Exception as e:
@@ -890,7 +1027,15 @@ class ChatService:
 
 
     async def upload_doc(self, file: UploadFile, user_id: str, directory_id: str, tenant_id: str) -> ResultEntity:
-        """上传文档"""
+        """
+        上传文档
+
+        文件流式写入磁盘后登记入库任务并立即返回，解析、分段、嵌入在后台执行，
+        进度通过 getDocStatus 查询（任务ID即文档ID）
+
+        文件按内容哈希存储（`{UPLOAD_DIR}/{sha256}.{ext}`），相同内容只存一份；同一用户（租户）
+        重复上传已入库的文件时不再入库，新文档直接引用已有的向量
+        """
         if not file.filename:
             raise HTTPException(status_code=400, detail="文件名不能为空")
 
@@ -899,19 +1044,32 @@ class ChatService:
             raise HTTPException(status_code=400, detail="只能上传pdf和txt的文档")
 
         doc_id = str(uuid.uuid4()).replace("-", "")
+        # 先写入临时文件，算出内容哈希后再改名
+        temp_path = os.path.join(self.upload_dir, f".{doc_id}.part")
+        file_path = None
 
         try:
-            content = await file.read()
-
-            if ext.lower() == "pdf":
-                self.process_pdf(content, file.filename, user_id, doc_id, tenant_id)
+            os.makedirs(self.upload_dir, exist_ok=True)
+            size, content_hash = await asyncio.to_thread(self._save_upload_file, file, temp_path)
+            if size == 0:
+                os.remove(temp_path)
+                return ResultUtil.fail(msg="文件内容为空")
+
+            file_path = self._content_path(content_hash, ext)
+            new_file = not os.path.exists(file_path)
+            if new_file:
+                os.replace(temp_path, file_path)
             else:
-                self.process_txt(content, file.filename, user_id, doc_id, tenant_id)
+                os.remove(temp_path)
 
-            file_path = os.path.join(self.upload_dir, file.filename)
-            os.makedirs(os.path.dirname(file_path), exist_ok=True)
-            with open(file_path, "wb") as f:
-                f.write(content)
+            ingestion = self._get_ingestion()
+            source = self.chat_repository.get_doc_by_hash(content_hash, user_id, tenant_id)
+            source_doc_id = (source.source_doc_id or source.id) if source else None
+            if source_doc_id:
+                source_job = await asyncio.to_thread(ingestion.get_job, source_doc_id)
+                if source_job and source_job.get("status") != SUCCESS:
+                    # 原文档还未入库完成（或失败），单独入库
+                    source_doc_id = None
 
             # 创建文档记录 - 包含 directory_id
             doc = ChatDocSchema(
@@ -921,15 +1079,111 @@ class ChatService:
                 user_id=user_id,
                 name=file.filename,
                 ext=ext,
-                tenant_id=tenant_id
+                tenant_id=tenant_id,
+                content_hash=content_hash,
+                source_doc_id=source_doc_id or doc_id
             )
             self.chat_repository.save_doc(doc)
-            return ResultUtil.success(msg="文件上传成功")
+            new_file = False
+
+            if source_doc_id:
+                logger.info(f"[ChatService] 文档内容已入库，复用向量: doc_id={doc_id}, source_doc_id={source_doc_id}")
+                return ResultUtil.success(
+                    data={"docId": doc_id, "jobId": doc_id, "status": SUCCESS, "reused": True},
+                    msg="文件上传成功"
+                )
+
+            ingestion.create_job(doc_id, user_id, tenant_id, file.filename, ext, file_path)
+            ingestion.submit(doc_id)
+            logger.info(f"[ChatService] 文档已保存，开始后台入库: doc_id={doc_id}, size={size}")
+            return ResultUtil.success(
+                data={"docId": doc_id, "jobId": doc_id, "status": PENDING},
+                msg="文件上传成功，正在后台处理"
+            )
 
         except Exception as e:
-            logger.error(f"Document processing failed: {str(e)}")
+            logger.error(f"Document processing failed: {str(e)}", exc_info=True)
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            # 只删除本次新写入、还没有文档引用的文件
+            if file_path and new_file and os.path.exists(file_path):
+                os.remove(file_path)
             raise HTTPException(status_code=500, detail=f"文件处理失败: {str(e)}")
 
+    def _content_path(self, content_hash: str, ext: Optional[str]) -> str:
+        """按内容哈希命名的文件路径"""
+        return os.path.join(self.upload_dir, f"{content_hash}{'.' + ext.lower() if ext else ''}")
+
+    @staticmethod
+    def _save_upload_file(file: UploadFile, file_path: str):
+        """把上传文件分块写入磁盘（不整体读入内存），边写边计算 SHA-256，返回 (字节数, 哈希)"""
+        size = 0
+        digest = hashlib.sha256()
+        file.file.seek(0)
+        with open(file_path, "wb") as f:
+            while True:
+                chunk = file.file.read(UPLOAD_CHUNK_BYTES)
+                if not chunk:
+                    break
+                f.write(chunk)
+                digest.update(chunk)
+                size += len(chunk)
+        return size, digest.hexdigest()
+
+    async def get_doc_status(self, doc_id: str, user_id: str) -> ResultEntity:
+        """查询文档入库进度"""
+        job = await asyncio.to_thread(self._get_ingestion().get_job, doc_id)
+        if not job:
+            # 没有任务记录：后台入库上线前上传的文档，或任务状态已过期
+            doc = self.chat_repository.get_doc_by_id(doc_id, user_id)
+            if not doc:
+                return ResultUtil.fail(msg="文档不存在或无权查看")
+            return ResultUtil.success(data={"docId": doc_id, "status": SUCCESS})
+
+        if job.get("user_id") != user_id:
+            return ResultUtil.fail(msg="文档不存在或无权查看")
+
+        status = job.get("status")
+        total_pages = int(job.get("total_pages") or 0)
+        done_pages = int(job.get("done_pages") or 0)
+        total = int(job.get("total_chunks") or 0)
+        if status == SUCCESS:
+            progress = 100
+        elif total_pages:
+            # 片段总数在提取完成后才知道，进行中按已提取的页数估算（嵌入未完成前不超过 99）
+            progress = min(round(done_pages / total_pages * 100, 1), 99)
+        else:
+            progress = 0
+        return ResultUtil.success(data={
+            "docId": doc_id,
+            "name": job.get("filename"),
+            "status": status,
+            "stage": job.get("stage"),
+            "totalPages": total_pages,
+            "donePages": done_pages,
+            "totalChunks": total or None,
+            "doneChunks": int(job.get("done_chunks") or 0),
+            "progress": progress,
+            "attempts": int(job.get("attempts") or 0),
+            "error": job.get("error") or None,
+            "updateTime": datetime.fromtimestamp(int(job["update_time"])).strftime("%Y-%m-%d %H:%M:%S")
+            if job.get("update_time") else None,
+        })
+
+    async def retry_doc(self, doc_id: str, user_id: str) -> ResultEntity:
+        """手动重试入库失败的文档（从已写入的片段之后继续）"""
+        ingestion = self._get_ingestion()
+        job = await asyncio.to_thread(ingestion.get_job, doc_id)
+        if not job or job.get("user_id") != user_id:
+            return ResultUtil.fail(msg="文档不存在或无权操作")
+        if job.get("status") != FAILED:
+            return ResultUtil.fail(msg=f"当前状态不可重试: {job.get('status')}")
+        if not os.path.exists(job.get("file_path", "")):
+            return ResultUtil.fail(msg="源文件已不存在，请重新上传")
+
+        await asyncio.to_thread(ingestion.retry, doc_id)
+        return ResultUtil.success(data={"docId": doc_id, "status": PENDING}, msg="已重新开始处理")
+
     async def get_doc_list(self, user_id: str, directory_id: str = None) -> ResultEntity:
         """获取文档列表"""
         return ResultUtil.success(data=self.chat_repository.get_doc_List(user_id, directory_id))
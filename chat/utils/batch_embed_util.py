@@ -0,0 +1,126 @@
+# chat/utils/batch_embed_util.py
+"""
+入库批量嵌入
+
+一次写入的片段按 EMBED_BATCH_SIZE 切成多个嵌入请求，在进程级共享的嵌入线程池中并行执行，
+线程池大小即同时发往嵌入服务的请求数上限（所有入库任务共用，不会因为同时上传多个文档而压垮 Ollama）。
+
+- 结果按原顺序返回
+- 单个请求失败时指数退避重试（带随机抖动），嵌入服务过载（429 / 503 / 超时 / 连接失败）时记录告警
+- 嵌入经过 CachedEmbeddings，重复的片段直接命中缓存
+- 每个请求的耗时、重试次数输出到指标
+
+环境变量:
+    EMBED_BATCH_SIZE        每个嵌入请求的片段数，默认 16
+    EMBED_MAX_IN_FLIGHT     同时在途的嵌入请求数，默认 4
+    EMBED_MAX_RETRIES       单个请求的最大重试次数，默认 5
+"""
+import os
+import time
+import random
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+from chat.utils.chroma_util import EMBEDDING
+from common.utils.metrics_util import counter, histogram
+from common.utils.service_container import service_container
+
+logger = logging.getLogger(__name__)
+
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "16"))
+EMBED_MAX_IN_FLIGHT = int(os.getenv("EMBED_MAX_IN_FLIGHT", "4"))
+EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", "5"))
+
+# 退避：0.5s、1s、2s ... 最长 30s，再乘以 0.5~1.5 的随机抖动
+BACKOFF_BASE_SECONDS = 0.5
+BACKOFF_MAX_SECONDS = 30
+
+# 判断为嵌入服务过载的错误特征
+OVERLOAD_MARKERS = ("429", "503", "too many requests", "overload", "timeout", "timed out", "connection")
+
+EMBED_EXECUTOR = "chat.embed_executor"
+
+EMBED_REQUEST_SECONDS = histogram(
+    "chat_embed_request_seconds",
+    "入库时单个嵌入请求的耗时（秒，含重试）",
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+)
+EMBED_RETRIES = counter("chat_embed_retries_total", "嵌入请求重试次数（标签 reason=overload/error）")
+
+
+def is_overload(error: Exception) -> bool:
+    message = f"{type(error).__name__} {error}".lower()
+    return any(marker in message for marker in OVERLOAD_MARKERS)
+
+
+class BatchEmbedder:
+    """
+    并行、分批、带重试的嵌入
+
+    使用示例:
+        vectors = BatchEmbedder().embed(texts)     # 与 texts 一一对应
+    """
+
+    def __init__(
+            self,
+            embeddings: Optional[Embeddings] = None,
+            executor: Optional[ThreadPoolExecutor] = None,
+            batch_size: int = EMBED_BATCH_SIZE,
+            max_retries: int = EMBED_MAX_RETRIES
+    ):
+        """
+        Args:
+            embeddings: 嵌入模型，默认使用进程级共享的（带缓存）嵌入模型
+            executor: 嵌入线程池，默认使用进程级共享的线程池（大小为 EMBED_MAX_IN_FLIGHT）
+            batch_size: 每个请求的片段数
+            max_retries: 单个请求的最大重试次数
+        """
+        self.embeddings = embeddings or service_container.get(EMBEDDING)
+        self.executor = executor or service_container.get(EMBED_EXECUTOR)
+        self.batch_size = max(batch_size, 1)
+        self.max_retries = max_retries
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """嵌入一组文本，按原顺序返回向量；任一请求重试耗尽时抛出异常"""
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        futures = [self.executor.submit(self._embed_with_retry, batch) for batch in batches]
+        vectors: List[List[float]] = []
+        try:
+            for future in futures:
+                vectors.extend(future.result())
+        except Exception:
+            for future in futures:
+                future.cancel()
+            raise
+        return vectors
+
+    def _embed_with_retry(self, batch: List[str]) -> List[List[float]]:
+        start = time.perf_counter()
+        attempt = 0
+        while True:
+            try:
+                vectors = self.embeddings.embed_documents(batch)
+                EMBED_REQUEST_SECONDS.observe(time.perf_counter() - start)
+                return vectors
+            except Exception as e:
+                if attempt >= self.max_retries:
+                    raise
+                overload = is_overload(e)
+                delay = min(BACKOFF_BASE_SECONDS * 2 ** attempt, BACKOFF_MAX_SECONDS) * (0.5 + random.random())
+                attempt += 1
+                EMBED_RETRIES.inc(reason="overload" if overload else "error")
+                logger.warning(
+                    f"[BatchEmbedder] 嵌入请求失败{'（服务过载）' if overload else ''}，"
+                    f"{delay:.1f}s 后第 {attempt} 次重试: size={len(batch)}, error={str(e)}"
+                )
+                time.sleep(delay)
+
+
+service_container.register(
+    EMBED_EXECUTOR,
+    lambda: ThreadPoolExecutor(max_workers=max(EMBED_MAX_IN_FLIGHT, 1), thread_name_prefix="embed"),
+    lambda executor: executor.shutdown(wait=False)
+)
@@ -0,0 +1,164 @@
+# chat/utils/chroma_util.py
+"""
+Chroma 客户端、嵌入模型与向量存储的进程级工厂
+
+这些对象创建代价高（建立 HTTP 连接、加载集合），注册到 service_container 后
+每个 worker 进程只创建一次，所有请求共享。
+"""
+import os
+import logging
+import tempfile
+
+from langchain_chroma import Chroma
+from langchain_ollama import OllamaEmbeddings
+
+from chat.utils.embedding_cache_util import CachedEmbeddings
+from common.utils.service_container import service_container
+
+# ========== 彻底禁用 ChromaDB 遥测（通过环境变量） ==========
+os.environ["ANONYMIZED_TELEMETRY"] = "False"
+os.environ["CHROMA_TELEMETRY_DISABLED"] = "true"
+os.environ["DO_NOT_TRACK"] = "1"
+
+logger = logging.getLogger(__name__)
+
+# 直接从环境变量读取配置
+CHROMA_HOST = os.getenv("CHROMA_HOST")
+CHROMA_PORT = int(os.getenv("CHROMA_PORT", "8000"))
+CHROMA_COLLECTION_NAME = os.getenv("CHROMA_COLLECTION_NAME")
+OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL")
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL")
+
+# 本地持久化目录（默认为项目根目录下的 chroma_db，压测环境可通过 CHROMA_PERSIST_DIR 指向独立目录）
+PERSIST_DIR = os.getenv(
+    "CHROMA_PERSIST_DIR",
+    os.path.join(os.path.dirname(__file__), "..", "..", "chroma_db")
+)
+
+CHROMA_CLIENT = "chat.chroma_client"
+EMBEDDING = "chat.embedding_model"
+VECTOR_STORE = "chat.vector_store"
+
+
+def create_chroma_client():
+    """创建 Chroma 客户端：优先 HTTP，失败时回退到本地持久化，再失败使用临时目录"""
+    import chromadb
+    from chromadb.config import Settings as ChromaSettings
+
+    # 新版 ChromaDB 配置：只保留允许的字段
+    chroma_settings = ChromaSettings(
+        anonymized_telemetry=False,
+        allow_reset=True,
+    )
+
+    try:
+        try:
+            # 尝试 HTTP 连接
+            client = chromadb.HttpClient(
+                host=CHROMA_HOST,
+                port=CHROMA_PORT,
+                settings=chroma_settings
+            )
+            client.heartbeat()
+            logger.info(f"[Chroma] HTTP客户端连接成功: {CHROMA_HOST}:{CHROMA_PORT}")
+            return client
+        except Exception as e:
+            logger.warning(f"[Chroma] HTTP客户端连接失败: {str(e)}，尝试使用持久化方式")
+            os.makedirs(PERSIST_DIR, exist_ok=True)
+
+            # 持久化客户端配置
+            client = chromadb.PersistentClient(
+                path=PERSIST_DIR,
+                settings=chroma_settings
+            )
+            logger.info(f"[Chroma] 持久化客户端初始化成功: {PERSIST_DIR}")
+            return client
+
+    except Exception as e:
+        logger.error(f"[Chroma] 客户端初始化失败: {str(e)}")
+        try:
+            # 内存模式：使用临时目录
+            temp_dir = tempfile.mkdtemp(prefix="chroma_")
+            client = chromadb.PersistentClient(
+                path=temp_dir,
+                settings=ChromaSettings(
+                    anonymized_telemetry=False,
+                    allow_reset=True,
+                )
+            )
+            logger.info(f"[Chroma] 临时持久化客户端初始化成功: {temp_dir}")
+            return client
+        except Exception as e2:
+            logger.error(f"[Chroma] 所有Chroma客户端初始化方式都失败: {str(e2)}")
+            raise
+
+
+def create_embedding_model():
+    """创建嵌入模型（带向量缓存，检索与入库共用）"""
+    return CachedEmbeddings(
+        OllamaEmbeddings(
+            model=EMBEDDING_MODEL,
+            base_url=OLLAMA_BASE_URL
+        ),
+        model_name=EMBEDDING_MODEL
+    )
+
+
+def create_vector_store():
+    """创建 Chroma 向量存储（集合不存在时自动创建）"""
+    embedding = service_container.get(EMBEDDING)
+    try:
+        client = service_container.get(CHROMA_CLIENT)
+
+        try:
+            client.get_collection(CHROMA_COLLECTION_NAME)
+            logger.info(f"[Chroma] 使用已存在的集合: {CHROMA_COLLECTION_NAME}")
+        except Exception:
+            client.create_collection(
+                name=CHROMA_COLLECTION_NAME,
+                metadata={"hnsw:space": "cosine"}
+            )
+            logger.info(f"[Chroma] 创建新集合: {CHROMA_COLLECTION_NAME}")
+
+        vector_store = Chroma(
+            client=client,
+            collection_name=CHROMA_COLLECTION_NAME,
+            embedding_function=embedding,
+            collection_metadata={"hnsw:space": "cosine"}
+        )
+        logger.info(f"[Chroma] 向量存储初始化成功")
+        return vector_store
+
+    except Exception as e:
+        logger.error(f"[Chroma] 获取Chroma存储失败: {str(e)}")
+        try:
+            logger.info("[Chroma] 尝试使用本地持久化方式...")
+            os.makedirs(PERSIST_DIR, exist_ok=True)
+
+            vector_store = Chroma(
+                collection_name=CHROMA_COLLECTION_NAME,
+                embedding_function=embedding,
+                persist_directory=PERSIST_DIR
+            )
+            logger.info(f"[Chroma] 本地持久化方式初始化成功: {PERSIST_DIR}")
+            return vector_store
+        except Exception:
+            try:
+                logger.info("[Chroma] 尝试使用内存模式...")
+                temp_dir = tempfile.mkdtemp(prefix="chroma_")
+
+                vector_store = Chroma(
+                    collection_name=CHROMA_COLLECTION_NAME,
+                    embedding_function=embedding,
+                    persist_directory=temp_dir
+                )
+                logger.info(f"[Chroma] 内存模式初始化成功: {temp_dir}")
+                return vector_store
+            except Exception as e3:
+                logger.error(f"[Chroma] 所有方式都失败: {str(e3)}")
+                raise
+
+
+service_container.register(CHROMA_CLIENT, create_chroma_client)
+service_container.register(EMBEDDING, create_embedding_model)
+service_container.register(VECTOR_STORE, create_vector_store)
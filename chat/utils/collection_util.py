@@ -0,0 +1,183 @@
+# chat/utils/collection_util.py
+"""
+向量集合分片路由
+
+所有用户的片段原先存放在同一个 Chroma 集合中，每次检索都靠 user_id / tenant_id / doc_id 元数据过滤，
+语料增长后 ANN 检索要扫描远多于所需的向量。这里按租户（或用户 + 租户）把片段分到独立的集合：
+
+- tenant：每个租户一个集合（默认，集合内仍按 user_id 过滤，保证租户内的个人文档互不可见）
+- user_tenant：每个 用户 + 租户 一个集合，集合内只有一个用户的片段
+- global：沿用单一集合 CHROMA_COLLECTION_NAME（迁移前的行为）
+- 集合名：`{前缀}_t_{tenant_id}[_u_{user_id}]`，超过 Chroma 的长度限制时改用哈希；
+  集合元数据记录 tenant_id / user_id，按租户删除时据此找到所有分片
+- 删除租户的文档即删除其集合，不需要逐条删除向量
+- 过渡期：旧的全局集合中仍有数据（尚未执行 test/chroma_shard_migrate.py）时，检索同时查询全局集合
+
+环境变量:
+    CHROMA_SHARDING             tenant / user_tenant / global，默认 tenant
+    CHROMA_COLLECTION_PREFIX    分片集合名前缀，默认 chat
+"""
+import os
+import re
+import time
+import hashlib
+import logging
+import threading
+from typing import Dict, List, Optional
+
+from langchain_chroma import Chroma
+
+from chat.utils.chroma_util import CHROMA_CLIENT, CHROMA_COLLECTION_NAME, EMBEDDING, VECTOR_STORE
+from common.utils.service_container import service_container
+
+logger = logging.getLogger(__name__)
+
+CHROMA_SHARDING = os.getenv("CHROMA_SHARDING", "tenant").lower()
+CHROMA_COLLECTION_PREFIX = os.getenv("CHROMA_COLLECTION_PREFIX", "chat")
+
+SHARDING_MODES = ("tenant", "user_tenant", "global")
+
+# 上传接口未指定租户时的默认租户
+DEFAULT_TENANT = "personal"
+# Chroma 集合名：3~63 个字符，字母数字开头结尾，只能包含字母数字、下划线、短横线、点
+MAX_NAME_LENGTH = 63
+INVALID_NAME_CHARS = re.compile(r"[^a-zA-Z0-9_-]")
+# 旧全局集合是否还有数据的检查结果缓存时间（秒）
+LEGACY_CHECK_SECONDS = 60
+
+COLLECTION_ROUTER = "chat.collection_router"
+
+
+def collection_name(tenant_id: Optional[str], user_id: Optional[str] = None, sharding: str = CHROMA_SHARDING) -> str:
+    """片段所在的集合名"""
+    if sharding == "global":
+        return CHROMA_COLLECTION_NAME
+    parts = [CHROMA_COLLECTION_PREFIX, "t", tenant_id or DEFAULT_TENANT]
+    if sharding == "user_tenant":
+        parts += ["u", user_id or ""]
+    name = "_".join(INVALID_NAME_CHARS.sub("-", part) for part in parts)
+    if len(name) > MAX_NAME_LENGTH or not name[-1].isalnum():
+        name = f"{CHROMA_COLLECTION_PREFIX[:24]}_{hashlib.sha1(name.encode('utf-8')).hexdigest()[:32]}"
+    return name
+
+
+class CollectionRouter:
+    """
+    按租户路由到向量集合（进程级共享，通过 service_container 获取）
+
+    使用示例:
+        router = service_container.get(COLLECTION_ROUTER)
+        store = router.get_store_for(tenant_id, user_id)                  # 写入：不存在时创建
+        store = router.get_store(name, create=False)                      # 查询：不存在时返回 None
+        router.drop_tenant(tenant_id)
+    """
+
+    def __init__(self, sharding: str = CHROMA_SHARDING):
+        if sharding not in SHARDING_MODES:
+            logger.warning(f"[CollectionRouter] 未知的分片方式 {sharding}，使用 tenant")
+            sharding = "tenant"
+        self.sharding = sharding
+        self._stores: Dict[str, Chroma] = {}
+        self._lock = threading.Lock()
+        self._legacy_checked_at = 0.0
+        self._legacy_has_data = False
+
+    def name(self, tenant_id: Optional[str], user_id: Optional[str] = None) -> str:
+        return collection_name(tenant_id, user_id, self.sharding)
+
+    def get_store(self, name: str, create: bool = True, metadata: Optional[Dict[str, str]] = None) -> Optional[Chroma]:
+        """
+        获取集合对应的向量存储
+
+        Args:
+            name: 集合名
+            create: 集合不存在时是否创建（查询传 False，不存在时返回 None，不创建空集合）
+            metadata: 新建集合时记录的元数据
+        """
+        if name == CHROMA_COLLECTION_NAME:
+            return service_container.get(VECTOR_STORE)
+        store = self._stores.get(name)
+        if store is not None:
+            return store
+
+        with self._lock:
+            store = self._stores.get(name)
+            if store is not None:
+                return store
+            client = service_container.get(CHROMA_CLIENT)
+            if not create:
+                try:
+                    client.get_collection(name)
+                except Exception:
+                    return None
+            store = Chroma(
+                client=client,
+                collection_name=name,
+                embedding_function=service_container.get(EMBEDDING),
+                collection_metadata={"hnsw:space": "cosine", **(metadata or {})}
+            )
+            self._stores[name] = store
+            logger.info(f"[CollectionRouter] 使用集合: {name}")
+            return store
+
+    def get_store_for(self, tenant_id: Optional[str], user_id: Optional[str] = None, create: bool = True) -> Optional[Chroma]:
+        """按租户（用户）获取向量存储，新建的集合元数据中记录 tenant_id / user_id"""
+        metadata = {"tenant_id": tenant_id or DEFAULT_TENANT}
+        if self.sharding == "user_tenant" and user_id:
+            metadata["user_id"] = user_id
+        return self.get_store(self.name(tenant_id, user_id), create=create, metadata=metadata)
+
+    def legacy_store(self) -> Optional[Chroma]:
+        """分片模式下旧的全局集合仍有数据时返回它（过渡期检索需要同时查询），否则返回 None"""
+        if self.sharding == "global":
+            return None
+        now = time.monotonic()
+        if now - self._legacy_checked_at > LEGACY_CHECK_SECONDS:
+            try:
+                collection = service_container.get(CHROMA_CLIENT).get_collection(CHROMA_COLLECTION_NAME)
+                self._legacy_has_data = collection.count() > 0
+            except Exception:
+                self._legacy_has_data = False
+            self._legacy_checked_at = now
+        return service_container.get(VECTOR_STORE) if self._legacy_has_data else None
+
+    def tenant_collections(self, tenant_id: str) -> List[str]:
+        """租户的所有分片集合名"""
+        if self.sharding == "global":
+            return []
+        client = service_container.get(CHROMA_CLIENT)
+        names = {self.name(tenant_id)} if self.sharding == "tenant" else set()
+        for collection in client.list_collections():
+            # chromadb 0.6 的 list_collections 只返回名称，其他版本返回集合对象
+            if isinstance(collection, str):
+                if not collection.startswith(f"{CHROMA_COLLECTION_PREFIX[:24]}_"):
+                    continue
+                collection = client.get_collection(collection)
+            if (collection.metadata or {}).get("tenant_id") == tenant_id:
+                names.add(collection.name)
+        return sorted(names)
+
+    def drop_tenant(self, tenant_id: str) -> List[str]:
+        """删除租户的所有分片集合，返回已删除的集合名"""
+        return [name for name in self.tenant_collections(tenant_id) if self.drop(name)]
+
+    def drop(self, name: str) -> bool:
+        """删除集合，集合不存在时返回 False"""
+        with self._lock:
+            self._stores.pop(name, None)
+        try:
+            service_container.get(CHROMA_CLIENT).delete_collection(name)
+            logger.info(f"[CollectionRouter] 已删除集合: {name}")
+            return True
+        except Exception as e:
+            logger.info(f"[CollectionRouter] 集合不存在或删除失败: {name}, {str(e)}")
+            return False
+
+    def reset(self) -> None:
+        """丢弃缓存的向量存储（Chroma 客户端重建后调用）"""
+        with self._lock:
+            self._stores.clear()
+        self._legacy_checked_at = 0.0
+
+
+service_container.register(COLLECTION_ROUTER, CollectionRouter)
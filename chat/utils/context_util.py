@@ -0,0 +1,322 @@
+# chat/utils/context_util.py
+"""
+对话上下文管理（按模型计数 token + 滚动摘要）
+
+每次请求发送给模型的 prompt 由四部分组成：系统提示词、滚动摘要、最近若干轮原文、本轮问题（含检索到的文档）。
+- 系统提示词与本轮问题必须完整保留，先从预算中扣除
+- 剩余预算从最新的消息往前保留原文，放不下的更早消息不再发送
+- 放不下的消息在本轮回答结束后由同一个模型异步折叠进滚动摘要（不阻塞当前回答，与对话一样按模型准入、按用户排队），
+  摘要写入 Redis 后这些消息从会话列表中移除；会话列表即将达到条数上限时也会提前折叠，
+  避免被 LTRIM 直接丢弃
+
+token 计数：deepseek / tongyi 等 OpenAI 兼容模型在安装了 tiktoken 时使用其编码计数，
+其余模型（Ollama 等）及未安装 tiktoken 时按字符估算（见 estimate_tokens）。
+
+环境变量:
+    CHAT_CONTEXT_TOKEN_BUDGET    prompt 的 token 预算，默认 4096
+    CHAT_CONTEXT_TOKEN_BUDGETS   按模型名覆盖预算，如 "qwen3:8b=8192,deepseek-chat=32000"
+    CHAT_SUMMARY_ENABLED         是否生成滚动摘要，默认 True；关闭后超出预算的历史直接丢弃
+    CHAT_SUMMARY_MAX_CHARS       摘要的目标长度（字符），默认 800
+"""
+import os
+import re
+import time
+import uuid
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+
+from chat.schemas.chat_schema import ChatModelSchema
+from common.utils.admission_util import ADMISSION, LLM_QUEUE_TIMEOUT, AdmissionRejected
+from common.utils.chat_memory_util import ChatMemory, Message, estimate_tokens
+from common.utils.metrics_util import counter, histogram
+from common.utils.service_container import service_container
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+
+def _parse_budgets(value: str) -> Dict[str, int]:
+    budgets = {}
+    for item in value.split(","):
+        name, sep, budget = item.strip().rpartition("=")
+        if sep and name and budget.strip().isdigit():
+            budgets[name.strip()] = int(budget)
+    return budgets
+
+
+CHAT_CONTEXT_TOKEN_BUDGET = int(os.getenv("CHAT_CONTEXT_TOKEN_BUDGET", "4096"))
+CHAT_CONTEXT_TOKEN_BUDGETS = _parse_budgets(os.getenv("CHAT_CONTEXT_TOKEN_BUDGETS", ""))
+CHAT_SUMMARY_ENABLED = os.getenv("CHAT_SUMMARY_ENABLED", "True").lower() == "true"
+CHAT_SUMMARY_MAX_CHARS = int(os.getenv("CHAT_SUMMARY_MAX_CHARS", "800"))
+
+# 每条消息的角色标记等格式开销（近似值）
+MESSAGE_OVERHEAD_TOKENS = 4
+# 同一会话同时只允许一个摘要任务（锁的有效期另加排队等待准入的时间）
+SUMMARY_LOCK_SECONDS = 120
+
+# 使用 tiktoken 计数的模型类型（OpenAI 兼容接口）
+TIKTOKEN_MODEL_TYPES = ("deepseek", "tongyi")
+
+SUMMARY_SYSTEM_PROMPT = (
+    "你是对话摘要助手。请把【已有摘要】与【新增对话】合并为一段新的摘要，"
+    "保留用户的身份信息、偏好、已确认的事实、结论以及尚未解决的问题，省略寒暄与重复内容。"
+    f"使用第三人称陈述，不超过{CHAT_SUMMARY_MAX_CHARS}字，只输出摘要正文。"
+)
+
+THINK_PATTERN = re.compile(r"<think>.*?</think>", re.S)
+
+PROMPT_TOKENS = histogram(
+    "chat_prompt_tokens",
+    "每次请求发送给模型的 prompt token 数",
+    buckets=(128, 256, 512, 1024, 2048, 4096, 8192, 16384, 32768)
+)
+HISTORY_MESSAGES = histogram(
+    "chat_prompt_history_messages",
+    "每次请求保留原文发送的历史消息条数",
+    buckets=(0, 2, 4, 8, 12, 16, 20, 40)
+)
+COMPACTIONS = counter("chat_context_compactions_total", "滚动摘要任务次数（按结果）")
+SUMMARY_SECONDS = histogram(
+    "chat_summary_seconds",
+    "生成滚动摘要耗时（秒）",
+    buckets=(0.5, 1, 2, 5, 10, 20, 30, 60)
+)
+
+
+class TokenCounter:
+    """按模型计数 token"""
+
+    def __init__(self, model_type: str, model_name: str):
+        self.model_type = model_type
+        self.model_name = model_name
+        self.encoding = None
+        if tiktoken is not None and model_type in TIKTOKEN_MODEL_TYPES:
+            try:
+                self.encoding = tiktoken.encoding_for_model(model_name)
+            except KeyError:
+                # 非 OpenAI 模型名，使用通用编码近似
+                self.encoding = tiktoken.get_encoding("cl100k_base")
+            except Exception as e:
+                logger.warning(f"[TokenCounter] 加载 tiktoken 编码失败，改用估算: {str(e)}")
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        if self.encoding is not None:
+            return len(self.encoding.encode(text, disallowed_special=()))
+        return estimate_tokens(text)
+
+    def count_messages(self, messages: List[Message]) -> int:
+        return sum(self.count(content) + MESSAGE_OVERHEAD_TOKENS for _, content in messages)
+
+
+@lru_cache(maxsize=64)
+def get_token_counter(model_type: str, model_name: str) -> TokenCounter:
+    """获取模型对应的 token 计数器（按模型缓存，编码只加载一次）"""
+    return TokenCounter(model_type, model_name)
+
+
+def get_token_budget(model_name: str) -> int:
+    """获取模型的 prompt token 预算"""
+    return CHAT_CONTEXT_TOKEN_BUDGETS.get(model_name, CHAT_CONTEXT_TOKEN_BUDGET)
+
+
+@dataclass
+class ConversationContext:
+    """一次请求的对话上下文"""
+    summary: str = ""
+    # 以原文发送的最近消息
+    history: List[Message] = field(default_factory=list)
+    # 回答结束后需要折叠进摘要的消息（会话列表头部）
+    folded: List[Message] = field(default_factory=list)
+    prompt_tokens: int = 0
+    budget: int = 0
+
+    @property
+    def needs_compaction(self) -> bool:
+        return CHAT_SUMMARY_ENABLED and bool(self.folded)
+
+    def to_messages(self) -> List[BaseMessage]:
+        """摘要与历史转换为消息对象（内容中的花括号不会被当作模板变量）"""
+        messages: List[BaseMessage] = []
+        if self.summary:
+            messages.append(SystemMessage(content=f"以下是此前对话的摘要：\n{self.summary}"))
+        messages.extend(
+            HumanMessage(content=content) if role == "human" else AIMessage(content=content)
+            for role, content in self.history
+        )
+        return messages
+
+
+class ContextManager:
+    """
+    按 token 预算组装对话上下文，并在回答结束后异步折叠更早的消息
+
+    使用示例:
+        context_manager = ContextManager(chat_memory)
+        context = context_manager.build(model_config, user_id, chat_id, system_prompt, prompt)
+        ...                                                    # 使用 context.to_messages() 组装 prompt
+        if context.needs_compaction:
+            asyncio.create_task(context_manager.compact(chat_model, model_config, user_id, chat_id, context))
+    """
+
+    def __init__(self, memory: ChatMemory):
+        self.memory = memory
+
+    def build(
+            self,
+            model_config: ChatModelSchema,
+            user_id: str,
+            chat_id: str,
+            system_prompt: str,
+            prompt: str
+    ) -> ConversationContext:
+        """
+        Args:
+            model_config: 模型配置（决定 token 计数方式与预算）
+            user_id: 用户ID
+            chat_id: 会话ID
+            system_prompt: 系统提示词
+            prompt: 本轮发送给模型的问题（含检索到的文档上下文）
+        """
+        token_counter = get_token_counter(model_config.type, model_config.model_name)
+        budget = get_token_budget(model_config.model_name)
+        fixed_tokens = token_counter.count_messages([("system", system_prompt), ("human", prompt)])
+
+        summary, messages = self.memory.load_with_summary(user_id, chat_id)
+        if not CHAT_SUMMARY_ENABLED:
+            summary = ""
+        summary_tokens = token_counter.count(summary) + MESSAGE_OVERHEAD_TOKENS if summary else 0
+
+        remaining = budget - fixed_tokens - summary_tokens
+        if remaining < 0:
+            logger.warning(
+                f"[ContextManager] 系统提示词与本轮问题已超出预算: "
+                f"tokens={fixed_tokens + summary_tokens}, budget={budget}, model={model_config.model_name}"
+            )
+
+        # 从最新的消息往前保留原文
+        start = len(messages)
+        used = 0
+        while start > 0:
+            role, content = messages[start - 1]
+            cost = token_counter.count(content) + MESSAGE_OVERHEAD_TOKENS
+            if used + cost > remaining:
+                break
+            used += cost
+            start -= 1
+        # 原文窗口从 human 消息开始，不以半轮回答开头
+        while start < len(messages) and messages[start][0] != "human":
+            used -= token_counter.count(messages[start][1]) + MESSAGE_OVERHEAD_TOKENS
+            start += 1
+
+        fold_end = start
+        # 本轮追加两条后会被 LTRIM 裁掉的消息也提前折叠；一次折叠约一半，避免每轮都生成摘要
+        overflow = len(messages) + 2 - self.memory.max_messages
+        if overflow > 0 and fold_end < overflow:
+            fold_end = max(overflow, len(messages) // 2)
+            while fold_end < len(messages) and messages[fold_end][0] != "human":
+                fold_end += 1
+
+        context = ConversationContext(
+            summary=summary,
+            history=messages[start:],
+            folded=messages[:fold_end],
+            prompt_tokens=fixed_tokens + summary_tokens + used,
+            budget=budget
+        )
+        PROMPT_TOKENS.observe(context.prompt_tokens, model=model_config.model_name)
+        HISTORY_MESSAGES.observe(len(context.history), model=model_config.model_name)
+        logger.info(
+            f"[ContextManager] prompt_tokens={context.prompt_tokens}/{budget}, "
+            f"history={len(context.history)}/{len(messages)}, summary={'有' if summary else '无'}, "
+            f"folded={len(context.folded)}, model={model_config.model_name}"
+        )
+        return context
+
+    async def compact(
+            self,
+            chat_model: Any,
+            model_config: ChatModelSchema,
+            user_id: str,
+            chat_id: str,
+            context: ConversationContext
+    ) -> None:
+        """把 context.folded 与已有摘要合并为新摘要，并从会话列表中移除这些消息（回答结束后后台执行）"""
+        if not context.needs_compaction:
+            return
+
+        lock_key = f"{self.memory.summary_key(user_id, chat_id)}:lock"
+        lock_token = uuid.uuid4().hex
+        redis_client = self.memory.redis
+        try:
+            locked = await asyncio.to_thread(
+                redis_client.set, lock_key, lock_token, nx=True, ex=int(SUMMARY_LOCK_SECONDS + LLM_QUEUE_TIMEOUT)
+            )
+            if not locked:
+                COMPACTIONS.inc(result="skipped")
+                logger.info(f"[ContextManager] 会话正在生成摘要，跳过: chat_id={chat_id}")
+                return
+
+            # 摘要同样占用模型的生成名额，与该用户的对话一起排队，不绕过并发上限
+            ticket = service_container.get(ADMISSION).ticket(model_config, user_id)
+            try:
+                try:
+                    async for _ in ticket.wait():
+                        pass
+                except AdmissionRejected as e:
+                    COMPACTIONS.inc(result="skipped")
+                    logger.info(f"[ContextManager] 推理准入被拒绝，本轮不生成摘要: chat_id={chat_id}, {str(e)}")
+                    return
+
+                start = time.perf_counter()
+                summary = await self._summarize(chat_model, context.summary, context.folded)
+                SUMMARY_SECONDS.observe(time.perf_counter() - start, model=model_config.model_name)
+            finally:
+                ticket.release()
+            if not summary:
+                COMPACTIONS.inc(result="empty")
+                logger.warning(f"[ContextManager] 模型未返回摘要，保留原消息: chat_id={chat_id}")
+                return
+
+            removed = await asyncio.to_thread(self.memory.fold, user_id, chat_id, context.folded, summary)
+            COMPACTIONS.inc(result="success")
+            logger.info(
+                f"[ContextManager] 滚动摘要已更新: chat_id={chat_id}, folded={len(context.folded)}, "
+                f"removed={removed}, summary_chars={len(summary)}"
+            )
+        except Exception as e:
+            COMPACTIONS.inc(result="failed")
+            logger.error(f"[ContextManager] 生成滚动摘要失败: chat_id={chat_id}, error={str(e)}", exc_info=True)
+        finally:
+            try:
+                await asyncio.to_thread(self._release_lock, lock_key, lock_token)
+            except Exception as e:
+                logger.warning(f"[ContextManager] 释放摘要锁失败: {str(e)}")
+
+    def _release_lock(self, lock_key: str, lock_token: str) -> None:
+        if self.memory.redis.get(lock_key) == lock_token.encode("utf-8"):
+            self.memory.redis.delete(lock_key)
+
+    @staticmethod
+    async def _summarize(chat_model: Any, summary: str, folded: List[Message]) -> Optional[str]:
+        dialogue = "\n".join(
+            f"{'用户' if role == 'human' else '助手'}: {content}" for role, content in folded
+        )
+        messages = [
+            SystemMessage(content=SUMMARY_SYSTEM_PROMPT),
+            HumanMessage(content=f"【已有摘要】\n{summary or '无'}\n\n【新增对话】\n{dialogue}")
+        ]
+        result = await chat_model.ainvoke(messages)
+        # OllamaLLM 返回字符串，ChatOpenAI 返回消息对象；思考模型的 <think> 内容不进入摘要
+        text = result.content if hasattr(result, "content") else str(result)
+        return THINK_PATTERN.sub("", text).strip()
@@ -0,0 +1,238 @@
+# chat/utils/embedding_cache_util.py
+"""
+嵌入向量缓存
+
+文档对话每次检索都要把问题发给 Ollama 嵌入，CPU 环境下这是检索中最慢的一步；用户重复提问、
+重新上传相同文档时，同样的文本会被反复嵌入。CachedEmbeddings 包装嵌入模型，按
+"嵌入模型 + 规范化文本的哈希" 缓存向量：
+
+- 进程内 LRU：命中时不产生任何网络往返
+- Redis：float32 小端字节串存储（768 维约 3KB），多个 worker / 服务实例共享，未命中时批量 MGET
+- 规范化：Unicode NFKC + 合并连续空白 + 去掉首尾空白，只影响缓存键，嵌入的仍是原文
+- 检索（embed_query / aembed_query）与入库（embed_documents，BatchEmbedder 会调用）共用同一缓存
+- Redis 不可用时只使用进程内缓存，不影响嵌入
+
+命中率见指标 embedding_cache_requests_total（标签 tier=memory/redis/miss，kind=query/document）。
+
+环境变量:
+    EMBEDDING_CACHE_ENABLED     是否启用，默认 True
+    EMBEDDING_CACHE_SIZE        进程内 LRU 条数，默认 4096
+    EMBEDDING_CACHE_TTL_DAYS    Redis 中向量的过期天数，默认 30
+"""
+import os
+import re
+import sys
+import array
+import asyncio
+import hashlib
+import logging
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence
+
+from langchain_core.embeddings import Embeddings
+
+from common.utils.metrics_util import counter
+from common.utils.redis_util import get_redis
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "True").lower() == "true"
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "4096"))
+EMBEDDING_CACHE_TTL_DAYS = int(os.getenv("EMBEDDING_CACHE_TTL_DAYS", "30"))
+
+KEY_PREFIX = "emb"
+
+LITTLE_ENDIAN = sys.byteorder == "little"
+
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+CACHE_REQUESTS = counter(
+    "embedding_cache_requests_total",
+    "嵌入缓存查询次数，标签 tier=memory/redis/miss（miss 表示实际调用了嵌入模型），kind=query/document"
+)
+
+
+def normalize_text(text: str) -> str:
+    """规范化文本（仅用于计算缓存键）"""
+    return WHITESPACE_PATTERN.sub(" ", unicodedata.normalize("NFKC", text or "")).strip()
+
+
+def pack_vector(vector: Sequence[float]) -> bytes:
+    """向量编码为 float32 小端字节串"""
+    values = array.array("f", vector)
+    if values.itemsize != 4:
+        raise ValueError("当前平台的 float 不是 32 位")
+    if not LITTLE_ENDIAN:
+        values.byteswap()
+    return values.tobytes()
+
+
+def unpack_vector(data: bytes) -> List[float]:
+    """float32 小端字节串解码为向量"""
+    values = array.array("f")
+    values.frombytes(data)
+    if not LITTLE_ENDIAN:
+        values.byteswap()
+    return values.tolist()
+
+
+class _LRUCache:
+    """线程安全的进程内 LRU（入库在线程池中执行，检索在事件循环中执行）"""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._items: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[List[float]]:
+        with self._lock:
+            vector = self._items.get(key)
+            if vector is not None:
+                self._items.move_to_end(key)
+            return vector
+
+    def put(self, key: str, vector: List[float]) -> None:
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._items[key] = vector
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    带缓存的嵌入模型包装
+
+    使用示例:
+        embedding = CachedEmbeddings(OllamaEmbeddings(model=..., base_url=...), model_name=EMBEDDING_MODEL)
+        Chroma(client=client, collection_name=..., embedding_function=embedding)
+    """
+
+    def __init__(
+            self,
+            embeddings: Embeddings,
+            model_name: str,
+            max_size: int = EMBEDDING_CACHE_SIZE,
+            ttl_seconds: int = EMBEDDING_CACHE_TTL_DAYS * 86400
+    ):
+        """
+        Args:
+            embeddings: 实际的嵌入模型
+            model_name: 嵌入模型名（缓存键的一部分，换模型后旧向量不会被误用）
+            max_size: 进程内 LRU 条数
+            ttl_seconds: Redis 中向量的过期时间（秒）
+        """
+        self.embeddings = embeddings
+        self.model_name = model_name or "default"
+        self.ttl_seconds = ttl_seconds
+        self._memory = _LRUCache(max_size)
+
+    def key(self, text: str) -> str:
+        digest = hashlib.sha1(normalize_text(text).encode("utf-8")).hexdigest()
+        return f"{KEY_PREFIX}:{self.model_name}:{digest}"
+
+    # ==================== 同步接口 ====================
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys, vectors, missing = self._lookup(texts, "document")
+        if missing:
+            embedded = self.embeddings.embed_documents([texts[i] for i in missing])
+            self._store(keys, vectors, missing, embedded)
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        keys, vectors, missing = self._lookup([text], "query")
+        if missing:
+            self._store(keys, vectors, missing, [self.embeddings.embed_query(text)])
+        return vectors[0]
+
+    # ==================== 异步接口 ====================
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys, vectors, missing = await asyncio.to_thread(self._lookup, texts, "document")
+        if missing:
+            embedded = await self.embeddings.aembed_documents([texts[i] for i in missing])
+            await asyncio.to_thread(self._store, keys, vectors, missing, embedded)
+        return vectors
+
+    async def aembed_query(self, text: str) -> List[float]:
+        keys, vectors, missing = self._lookup([text], "query", redis_lookup=False)
+        if missing:
+            # 进程内未命中时才访问 Redis（在线程中执行，不阻塞事件循环）
+            keys, vectors, missing = await asyncio.to_thread(self._lookup, [text], "query")
+        if missing:
+            vector = await self.embeddings.aembed_query(text)
+            await asyncio.to_thread(self._store, keys, vectors, missing, [vector])
+        return vectors[0]
+
+    # ==================== 缓存读写 ====================
+
+    def _lookup(self, texts: List[str], kind: str, redis_lookup: bool = True):
+        """
+        依次查询进程内缓存与 Redis
+
+        Returns:
+            (缓存键列表, 向量列表（未命中的位置为 None）, 未命中的下标列表)
+        """
+        keys = [self.key(text) for text in texts]
+        vectors: List[Optional[List[float]]] = [None] * len(texts)
+        if not EMBEDDING_CACHE_ENABLED:
+            return keys, vectors, list(range(len(texts)))
+
+        missing = []
+        for index, key in enumerate(keys):
+            vector = self._memory.get(key)
+            if vector is not None:
+                vectors[index] = vector
+            else:
+                missing.append(index)
+        if len(texts) > len(missing):
+            CACHE_REQUESTS.inc(len(texts) - len(missing), tier="memory", kind=kind)
+        if not missing or not redis_lookup:
+            return keys, vectors, missing
+
+        try:
+            # 同一批文本中可能有重复的片段，只查询一次
+            unique_keys = list(dict.fromkeys(keys[i] for i in missing))
+            found: Dict[str, List[float]] = {}
+            for key, data in zip(unique_keys, get_redis().mget(unique_keys)):
+                if data:
+                    found[key] = unpack_vector(data)
+        except Exception as e:
+            logger.warning(f"[EmbeddingCache] 读取 Redis 缓存失败: {str(e)}")
+            found = {}
+
+        still_missing = []
+        for index in missing:
+            vector = found.get(keys[index])
+            if vector is not None:
+                vectors[index] = vector
+                self._memory.put(keys[index], vector)
+            else:
+                still_missing.append(index)
+        if len(missing) > len(still_missing):
+            CACHE_REQUESTS.inc(len(missing) - len(still_missing), tier="redis", kind=kind)
+        if still_missing:
+            CACHE_REQUESTS.inc(len(still_missing), tier="miss", kind=kind)
+        return keys, vectors, still_missing
+
+    def _store(self, keys: List[str], vectors: List, missing: List[int], embedded: List[List[float]]) -> None:
+        """把新嵌入的向量填回结果并写入缓存"""
+        for index, vector in zip(missing, embedded):
+            vectors[index] = vector
+        if not EMBEDDING_CACHE_ENABLED:
+            return
+
+        for index in missing:
+            self._memory.put(keys[index], vectors[index])
+        try:
+            pipe = get_redis().pipeline(transaction=False)
+            for key, index in {keys[i]: i for i in missing}.items():
+                pipe.set(key, pack_vector(vectors[index]), ex=self.ttl_seconds)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"[EmbeddingCache] 写入 Redis 缓存失败: {str(e)}")
@@ -0,0 +1,241 @@
+# chat/utils/history_writer_util.py
+"""
+聊天记录后台批量写入（chat / agent 服务共用）
+
+原先每轮对话结束后 create_task 一个协程，在请求的数据库会话上执行一次 INSERT + COMMIT：
+会话在响应结束后可能已经关闭，同步的 commit 还会阻塞事件循环，并发高时每轮一次提交也放大了数据库压力。
+这里改为每个进程一个写入线程：
+
+- 仓储的 save_chat_history 只把记录放入有界队列（HISTORY_WRITER_QUEUE_SIZE）即返回
+- 写入线程使用自己的数据库会话，每攒够 HISTORY_WRITER_BATCH_SIZE 条或等待满 HISTORY_WRITER_FLUSH_MS 毫秒
+  即用一条多行 INSERT 写入并提交一次；批量写入失败时逐条重试，只丢弃出错的那一条
+- 队列满时不丢记录：调用方在线程池中直接写入这一条（相当于回到原来的逐条写入）
+- 会话汇总表 chat_conversation（标题、轮数、最后消息时间）在同一事务中按会话合并后 upsert，
+  会话列表接口直接分页读取汇总表，不再扫描聊天记录
+- 服务关闭时（service_container.shutdown）写完队列中剩余的记录，最多等待 HISTORY_WRITER_SHUTDOWN_SECONDS 秒
+
+指标：chat_history_queue_depth、chat_history_write_seconds、chat_history_batch_rows、chat_history_rows_total
+
+环境变量:
+    HISTORY_WRITER_QUEUE_SIZE          队列容量，默认 10000
+    HISTORY_WRITER_BATCH_SIZE          每批最多写入的记录数，默认 200
+    HISTORY_WRITER_FLUSH_MS            一批记录的最长等待时间（毫秒），默认 200
+    HISTORY_WRITER_SHUTDOWN_SECONDS    关闭时等待写完剩余记录的最长时间（秒），默认 10
+"""
+import os
+import time
+import queue
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import func, insert
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+
+from chat.models.chat_model import ChatConversation, ChatHistory
+from common.config.common_database import SessionLocal
+from common.utils.count_cache_util import invalidate_count
+from common.utils.metrics_util import counter, gauge, histogram
+from common.utils.service_container import service_container
+
+logger = logging.getLogger(__name__)
+
+HISTORY_WRITER_QUEUE_SIZE = int(os.getenv("HISTORY_WRITER_QUEUE_SIZE", "10000"))
+HISTORY_WRITER_BATCH_SIZE = int(os.getenv("HISTORY_WRITER_BATCH_SIZE", "200"))
+HISTORY_WRITER_FLUSH_MS = float(os.getenv("HISTORY_WRITER_FLUSH_MS", "200"))
+HISTORY_WRITER_SHUTDOWN_SECONDS = float(os.getenv("HISTORY_WRITER_SHUTDOWN_SECONDS", "10"))
+
+HISTORY_WRITER = "chat.history_writer"
+
+QUEUE_DEPTH = gauge("chat_history_queue_depth", "等待写入的聊天记录数")
+WRITE_SECONDS = histogram(
+    "chat_history_write_seconds",
+    "写入一批聊天记录（INSERT + COMMIT）的耗时（秒）",
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+)
+BATCH_ROWS = histogram(
+    "chat_history_batch_rows",
+    "每批写入的聊天记录数",
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500)
+)
+ROWS = counter(
+    "chat_history_rows_total",
+    "聊天记录写入结果，标签 source=chat/agent、result=written/failed/direct（direct 表示队列已满时直接写入）"
+)
+
+# 会话标题取第一个问题的前若干个字符
+CONVERSATION_TITLE_LENGTH = 100
+
+# 队列中的关闭标记
+_STOP = object()
+
+
+def history_row(chat_data, source: str, default_tenant_id: Optional[str] = None) -> Dict[str, Any]:
+    """把 ChatSchema / ChatHistorySchema 转换为 chat_history 表的一行（create_time 取入队时间）"""
+    return {
+        "user_id": chat_data.user_id,
+        "tenant_id": chat_data.tenant_id or default_tenant_id,
+        "model_id": chat_data.model_id,
+        "files": getattr(chat_data, "files", None),
+        "chat_id": chat_data.chat_id,
+        "prompt": chat_data.prompt,
+        "system_prompt": chat_data.system_prompt,
+        "think_content": chat_data.think_content,
+        "response_content": chat_data.response_content,
+        "content": chat_data.content,
+        "create_time": datetime.now(),
+        "_source": source,
+    }
+
+
+def conversation_rows(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """把一批聊天记录按 (user_id, chat_id) 合并为会话汇总行（没有会话ID的记录不计入）"""
+    summaries: Dict[tuple, Dict[str, Any]] = {}
+    for row in rows:
+        if not row.get("user_id") or not row.get("chat_id"):
+            continue
+        key = (row["user_id"], row["chat_id"])
+        summary = summaries.get(key)
+        if summary is None:
+            summary = summaries[key] = {
+                "user_id": row["user_id"],
+                "tenant_id": row.get("tenant_id"),
+                "chat_id": row["chat_id"],
+                "title": (row.get("prompt") or "").strip()[:CONVERSATION_TITLE_LENGTH] or None,
+                "model_id": row.get("model_id"),
+                "turn_count": 0,
+                "create_time": row["create_time"],
+                "last_message_time": row["create_time"],
+            }
+        summary["turn_count"] += 1
+        summary["model_id"] = row.get("model_id") or summary["model_id"]
+        summary["last_message_time"] = max(summary["last_message_time"], row["create_time"])
+    return list(summaries.values())
+
+
+def upsert_conversations(db, rows: List[Dict[str, Any]]) -> None:
+    """在调用方的事务中累加会话汇总（已有会话：轮数相加、最后消息时间取较大值、保留原标题）"""
+    values = conversation_rows(rows)
+    if not values:
+        return
+    stmt = mysql_insert(ChatConversation).values(values)
+    stmt = stmt.on_duplicate_key_update(
+        turn_count=ChatConversation.turn_count + stmt.inserted.turn_count,
+        last_message_time=func.greatest(ChatConversation.last_message_time, stmt.inserted.last_message_time),
+        model_id=func.coalesce(stmt.inserted.model_id, ChatConversation.model_id),
+        title=func.coalesce(ChatConversation.title, stmt.inserted.title),
+    )
+    db.execute(stmt)
+
+
+class ChatHistoryWriter:
+    """
+    聊天记录写入线程（进程级共享，通过 service_container 获取）
+
+    使用示例:
+        writer = service_container.get(HISTORY_WRITER)
+        row = history_row(chat_data, "chat")
+        if not writer.submit(row):
+            await asyncio.to_thread(writer.write_now, row)      # 队列已满
+    """
+
+    def __init__(
+            self,
+            queue_size: int = HISTORY_WRITER_QUEUE_SIZE,
+            batch_size: int = HISTORY_WRITER_BATCH_SIZE,
+            flush_ms: float = HISTORY_WRITER_FLUSH_MS
+    ):
+        self.batch_size = max(1, batch_size)
+        self.flush_seconds = max(0.0, flush_ms / 1000)
+        self._queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self._thread = threading.Thread(target=self._run, name="chat-history-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, row: Dict[str, Any]) -> bool:
+        """放入写入队列，队列已满时返回 False（不阻塞事件循环）"""
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            return False
+        QUEUE_DEPTH.set(self._queue.qsize())
+        return True
+
+    def write_now(self, row: Dict[str, Any]) -> bool:
+        """在调用线程中直接写入一条记录（队列已满时使用）"""
+        written = self._write([row])
+        ROWS.inc(source=row.get("_source", ""), result="direct" if written else "failed")
+        return written
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.flush_seconds
+            stop = False
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+            QUEUE_DEPTH.set(self._queue.qsize())
+            self._flush(batch)
+            if stop:
+                return
+
+    def _flush(self, batch: List[Dict[str, Any]]) -> None:
+        """写入一批记录；整批失败时逐条重试，只丢弃出错的记录"""
+        if self._write(batch):
+            for row in batch:
+                ROWS.inc(source=row.get("_source", ""), result="written")
+            return
+        if len(batch) == 1:
+            ROWS.inc(source=batch[0].get("_source", ""), result="failed")
+            return
+        for row in batch:
+            ROWS.inc(source=row.get("_source", ""), result="written" if self._write([row]) else "failed")
+
+    @staticmethod
+    def _write(rows: List[Dict[str, Any]]) -> bool:
+        values = [{key: value for key, value in row.items() if not key.startswith("_")} for row in rows]
+        start = time.perf_counter()
+        db = SessionLocal()
+        try:
+            # 多行 INSERT 与会话汇总的 upsert，一次提交
+            db.execute(insert(ChatHistory), values)
+            upsert_conversations(db, values)
+            db.commit()
+        except Exception as e:
+            logger.error(f"[ChatHistoryWriter] 写入 {len(rows)} 条聊天记录失败: {str(e)}", exc_info=True)
+            db.rollback()
+            return False
+        finally:
+            db.close()
+        WRITE_SECONDS.observe(time.perf_counter() - start)
+        BATCH_ROWS.observe(len(rows))
+        invalidate_count(*{f"chat_history:{row['user_id']}" for row in rows})
+        return True
+
+    def shutdown(self, timeout: float = HISTORY_WRITER_SHUTDOWN_SECONDS) -> None:
+        """写完队列中剩余的记录后停止写入线程"""
+        remaining = self._queue.qsize()
+        if remaining:
+            logger.info(f"[ChatHistoryWriter] 关闭前写入剩余的 {remaining} 条聊天记录")
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            logger.error("[ChatHistoryWriter] 写入队列已满，无法在关闭前写完剩余记录")
+            return
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            logger.error(f"[ChatHistoryWriter] {timeout} 秒内未写完剩余记录，剩余 {self._queue.qsize()} 条")
+
+
+service_container.register(HISTORY_WRITER, ChatHistoryWriter, lambda writer: writer.shutdown())
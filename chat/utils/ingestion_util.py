@@ -0,0 +1,439 @@
+# chat/utils/ingestion_util.py
+"""
+文档后台入库
+
+上传接口只负责把文件流式写入磁盘并登记任务，立即返回；PDF 解析、分段、嵌入与写入 Chroma
+由进程内的入库线程池执行，不占用请求，也不阻塞事件循环。
+
+- 任务状态：Redis 哈希 `ingest_job:{doc_id}`（status / stage / 页数与片段数进度 / attempts / error ...），
+  由 getDocStatus 接口查询；任务 ID 即文档 ID
+- 流水线：PDF 按页码区间并行提取（见 chat/utils/pdf_util.py），提取出的文本流式分段，
+  每累计 INGEST_BATCH_SIZE 个片段嵌入后写入 Chroma 并记录一次进度，不在内存中拼接整个文档
+- 嵌入：一批片段再按 EMBED_BATCH_SIZE 切成多个请求并行发往嵌入服务，过载时退避重试
+  （见 chat/utils/batch_embed_util.py）；向量算好后按批 upsert 到 Chroma，单次写入的片段数有上限
+- 增量入库：每个片段的元数据带 chunk_hash（片段文本的 SHA-1），写入前先按哈希在向量库中查找已有的向量，
+  重新上传改动不大的文档时，未变化的片段直接复用向量，只嵌入新增或改动的片段
+- 分片：片段写入文档所属租户（或用户 + 租户）的集合（见 chat/utils/collection_util.py）
+- 关键词索引：写入 Chroma 后同一批片段写入 BM25 索引（见 chat/utils/lexical_util.py），供混合检索使用
+- 吞吐：每个任务完成时输出 片段数/秒 到日志与指标 chat_ingest_chunks_per_second
+- 断点续传：片段 ID 为 `{doc_id}-{序号}`，分段结果是确定的；失败重试时从 done_chunks 继续，
+  已写入的片段不会重复嵌入
+- 失败重试：自动重试 INGEST_MAX_ATTEMPTS 次（指数退避），之后标记为 failed，可通过 retryDoc 接口手动重试
+- 多 worker：每个任务执行时持有 `ingest_job:{doc_id}:lock`，服务启动时各 worker 都会尝试恢复
+  未完成的任务，同一任务只会被一个 worker 执行
+
+环境变量:
+    INGEST_MAX_WORKERS     入库线程数，默认 2
+    INGEST_BATCH_SIZE      每批嵌入/写入 Chroma 的片段数，默认 128
+    INGEST_MAX_ATTEMPTS    自动重试次数上限，默认 3
+    INGEST_JOB_TTL_DAYS    任务状态保留天数，默认 7
+"""
+import os
+import time
+import uuid
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+from chat.utils.batch_embed_util import BatchEmbedder
+from chat.utils.collection_util import COLLECTION_ROUTER
+from chat.utils.lexical_util import get_lexical_index
+from chat.utils.pdf_util import iter_pdf_text
+from common.utils.metrics_util import counter, gauge, histogram
+from common.utils.redis_util import get_redis
+from common.utils.service_container import service_container
+
+logger = logging.getLogger(__name__)
+
+INGEST_MAX_WORKERS = int(os.getenv("INGEST_MAX_WORKERS", "2"))
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "128"))
+INGEST_MAX_ATTEMPTS = int(os.getenv("INGEST_MAX_ATTEMPTS", "3"))
+INGEST_JOB_TTL_DAYS = int(os.getenv("INGEST_JOB_TTL_DAYS", "7"))
+
+KEY_PREFIX = "ingest_job"
+# 任务锁的过期时间（秒），每写完一批续期一次
+LOCK_SECONDS = 300
+# 自动重试的退避基数（秒）：5、10、20 ...
+RETRY_BACKOFF_SECONDS = 5
+
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+# 流式分段时每累计这么多字符切分一次
+SPLIT_FLUSH_CHARS = CHUNK_SIZE * 64
+# TXT 文件每次读取的字符数
+TEXT_READ_CHARS = 1024 * 1024
+
+INGESTION = "chat.ingestion"
+
+# 任务状态
+PENDING = "pending"
+RUNNING = "running"
+SUCCESS = "success"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+INGEST_JOBS = counter("chat_ingest_jobs_total", "文档入库任务次数（按结果）")
+INGEST_CHUNKS = counter("chat_ingest_chunks_total", "写入向量库的文档片段数")
+INGEST_RUNNING = gauge("chat_ingest_jobs_running", "正在执行的文档入库任务数")
+INGEST_THROUGHPUT = histogram(
+    "chat_ingest_chunks_per_second",
+    "每个入库任务的吞吐（片段数/秒，含提取、嵌入与写入）",
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+)
+INGEST_REUSED_CHUNKS = counter("chat_ingest_chunks_reused_total", "按片段哈希复用已有向量、未重新嵌入的片段数")
+INGEST_WRITE_SECONDS = histogram("chat_ingest_write_seconds", "每批片段写入 Chroma 的耗时（秒）")
+
+
+class IngestionCancelled(Exception):
+    """任务已被取消（文档被删除）"""
+
+
+def job_key(doc_id: str) -> str:
+    return f"{KEY_PREFIX}:{doc_id}"
+
+
+def chunk_hash(text: str) -> str:
+    """片段文本的哈希（向量复用的依据）"""
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def iter_text(file_path: str, ext: str, on_progress=None) -> Iterator[str]:
+    """逐段读取磁盘文件的文本（PDF 按页码区间并行提取，TXT 按块读取）"""
+    if ext.lower() == "pdf":
+        yield from iter_pdf_text(file_path, on_progress=on_progress)
+        return
+
+    with open(file_path, "r", encoding="utf-8") as f:
+        while True:
+            block = f.read(TEXT_READ_CHARS)
+            if not block:
+                break
+            yield block
+
+
+def split_stream(parts: Iterable[str]) -> Iterator[str]:
+    """
+    流式分段：文本累计到 SPLIT_FLUSH_CHARS 后切分一次，最后一段与后续文本合并后再切分
+
+    不需要把整个文档的文本拼成一个字符串；结果对同样的输入是确定的，重试时片段序号不变。
+    """
+    splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+    buffer: List[str] = []
+    buffered = 0
+    for part in parts:
+        buffer.append(part)
+        buffered += len(part)
+        if buffered < SPLIT_FLUSH_CHARS:
+            continue
+        chunks = splitter.split_text("".join(buffer))
+        # 最后一段可能在区间边界处被截断，留到下一轮
+        yield from chunks[:-1]
+        buffer = chunks[-1:]
+        buffered = sum(len(chunk) for chunk in buffer)
+
+    tail = "".join(buffer)
+    if tail.strip():
+        yield from splitter.split_text(tail)
+
+
+class IngestionPipeline:
+    """
+    文档入库任务（进程级共享，通过 service_container 获取）
+
+    使用示例:
+        pipeline = service_container.get(INGESTION)
+        pipeline.create_job(doc_id, user_id, tenant_id, filename, ext, file_path)
+        pipeline.submit(doc_id)
+        pipeline.get_job(doc_id)    # {"status": "running", "done_chunks": "64", ...}
+    """
+
+    def __init__(self, max_workers: int = INGEST_MAX_WORKERS):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingest")
+        self.ttl_seconds = INGEST_JOB_TTL_DAYS * 86400
+
+    # ==================== 任务状态 ====================
+
+    def create_job(self, doc_id: str, user_id: str, tenant_id: str, filename: str, ext: str, file_path: str) -> None:
+        now = str(int(time.time()))
+        key = job_key(doc_id)
+        pipe = get_redis().pipeline(transaction=False)
+        pipe.hset(key, mapping={
+            "doc_id": doc_id,
+            "user_id": user_id,
+            "tenant_id": tenant_id or "",
+            "filename": filename,
+            "ext": ext,
+            "file_path": file_path,
+            "status": PENDING,
+            "stage": "",
+            "total_pages": 0,
+            "done_pages": 0,
+            "total_chunks": 0,
+            "done_chunks": 0,
+            "attempts": 0,
+            "error": "",
+            "create_time": now,
+            "update_time": now,
+        })
+        pipe.expire(key, self.ttl_seconds)
+        pipe.execute()
+
+    def get_job(self, doc_id: str) -> Optional[Dict[str, str]]:
+        raw = get_redis().hgetall(job_key(doc_id))
+        if not raw:
+            return None
+        return {k.decode("utf-8"): v.decode("utf-8") for k, v in raw.items()}
+
+    def _update(self, doc_id: str, **fields) -> None:
+        fields["update_time"] = str(int(time.time()))
+        key = job_key(doc_id)
+        pipe = get_redis().pipeline(transaction=False)
+        pipe.hset(key, mapping=fields)
+        pipe.expire(key, self.ttl_seconds)
+        pipe.execute()
+
+    def cancel(self, doc_id: str) -> None:
+        """取消任务（删除文档时调用），执行中的任务在下一批写入前停止"""
+        key = job_key(doc_id)
+        if get_redis().exists(key):
+            self._update(doc_id, status=CANCELLED)
+
+    def retry(self, doc_id: str) -> bool:
+        """手动重试失败的任务（从已完成的片段继续），任务不是 failed 状态时返回 False"""
+        job = self.get_job(doc_id)
+        if not job or job.get("status") != FAILED:
+            return False
+        self._update(doc_id, status=PENDING, attempts=0, error="")
+        self.submit(doc_id)
+        return True
+
+    # ==================== 执行 ====================
+
+    def submit(self, doc_id: str, delay: float = 0) -> None:
+        """提交任务到入库线程池（delay 秒后执行）"""
+        if delay > 0:
+            timer = threading.Timer(delay, self.submit, args=(doc_id,))
+            timer.daemon = True
+            timer.start()
+            return
+        self.executor.submit(self.run, doc_id)
+
+    def resume_pending(self, batch_size: int = 500) -> int:
+        """提交未完成的任务（服务启动时调用），返回提交的任务数"""
+        submitted = 0
+        for key in get_redis().scan_iter(match=f"{KEY_PREFIX}:*", count=batch_size):
+            key = key.decode("utf-8")
+            if key.endswith(":lock"):
+                continue
+            doc_id = key.split(":", 1)[1]
+            job = self.get_job(doc_id)
+            if job and job.get("status") in (PENDING, RUNNING):
+                self.submit(doc_id)
+                submitted += 1
+        if submitted:
+            logger.info(f"[Ingestion] 已恢复 {submitted} 个未完成的入库任务")
+        return submitted
+
+    def run(self, doc_id: str) -> None:
+        """执行入库任务（在入库线程中运行）"""
+        redis_client = get_redis()
+        lock_key = f"{job_key(doc_id)}:lock"
+        lock_token = uuid.uuid4().hex
+        if not redis_client.set(lock_key, lock_token, nx=True, ex=LOCK_SECONDS):
+            logger.info(f"[Ingestion] 任务正在其他 worker 执行: doc_id={doc_id}")
+            return
+
+        INGEST_RUNNING.inc()
+        try:
+            job = self.get_job(doc_id)
+            if not job or job.get("status") not in (PENDING, RUNNING):
+                return
+            attempts = int(job.get("attempts") or 0) + 1
+            self._update(doc_id, status=RUNNING, stage="extract", attempts=attempts, error="", done_pages=0)
+            try:
+                self._ingest(job, lock_key)
+                self._update(doc_id, status=SUCCESS, stage="done")
+                INGEST_JOBS.inc(result="success")
+                logger.info(f"[Ingestion] 文档入库完成: doc_id={doc_id}, filename={job.get('filename')}")
+            except IngestionCancelled:
+                self._remove_vectors(job)
+                INGEST_JOBS.inc(result="cancelled")
+                logger.info(f"[Ingestion] 任务已取消: doc_id={doc_id}")
+            except Exception as e:
+                if self._is_cancelled(doc_id):
+                    # 文档在入库过程中被删除（文件已不存在等），不再重试
+                    self._remove_vectors(job)
+                    INGEST_JOBS.inc(result="cancelled")
+                    logger.info(f"[Ingestion] 任务已取消: doc_id={doc_id}")
+                    return
+                logger.error(f"[Ingestion] 文档入库失败: doc_id={doc_id}, attempts={attempts}, error={str(e)}",
+                             exc_info=True)
+                if attempts < INGEST_MAX_ATTEMPTS:
+                    self._update(doc_id, status=PENDING, error=str(e))
+                    self.submit(doc_id, delay=RETRY_BACKOFF_SECONDS * 2 ** (attempts - 1))
+                    INGEST_JOBS.inc(result="retry")
+                else:
+                    self._update(doc_id, status=FAILED, error=str(e))
+                    INGEST_JOBS.inc(result="failed")
+        finally:
+            INGEST_RUNNING.dec()
+            try:
+                if redis_client.get(lock_key) == lock_token.encode("utf-8"):
+                    redis_client.delete(lock_key)
+            except Exception as e:
+                logger.warning(f"[Ingestion] 释放任务锁失败: {str(e)}")
+
+    def _ingest(self, job: Dict[str, str], lock_key: str) -> None:
+        doc_id = job["doc_id"]
+        done = int(job.get("done_chunks") or 0)
+        if done:
+            logger.info(f"[Ingestion] 从第 {done + 1} 个片段继续: doc_id={doc_id}")
+
+        def on_pages(done_pages: int, total_pages: int) -> None:
+            self._update(doc_id, done_pages=done_pages, total_pages=total_pages)
+            get_redis().expire(lock_key, LOCK_SECONDS)
+
+        # 提取、分段与写入流水线执行：已提取的页面边分段边写入，不等整个文档提取完
+        chunks = split_stream(iter_text(job["file_path"], job["ext"], on_progress=on_pages))
+        # 写入文档所属租户（用户）的分片集合
+        vector_store = service_container.get(COLLECTION_ROUTER).get_store_for(job["tenant_id"], job["user_id"])
+        embedder = BatchEmbedder()
+        batch: List[Tuple[int, str]] = []
+        total = 0
+        written = 0
+        start = time.perf_counter()
+        for index, text in enumerate(chunks):
+            total = index + 1
+            if index < done:
+                continue
+            batch.append((index, text))
+            if len(batch) >= INGEST_BATCH_SIZE:
+                self._write_batch(vector_store, embedder, job, batch, lock_key)
+                written += len(batch)
+                batch = []
+        if batch:
+            self._write_batch(vector_store, embedder, job, batch, lock_key)
+            written += len(batch)
+
+        if total == 0:
+            raise ValueError("无法从文档提取文本内容")
+        if self._is_cancelled(doc_id):
+            raise IngestionCancelled()
+        self._update(doc_id, total_chunks=total, done_chunks=total)
+
+        elapsed = time.perf_counter() - start
+        rate = written / elapsed if elapsed > 0 else 0.0
+        if written:
+            INGEST_THROUGHPUT.observe(rate)
+        logger.info(f"[Ingestion] 文档已索引: {job['filename']}, 共{total}个片段, "
+                    f"本次写入{written}个, 耗时{elapsed:.1f}s, {rate:.1f} 片段/秒")
+
+    def _write_batch(
+            self,
+            vector_store,
+            embedder: BatchEmbedder,
+            job: Dict[str, str],
+            batch: List[Tuple[int, str]],
+            lock_key: str
+    ) -> None:
+        """嵌入并写入一批片段，记录进度并续期任务锁"""
+        doc_id = job["doc_id"]
+        if self._is_cancelled(doc_id):
+            raise IngestionCancelled()
+        texts = [text for _, text in batch]
+        hashes = [chunk_hash(text) for text in texts]
+        embeddings = self._find_embeddings(vector_store, hashes)
+        missing = [i for i, vector in enumerate(embeddings) if vector is None]
+        if missing:
+            for i, vector in zip(missing, embedder.embed([texts[i] for i in missing])):
+                embeddings[i] = vector
+        if len(batch) > len(missing):
+            INGEST_REUSED_CHUNKS.inc(len(batch) - len(missing))
+        # 再次检查：嵌入期间文档可能已被删除
+        if self._is_cancelled(doc_id):
+            raise IngestionCancelled()
+
+        metadatas = []
+        for (index, _), hash_value in zip(batch, hashes):
+            metadata = {
+                "filename": job["filename"],
+                "page": index + 1,
+                "user_id": job["user_id"],
+                "doc_id": doc_id,
+                "chunk_hash": hash_value,
+            }
+            if job["tenant_id"]:
+                metadata["tenant_id"] = job["tenant_id"]
+            metadatas.append(metadata)
+
+        # 向量已经算好，直接写入集合，不再经过 Chroma.add_documents 重新嵌入；
+        # upsert 保证重试时重复写入同一片段不会报错
+        start = time.perf_counter()
+        ids = [f"{doc_id}-{index}" for index, _ in batch]
+        vector_store._collection.upsert(
+            ids=ids,
+            embeddings=embeddings,
+            documents=texts,
+            metadatas=metadatas
+        )
+        INGEST_WRITE_SECONDS.observe(time.perf_counter() - start)
+        self._write_lexical(ids, texts, metadatas)
+        INGEST_CHUNKS.inc(len(batch))
+        self._update(doc_id, stage="embed", done_chunks=batch[-1][0] + 1)
+        get_redis().expire(lock_key, LOCK_SECONDS)
+
+    @staticmethod
+    def _write_lexical(ids: List[str], texts: List[str], metadatas: List[Dict]) -> None:
+        """写入关键词索引；失败只影响混合检索的召回，不让任务失败"""
+        try:
+            lexical = get_lexical_index()
+            if lexical is not None:
+                lexical.add(list(zip(ids, texts, metadatas)))
+        except Exception as e:
+            logger.warning(f"[Ingestion] 写入关键词索引失败: {str(e)}")
+
+    @staticmethod
+    def _find_embeddings(vector_store, hashes: List[str]) -> List[Optional[List[float]]]:
+        """按片段哈希查找向量库中已有的向量（与 hashes 一一对应，没有的位置为 None）"""
+        found: Dict[str, List[float]] = {}
+        try:
+            result = vector_store._collection.get(
+                where={"chunk_hash": {"$in": list(dict.fromkeys(hashes))}},
+                include=["embeddings", "metadatas"]
+            )
+            # embeddings 可能是 numpy 数组，不能直接做真值判断
+            vectors = result.get("embeddings")
+            for metadata, vector in zip(result.get("metadatas") or [], vectors if vectors is not None else []):
+                found.setdefault(metadata.get("chunk_hash"), [float(v) for v in vector])
+        except Exception as e:
+            # 查不到只是不能复用，照常嵌入
+            logger.warning(f"[Ingestion] 按片段哈希查找向量失败: {str(e)}")
+        return [found.get(hash_value) for hash_value in hashes]
+
+    def _is_cancelled(self, doc_id: str) -> bool:
+        return get_redis().hget(job_key(doc_id), "status") == CANCELLED.encode("utf-8")
+
+    @staticmethod
+    def _remove_vectors(job: Dict[str, str]) -> None:
+        doc_id = job["doc_id"]
+        try:
+            vector_store = service_container.get(COLLECTION_ROUTER).get_store_for(
+                job.get("tenant_id"), job.get("user_id"), create=False
+            )
+            if vector_store is not None:
+                vector_store.delete(where={"doc_id": doc_id})
+            lexical = get_lexical_index()
+            if lexical is not None:
+                lexical.delete_doc(doc_id)
+        except Exception as e:
+            logger.error(f"[Ingestion] 清理已取消任务的向量失败: doc_id={doc_id}, error={str(e)}")
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+service_container.register(INGESTION, IngestionPipeline, lambda pipeline: pipeline.shutdown())
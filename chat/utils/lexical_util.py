@@ -0,0 +1,313 @@
+# chat/utils/lexical_util.py
+"""
+文档片段的关键词（BM25）索引与混合检索融合
+
+纯向量检索对专有名词、编号、代码片段等字面匹配不敏感。入库时每个片段在写入 Chroma 的同时写入关键词索引，
+检索时向量结果与关键词结果用 RRF（Reciprocal Rank Fusion，按名次而不是分数融合，两路分数不需要可比）合并。
+
+- 后端：elasticsearch（服务部署）或 sqlite（内置 FTS5 的 BM25，本地运行无需额外服务）；
+  Elasticsearch 不可用时回退到 sqlite，设为 off 时只用向量检索
+- 过滤：user_id / tenant_id / doc_id 作为查询条件，在排序之前生效，只在用户自己的片段中计算名次
+- 中文分词：sqlite 后端把连续汉字切成二元组（bigram），英文与数字按词，无需额外的分词库
+- 片段 ID 与 Chroma 一致（`{doc_id}-{序号}`），重复写入同一片段会覆盖
+
+环境变量:
+    LEXICAL_BACKEND         sqlite / elasticsearch / off，默认 sqlite
+    LEXICAL_SQLITE_PATH     sqlite 索引文件，默认 Chroma 持久化目录下的 lexical_index.db
+    ES_HOST                 Elasticsearch 地址，如 https://localhost:9200
+    ES_USERNAME             Elasticsearch 用户名（可选）
+    ES_PASSWORD             Elasticsearch 密码（可选）
+    ES_VERIFY_CERTS         是否校验证书，默认 False
+    LEXICAL_ES_INDEX        Elasticsearch 索引名，默认 chat_chunks
+    LEXICAL_ES_ANALYZER     text 字段的分词器，默认 standard（安装了 IK 插件时可设为 ik_max_word）
+    RRF_K                   RRF 平滑常数，默认 60
+"""
+import os
+import re
+import sqlite3
+import logging
+import threading
+import unicodedata
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from langchain_core.documents import Document
+
+from chat.utils.chroma_util import PERSIST_DIR
+from common.utils.service_container import service_container
+
+try:
+    from elasticsearch import Elasticsearch, helpers as es_helpers
+except ImportError:
+    Elasticsearch = None
+    es_helpers = None
+
+logger = logging.getLogger(__name__)
+
+LEXICAL_BACKEND = os.getenv("LEXICAL_BACKEND", "sqlite").lower()
+LEXICAL_SQLITE_PATH = os.getenv("LEXICAL_SQLITE_PATH", os.path.join(PERSIST_DIR, "lexical_index.db"))
+ES_HOST = os.getenv("ES_HOST")
+ES_USERNAME = os.getenv("ES_USERNAME")
+ES_PASSWORD = os.getenv("ES_PASSWORD")
+ES_VERIFY_CERTS = os.getenv("ES_VERIFY_CERTS", "False").lower() == "true"
+LEXICAL_ES_INDEX = os.getenv("LEXICAL_ES_INDEX", "chat_chunks")
+LEXICAL_ES_ANALYZER = os.getenv("LEXICAL_ES_ANALYZER", "standard")
+RRF_K = int(os.getenv("RRF_K", "60"))
+
+# 查询最多使用的词项数（超长问题只取前面的词）
+MAX_QUERY_TERMS = 64
+
+LEXICAL_INDEX = "chat.lexical_index"
+
+TOKEN_PATTERN = re.compile(r"[\u4e00-\u9fff]+|[a-z0-9]+")
+
+SearchResult = List[Tuple[Document, float]]
+# (片段ID, 片段文本, 元数据)
+ChunkRecord = Tuple[str, str, Dict[str, Any]]
+
+
+def tokenize(text: str) -> List[str]:
+    """切分词项：连续汉字切成二元组，英文与数字按词（小写）"""
+    tokens: List[str] = []
+    for run in TOKEN_PATTERN.findall(unicodedata.normalize("NFKC", text or "").lower()):
+        if "\u4e00" <= run[0] <= "\u9fff" and len(run) > 1:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            tokens.append(run)
+    return tokens
+
+
+def chunk_key(doc: Document) -> str:
+    """片段的唯一标识（与 Chroma 中的 ID 一致）"""
+    doc_id = getattr(doc, "id", None)
+    if doc_id:
+        return doc_id
+    metadata = doc.metadata or {}
+    return f"{metadata.get('doc_id')}-{int(metadata.get('page') or 1) - 1}"
+
+
+def reciprocal_rank_fusion(result_lists: Iterable[SearchResult], k: int = RRF_K, limit: Optional[int] = None) -> SearchResult:
+    """
+    按名次融合多路检索结果：score = Σ 1 / (k + 名次)
+
+    Returns:
+        [(Document, 融合分数)]，分数从高到低
+    """
+    scores: Dict[str, float] = {}
+    documents: Dict[str, Document] = {}
+    for results in result_lists:
+        for rank, (doc, _) in enumerate(results, start=1):
+            key = chunk_key(doc)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+            documents.setdefault(key, doc)
+    ordered = sorted(scores, key=scores.get, reverse=True)
+    if limit is not None:
+        ordered = ordered[:limit]
+    return [(documents[key], scores[key]) for key in ordered]
+
+
+def _to_document(chunk_id: str, text: str, metadata: Dict[str, Any]) -> Document:
+    return Document(id=chunk_id, page_content=text or "", metadata={k: v for k, v in metadata.items() if v is not None})
+
+
+class SqliteLexicalIndex:
+    """基于 SQLite FTS5 的 BM25 索引（片段表 + 全文索引表，rowid 对应）"""
+
+    def __init__(self, path: str = LEXICAL_SQLITE_PATH):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS chunks (
+                id INTEGER PRIMARY KEY,
+                chunk_id TEXT NOT NULL UNIQUE,
+                doc_id TEXT,
+                user_id TEXT,
+                tenant_id TEXT,
+                filename TEXT,
+                page INTEGER,
+                text TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_chunks_doc ON chunks(doc_id);
+            CREATE INDEX IF NOT EXISTS idx_chunks_user ON chunks(user_id, tenant_id);
+            CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts USING fts5(tokens, tokenize='unicode61');
+        """)
+        self._conn.commit()
+
+    def add(self, records: Sequence[ChunkRecord]) -> None:
+        if not records:
+            return
+        with self._lock, self._conn:
+            self._delete_where("chunk_id IN (%s)" % ",".join("?" * len(records)), [r[0] for r in records])
+            for chunk_id, text, metadata in records:
+                cursor = self._conn.execute(
+                    "INSERT INTO chunks (chunk_id, doc_id, user_id, tenant_id, filename, page, text) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (chunk_id, metadata.get("doc_id"), metadata.get("user_id"), metadata.get("tenant_id"),
+                     metadata.get("filename"), metadata.get("page"), text)
+                )
+                self._conn.execute(
+                    "INSERT INTO chunks_fts (rowid, tokens) VALUES (?, ?)",
+                    (cursor.lastrowid, " ".join(tokenize(text)))
+                )
+
+    def delete_doc(self, doc_id: str) -> None:
+        with self._lock, self._conn:
+            self._delete_where("doc_id = ?", [doc_id])
+
+    def delete_tenant(self, tenant_id: str) -> None:
+        with self._lock, self._conn:
+            self._delete_where("tenant_id = ?", [tenant_id])
+
+    def _delete_where(self, condition: str, params: List[Any]) -> None:
+        self._conn.execute(f"DELETE FROM chunks_fts WHERE rowid IN (SELECT id FROM chunks WHERE {condition})", params)
+        self._conn.execute(f"DELETE FROM chunks WHERE {condition}", params)
+
+    def search(
+            self,
+            query: str,
+            k: int,
+            user_id: str,
+            tenant_id: Optional[str] = None,
+            doc_ids: Optional[List[str]] = None
+    ) -> SearchResult:
+        terms = list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS]
+        if not terms:
+            return []
+        match = " OR ".join(f'"{term}"' for term in terms)
+        sql = (
+            "SELECT c.chunk_id, c.text, c.doc_id, c.user_id, c.tenant_id, c.filename, c.page, bm25(chunks_fts) AS score "
+            "FROM chunks_fts JOIN chunks c ON c.id = chunks_fts.rowid "
+            "WHERE chunks_fts MATCH ? AND c.user_id = ?"
+        )
+        params: List[Any] = [match, user_id]
+        if tenant_id:
+            sql += " AND c.tenant_id = ?"
+            params.append(tenant_id)
+        if doc_ids:
+            sql += " AND c.doc_id IN (%s)" % ",".join("?" * len(doc_ids))
+            params.extend(doc_ids)
+        sql += " ORDER BY score LIMIT ?"
+        params.append(k)
+
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [
+            (_to_document(chunk_id, text, {
+                "doc_id": doc_id, "user_id": uid, "tenant_id": tid, "filename": filename, "page": page
+            }), score)
+            for chunk_id, text, doc_id, uid, tid, filename, page, score in rows
+        ]
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+class ElasticsearchLexicalIndex:
+    """基于 Elasticsearch 的 BM25 索引（元数据为 keyword 字段，过滤放在 bool.filter 中，不参与打分）"""
+
+    def __init__(self, index_name: str = LEXICAL_ES_INDEX):
+        if Elasticsearch is None:
+            raise RuntimeError("未安装 elasticsearch")
+        self.index_name = index_name
+        self.client = Elasticsearch(
+            hosts=[ES_HOST],
+            basic_auth=(ES_USERNAME, ES_PASSWORD) if ES_USERNAME else None,
+            verify_certs=ES_VERIFY_CERTS,
+            request_timeout=10
+        )
+        if not self.client.indices.exists(index=index_name):
+            self.client.indices.create(index=index_name, mappings={
+                "properties": {
+                    "text": {"type": "text", "analyzer": LEXICAL_ES_ANALYZER},
+                    "doc_id": {"type": "keyword"},
+                    "user_id": {"type": "keyword"},
+                    "tenant_id": {"type": "keyword"},
+                    "filename": {"type": "keyword"},
+                    "page": {"type": "integer"},
+                }
+            })
+
+    def add(self, records: Sequence[ChunkRecord]) -> None:
+        if not records:
+            return
+        es_helpers.bulk(self.client, (
+            {
+                "_index": self.index_name,
+                "_id": chunk_id,
+                "_source": {
+                    "text": text,
+                    "doc_id": metadata.get("doc_id"),
+                    "user_id": metadata.get("user_id"),
+                    "tenant_id": metadata.get("tenant_id"),
+                    "filename": metadata.get("filename"),
+                    "page": metadata.get("page"),
+                },
+            }
+            for chunk_id, text, metadata in records
+        ))
+
+    def delete_doc(self, doc_id: str) -> None:
+        self.client.delete_by_query(
+            index=self.index_name,
+            query={"term": {"doc_id": doc_id}},
+            conflicts="proceed"
+        )
+
+    def delete_tenant(self, tenant_id: str) -> None:
+        self.client.delete_by_query(
+            index=self.index_name,
+            query={"term": {"tenant_id": tenant_id}},
+            conflicts="proceed"
+        )
+
+    def search(
+            self,
+            query: str,
+            k: int,
+            user_id: str,
+            tenant_id: Optional[str] = None,
+            doc_ids: Optional[List[str]] = None
+    ) -> SearchResult:
+        filters: List[Dict[str, Any]] = [{"term": {"user_id": user_id}}]
+        if tenant_id:
+            filters.append({"term": {"tenant_id": tenant_id}})
+        if doc_ids:
+            filters.append({"terms": {"doc_id": doc_ids}})
+        response = self.client.search(
+            index=self.index_name,
+            query={"bool": {"must": [{"match": {"text": query}}], "filter": filters}},
+            size=k
+        )
+        results = []
+        for hit in response["hits"]["hits"]:
+            source = dict(hit["_source"])
+            text = source.pop("text", "")
+            results.append((_to_document(hit["_id"], text, source), hit["_score"]))
+        return results
+
+    def close(self) -> None:
+        self.client.close()
+
+
+def create_lexical_index():
+    if LEXICAL_BACKEND == "elasticsearch":
+        try:
+            index = ElasticsearchLexicalIndex()
+            logger.info(f"[LexicalIndex] 使用 Elasticsearch 索引: {ES_HOST}/{LEXICAL_ES_INDEX}")
+            return index
+        except Exception as e:
+            logger.warning(f"[LexicalIndex] Elasticsearch 不可用，改用本地 sqlite 索引: {str(e)}")
+    logger.info(f"[LexicalIndex] 使用 sqlite 索引: {LEXICAL_SQLITE_PATH}")
+    return SqliteLexicalIndex()
+
+
+def get_lexical_index():
+    """获取关键词索引；LEXICAL_BACKEND=off 时返回 None"""
+    if LEXICAL_BACKEND == "off":
+        return None
+    return service_container.get(LEXICAL_INDEX)
+
+
+service_container.register(LEXICAL_INDEX, create_lexical_index, lambda index: index.close())
@@ -0,0 +1,179 @@
+# chat/utils/pdf_util.py
+"""
+PDF 文本并行提取
+
+PDF 文本提取是纯 CPU 计算，逐页串行执行时只能用满一个核。这里把页码按区间切分，
+交给进程池并行提取，再按页码顺序逐段产出：
+
+- 每个任务在子进程中自行打开文件，只返回自己负责区间的文本，父进程不持有 PdfReader
+- 同时在途的区间数有上限（进程数 × 2），调用方逐段消费，已消费的区间文本可被回收，
+  内存占用与区间大小相关，而不是整个文档
+- 页数少于 PDF_PARALLEL_MIN_PAGES 时在当前线程直接提取，避免进程间传输的开销
+- 提取器：pypdf（默认）或 pdfplumber（版面还原更好，速度较慢），未安装 pdfplumber 时回退到 pypdf
+- 进程池使用 spawn 方式启动（服务进程内有多个线程，fork 可能继承被占用的锁），子进程只导入本模块
+
+环境变量:
+    PDF_EXTRACTOR             pypdf / pdfplumber，默认 pypdf
+    PDF_EXTRACT_WORKERS       提取进程数，默认 min(4, CPU 核数)
+    PDF_PAGES_PER_TASK        每个任务提取的页数，默认 20
+    PDF_PARALLEL_MIN_PAGES    并行提取的最小页数，默认 40
+"""
+import os
+import logging
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Optional, Tuple
+
+from pypdf import PdfReader
+
+from common.utils.service_container import service_container
+
+try:
+    import pdfplumber
+except ImportError:
+    pdfplumber = None
+
+logger = logging.getLogger(__name__)
+
+PDF_EXTRACTOR = os.getenv("PDF_EXTRACTOR", "pypdf").lower()
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", str(min(4, os.cpu_count() or 1))))
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "20"))
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "40"))
+
+EXTRACTORS = ("pypdf", "pdfplumber")
+
+PDF_EXECUTOR = "chat.pdf_executor"
+
+
+def resolve_extractor(extractor: Optional[str] = None) -> str:
+    """确定实际使用的提取器（pdfplumber 未安装时回退到 pypdf）"""
+    extractor = (extractor or PDF_EXTRACTOR).lower()
+    if extractor not in EXTRACTORS:
+        logger.warning(f"[PdfUtil] 未知的提取器 {extractor}，使用 pypdf")
+        return "pypdf"
+    if extractor == "pdfplumber" and pdfplumber is None:
+        logger.warning("[PdfUtil] 未安装 pdfplumber，使用 pypdf")
+        return "pypdf"
+    return extractor
+
+
+def _format_pages(pages: List[Tuple[int, str]]) -> str:
+    return "".join(f"Page {page_num}:\n{text}\n\n" for page_num, text in pages if text)
+
+
+def extract_page_range(file_path: str, start: int, end: int, extractor: str = "pypdf") -> str:
+    """
+    提取 [start, end) 区间的页面文本（页码从 0 开始），单页失败跳过
+
+    在子进程中执行，参数与返回值都需可序列化。
+    """
+    if extractor == "pdfplumber":
+        with pdfplumber.open(file_path, pages=list(range(start + 1, end + 1))) as pdf:
+            return _extract_plumber_pages(pdf.pages, start)
+    return _extract_pypdf_pages(PdfReader(file_path), start, end)
+
+
+def _extract_pypdf_pages(reader: PdfReader, start: int, end: int) -> str:
+    pages: List[Tuple[int, str]] = []
+    for index in range(start, end):
+        try:
+            pages.append((index + 1, reader.pages[index].extract_text() or ""))
+        except Exception as e:
+            logger.warning(f"Page {index + 1} text extraction failed: {str(e)}")
+    return _format_pages(pages)
+
+
+def _extract_plumber_pages(plumber_pages, start: int) -> str:
+    pages: List[Tuple[int, str]] = []
+    for offset, page in enumerate(plumber_pages):
+        try:
+            pages.append((start + offset + 1, page.extract_text() or ""))
+        except Exception as e:
+            logger.warning(f"Page {start + offset + 1} text extraction failed: {str(e)}")
+        finally:
+            # pdfplumber 会缓存页面对象，逐页释放
+            page.close()
+    return _format_pages(pages)
+
+
+def _iter_serial(file_path: str, ranges: List[Tuple[int, int]], extractor: str) -> Iterator[Tuple[int, str]]:
+    """在当前线程按区间提取（只打开一次文件）"""
+    if extractor == "pdfplumber":
+        with pdfplumber.open(file_path) as pdf:
+            for start, end in ranges:
+                yield end, _extract_plumber_pages(pdf.pages[start:end], start)
+        return
+    reader = PdfReader(file_path)
+    for start, end in ranges:
+        yield end, _extract_pypdf_pages(reader, start, end)
+
+
+def count_pages(file_path: str) -> int:
+    return len(PdfReader(file_path).pages)
+
+
+def iter_pdf_text(
+        file_path: str,
+        extractor: Optional[str] = None,
+        executor: Optional[ProcessPoolExecutor] = None,
+        pages_per_task: int = PDF_PAGES_PER_TASK,
+        on_progress=None
+) -> Iterator[str]:
+    """
+    按页码顺序逐段产出 PDF 文本（每段为一个页码区间，格式为 "Page n:\\n...\\n\\n"）
+
+    Args:
+        file_path: PDF 文件路径
+        extractor: 提取器，默认 PDF_EXTRACTOR
+        executor: 进程池，默认使用进程级共享的提取进程池
+        pages_per_task: 每个任务的页数
+        on_progress: 回调 on_progress(已提取页数, 总页数)
+    """
+    extractor = resolve_extractor(extractor)
+    total = count_pages(file_path)
+    if total == 0:
+        raise ValueError("PDF文件无有效内容")
+    ranges = [(start, min(start + pages_per_task, total)) for start in range(0, total, pages_per_task)]
+
+    if total < PDF_PARALLEL_MIN_PAGES or PDF_EXTRACT_WORKERS <= 1:
+        for end, text in _iter_serial(file_path, ranges, extractor):
+            yield text
+            if on_progress:
+                on_progress(end, total)
+        return
+
+    executor = executor or service_container.get(PDF_EXECUTOR)
+    window = max(PDF_EXTRACT_WORKERS, 1) * 2
+    pending = deque()
+    next_range = 0
+    try:
+        while pending or next_range < len(ranges):
+            # 在途任务数有上限，未消费的区间文本不会无限堆积
+            while next_range < len(ranges) and len(pending) < window:
+                start, end = ranges[next_range]
+                pending.append((end, executor.submit(extract_page_range, file_path, start, end, extractor)))
+                next_range += 1
+            end, future = pending.popleft()
+            yield future.result()
+            if on_progress:
+                on_progress(end, total)
+    finally:
+        # 调用方提前停止（任务取消）时不再等待剩余区间
+        for _, future in pending:
+            future.cancel()
+
+
+def extract_pdf_text(file_path: str, extractor: Optional[str] = None) -> str:
+    """提取整个 PDF 的文本（列表拼接，不做重复的字符串累加）"""
+    return "".join(iter_pdf_text(file_path, extractor))
+
+
+def create_pdf_executor() -> ProcessPoolExecutor:
+    return ProcessPoolExecutor(
+        max_workers=max(PDF_EXTRACT_WORKERS, 1),
+        mp_context=multiprocessing.get_context("spawn")
+    )
+
+
+service_container.register(PDF_EXECUTOR, create_pdf_executor, lambda executor: executor.shutdown(wait=False))
@@ -0,0 +1,226 @@
+# chat/utils/rerank_util.py
+"""
+检索结果重排与上下文装填
+
+混合检索（向量 + BM25，RRF 融合）只按召回排名排序，排在前面的片段不一定与问题最相关；
+原先放入 prompt 的也只是每个片段的前 50 个字符。这里：
+
+- 重排：启用重排时两路检索各多召回 CHAT_RERANK_CANDIDATES 个候选，融合后由重排器逐段打分，取前 CHAT_RETRIEVAL_TOP_K 个
+  - cross_encoder：本地轻量交叉编码模型（sentence-transformers 的 CrossEncoder，未安装时不重排），在检索线程池中执行
+  - llm：用本次对话配置的大模型一次性给所有候选打分（0~10），不额外部署模型，但会增加一次模型调用
+  - 重排超时（CHAT_RERANK_TIMEOUT）或失败时按融合顺序截取，不影响回答
+- 装填：片段全文按 token 预算（CHAT_CONTEXT_DOC_TOKENS，且不超过模型 prompt 预算的一半）依次放入上下文，
+  放不下的最后一段截断，内容相同的片段只放一次
+
+环境变量:
+    CHAT_RERANKER               none / cross_encoder / llm，默认 none（不重排）
+    CHAT_RERANK_CANDIDATES      启用重排时每路召回的候选数，默认 20
+    CHAT_RERANK_MODEL           cross_encoder 使用的模型，默认 BAAI/bge-reranker-base
+    CHAT_RERANK_TIMEOUT         重排超时（秒），默认 8
+    CHAT_CONTEXT_DOC_TOKENS     文档上下文的 token 预算，默认 1536
+"""
+import os
+import re
+import json
+import time
+import asyncio
+import logging
+import threading
+from typing import Callable, List
+
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from chat.utils.context_util import THINK_PATTERN
+from chat.utils.lexical_util import chunk_key
+from chat.utils.retrieval_util import RETRIEVAL_EXECUTOR, SearchResult
+from common.utils.chat_memory_util import estimate_tokens
+from common.utils.metrics_util import counter, histogram
+from common.utils.service_container import service_container
+
+try:
+    from sentence_transformers import CrossEncoder
+except ImportError:
+    CrossEncoder = None
+
+logger = logging.getLogger(__name__)
+
+CHAT_RERANKER = os.getenv("CHAT_RERANKER", "none").lower()
+CHAT_RERANK_CANDIDATES = int(os.getenv("CHAT_RERANK_CANDIDATES", "20"))
+CHAT_RERANK_MODEL = os.getenv("CHAT_RERANK_MODEL", "BAAI/bge-reranker-base")
+CHAT_RERANK_TIMEOUT = float(os.getenv("CHAT_RERANK_TIMEOUT", "8"))
+CHAT_CONTEXT_DOC_TOKENS = int(os.getenv("CHAT_CONTEXT_DOC_TOKENS", "1536"))
+
+# llm 重排时每个候选截取的字符数（控制打分 prompt 的长度）
+LLM_RERANK_MAX_CHARS = 400
+# 最后一段剩余预算少于该值时不再截断放入
+MIN_PARTIAL_TOKENS = 64
+
+RERANKER = "chat.reranker"
+
+LLM_RERANK_PROMPT = (
+    "你是检索结果相关性评估助手。请判断每段文本对回答问题的帮助程度，给出 0~10 的整数分，"
+    "只输出 JSON 数组（如 [7, 0, 9]），数组长度与文本段数一致，不要输出其他内容。"
+)
+SCORES_PATTERN = re.compile(r"\[[^\[\]]*\]", re.S)
+
+RERANK_SECONDS = histogram(
+    "chat_rerank_seconds",
+    "检索结果重排耗时（秒），标签 reranker=cross_encoder/llm",
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10)
+)
+RERANK_FAILURES = counter("chat_rerank_failures_total", "重排失败次数（按融合顺序截取），标签 reranker")
+CONTEXT_DOC_TOKENS = histogram(
+    "chat_context_doc_tokens",
+    "放入 prompt 的文档上下文 token 数",
+    buckets=(128, 256, 512, 1024, 1536, 2048, 4096, 8192)
+)
+
+
+class CrossEncoderReranker:
+    """本地交叉编码模型重排（模型在第一次打分时加载，进程级共享）"""
+
+    name = "cross_encoder"
+
+    def __init__(self, model_name: str = CHAT_RERANK_MODEL):
+        self.model_name = model_name
+        self._model = None
+        self._lock = threading.Lock()
+
+    def _get_model(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    logger.info(f"[CrossEncoderReranker] 加载重排模型: {self.model_name}")
+                    self._model = CrossEncoder(self.model_name, max_length=512)
+        return self._model
+
+    def predict(self, query: str, texts: List[str]) -> List[float]:
+        scores = self._get_model().predict([(query, text) for text in texts])
+        return [float(score) for score in scores]
+
+    async def score(self, query: str, texts: List[str]) -> List[float]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(service_container.get(RETRIEVAL_EXECUTOR), self.predict, query, texts)
+
+
+class LLMReranker:
+    """用对话配置的大模型打分重排（OllamaLLM / ChatOpenAI）"""
+
+    name = "llm"
+
+    def __init__(self, chat_model):
+        self.chat_model = chat_model
+
+    async def score(self, query: str, texts: List[str]) -> List[float]:
+        passages = "\n\n".join(
+            f"[{idx + 1}] {text[:LLM_RERANK_MAX_CHARS]}" for idx, text in enumerate(texts)
+        )
+        messages = [
+            SystemMessage(content=LLM_RERANK_PROMPT),
+            HumanMessage(content=f"问题：{query}\n\n共 {len(texts)} 段文本：\n{passages}")
+        ]
+        result = await self.chat_model.ainvoke(messages)
+        text = result.content if hasattr(result, "content") else str(result)
+        return parse_scores(THINK_PATTERN.sub("", text), len(texts))
+
+
+def parse_scores(text: str, expected: int) -> List[float]:
+    """解析大模型输出的分数数组，格式不符时抛出 ValueError"""
+    for match in SCORES_PATTERN.findall(text):
+        try:
+            scores = json.loads(match)
+        except ValueError:
+            continue
+        if len(scores) == expected and all(isinstance(score, (int, float)) for score in scores):
+            return [float(score) for score in scores]
+    raise ValueError(f"无法解析重排分数: {text[:200]}")
+
+
+def get_reranker(chat_model=None):
+    """按 CHAT_RERANKER 获取重排器；未启用、依赖未安装或缺少对话模型时返回 None"""
+    if CHAT_RERANKER == "cross_encoder":
+        if CrossEncoder is None:
+            return None
+        return service_container.get(RERANKER)
+    if CHAT_RERANKER == "llm" and chat_model is not None:
+        return LLMReranker(chat_model)
+    return None
+
+
+async def rerank(reranker, query: str, results: SearchResult, top_n: int) -> SearchResult:
+    """
+    重排检索结果，返回前 top_n 个（分数替换为重排分数）
+
+    未启用重排、重排失败或超时时按原顺序截取。
+    """
+    if reranker is None or len(results) <= 1:
+        return results[:top_n]
+    start = time.perf_counter()
+    try:
+        scores = await asyncio.wait_for(
+            reranker.score(query, [doc.page_content for doc, _ in results]), CHAT_RERANK_TIMEOUT
+        )
+    except Exception as e:
+        RERANK_FAILURES.inc(reranker=reranker.name)
+        logger.warning(f"[rerank] 重排失败，按融合顺序截取: reranker={reranker.name}, error={str(e) or type(e).__name__}")
+        return results[:top_n]
+    finally:
+        RERANK_SECONDS.observe(time.perf_counter() - start, reranker=reranker.name)
+
+    # 同分时保持融合顺序
+    order = sorted(range(len(results)), key=lambda idx: scores[idx], reverse=True)
+    return [(results[idx][0], scores[idx]) for idx in order[:top_n]]
+
+
+def _truncate(text: str, budget: int, count: Callable[[str], int]) -> str:
+    """截取 text 的前缀，使其 token 数不超过 budget"""
+    total = count(text)
+    if total <= budget:
+        return text
+    end = max(1, len(text) * budget // total)
+    while end > 1 and count(text[:end]) > budget:
+        end = end * 9 // 10
+    return text[:end]
+
+
+def pack_documents(
+        results: SearchResult,
+        budget: int = CHAT_CONTEXT_DOC_TOKENS,
+        count: Callable[[str], int] = estimate_tokens
+) -> str:
+    """
+    按 token 预算把片段全文装入上下文
+
+    Args:
+        results: 排好序的检索结果
+        budget: 文档上下文的 token 预算
+        count: token 计数函数（默认按字符估算，对话时使用模型的计数器）
+    """
+    output_lines = []
+    used = 0
+    seen = set()
+    for doc, _ in results:
+        metadata = doc.metadata
+        text = doc.page_content.strip()
+        # 不同文档中内容相同的片段只放一次
+        key = metadata.get("chunk_hash") or chunk_key(doc)
+        if not text or key in seen:
+            continue
+        seen.add(key)
+
+        header = f"第{len(output_lines) + 1}段, 文档来源：{metadata.get('filename', '未知文件')},  内容："
+        cost = count(header + text)
+        if used + cost > budget:
+            remaining = budget - used - count(header)
+            if remaining >= MIN_PARTIAL_TOKENS:
+                output_lines.append(f"{header}{_truncate(text, remaining, count)}...\n\n")
+                used = budget
+            break
+        output_lines.append(f"{header}{text}\n\n")
+        used += cost
+
+    CONTEXT_DOC_TOKENS.observe(used)
+    return "\n".join(output_lines)
+
+
+service_container.register(RERANKER, CrossEncoderReranker)
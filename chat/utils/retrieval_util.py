@@ -0,0 +1,234 @@
+# chat/utils/retrieval_util.py
+"""
+异步向量检索
+
+文档对话的检索分两步：查询文本嵌入（请求 Ollama）与 Chroma 相似度查询。原先两步都在 async 方法里同步执行，
+整段网络往返期间 worker 的事件循环被阻塞，同一进程内的其他对话（包括正在流式输出的回答）都要等待。
+
+- 嵌入：嵌入模型实现了原生异步接口（OllamaEmbeddings）时直接 await，否则放到检索线程池执行
+- 查询：设置了 CHROMA_HOST 且可连接时使用 chromadb.AsyncHttpClient 原生异步查询；
+  否则（本地持久化模式或异步客户端不可用）在检索线程池中执行同步查询
+- 检索线程池大小固定（CHAT_RETRIEVAL_MAX_WORKERS），并发超过时排队，不会无限制地创建线程
+- 每次检索记录各阶段耗时（embed / search / lexical / fuse / rerank / format），输出到日志与 chat_retrieval_seconds 指标
+
+环境变量:
+    CHAT_RETRIEVAL_MAX_WORKERS   检索线程池大小，默认 8
+    CHAT_RETRIEVAL_TOP_K         最终放入上下文的片段数，默认 4
+    CHAT_RETRIEVAL_CANDIDATES    混合检索时向量与关键词各自召回的候选数，默认 10
+    CHROMA_ASYNC_CLIENT          CHROMA_HOST 可用时是否使用异步 HTTP 客户端，默认 True
+"""
+import os
+import time
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from chat.utils.chroma_util import CHROMA_COLLECTION_NAME, CHROMA_HOST, CHROMA_PORT, EMBEDDING
+from chat.utils.collection_util import COLLECTION_ROUTER
+from common.utils.metrics_util import histogram
+from common.utils.service_container import service_container
+
+logger = logging.getLogger(__name__)
+
+CHAT_RETRIEVAL_MAX_WORKERS = int(os.getenv("CHAT_RETRIEVAL_MAX_WORKERS", "8"))
+CHROMA_ASYNC_CLIENT = os.getenv("CHROMA_ASYNC_CLIENT", "True").lower() == "true"
+CHAT_RETRIEVAL_TOP_K = int(os.getenv("CHAT_RETRIEVAL_TOP_K", "4"))
+CHAT_RETRIEVAL_CANDIDATES = int(os.getenv("CHAT_RETRIEVAL_CANDIDATES", "10"))
+
+# 异步客户端连接失败后，间隔多久再尝试（秒）
+ASYNC_CLIENT_RETRY_SECONDS = 60
+
+RETRIEVAL_EXECUTOR = "chat.retrieval_executor"
+RETRIEVER = "chat.retriever"
+
+RETRIEVAL_SECONDS = histogram(
+    "chat_retrieval_seconds",
+    "文档检索各阶段耗时（秒），标签 stage=embed/search/lexical/fuse/rerank/format，mode=async/thread",
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+)
+
+SearchResult = List[Tuple[Document, float]]
+
+
+class StageTimer:
+    """记录检索各阶段耗时"""
+
+    def __init__(self, mode: str):
+        self.mode = mode
+        self.stages: Dict[str, float] = {}
+        self._start = time.perf_counter()
+
+    def mark(self, stage: str) -> None:
+        now = time.perf_counter()
+        elapsed = now - self._start
+        self._start = now
+        self.stages[stage] = self.stages.get(stage, 0) + elapsed
+        RETRIEVAL_SECONDS.observe(elapsed, stage=stage, mode=self.mode)
+
+    def summary(self) -> str:
+        total = sum(self.stages.values())
+        parts = ", ".join(f"{stage}={seconds * 1000:.1f}ms" for stage, seconds in self.stages.items())
+        return f"mode={self.mode}, {parts}, total={total * 1000:.1f}ms"
+
+
+class VectorRetriever:
+    """
+    不阻塞事件循环的向量检索（进程级共享，通过 service_container 获取）
+
+    使用示例:
+        retriever = service_container.get(RETRIEVER)
+        timer = retriever.timer()
+        vector = await retriever.embed(query, timer)
+        results = await retriever.search(vector, k=5, where={"user_id": user_id}, timer=timer)
+    """
+
+    def __init__(self, executor: Optional[ThreadPoolExecutor] = None, use_async_client: bool = CHROMA_ASYNC_CLIENT):
+        self._executor = executor
+        self._use_async_client = use_async_client and bool(CHROMA_HOST)
+        self._async_client = None
+        self._async_collections: Dict[str, Any] = {}
+        self._async_lock: Optional[asyncio.Lock] = None
+        self._async_retry_at = 0.0
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        return self._executor or service_container.get(RETRIEVAL_EXECUTOR)
+
+    def timer(self) -> StageTimer:
+        return StageTimer("async" if self._async_client is not None else "thread")
+
+    async def run_in_executor(self, func, *args) -> Any:
+        """在检索线程池中执行同步调用"""
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    async def embed(self, query: str, timer: Optional[StageTimer] = None) -> List[float]:
+        """查询文本嵌入"""
+        embedding = service_container.get(EMBEDDING)
+        if type(embedding).aembed_query is not Embeddings.aembed_query:
+            vector = await embedding.aembed_query(query)
+        else:
+            vector = await self.run_in_executor(embedding.embed_query, query)
+        if timer:
+            timer.mark("embed")
+        return vector
+
+    async def search(
+            self,
+            vector: List[float],
+            k: int = 5,
+            where: Optional[Dict[str, Any]] = None,
+            timer: Optional[StageTimer] = None,
+            collection: Optional[str] = None
+    ) -> SearchResult:
+        """
+        按向量查询最相似的片段
+
+        Args:
+            collection: 集合名（见 chat/utils/collection_util.py），默认全局集合；集合不存在时返回空列表
+
+        Returns:
+            [(Document, 距离)]，与 similarity_search_with_score 的返回格式一致
+        """
+        name = collection or CHROMA_COLLECTION_NAME
+        client = await self._get_async_client()
+        if client is not None:
+            if timer:
+                timer.mode = "async"
+            async_collection = await self._get_async_collection(client, name)
+            results = await self._search_async(async_collection, vector, k, where) if async_collection is not None else []
+        else:
+            if timer:
+                timer.mode = "thread"
+            router = service_container.get(COLLECTION_ROUTER)
+
+            def query() -> SearchResult:
+                vector_store = router.get_store(name, create=False)
+                if vector_store is None:
+                    return []
+                return vector_store.similarity_search_by_vector_with_relevance_scores(vector, k=k, filter=where)
+
+            results = await self.run_in_executor(query)
+        if timer:
+            timer.mark("search")
+        return results
+
+    @staticmethod
+    async def _search_async(collection, vector: List[float], k: int, where: Optional[Dict[str, Any]]) -> SearchResult:
+        response = await collection.query(
+            query_embeddings=[vector],
+            n_results=k,
+            where=where,
+            include=["documents", "metadatas", "distances"]
+        )
+        ids = (response.get("ids") or [[]])[0]
+        documents = (response.get("documents") or [[]])[0]
+        metadatas = (response.get("metadatas") or [[]])[0]
+        distances = (response.get("distances") or [[]])[0]
+        return [
+            (Document(id=chunk_id, page_content=text or "", metadata=metadata or {}), distance)
+            for chunk_id, text, metadata, distance in zip(ids, documents, metadatas, distances)
+        ]
+
+    async def _get_async_client(self):
+        """获取异步 HTTP 客户端；不可用时返回 None（改走线程池）"""
+        if not self._use_async_client:
+            return None
+        if self._async_client is not None:
+            return self._async_client
+        if time.monotonic() < self._async_retry_at:
+            return None
+
+        if self._async_lock is None:
+            self._async_lock = asyncio.Lock()
+        async with self._async_lock:
+            if self._async_client is not None:
+                return self._async_client
+            try:
+                import chromadb
+                from chromadb.config import Settings as ChromaSettings
+
+                client = await chromadb.AsyncHttpClient(
+                    host=CHROMA_HOST,
+                    port=CHROMA_PORT,
+                    settings=ChromaSettings(anonymized_telemetry=False)
+                )
+                await client.heartbeat()
+                self._async_client = client
+                logger.info(f"[VectorRetriever] 异步HTTP客户端连接成功: {CHROMA_HOST}:{CHROMA_PORT}")
+            except Exception as e:
+                self._async_retry_at = time.monotonic() + ASYNC_CLIENT_RETRY_SECONDS
+                logger.warning(f"[VectorRetriever] 异步HTTP客户端不可用，改用线程池查询: {str(e)}")
+        return self._async_client
+
+    async def _get_async_collection(self, client, name: str):
+        """获取集合；集合不存在时返回 None（不缓存，集合创建后即可查到）"""
+        collection = self._async_collections.get(name)
+        if collection is None:
+            try:
+                collection = await client.get_collection(name)
+            except Exception:
+                return None
+            self._async_collections[name] = collection
+        return collection
+
+    def forget(self, name: str) -> None:
+        """丢弃已缓存的集合（集合被删除后调用）"""
+        self._async_collections.pop(name, None)
+
+    def reset(self) -> None:
+        """丢弃异步客户端（集合被重建等情况下调用）"""
+        self._async_client = None
+        self._async_collections.clear()
+        self._async_retry_at = 0.0
+
+
+service_container.register(
+    RETRIEVAL_EXECUTOR,
+    lambda: ThreadPoolExecutor(max_workers=CHAT_RETRIEVAL_MAX_WORKERS, thread_name_prefix="retrieval"),
+    lambda executor: executor.shutdown(wait=False)
+)
+service_container.register(RETRIEVER, VectorRetriever)
@@ -0,0 +1,224 @@
+# chat/utils/semantic_cache_util.py
+"""
+语义回答缓存
+
+大量用户会问几乎相同的问题（共享租户文档上的常见问题、默认助手人设下的闲聊），每次都要完整调用一次模型生成。
+开启后，会话的第一轮问答按语义缓存：
+
+- 作用域：模型ID + 系统提示词哈希 + 租户 + 文档ID（文档对话再加上用户：检索只命中该用户自己的文档，
+  其他用户即使传入相同的文档ID也不能复用）+ 对话类型 / showThink / language；不同作用域的回答互不复用
+- 命中：作用域内与本轮问题嵌入向量的余弦相似度最高且不低于 SEMANTIC_CACHE_THRESHOLD 的条目
+- 命中后把缓存的回答按原来的流式输出方式分段返回，并照常写入会话记忆与聊天记录，客户端无法区分
+- 只缓存没有历史与摘要的会话第一轮：多轮对话的回答依赖上下文，不复用
+- 存储：Redis，条目哈希 `scache:e:{id}`（向量 float32 字节串、问题、回答）带 TTL；
+  作用域索引 `scache:{scope}` 为按过期时间排序的 ZSET，每个作用域最多保留 SEMANTIC_CACHE_MAX_ENTRIES 条
+- 租户可单独关闭（tenant.semantic_cache = 0），开关在进程内缓存 TENANT_FLAG_SECONDS 秒
+- Redis 不可用时视为未命中，不影响对话
+
+命中率见指标 chat_semantic_cache_requests_total（标签 result=hit/miss/skipped），命中率 = hit / (hit + miss)。
+
+环境变量:
+    SEMANTIC_CACHE_ENABLED       是否启用，默认 False
+    SEMANTIC_CACHE_THRESHOLD     命中所需的最低余弦相似度，默认 0.95
+    SEMANTIC_CACHE_TTL_SECONDS   缓存回答的有效期（秒），默认 3600
+    SEMANTIC_CACHE_MAX_ENTRIES   每个作用域保留的最大条目数，默认 200
+"""
+import os
+import json
+import math
+import time
+import uuid
+import asyncio
+import hashlib
+import logging
+import threading
+from dataclasses import dataclass
+from typing import AsyncGenerator, Callable, Dict, List, Optional, Sequence, Tuple
+
+from chat.utils.embedding_cache_util import pack_vector, unpack_vector
+from common.utils.metrics_util import counter, histogram
+from common.utils.redis_util import get_redis
+from common.utils.service_container import service_container
+
+logger = logging.getLogger(__name__)
+
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "False").lower() == "true"
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+SEMANTIC_CACHE_TTL_SECONDS = int(os.getenv("SEMANTIC_CACHE_TTL_SECONDS", "3600"))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "200"))
+
+KEY_PREFIX = "scache"
+# 租户开关在进程内的缓存时间（秒）
+TENANT_FLAG_SECONDS = 60
+# 回放时每段的字符数
+REPLAY_CHUNK_CHARS = 8
+
+SEMANTIC_CACHE = "chat.semantic_cache"
+
+CACHE_REQUESTS = counter(
+    "chat_semantic_cache_requests_total",
+    "语义回答缓存查询次数，标签 result=hit/miss/skipped（skipped 表示多轮对话或租户已关闭，不查询）"
+)
+CACHE_SIMILARITY = histogram(
+    "chat_semantic_cache_similarity",
+    "语义回答缓存查询时作用域内最高的余弦相似度",
+    buckets=(0.5, 0.7, 0.8, 0.85, 0.9, 0.93, 0.95, 0.97, 0.99, 1)
+)
+
+
+@dataclass
+class CacheHit:
+    entry_id: str
+    prompt: str
+    answer: str
+    similarity: float
+
+
+def cache_scope(
+        model_id: str,
+        system_prompt: str,
+        tenant_id: Optional[str],
+        doc_ids: Optional[Sequence[str]],
+        user_id: str,
+        chat_type: Optional[str],
+        show_think: bool = False,
+        language: Optional[str] = None
+) -> str:
+    """缓存作用域（只有作用域相同的问题才会复用回答）"""
+    valid_doc_ids = sorted({doc_id for doc_id in doc_ids or [] if doc_id and doc_id.strip()})
+    parts = {
+        "model": model_id,
+        "system": hashlib.sha1((system_prompt or "").encode("utf-8")).hexdigest(),
+        "tenant": tenant_id or "",
+        "docs": valid_doc_ids,
+        "type": chat_type or "",
+        "think": bool(show_think),
+        "language": language or "",
+    }
+    if chat_type == "document":
+        # 检索按 user_id 过滤，回答来自该用户自己的文档，只对该用户有效
+        parts["user"] = user_id
+    return hashlib.sha1(json.dumps(parts, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def cosine_similarity(a: Sequence[float], b: Sequence[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+async def replay(answer: str, chunk_chars: int = REPLAY_CHUNK_CHARS) -> AsyncGenerator[str, None]:
+    """把缓存的回答按流式输出的方式分段返回"""
+    for start in range(0, len(answer), chunk_chars):
+        yield answer[start:start + chunk_chars]
+        await asyncio.sleep(0)
+
+
+class SemanticCache:
+    """
+    基于 Redis 的语义回答缓存（进程级共享，通过 service_container 获取）
+
+    使用示例:
+        cache = service_container.get(SEMANTIC_CACHE)
+        scope = cache_scope(model_id, system_prompt, tenant_id, doc_ids, user_id, chat_type)
+        hit = await cache.lookup(scope, vector)
+        if hit is None:
+            ...                                                 # 调用模型生成
+            await cache.store(scope, vector, prompt, answer)
+    """
+
+    def __init__(
+            self,
+            threshold: float = SEMANTIC_CACHE_THRESHOLD,
+            ttl_seconds: int = SEMANTIC_CACHE_TTL_SECONDS,
+            max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES
+    ):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._tenant_flags: Dict[str, Tuple[bool, float]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def index_key(scope: str) -> str:
+        return f"{KEY_PREFIX}:{scope}"
+
+    @staticmethod
+    def entry_key(entry_id: str) -> str:
+        return f"{KEY_PREFIX}:e:{entry_id}"
+
+    async def tenant_enabled(self, tenant_id: Optional[str], loader: Callable[[str], bool]) -> bool:
+        """
+        租户是否启用语义缓存（未指定租户时按全局开关）
+
+        Args:
+            tenant_id: 租户ID
+            loader: 从数据库读取租户开关的函数（在线程池中执行），结果在进程内缓存 TENANT_FLAG_SECONDS 秒
+        """
+        if not tenant_id:
+            return True
+        now = time.monotonic()
+        cached = self._tenant_flags.get(tenant_id)
+        if cached is not None and cached[1] > now:
+            return cached[0]
+        enabled = await asyncio.to_thread(loader, tenant_id)
+        with self._lock:
+            self._tenant_flags[tenant_id] = (enabled, now + TENANT_FLAG_SECONDS)
+        return enabled
+
+    async def lookup(self, scope: str, vector: List[float]) -> Optional[CacheHit]:
+        """查找作用域内最相似的回答，未命中或 Redis 不可用时返回 None"""
+        try:
+            hit = await asyncio.to_thread(self._lookup, scope, vector)
+        except Exception as e:
+            logger.warning(f"[SemanticCache] 查询缓存失败: {str(e)}")
+            hit = None
+        CACHE_REQUESTS.inc(result="hit" if hit else "miss")
+        return hit
+
+    def _lookup(self, scope: str, vector: List[float]) -> Optional[CacheHit]:
+        redis_client = get_redis()
+        index_key = self.index_key(scope)
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.zremrangebyscore(index_key, 0, time.time())
+        pipe.zrevrange(index_key, 0, self.max_entries - 1)
+        _, entry_ids = pipe.execute()
+        if not entry_ids:
+            return None
+
+        pipe = redis_client.pipeline(transaction=False)
+        for entry_id in entry_ids:
+            pipe.hmget(self.entry_key(entry_id.decode("utf-8")), "v", "p", "a")
+        best: Optional[CacheHit] = None
+        for entry_id, (data, prompt, answer) in zip(entry_ids, pipe.execute()):
+            if not data or answer is None:
+                continue
+            similarity = cosine_similarity(vector, unpack_vector(data))
+            if best is None or similarity > best.similarity:
+                best = CacheHit(entry_id.decode("utf-8"), prompt.decode("utf-8"), answer.decode("utf-8"), similarity)
+        if best is None:
+            return None
+        CACHE_SIMILARITY.observe(best.similarity)
+        return best if best.similarity >= self.threshold else None
+
+    async def store(self, scope: str, vector: List[float], prompt: str, answer: str) -> None:
+        """写入一条回答；失败只记录日志"""
+        try:
+            await asyncio.to_thread(self._store, scope, vector, prompt, answer)
+        except Exception as e:
+            logger.warning(f"[SemanticCache] 写入缓存失败: {str(e)}")
+
+    def _store(self, scope: str, vector: List[float], prompt: str, answer: str) -> None:
+        entry_id = uuid.uuid4().hex
+        index_key = self.index_key(scope)
+        pipe = get_redis().pipeline(transaction=False)
+        pipe.hset(self.entry_key(entry_id), mapping={"v": pack_vector(vector), "p": prompt, "a": answer})
+        pipe.expire(self.entry_key(entry_id), self.ttl_seconds)
+        pipe.zadd(index_key, {entry_id: time.time() + self.ttl_seconds})
+        # 超出条数上限时去掉最早过期的条目（条目本身随 TTL 过期）
+        pipe.zremrangebyrank(index_key, 0, -self.max_entries - 1)
+        pipe.expire(index_key, self.ttl_seconds)
+        pipe.execute()
+
+
+service_container.register(SEMANTIC_CACHE, SemanticCache)
@@ -0,0 +1,292 @@
+# chat/utils/sse_util.py
+"""
+SSE 对话流的可续传缓冲
+
+POST /service/chat/chat 以 text/plain 流式返回，断线后只能重新提问、重新生成；WebSocket 又需要网关维持有状态的代理。
+SSE 接口在普通 HTTP 上流式返回，每个事件带 ID，断线重连时带上 Last-Event-ID 即可从断点继续，不重新生成：
+
+- 生成与连接解耦：回答在后台任务中生成，事件依次写入本进程内存与 Redis Stream `sse:{stream_id}`
+  （条目 ID 为 "0-{序号}"），保留 SSE_BUFFER_SECONDS 秒；流的所属用户保存在 `sse:{stream_id}:user`
+- 事件 ID 为 "{stream_id}:{序号}"；重连请求（可能落到其他 worker）先补发该序号之后已缓冲的事件，再继续接收后续事件
+- 本进程内的读者直接读内存；其他进程的读者按 SSE_POLL_MS 轮询 Redis，并刷新心跳键 `sse:{stream_id}:reader`
+- 读者全部断开后继续生成 SSE_RESUME_GRACE_SECONDS 秒等待重连，期间无人重连则取消生成
+  （与 WebSocket 断开时一样保存带中断标记的部分回答）
+- 事件类型: stream（首个事件，data 为 streamId）、message（回答分片）、queue（排队排位）、
+  error（服务产出的 ErrorMessage，或生成中断）、completed
+
+环境变量:
+    SSE_BUFFER_SECONDS           事件在 Redis 与本进程中的保留时间（秒），默认 300
+    SSE_RESUME_GRACE_SECONDS     读者全部断开后继续生成、等待重连的时间（秒），默认 30
+    SSE_POLL_MS                  其他进程的读者轮询 Redis 的间隔（毫秒），默认 100
+"""
+import os
+import uuid
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import AsyncGenerator, Callable, Dict, List, Optional, Tuple
+
+from common.utils.admission_util import QUEUE_MESSAGE_PREFIX, is_queue_message
+from common.utils.redis_util import get_redis
+from common.utils.stream_util import is_error_message
+from common.utils.service_container import service_container
+
+logger = logging.getLogger(__name__)
+
+SSE_BUFFER_SECONDS = int(os.getenv("SSE_BUFFER_SECONDS", "300"))
+SSE_RESUME_GRACE_SECONDS = float(os.getenv("SSE_RESUME_GRACE_SECONDS", "30"))
+SSE_POLL_MS = float(os.getenv("SSE_POLL_MS", "100"))
+
+KEY_PREFIX = "sse"
+# 其他进程的读者每次从 Redis 读取的最大事件数
+REMOTE_READ_COUNT = 200
+
+SSE_STREAMS = "chat.sse_streams"
+
+
+class StreamNotFound(Exception):
+    """流不存在、已过期或不属于当前用户"""
+
+
+@dataclass
+class StreamEvent:
+    seq: int
+    event: str
+    data: str
+
+    def to_sse(self, stream_id: str) -> Dict[str, str]:
+        """转换为 EventSourceResponse 接受的事件字典"""
+        return {"id": f"{stream_id}:{self.seq}", "event": self.event, "data": self.data}
+
+
+def classify(message: str) -> Tuple[str, str]:
+    """把 chat_with_websocket 产出的消息转换为 (事件类型, 数据)"""
+    if message == "[completed]":
+        return "completed", ""
+    if is_queue_message(message):
+        return "queue", message[len(QUEUE_MESSAGE_PREFIX):-1]
+    if is_error_message(message):
+        return "error", str(message)
+    return "message", message
+
+
+def parse_event_id(value: Optional[str]) -> Optional[Tuple[str, int]]:
+    """解析 Last-Event-ID（"{stream_id}:{序号}"），格式不对时返回 None"""
+    if not value:
+        return None
+    stream_id, sep, seq = value.strip().rpartition(":")
+    if not sep or not stream_id or not seq.isdigit():
+        return None
+    return stream_id, int(seq)
+
+
+class BufferedStream:
+    """一次生成的事件缓冲（本进程内）"""
+
+    def __init__(self, stream_id: str, user_id: str):
+        self.stream_id = stream_id
+        self.user_id = user_id
+        self.events: List[StreamEvent] = []
+        self.finished = False
+        self.readers = 0
+        # 无人读取超过宽限期时设置，chat_with_websocket 据此取消生成
+        self.cancel_event = asyncio.Event()
+        self._changed = asyncio.Event()
+        # 持有生成任务的引用，避免事件循环只保留弱引用时任务被回收
+        self._produce_task: Optional[asyncio.Task] = None
+        self._abandon_task: Optional[asyncio.Task] = None
+
+    def publish(self, event: str, data: str) -> StreamEvent:
+        item = StreamEvent(len(self.events) + 1, event, data)
+        self.events.append(item)
+        self._notify()
+        return item
+
+    def finish(self) -> None:
+        self.finished = True
+        self._notify()
+
+    def _notify(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def events_after(self, seq: int) -> AsyncGenerator[StreamEvent, None]:
+        """产出序号大于 seq 的事件，生成结束且全部产出后结束"""
+        while True:
+            changed = self._changed
+            for item in self.events[seq:]:
+                yield item
+                seq = item.seq
+            if self.finished and seq >= len(self.events):
+                return
+            await changed.wait()
+
+
+class SSEStreams:
+    """
+    可续传的 SSE 对话流（进程级共享，通过 service_container 获取）
+
+    使用示例:
+        streams = service_container.get(SSE_STREAMS)
+        buffered = streams.start(user_id, lambda cancel_event: chat_service.chat_with_websocket(...))
+        events = await streams.subscribe(buffered.stream_id, user_id)           # 新请求
+        events = await streams.subscribe(stream_id, user_id, after_seq)         # 带 Last-Event-ID 重连
+        async for item in events:
+            yield item.to_sse(stream_id)
+    """
+
+    def __init__(self):
+        self._streams: Dict[str, BufferedStream] = {}
+
+    @staticmethod
+    def events_key(stream_id: str) -> str:
+        return f"{KEY_PREFIX}:{stream_id}"
+
+    @staticmethod
+    def user_key(stream_id: str) -> str:
+        return f"{KEY_PREFIX}:{stream_id}:user"
+
+    @staticmethod
+    def reader_key(stream_id: str) -> str:
+        return f"{KEY_PREFIX}:{stream_id}:reader"
+
+    def start(
+            self,
+            user_id: str,
+            make_stream: Callable[[asyncio.Event], AsyncGenerator[str, None]]
+    ) -> BufferedStream:
+        """在后台任务中开始生成，返回事件缓冲（首个事件为 stream，data 为 streamId）"""
+        stream_id = uuid.uuid4().hex
+        buffered = BufferedStream(stream_id, user_id)
+        self._streams[stream_id] = buffered
+        buffered._produce_task = asyncio.create_task(self._produce(buffered, make_stream))
+        return buffered
+
+    async def _produce(self, buffered: BufferedStream, make_stream) -> None:
+        await self._persist(buffered, buffered.publish("stream", buffered.stream_id), owner=True)
+        generator = make_stream(buffered.cancel_event)
+        completed = False
+        try:
+            async for message in generator:
+                event, data = classify(message)
+                completed = event == "completed"
+                await self._persist(buffered, buffered.publish(event, data))
+        except Exception as e:
+            logger.error(f"[SSEStreams] 生成失败: stream_id={buffered.stream_id}, {str(e)}", exc_info=True)
+        finally:
+            await generator.aclose()
+            if not completed:
+                # 被取消或出错：告知之后重连的客户端回答不完整
+                await self._persist(buffered, buffered.publish("error", "回答已中断"))
+                await self._persist(buffered, buffered.publish("completed", ""))
+            buffered.finish()
+            # 本进程内的缓冲与 Redis 中的事件同时过期
+            asyncio.get_running_loop().call_later(
+                SSE_BUFFER_SECONDS, self._streams.pop, buffered.stream_id, None
+            )
+
+    async def _persist(self, buffered: BufferedStream, item: StreamEvent, owner: bool = False) -> None:
+        """把事件写入 Redis（失败只记录日志，不影响本进程内的读者）"""
+        try:
+            await asyncio.to_thread(self._xadd, buffered, item, owner)
+        except Exception as e:
+            logger.warning(f"[SSEStreams] 写入事件失败: stream_id={buffered.stream_id}, {str(e)}")
+
+    def _xadd(self, buffered: BufferedStream, item: StreamEvent, owner: bool) -> None:
+        events_key = self.events_key(buffered.stream_id)
+        pipe = get_redis().pipeline(transaction=False)
+        if owner:
+            pipe.set(self.user_key(buffered.stream_id), buffered.user_id, ex=SSE_BUFFER_SECONDS)
+        pipe.xadd(events_key, {"e": item.event, "d": item.data}, id=f"0-{item.seq}")
+        pipe.expire(events_key, SSE_BUFFER_SECONDS)
+        pipe.execute()
+
+    async def subscribe(self, stream_id: str, user_id: str, after_seq: int = 0) -> AsyncGenerator[StreamEvent, None]:
+        """
+        订阅流中序号大于 after_seq 的事件
+
+        Raises:
+            StreamNotFound: 流不存在、已过期或不属于当前用户
+        """
+        buffered = self._streams.get(stream_id)
+        if buffered is not None:
+            if buffered.user_id != user_id:
+                raise StreamNotFound()
+            return self._read_local(buffered, after_seq)
+
+        try:
+            owner = await asyncio.to_thread(get_redis().get, self.user_key(stream_id))
+        except Exception as e:
+            logger.warning(f"[SSEStreams] 读取流信息失败: stream_id={stream_id}, {str(e)}")
+            owner = None
+        if owner is None or owner.decode("utf-8") != user_id:
+            raise StreamNotFound()
+        return self._read_remote(stream_id, after_seq)
+
+    async def _read_local(self, buffered: BufferedStream, after_seq: int) -> AsyncGenerator[StreamEvent, None]:
+        buffered.readers += 1
+        try:
+            async for item in buffered.events_after(after_seq):
+                yield item
+        finally:
+            buffered.readers -= 1
+            if not buffered.readers and not buffered.finished and buffered._abandon_task is None:
+                buffered._abandon_task = asyncio.create_task(self._cancel_if_abandoned(buffered))
+
+    async def _cancel_if_abandoned(self, buffered: BufferedStream) -> None:
+        """读者全部断开后等待重连，宽限期内本进程与其他进程都没有读者时取消生成"""
+        try:
+            while not buffered.finished:
+                await asyncio.sleep(SSE_RESUME_GRACE_SECONDS)
+                if buffered.finished or buffered.readers:
+                    return
+                try:
+                    remote_reader = await asyncio.to_thread(get_redis().exists, self.reader_key(buffered.stream_id))
+                except Exception:
+                    remote_reader = False
+                if not remote_reader:
+                    logger.info(f"[SSEStreams] 客户端未重连，取消生成: stream_id={buffered.stream_id}")
+                    buffered.cancel_event.set()
+                    return
+        finally:
+            buffered._abandon_task = None
+
+    async def _read_remote(self, stream_id: str, after_seq: int) -> AsyncGenerator[StreamEvent, None]:
+        """读取其他进程生成的流：轮询 Redis，直到 completed 事件或流过期"""
+        seq = after_seq
+        while True:
+            try:
+                entries, exists = await asyncio.to_thread(self._xrange, stream_id, seq)
+            except Exception as e:
+                logger.warning(f"[SSEStreams] 读取事件失败: stream_id={stream_id}, {str(e)}")
+                entries, exists = [], True
+            if not exists:
+                return
+            for item in entries:
+                yield item
+                seq = item.seq
+                if item.event == "completed":
+                    return
+            if len(entries) < REMOTE_READ_COUNT:
+                await asyncio.sleep(SSE_POLL_MS / 1000)
+
+    def _xrange(self, stream_id: str, after_seq: int) -> Tuple[List[StreamEvent], bool]:
+        events_key = self.events_key(stream_id)
+        pipe = get_redis().pipeline(transaction=False)
+        pipe.xrange(events_key, min=f"0-{after_seq + 1}", max="+", count=REMOTE_READ_COUNT)
+        pipe.exists(events_key)
+        # 心跳：生成所在的进程据此判断是否仍有读者
+        pipe.set(self.reader_key(stream_id), 1, ex=max(1, int(SSE_RESUME_GRACE_SECONDS)))
+        entries, exists, _ = pipe.execute()
+        events = [
+            StreamEvent(
+                int(entry_id.decode("utf-8").split("-", 1)[1]),
+                fields[b"e"].decode("utf-8"),
+                fields[b"d"].decode("utf-8")
+            )
+            for entry_id, fields in entries
+        ]
+        return events, bool(exists)
+
+
+service_container.register(SSE_STREAMS, SSEStreams)
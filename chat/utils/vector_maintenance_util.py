@@ -0,0 +1,445 @@
+# chat/utils/vector_maintenance_util.py
+"""
+向量库维护：孤儿向量清理、分片统计、压缩与重建（命令行 test/chroma_maintenance.py 与 chat 服务定时任务共用）
+
+删除文档时 Chroma 删除失败只记录日志、入库被取消时可能已写入部分片段，这些向量不再属于任何文档却一直参与检索；
+持久化目录下的 chroma.sqlite3 删除数据后也不会变小。这里提供:
+
+- 孤儿检测：分页读取集合中片段的 doc_id，与 chat_doc 表（文档id 或 source_doc_id）比对，
+  表中已不存在的文档的片段即为孤儿；没有 doc_id 元数据的片段只统计，不删除
+- 批量删除：按 VECTOR_MAINTENANCE_BATCH_SIZE 条一批按 id 删除，同时清理关键词索引；
+  孤儿占集合比例超过 VECTOR_ORPHAN_MAX_RATIO 时不删除（多半是连错了数据库），需要命令行加 --force
+- 统计：每个集合的向量数、文档数，按租户汇总；本地持久化时附带各集合向量段目录与 chroma.sqlite3 的磁盘占用
+- 压缩：对 chroma.sqlite3 执行 VACUUM 回收删除后留下的空闲页（需独占数据库，应在 Chroma 服务停止时执行）
+- 重建：把集合复制到新集合后替换原集合，重建 HNSW 索引（集合 id 会变化，其他进程需重启或等待缓存失效）
+- 定时任务：VECTOR_MAINTENANCE_INTERVAL_HOURS > 0 时 chat 服务按间隔执行孤儿清理并刷新统计指标，
+  通过 Redis 锁保证同一时间只有一个进程执行
+
+指标：vector_maintenance_runs_total、vector_orphans_deleted_total、vector_store_vectors、vector_store_bytes
+
+环境变量:
+    VECTOR_MAINTENANCE_INTERVAL_HOURS    定时维护间隔（小时），默认 0（不启用）
+    VECTOR_MAINTENANCE_BATCH_SIZE        分页读取与批量删除的条数，默认 500
+    VECTOR_ORPHAN_MAX_RATIO              孤儿向量占集合比例的上限，超过时不删除，默认 0.5
+"""
+import os
+import uuid
+import asyncio
+import logging
+import sqlite3
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Set
+
+from chat.models.chat_model import ChatDocModel
+from chat.utils.chroma_util import CHROMA_CLIENT, CHROMA_COLLECTION_NAME, PERSIST_DIR
+from chat.utils.collection_util import COLLECTION_ROUTER, CHROMA_COLLECTION_PREFIX
+from chat.utils.lexical_util import get_lexical_index
+from chat.utils.retrieval_util import RETRIEVER
+from common.config.common_database import SessionLocal
+from common.utils.metrics_util import counter, gauge
+from common.utils.redis_util import get_redis
+from common.utils.service_container import service_container
+
+logger = logging.getLogger(__name__)
+
+VECTOR_MAINTENANCE_INTERVAL_HOURS = float(os.getenv("VECTOR_MAINTENANCE_INTERVAL_HOURS", "0"))
+VECTOR_MAINTENANCE_BATCH_SIZE = int(os.getenv("VECTOR_MAINTENANCE_BATCH_SIZE", "500"))
+VECTOR_ORPHAN_MAX_RATIO = float(os.getenv("VECTOR_ORPHAN_MAX_RATIO", "0.5"))
+
+VECTOR_MAINTENANCE = "chat.vector_maintenance"
+
+# 定时任务的跨进程锁（单次维护的最长时间内有效）
+LOCK_KEY = "vector_maintenance:lock"
+LOCK_SECONDS = 3600
+SQLITE_FILE = "chroma.sqlite3"
+
+MAINTENANCE_RUNS = counter(
+    "vector_maintenance_runs_total",
+    "向量库定时维护次数，标签 result=success/skipped/failed（skipped 表示其他进程正在执行）"
+)
+ORPHANS_DELETED = counter("vector_orphans_deleted_total", "已删除的孤儿向量数，标签 collection")
+STORE_VECTORS = gauge("vector_store_vectors", "各租户的向量数（最近一次维护时统计），标签 tenant")
+STORE_BYTES = gauge("vector_store_bytes", "各租户向量段目录的磁盘占用（字节，仅本地持久化时统计），标签 tenant")
+
+
+def list_collection_names(client) -> List[str]:
+    """全部集合名（chromadb 0.6 的 list_collections 只返回名称，其他版本返回集合对象）"""
+    return sorted(c if isinstance(c, str) else c.name for c in client.list_collections())
+
+
+def iter_pages(
+        collection,
+        include: Sequence[str] = ("embeddings", "metadatas", "documents"),
+        page_size: int = VECTOR_MAINTENANCE_BATCH_SIZE
+) -> Iterator[Dict[str, Any]]:
+    """分页读取集合中的全部数据（不一次性读入全部向量）"""
+    offset = 0
+    while True:
+        data = collection.get(include=list(include), limit=page_size, offset=offset)
+        if not data["ids"]:
+            break
+        yield data
+        offset += len(data["ids"])
+
+
+def copy_collection(client, source, target_name: str, page_size: int = VECTOR_MAINTENANCE_BATCH_SIZE) -> int:
+    """把集合完整复制到 target_name（不存在时创建，沿用源集合元数据；upsert，可重复执行），返回复制条数"""
+    target = client.get_or_create_collection(name=target_name, metadata=source.metadata)
+    copied = 0
+    for data in iter_pages(source, page_size=page_size):
+        target.upsert(
+            ids=data["ids"],
+            embeddings=data["embeddings"],
+            metadatas=data["metadatas"],
+            documents=data["documents"]
+        )
+        copied += len(data["ids"])
+    logger.info(f"[VectorMaintenance] 已复制 {copied} 条记录: {source.name} -> {target_name}")
+    return copied
+
+
+def _dir_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+@dataclass
+class OrphanReport:
+    """一个集合的孤儿检测结果"""
+    collection: str
+    total: int = 0
+    # 孤儿文档 id -> 片段数
+    orphan_docs: Dict[str, int] = field(default_factory=dict)
+    orphan_ids: List[str] = field(default_factory=list)
+    # 没有 doc_id 元数据的片段数（只统计，不删除）
+    unlabeled: int = 0
+    deleted: int = 0
+    skipped: bool = False
+
+    @property
+    def ratio(self) -> float:
+        return len(self.orphan_ids) / self.total if self.total else 0.0
+
+
+class VectorMaintenance:
+    """
+    向量库维护（进程级共享，通过 service_container 获取；命令行可直接传入 Chroma 客户端）
+
+    使用示例:
+        maintenance = VectorMaintenance(client=chromadb.PersistentClient(path="./chroma_db"), persist_dir="./chroma_db")
+        reports = maintenance.delete_orphans(dry_run=True)
+        stats = maintenance.collection_stats()
+        maintenance.compact()
+    """
+
+    def __init__(
+            self,
+            client=None,
+            session_factory=SessionLocal,
+            persist_dir: Optional[str] = PERSIST_DIR,
+            batch_size: int = VECTOR_MAINTENANCE_BATCH_SIZE,
+            max_orphan_ratio: float = VECTOR_ORPHAN_MAX_RATIO
+    ):
+        self._client = client
+        self.session_factory = session_factory
+        self.persist_dir = persist_dir
+        self.batch_size = max(1, batch_size)
+        self.max_orphan_ratio = max_orphan_ratio
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def client(self):
+        return self._client if self._client is not None else service_container.get(CHROMA_CLIENT)
+
+    def collection_names(self) -> List[str]:
+        """本项目的向量集合：全局集合与分片集合"""
+        prefix = f"{CHROMA_COLLECTION_PREFIX[:24]}_"
+        return [
+            name for name in list_collection_names(self.client)
+            if name == CHROMA_COLLECTION_NAME or name.startswith(prefix)
+        ]
+
+    # ==================== 孤儿检测与删除 ====================
+
+    def referenced_doc_ids(self, doc_ids: Sequence[str]) -> Set[str]:
+        """doc_ids 中仍被 chat_doc 引用的（作为文档id，或作为其他文档的 source_doc_id）"""
+        referenced: Set[str] = set()
+        doc_ids = list(doc_ids)
+        db = self.session_factory()
+        try:
+            for start in range(0, len(doc_ids), self.batch_size):
+                chunk = doc_ids[start:start + self.batch_size]
+                for row in db.query(ChatDocModel.id).filter(ChatDocModel.id.in_(chunk)):
+                    referenced.add(row.id)
+                for row in db.query(ChatDocModel.source_doc_id).filter(ChatDocModel.source_doc_id.in_(chunk)):
+                    referenced.add(row.source_doc_id)
+        finally:
+            db.close()
+        return referenced
+
+    def find_orphans(self, name: str) -> OrphanReport:
+        """检测集合中的孤儿片段"""
+        collection = self.client.get_collection(name)
+        report = OrphanReport(collection=name)
+        ids_by_doc: Dict[str, List[str]] = defaultdict(list)
+        for data in iter_pages(collection, include=("metadatas",), page_size=self.batch_size):
+            report.total += len(data["ids"])
+            for vector_id, metadata in zip(data["ids"], data["metadatas"]):
+                doc_id = (metadata or {}).get("doc_id")
+                if doc_id:
+                    ids_by_doc[doc_id].append(vector_id)
+                else:
+                    report.unlabeled += 1
+
+        referenced = self.referenced_doc_ids(list(ids_by_doc))
+        for doc_id, vector_ids in ids_by_doc.items():
+            if doc_id not in referenced:
+                report.orphan_docs[doc_id] = len(vector_ids)
+                report.orphan_ids.extend(vector_ids)
+        return report
+
+    def delete_orphans(
+            self,
+            names: Optional[Sequence[str]] = None,
+            dry_run: bool = False,
+            force: bool = False
+    ) -> List[OrphanReport]:
+        """
+        检测并批量删除孤儿片段
+
+        Args:
+            names: 要处理的集合，默认全部
+            dry_run: 只检测，不删除
+            force: 孤儿比例超过 max_orphan_ratio 时仍然删除
+        """
+        reports = []
+        for name in names or self.collection_names():
+            try:
+                report = self.find_orphans(name)
+            except Exception as e:
+                logger.error(f"[VectorMaintenance] 检测孤儿向量失败: collection={name}, {str(e)}", exc_info=True)
+                continue
+            reports.append(report)
+            if not report.orphan_ids or dry_run:
+                continue
+            if report.ratio > self.max_orphan_ratio and not force:
+                report.skipped = True
+                logger.error(
+                    f"[VectorMaintenance] 孤儿向量占比 {report.ratio:.0%} 超过上限 {self.max_orphan_ratio:.0%}，"
+                    f"未删除（请确认数据库连接是否正确）: collection={name}"
+                )
+                continue
+            report.deleted = self._delete_ids(name, report.orphan_ids)
+            lexical = get_lexical_index()
+            if lexical is not None:
+                for doc_id in report.orphan_docs:
+                    lexical.delete_doc(doc_id)
+            logger.info(
+                f"[VectorMaintenance] 已删除孤儿向量: collection={name}, "
+                f"docs={len(report.orphan_docs)}, vectors={report.deleted}"
+            )
+        return reports
+
+    def _delete_ids(self, name: str, ids: List[str]) -> int:
+        collection = self.client.get_collection(name)
+        deleted = 0
+        for start in range(0, len(ids), self.batch_size):
+            batch = ids[start:start + self.batch_size]
+            collection.delete(ids=batch)
+            deleted += len(batch)
+            ORPHANS_DELETED.inc(len(batch), collection=name)
+        return deleted
+
+    # ==================== 统计 ====================
+
+    def _segment_sizes(self) -> Dict[str, int]:
+        """本地持久化目录中各集合向量段目录的大小（集合id -> 字节），不是本地持久化时返回空字典"""
+        if not self.persist_dir:
+            return {}
+        sqlite_path = os.path.join(self.persist_dir, SQLITE_FILE)
+        if not os.path.exists(sqlite_path):
+            return {}
+        sizes: Dict[str, int] = Counter()
+        try:
+            conn = sqlite3.connect(f"file:{sqlite_path}?mode=ro", uri=True)
+            try:
+                rows = conn.execute("SELECT id, collection FROM segments").fetchall()
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            logger.warning(f"[VectorMaintenance] 读取段信息失败: {str(e)}")
+            return {}
+        for segment_id, collection_id in rows:
+            segment_dir = os.path.join(self.persist_dir, str(segment_id))
+            if os.path.isdir(segment_dir):
+                sizes[str(collection_id)] += _dir_size(segment_dir)
+        return dict(sizes)
+
+    def collection_stats(self, names: Optional[Sequence[str]] = None) -> List[Dict[str, Any]]:
+        """
+        各集合的统计：向量数、文档数、租户（分片集合取集合元数据，全局集合按片段元数据拆分到各租户）、
+        向量段磁盘占用（bytes，不是本地持久化时为 None）
+        """
+        segment_sizes = self._segment_sizes()
+        stats = []
+        for name in names or self.collection_names():
+            collection = self.client.get_collection(name)
+            metadata = collection.metadata or {}
+            size = segment_sizes.get(str(collection.id)) if segment_sizes else None
+            vectors_by_tenant: Counter = Counter()
+            docs_by_tenant: Dict[str, Set[str]] = defaultdict(set)
+            for data in iter_pages(collection, include=("metadatas",), page_size=self.batch_size):
+                for item in data["metadatas"]:
+                    item = item or {}
+                    tenant_id = metadata.get("tenant_id") or item.get("tenant_id") or ""
+                    vectors_by_tenant[tenant_id] += 1
+                    if item.get("doc_id"):
+                        docs_by_tenant[tenant_id].add(item["doc_id"])
+            total = sum(vectors_by_tenant.values())
+            for tenant_id, vectors in (sorted(vectors_by_tenant.items()) or [(metadata.get("tenant_id") or "", 0)]):
+                stats.append({
+                    "collection": name,
+                    "tenant_id": tenant_id,
+                    "user_id": metadata.get("user_id"),
+                    "vectors": vectors,
+                    "docs": len(docs_by_tenant[tenant_id]),
+                    # 全局集合的磁盘占用按向量数分摊到各租户
+                    "bytes": round(size * vectors / total) if size is not None and total else size,
+                })
+        return stats
+
+    def tenant_stats(self, collection_stats: Optional[List[Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+        """按租户汇总集合统计"""
+        totals: Dict[str, Dict[str, Any]] = {}
+        for item in collection_stats if collection_stats is not None else self.collection_stats():
+            total = totals.setdefault(item["tenant_id"], {
+                "tenant_id": item["tenant_id"], "collections": 0, "vectors": 0, "docs": 0, "bytes": None
+            })
+            total["collections"] += 1
+            total["vectors"] += item["vectors"]
+            total["docs"] += item["docs"]
+            if item["bytes"] is not None:
+                total["bytes"] = (total["bytes"] or 0) + item["bytes"]
+        return sorted(totals.values(), key=lambda item: item["vectors"], reverse=True)
+
+    def sqlite_size(self) -> Optional[int]:
+        """chroma.sqlite3（含 WAL）的大小，不是本地持久化时返回 None"""
+        if not self.persist_dir:
+            return None
+        path = os.path.join(self.persist_dir, SQLITE_FILE)
+        if not os.path.exists(path):
+            return None
+        return sum(os.path.getsize(p) for p in (path, f"{path}-wal") if os.path.exists(p))
+
+    # ==================== 压缩与重建 ====================
+
+    def compact(self) -> Dict[str, Optional[int]]:
+        """
+        对本地持久化目录的 chroma.sqlite3 执行 VACUUM，回收删除数据后的空闲页
+
+        VACUUM 需要独占数据库，应在 Chroma 服务与 chat 服务停止（或不使用本地持久化目录）时执行。
+
+        Raises:
+            FileNotFoundError: 不是本地持久化目录
+            sqlite3.OperationalError: 数据库正在被使用
+        """
+        path = os.path.join(self.persist_dir or "", SQLITE_FILE)
+        if not self.persist_dir or not os.path.exists(path):
+            raise FileNotFoundError(f"未找到 {path}，压缩只支持本地持久化目录")
+        before = self.sqlite_size()
+        conn = sqlite3.connect(path, timeout=5)
+        try:
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            conn.execute("VACUUM")
+        finally:
+            conn.close()
+        after = self.sqlite_size()
+        logger.info(f"[VectorMaintenance] 压缩完成: {path}, {before} -> {after} 字节")
+        return {"before": before, "after": after}
+
+    def rebuild(self, name: str) -> int:
+        """
+        重建集合的向量索引：复制到临时集合、校验条数后删除原集合，再把临时集合改回原名
+
+        集合 id 会变化：本进程的集合缓存在重建后清空，其他进程中缓存的集合需重启服务后生效。
+        """
+        client = self.client
+        source = client.get_collection(name)
+        expected = source.count()
+        temp_name = f"{name[:40]}_rebuild_{uuid.uuid4().hex[:8]}"
+        copied = copy_collection(client, source, temp_name, page_size=self.batch_size)
+        temp = client.get_collection(temp_name)
+        if copied != expected or temp.count() != expected:
+            client.delete_collection(temp_name)
+            raise RuntimeError(f"重建校验失败: {name} 原有 {expected} 条，复制 {copied} 条")
+        client.delete_collection(name)
+        temp.modify(name=name)
+        self._forget(name)
+        logger.info(f"[VectorMaintenance] 已重建集合: {name}, {expected} 条")
+        return expected
+
+    @staticmethod
+    def _forget(name: str) -> None:
+        """丢弃本进程缓存的集合"""
+        service_container.get(COLLECTION_ROUTER).reset()
+        service_container.get(RETRIEVER).forget(name)
+
+    # ==================== 定时任务 ====================
+
+    def run_once(self) -> bool:
+        """执行一次定时维护（孤儿清理 + 刷新统计指标），其他进程正在执行时返回 False"""
+        redis_client = get_redis()
+        token = uuid.uuid4().hex
+        if not redis_client.set(LOCK_KEY, token, nx=True, ex=LOCK_SECONDS):
+            MAINTENANCE_RUNS.inc(result="skipped")
+            return False
+        try:
+            reports = self.delete_orphans()
+            for item in self.tenant_stats():
+                STORE_VECTORS.set(item["vectors"], tenant=item["tenant_id"])
+                if item["bytes"] is not None:
+                    STORE_BYTES.set(item["bytes"], tenant=item["tenant_id"])
+            MAINTENANCE_RUNS.inc(result="success")
+            logger.info(
+                f"[VectorMaintenance] 定时维护完成: collections={len(reports)}, "
+                f"deleted={sum(report.deleted for report in reports)}"
+            )
+            return True
+        except Exception as e:
+            MAINTENANCE_RUNS.inc(result="failed")
+            logger.error(f"[VectorMaintenance] 定时维护失败: {str(e)}", exc_info=True)
+            return False
+        finally:
+            try:
+                if redis_client.get(LOCK_KEY) == token.encode("utf-8"):
+                    redis_client.delete(LOCK_KEY)
+            except Exception as e:
+                logger.warning(f"[VectorMaintenance] 释放维护锁失败: {str(e)}")
+
+    def start_schedule(self, interval_hours: float = VECTOR_MAINTENANCE_INTERVAL_HOURS) -> bool:
+        """按间隔在后台执行 run_once（interval_hours <= 0 时不启用），需在事件循环中调用"""
+        if interval_hours <= 0 or self._task is not None:
+            return False
+        self._task = asyncio.create_task(self._schedule(interval_hours * 3600))
+        logger.info(f"[VectorMaintenance] 已启用定时维护，间隔 {interval_hours} 小时")
+        return True
+
+    async def _schedule(self, interval_seconds: float) -> None:
+        while True:
+            await asyncio.sleep(interval_seconds)
+            await asyncio.to_thread(self.run_once)
+
+    def shutdown(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+service_container.register(VECTOR_MAINTENANCE, VectorMaintenance, lambda maintenance: maintenance.shutdown())
@@ -1,12 +1,13 @@
 # circle/repositories/circle_repository.py
 from datetime import datetime
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 
 from sqlalchemy import text
 from sqlalchemy.orm import Session
 from fastapi.logger import logger
 
 from circle.models.circle_model import Circle
+from common.utils.pagination_util import SortKey, build_page, keyset_where_sql, order_by_sql
 
 
 class CircleRepository:
@@ -27,94 +28,150 @@ class CircleRepository:
             logger.error(f"获取朋友圈总数失败: {str(e)}", exc_info=True)
             return 0
 
-    def get_circle_list_by_type(
-            self,
-            start: int,
-            page_size: int,
-            circle_type: str
-    ) -> List[Dict[str, Any]]:
+    @staticmethod
+    def _circle_list_sql(circle_type: str, extra_where: str, tail: str) -> str:
         """
-        分页获取朋友圈列表（含点赞、评论嵌套）
+        构建朋友圈列表 SQL
 
         对应 Spring 中 getCircleListByType 的 MyBatis 动态 SQL：
         - type == MUSIC 时 LEFT JOIN music 表
         - type == MOVIE 时 LEFT JOIN movie 表
         - 始终 LEFT JOIN user 表
+
+        Args:
+            circle_type: 朋友圈类型
+            extra_where: 追加的 WHERE 条件（以 AND 开头，可为空）
+            tail: ORDER BY / LIMIT 子句
         """
-        try:
-            music_columns = ""
-            movie_columns = ""
-            join_sql = ""
-
-            if circle_type == "MUSIC":
-                music_columns = """
-                    m.song_name AS music_song_name,
-                    m.audio_id AS music_audio_id,
-                    m.author_name AS music_author_name,
-                    m.album_name AS music_album_name,
-                    m.cover AS music_cover,
-                    CASE WHEN 0 >= m.permission THEN m.play_url ELSE NULL END AS music_play_url,
-                    CASE WHEN 0 >= m.permission THEN m.local_play_url ELSE NULL END AS music_local_play_url,
-                    CASE WHEN 0 >= m.permission THEN m.lyrics ELSE NULL END AS music_lyrics,
-                """
-                join_sql = "LEFT JOIN music m ON c.relation_id = m.id"
-            elif circle_type == "MOVIE":
-                movie_columns = """
-                    o.ext_movie_id AS movie_id,
-                    o.movie_name AS movie_name,
-                    o.director AS movie_director,
-                    o.star AS movie_star,
-                    o.type AS movie_type,
-                    o.country_language AS movie_country_language,
-                    o.viewing_state AS movie_viewing_state,
-                    o.release_time AS movie_release_time,
-                    o.img AS movie_img,
-                    o.classify AS movie_classify,
-                    o.local_img AS movie_local_img,
-                    o.score AS movie_score,
-                """
-                join_sql = "LEFT JOIN movie o ON c.relation_id = o.id"
-
-            sql = f"""
-                SELECT
-                    c.id,
-                    c.relation_id,
-                    c.content,
-                    c.imgs,
-                    c.type,
-                    c.user_id,
-                    c.permission,
-                    c.create_time,
-                    c.update_time,
-                    {music_columns}
-                    {movie_columns}
-                    u.username,
-                    u.avater AS useravater
-                FROM circle c
-                LEFT JOIN user u ON c.user_id COLLATE utf8mb4_unicode_ci = u.id
-                {join_sql}
-                WHERE c.type = :type AND c.permission = 1
-                ORDER BY c.create_time DESC
-                LIMIT :start, :page_size
+        music_columns = ""
+        movie_columns = ""
+        join_sql = ""
+
+        if circle_type == "MUSIC":
+            music_columns = """
+                m.song_name AS music_song_name,
+                m.audio_id AS music_audio_id,
+                m.author_name AS music_author_name,
+                m.album_name AS music_album_name,
+                m.cover AS music_cover,
+                CASE WHEN 0 >= m.permission THEN m.play_url ELSE NULL END AS music_play_url,
+                CASE WHEN 0 >= m.permission THEN m.local_play_url ELSE NULL END AS music_local_play_url,
+                CASE WHEN 0 >= m.permission THEN m.lyrics ELSE NULL END AS music_lyrics,
+            """
+            join_sql = "LEFT JOIN music m ON c.relation_id = m.id"
+        elif circle_type == "MOVIE":
+            movie_columns = """
+                o.ext_movie_id AS movie_id,
+                o.movie_name AS movie_name,
+                o.director AS movie_director,
+                o.star AS movie_star,
+                o.type AS movie_type,
+                o.country_language AS movie_country_language,
+                o.viewing_state AS movie_viewing_state,
+                o.release_time AS movie_release_time,
+                o.img AS movie_img,
+                o.classify AS movie_classify,
+                o.local_img AS movie_local_img,
+                o.score AS movie_score,
             """
+            join_sql = "LEFT JOIN movie o ON c.relation_id = o.id"
+
+        return f"""
+            SELECT
+                c.id,
+                c.relation_id,
+                c.content,
+                c.imgs,
+                c.type,
+                c.user_id,
+                c.permission,
+                c.create_time,
+                c.update_time,
+                {music_columns}
+                {movie_columns}
+                u.username,
+                u.avater AS useravater
+            FROM circle c
+            LEFT JOIN user u ON c.user_id COLLATE utf8mb4_unicode_ci = u.id
+            {join_sql}
+            WHERE c.type = :type AND c.permission = 1 {extra_where}
+            {tail}
+        """
+
+    def _attach_likes_and_comments(self, rows) -> List[Dict[str, Any]]:
+        """格式化结果行并附加点赞、评论列表"""
+        circle_list = []
+        for row in rows:
+            item = self._row_to_dict(row)
+            item["circle_likes"] = self.get_circle_like_by_circle_id(item["id"])
+            item["circle_comments"] = self.get_social_comment_by_circle_id(item["id"])
+            circle_list.append(item)
+        return circle_list
+
+    def get_circle_list_by_type(
+            self,
+            start: int,
+            page_size: int,
+            circle_type: str
+    ) -> List[Dict[str, Any]]:
+        """分页获取朋友圈列表（含点赞、评论嵌套）"""
+        try:
+            sql = self._circle_list_sql(circle_type, "", "ORDER BY c.create_time DESC LIMIT :start, :page_size")
 
             rows = self.db.execute(
                 text(sql),
                 {"type": circle_type, "start": start, "page_size": page_size}
             ).mappings().all()
 
-            circle_list = []
-            for row in rows:
-                item = self._row_to_dict(row)
-                item["circle_likes"] = self.get_circle_like_by_circle_id(item["id"])
-                item["circle_comments"] = self.get_social_comment_by_circle_id(item["id"])
-                circle_list.append(item)
-
-            return circle_list
+            return self._attach_likes_and_comments(rows)
         except Exception as e:
             logger.error(f"获取朋友圈列表失败: {str(e)}", exc_info=True)
             return []
 
+    # 游标分页的排序键：id 保证唯一（对应索引 idx_circle_type_time）
+    CURSOR_SORT_KEYS = [
+        SortKey("c.create_time"),
+        SortKey("c.id"),
+    ]
+
+    def get_circle_list_by_type_by_cursor(
+            self,
+            circle_type: str,
+            cursor_values: Optional[List[Any]],
+            scope: str,
+            page_size: int
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        游标分页获取朋友圈列表（含点赞、评论嵌套）
+
+        Args:
+            circle_type: 朋友圈类型
+            cursor_values: 已解析的游标值，None 表示第一页
+            scope: 游标作用域（由 service 按筛选条件生成）
+            page_size: 每页数量
+
+        Returns:
+            (朋友圈列表, 下一页游标)
+        """
+        try:
+            where_sql, params = keyset_where_sql(self.CURSOR_SORT_KEYS, cursor_values)
+            sql = self._circle_list_sql(
+                circle_type,
+                f"AND {where_sql}" if where_sql else "",
+                f"ORDER BY {order_by_sql(self.CURSOR_SORT_KEYS)} LIMIT :limit"
+            )
+            params.update({"type": circle_type, "limit": page_size + 1})
+
+            rows = self.db.execute(text(sql), params).mappings().all()
+            # 游标取原始 datetime，_row_to_dict 会把时间格式化为字符串
+            rows, next_cursor = build_page(
+                list(rows), page_size, self.CURSOR_SORT_KEYS, lambda row: [row["create_time"], row["id"]], scope
+            )
+            return self._attach_likes_and_comments(rows), next_cursor
+        except Exception as e:
+            logger.error(f"游标获取朋友圈列表失败: {str(e)}", exc_info=True)
+            return [], None
+
     def get_circle_like_by_circle_id(self, circle_id: int) -> List[Dict[str, Any]]:
         """获取朋友圈点赞列表（type=MUSIC_CIRCLE）"""
         try:
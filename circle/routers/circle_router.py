@@ -29,13 +29,32 @@ async def get_circle_list_by_type(
         pageSize: int = Query(..., description="每页数量"),
         pageNum: int = Query(..., description="页码，从1开始"),
         type: str = Query(..., description="类型（MUSIC/MOVIE）"),
+        withTotal: bool = Query(True, description="是否返回总数，不需要时传 false 省去一次统计"),
         circle_service: CircleService = Depends()
 ) -> ResultEntity:
     """获取朋友圈列表（按类型分页）"""
     return await circle_service.get_circle_list_by_type(
         page_num=pageNum,
         page_size=pageSize,
-        circle_type=type
+        circle_type=type,
+        with_total=withTotal
+    )
+
+
+@router.get("/getCircleListByTypeCursor", response_model=ResultEntity)
+async def get_circle_list_by_type_cursor(
+        type: str = Query(..., description="类型（MUSIC/MOVIE）"),
+        cursor: Optional[str] = Query(None, description="上一页返回的游标，第一页不传"),
+        pageSize: int = Query(10, ge=1, le=100, description="每页数量"),
+        withTotal: bool = Query(True, description="是否返回总数（仅第一页生效）"),
+        circle_service: CircleService = Depends()
+) -> ResultEntity:
+    """获取朋友圈列表（按类型游标分页，翻页时传入上一页返回的 cursor）"""
+    return await circle_service.get_circle_list_by_type_by_cursor(
+        circle_type=type,
+        cursor=cursor,
+        page_size=pageSize,
+        with_total=withTotal
     )
 
 
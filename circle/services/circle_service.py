@@ -10,6 +10,8 @@ from fastapi.logger import logger
 
 from common.config.common_database import get_db
 from common.utils.result_util import ResultEntity, ResultUtil
+from common.utils.pagination_util import CursorError, decode_cursor
+from common.utils.count_cache_util import fetch_page_with_total, invalidate_count
 from circle.models.circle_model import Circle
 from circle.repositories.circle_repository import CircleRepository
 from circle.schemas.circle_schema import InsertCircleSchema
@@ -32,7 +34,8 @@ class CircleService:
             self,
             page_num: int,
             page_size: int,
-            circle_type: str
+            circle_type: str,
+            with_total: bool = True
     ) -> ResultEntity:
         """分页获取朋友圈列表"""
         try:
@@ -42,14 +45,50 @@ class CircleService:
                 page_size = 10
 
             start = (page_num - 1) * page_size
-            circle_list = self.repository.get_circle_list_by_type(start, page_size, circle_type)
-            total = self.repository.get_circle_count(circle_type)
+            circle_list, total = await fetch_page_with_total(
+                lambda: self.repository.get_circle_list_by_type(start, page_size, circle_type),
+                namespace="circle",
+                filters={"type": circle_type},
+                count=lambda db: CircleRepository(db).get_circle_count(circle_type),
+                with_total=with_total
+            )
 
             return ResultUtil.success(data=circle_list, total=total)
         except Exception as e:
             logger.error(f"获取朋友圈列表失败: {str(e)}", exc_info=True)
             return ResultUtil.fail(msg=f"获取朋友圈列表失败: {str(e)}", data=None)
 
+    async def get_circle_list_by_type_by_cursor(
+            self,
+            circle_type: str,
+            cursor: Optional[str],
+            page_size: int,
+            with_total: bool = True
+    ) -> ResultEntity:
+        """游标分页获取朋友圈列表（总数只在第一页统计）"""
+        try:
+            if page_size < 1:
+                page_size = 10
+
+            scope = f"circle.list:{circle_type}"
+            cursor_values = decode_cursor(cursor, scope, len(self.repository.CURSOR_SORT_KEYS))
+            (circle_list, next_cursor), total = await fetch_page_with_total(
+                lambda: self.repository.get_circle_list_by_type_by_cursor(
+                    circle_type, cursor_values, scope, page_size
+                ),
+                namespace="circle",
+                filters={"type": circle_type},
+                count=lambda db: CircleRepository(db).get_circle_count(circle_type),
+                with_total=with_total and cursor_values is None
+            )
+
+            return ResultUtil.success(data=circle_list, total=total, cursor=next_cursor)
+        except CursorError as e:
+            return ResultUtil.fail(msg=str(e), data=None)
+        except Exception as e:
+            logger.error(f"游标获取朋友圈列表失败: {str(e)}", exc_info=True)
+            return ResultUtil.fail(msg=f"获取朋友圈列表失败: {str(e)}", data=None)
+
     async def get_circle_article_count(self, circle_id: int) -> ResultEntity:
         """获取文章的评论数、浏览数、收藏数"""
         try:
@@ -82,6 +121,7 @@ class CircleService:
             )
 
             inserted = self.repository.insert_circle(circle)
+            invalidate_count("circle")
 
             # 广播新消息通知
             await manager.broadcast("有一条新消息")
@@ -0,0 +1,280 @@
+# common/utils/admission_util.py
+"""
+大模型推理准入控制（按模型配置限制并发生成数，排队按用户公平调度）
+
+对话与 agent 请求原先直接发给 Ollama / 在线模型，不做任何限制：并发用户一多，本地 Ollama 在多个生成之间来回切换，
+所有回答都变慢，首字延迟急剧上升。这里按模型配置（模型ID）准入：
+
+- 每个模型同时进行的生成数不超过上限（LLM_MAX_CONCURRENT，可按模型名覆盖），超出的请求排队
+- 排队按用户轮转：每个用户各自先进先出，有空位时依次从不同用户的队列中取请求，单个用户连发多条不会挤占其他用户
+- 队列有界：总排队数（LLM_MAX_QUEUE）与每个用户的排队数（LLM_MAX_QUEUE_PER_USER）超出时直接拒绝；
+  排队超过 LLM_QUEUE_TIMEOUT 秒放弃
+- 排队期间按 QUEUE_NOTIFY_SECONDS 报告当前排位（位置变化时立即报告），WebSocket 客户端收到 `[queue:N]` 消息；
+  客户端断开后请求的生成器被关闭（或取消事件被设置），排队中的请求随之出队，不会占用空位
+- 上限按进程统计：多个 uvicorn worker 或 chat / agent 服务共用同一个 Ollama 时，按 worker 数折算上限
+
+环境变量:
+    LLM_MAX_CONCURRENT           每个模型同时进行的生成数，默认 4
+    LLM_MAX_CONCURRENT_MODELS    按模型名覆盖，如 "qwen3:8b=2,deepseek-chat=16"
+    LLM_MAX_QUEUE                每个模型的最大排队数，默认 32
+    LLM_MAX_QUEUE_PER_USER       每个用户在同一模型上的最大排队数，默认 2
+    LLM_QUEUE_TIMEOUT            最长排队时间（秒），默认 120
+"""
+import os
+import time
+import asyncio
+import logging
+from collections import OrderedDict, deque
+from typing import AsyncGenerator, Deque, Dict, Optional
+
+from common.utils.metrics_util import counter, gauge, histogram
+from common.utils.stream_util import ClientDisconnected
+from common.utils.service_container import service_container
+
+logger = logging.getLogger(__name__)
+
+
+def _parse_limits(value: str) -> Dict[str, int]:
+    limits = {}
+    for item in value.split(","):
+        name, sep, limit = item.strip().rpartition("=")
+        if sep and name and limit.strip().isdigit():
+            limits[name.strip()] = int(limit)
+    return limits
+
+
+LLM_MAX_CONCURRENT = int(os.getenv("LLM_MAX_CONCURRENT", "4"))
+LLM_MAX_CONCURRENT_MODELS = _parse_limits(os.getenv("LLM_MAX_CONCURRENT_MODELS", ""))
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "32"))
+LLM_MAX_QUEUE_PER_USER = int(os.getenv("LLM_MAX_QUEUE_PER_USER", "2"))
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", "120"))
+
+# 排队期间检查排位的间隔（秒）；排位不变时也按该间隔报告，顺带发现已断开的客户端
+QUEUE_NOTIFY_SECONDS = 3
+
+# 排位消息格式（与 "[completed]" 一样是控制消息，客户端据此显示排队状态，不计入回答内容）
+QUEUE_MESSAGE_PREFIX = "[queue:"
+
+ADMISSION = "llm.admission"
+
+QUEUE_WAIT_SECONDS = histogram(
+    "llm_queue_wait_seconds",
+    "请求等待推理准入的时间（秒），标签 model",
+    buckets=(0.01, 0.1, 0.5, 1, 2, 5, 10, 20, 30, 60, 120)
+)
+GENERATION_SECONDS = histogram(
+    "llm_generation_seconds",
+    "获得准入后占用生成名额的时间（秒），标签 model",
+    buckets=(0.5, 1, 2, 5, 10, 20, 30, 60, 120, 300)
+)
+ACTIVE_GENERATIONS = gauge("llm_generations_active", "正在进行的生成数，标签 model")
+QUEUED_REQUESTS = gauge("llm_queue_length", "排队等待准入的请求数，标签 model")
+ADMISSIONS = counter(
+    "llm_admissions_total",
+    "准入结果，标签 model、result=immediate/queued/rejected/timeout/cancelled"
+)
+
+
+class AdmissionRejected(Exception):
+    """排队已满或排队超时"""
+
+
+def queue_message(position: int) -> str:
+    return f"{QUEUE_MESSAGE_PREFIX}{position}]"
+
+
+def is_queue_message(message: str) -> bool:
+    return message.startswith(QUEUE_MESSAGE_PREFIX)
+
+
+class AdmissionTicket:
+    """一次推理请求的准入凭证"""
+
+    def __init__(self, gate: "ModelGate", user_id: str):
+        self.gate = gate
+        self.user_id = user_id
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.created_at = time.monotonic()
+        self.admitted_at: Optional[float] = None
+        self.released = False
+
+    @property
+    def admitted(self) -> bool:
+        return self.admitted_at is not None
+
+    async def wait(self, cancel_event: Optional[asyncio.Event] = None) -> AsyncGenerator[int, None]:
+        """
+        等待准入；排队期间产出当前排位（从 1 开始），获得准入后结束
+
+        Args:
+            cancel_event: 客户端断开时设置的事件，设置后立即放弃排队
+
+        Raises:
+            AdmissionRejected: 排队已满或排队超时
+            ClientDisconnected: 排队期间客户端断开
+        """
+        self.gate.enqueue(self)
+        last_position = None
+        last_report = 0.0
+        deadline = self.created_at + LLM_QUEUE_TIMEOUT
+        while not self.admitted:
+            if cancel_event is not None and cancel_event.is_set():
+                self.gate.dequeue(self, result="cancelled")
+                raise ClientDisconnected()
+            now = time.monotonic()
+            if now >= deadline:
+                self.gate.dequeue(self, result="timeout")
+                raise AdmissionRejected("排队超时，请稍后再试")
+            position = self.gate.position(self)
+            if position != last_position or now - last_report >= QUEUE_NOTIFY_SECONDS:
+                last_position, last_report = position, now
+                yield position
+            waiters = {asyncio.shield(self.future)}
+            if cancel_event is not None:
+                waiters.add(asyncio.ensure_future(cancel_event.wait()))
+            try:
+                await asyncio.wait(
+                    waiters, timeout=min(QUEUE_NOTIFY_SECONDS, max(deadline - now, 0.01)),
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+            finally:
+                for waiter in waiters:
+                    waiter.cancel()
+
+    def release(self) -> None:
+        """结束生成或放弃排队（可重复调用，必须在 finally 中调用）"""
+        if self.released:
+            return
+        self.released = True
+        if self.admitted:
+            self.gate.finish(self)
+        else:
+            self.gate.dequeue(self, result="cancelled")
+
+
+class ModelGate:
+    """单个模型的并发名额与按用户轮转的等待队列"""
+
+    def __init__(self, model_key: str, model_name: str, max_concurrent: int):
+        self.model_key = model_key
+        self.model_name = model_name
+        self.max_concurrent = max(1, max_concurrent)
+        self.active = 0
+        # 用户 -> 该用户的等待队列；字典顺序即轮转顺序
+        self._queues: "OrderedDict[str, Deque[AdmissionTicket]]" = OrderedDict()
+        self._queued = 0
+
+    def enqueue(self, ticket: AdmissionTicket) -> None:
+        if self.active < self.max_concurrent and not self._queued:
+            self._admit(ticket)
+            ADMISSIONS.inc(model=self.model_name, result="immediate")
+            return
+        user_queue = self._queues.get(ticket.user_id)
+        if self._queued >= LLM_MAX_QUEUE or (user_queue and len(user_queue) >= LLM_MAX_QUEUE_PER_USER):
+            ADMISSIONS.inc(model=self.model_name, result="rejected")
+            raise AdmissionRejected("当前排队人数过多，请稍后再试")
+        if user_queue is None:
+            user_queue = self._queues[ticket.user_id] = deque()
+        user_queue.append(ticket)
+        self._queued += 1
+        QUEUED_REQUESTS.set(self._queued, model=self.model_name)
+
+    def dequeue(self, ticket: AdmissionTicket, result: str) -> None:
+        """从队列中移除未获得准入的请求（超时或客户端断开）"""
+        user_queue = self._queues.get(ticket.user_id)
+        if user_queue is None or ticket not in user_queue:
+            return
+        user_queue.remove(ticket)
+        if not user_queue:
+            del self._queues[ticket.user_id]
+        self._queued -= 1
+        QUEUED_REQUESTS.set(self._queued, model=self.model_name)
+        ADMISSIONS.inc(model=self.model_name, result=result)
+
+    def position(self, ticket: AdmissionTicket) -> int:
+        """请求在轮转调度下的排位（前面还有多少个请求 + 1）"""
+        user_queue = self._queues.get(ticket.user_id)
+        if user_queue is None or ticket not in user_queue:
+            return 0
+        index = user_queue.index(ticket)
+        ahead = 0
+        for user_id, queue in self._queues.items():
+            if user_id == ticket.user_id:
+                ahead += index
+                continue
+            # 排在该用户之前的用户在第 index 轮还有请求时先被调度
+            ahead += min(len(queue), index)
+            if len(queue) > index and self._is_before(user_id, ticket.user_id):
+                ahead += 1
+        return ahead + 1
+
+    def _is_before(self, user_a: str, user_b: str) -> bool:
+        for user_id in self._queues:
+            if user_id == user_a:
+                return True
+            if user_id == user_b:
+                return False
+        return False
+
+    def finish(self, ticket: AdmissionTicket) -> None:
+        self.active -= 1
+        ACTIVE_GENERATIONS.set(self.active, model=self.model_name)
+        GENERATION_SECONDS.observe(time.monotonic() - ticket.admitted_at, model=self.model_name)
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        """有空位时从轮转顺序中第一个用户的队列取出请求，该用户移到轮转末尾"""
+        while self.active < self.max_concurrent and self._queues:
+            user_id, user_queue = next(iter(self._queues.items()))
+            ticket = user_queue.popleft()
+            del self._queues[user_id]
+            if user_queue:
+                self._queues[user_id] = user_queue
+            self._queued -= 1
+            QUEUED_REQUESTS.set(self._queued, model=self.model_name)
+            ADMISSIONS.inc(model=self.model_name, result="queued")
+            self._admit(ticket)
+
+    def _admit(self, ticket: AdmissionTicket) -> None:
+        self.active += 1
+        ticket.admitted_at = time.monotonic()
+        if not ticket.future.done():
+            ticket.future.set_result(True)
+        ACTIVE_GENERATIONS.set(self.active, model=self.model_name)
+        QUEUE_WAIT_SECONDS.observe(ticket.admitted_at - ticket.created_at, model=self.model_name)
+
+
+class AdmissionController:
+    """
+    按模型配置的推理准入控制（进程级共享，通过 service_container 获取）
+
+    使用示例:
+        ticket = service_container.get(ADMISSION).ticket(model_config, user_id)
+        try:
+            async for position in ticket.wait():
+                yield queue_message(position)                  # 排队中
+            async for chunk in chat_model.astream(...):        # 获得准入
+                yield chunk
+        finally:
+            ticket.release()
+    """
+
+    def __init__(self):
+        self._gates: Dict[str, ModelGate] = {}
+
+    def max_concurrent(self, model_name: str) -> int:
+        return LLM_MAX_CONCURRENT_MODELS.get(model_name, LLM_MAX_CONCURRENT)
+
+    def ticket(self, model_config, user_id: str) -> AdmissionTicket:
+        """创建准入凭证（所有调度都在事件循环线程中进行，不需要加锁）"""
+        gate = self._gates.get(model_config.id)
+        limit = self.max_concurrent(model_config.model_name)
+        if gate is None or gate.model_name != model_config.model_name:
+            if gate is not None:
+                # 模型配置改了模型名：新名额从新建的 gate 开始计算，旧 gate 中进行中的生成自然结束
+                logger.info(f"[Admission] 模型 {model_config.id} 改为 {model_config.model_name}")
+            gate = self._gates[model_config.id] = ModelGate(model_config.id, model_config.model_name, limit)
+        return AdmissionTicket(gate, user_id)
+
+
+service_container.register(ADMISSION, AdmissionController)
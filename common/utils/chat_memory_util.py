@@ -0,0 +1,271 @@
+# common/utils/chat_memory_util.py
+"""
+会话记忆（多轮对话上下文）
+
+每条消息以 JSON 形式追加到 Redis 列表 `chat_memory:{scope}:{user_id}:{chat_id}`：
+- 保存：RPUSH 新消息 + LTRIM 保留最近 N 条 + EXPIRE 续期，一次 pipeline 往返，
+  只写入本轮新增的消息，不再整段重写历史
+- 读取：LRANGE 最近 N 条 + EXPIRE 续期，一次 pipeline 往返；可按 token 预算从新到旧截取窗口
+- 摘要：更早的消息由上下文管理器（chat/utils/context_util.py）折叠为滚动摘要，存于
+  `chat_memory:{scope}:{user_id}:{chat_id}:summary`，与消息列表一起读取、续期
+- 旧数据：原先以 `str(list)` 存在 `chat_history:{user_id}:{chat_id}` 字符串键中，
+  读取时发现新键为空会自动迁移（ast.literal_eval 解析，不再 eval），批量迁移见
+  test/migrate_chat_memory.py
+
+环境变量:
+    CHAT_MEMORY_MAX_MESSAGES   每个会话保留的最大消息数，默认 20
+    CHAT_MEMORY_TTL_DAYS       会话过期天数（每次读写续期），默认 180
+    CHAT_MEMORY_TOKEN_BUDGET   读取历史的 token 预算，默认 0（不限制，只按条数）
+"""
+import os
+import ast
+import json
+import time
+import logging
+from typing import Iterable, List, Optional, Tuple
+
+import redis
+
+from common.utils.redis_util import get_redis
+
+logger = logging.getLogger(__name__)
+
+CHAT_MEMORY_MAX_MESSAGES = int(os.getenv("CHAT_MEMORY_MAX_MESSAGES", "20"))
+CHAT_MEMORY_TTL_DAYS = int(os.getenv("CHAT_MEMORY_TTL_DAYS", "180"))
+CHAT_MEMORY_TOKEN_BUDGET = int(os.getenv("CHAT_MEMORY_TOKEN_BUDGET", "0"))
+
+KEY_PREFIX = "chat_memory"
+LEGACY_KEY_PREFIX = "chat_history"
+
+# 会话中保存的角色（与 langchain 消息元组的角色名一致）；system 提示词每次请求单独传入，不入库
+ROLES = ("human", "ai")
+
+Message = Tuple[str, str]
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    粗略估算 token 数：CJK 字符按 1 个 token，其余字符按 4 个字符 1 个 token
+
+    仅用于截取历史窗口，不追求与具体模型的分词器完全一致。
+    """
+    if not text:
+        return 0
+    cjk = sum(1 for ch in text if "一" <= ch <= "鿿" or "぀" <= ch <= "ヿ")
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def parse_legacy_history(raw: bytes) -> List[Message]:
+    """解析旧格式（str(list) 存储的消息元组列表），丢弃 system 消息与无法识别的条目"""
+    value = ast.literal_eval(raw.decode("utf-8"))
+    messages = []
+    for item in value:
+        if isinstance(item, (tuple, list)) and len(item) == 2 and item[0] in ROLES:
+            messages.append((item[0], str(item[1])))
+    return messages
+
+
+class ChatMemory:
+    """
+    基于 Redis 列表的会话记忆
+
+    使用示例:
+        memory = ChatMemory()
+        history = memory.load(user_id, chat_id)                 # [("human", "..."), ("ai", "..."), ...]
+        memory.append(user_id, chat_id, ("human", prompt), ("ai", response))
+    """
+
+    def __init__(
+            self,
+            scope: str = "chat",
+            redis_client: Optional[redis.Redis] = None,
+            max_messages: int = CHAT_MEMORY_MAX_MESSAGES,
+            ttl_seconds: int = CHAT_MEMORY_TTL_DAYS * 86400
+    ):
+        """
+        Args:
+            scope: 业务范围（chat / agent），不同服务的会话互不影响
+            redis_client: Redis 客户端，默认使用进程级共享客户端
+            max_messages: 每个会话保留的最大消息数
+            ttl_seconds: 会话过期时间（秒）
+        """
+        self.scope = scope
+        self.redis = redis_client or get_redis()
+        self.max_messages = max_messages
+        self.ttl_seconds = ttl_seconds
+
+    def key(self, user_id: str, chat_id: str) -> str:
+        return f"{KEY_PREFIX}:{self.scope}:{user_id}:{chat_id}"
+
+    @staticmethod
+    def legacy_key(user_id: str, chat_id: str) -> str:
+        return f"{LEGACY_KEY_PREFIX}:{user_id}:{chat_id}"
+
+    def summary_key(self, user_id: str, chat_id: str) -> str:
+        return f"{self.key(user_id, chat_id)}:summary"
+
+    def load(self, user_id: str, chat_id: str, token_budget: Optional[int] = None) -> List[Message]:
+        """
+        读取会话最近的消息（按时间正序）
+
+        Args:
+            user_id: 用户ID
+            chat_id: 会话ID
+            token_budget: token 预算，None 时使用 CHAT_MEMORY_TOKEN_BUDGET，<=0 表示不限制
+        """
+        if not chat_id:
+            return []
+        key = self.key(user_id, chat_id)
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.lrange(key, -self.max_messages, -1)
+        pipe.expire(key, self.ttl_seconds)
+        entries, _ = pipe.execute()
+
+        messages = self._load_entries(user_id, chat_id, entries)
+        budget = CHAT_MEMORY_TOKEN_BUDGET if token_budget is None else token_budget
+        return self.window(messages, budget) if budget > 0 else messages
+
+    def load_with_summary(self, user_id: str, chat_id: str) -> Tuple[str, List[Message]]:
+        """读取滚动摘要与全部保留的消息（一次 pipeline 往返），不按 token 预算截取"""
+        if not chat_id:
+            return "", []
+        key = self.key(user_id, chat_id)
+        summary_key = self.summary_key(user_id, chat_id)
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.lrange(key, -self.max_messages, -1)
+        pipe.get(summary_key)
+        pipe.expire(key, self.ttl_seconds)
+        pipe.expire(summary_key, self.ttl_seconds)
+        entries, summary, _, _ = pipe.execute()
+
+        messages = self._load_entries(user_id, chat_id, entries)
+        return (summary.decode("utf-8") if summary else ""), messages
+
+    def fold(self, user_id: str, chat_id: str, folded: List[Message], summary: str) -> int:
+        """
+        保存新的滚动摘要，并从列表头部移除已折叠进摘要的消息
+
+        读取与裁剪之间可能有新消息追加（只追加在尾部），也可能被 append 的 LTRIM 从头部裁掉一部分，
+        因此以列表当前头部与 folded 尾部的重合部分为准，WATCH 保证裁剪期间列表未变化。
+
+        Returns:
+            实际从列表中移除的消息数
+        """
+        key = self.key(user_id, chat_id)
+        summary_key = self.summary_key(user_id, chat_id)
+        with self.redis.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(key)
+                    entries = pipe.lrange(key, 0, len(folded) - 1) if folded else []
+                    head = [self._parse_entry(key, entry) for entry in entries]
+                    trim = 0
+                    for offset in range(len(folded) + 1):
+                        overlap = folded[offset:]
+                        if head[:len(overlap)] == overlap:
+                            trim = len(overlap)
+                            break
+                    pipe.multi()
+                    pipe.set(summary_key, summary, ex=self.ttl_seconds)
+                    if trim:
+                        pipe.ltrim(key, trim, -1)
+                    pipe.execute()
+                    return trim
+                except redis.WatchError:
+                    continue
+
+    def _load_entries(self, user_id: str, chat_id: str, entries: List[bytes]) -> List[Message]:
+        if not entries:
+            return self.migrate_legacy(user_id, chat_id) if self.scope == "chat" else []
+        key = self.key(user_id, chat_id)
+        messages = []
+        for entry in entries:
+            message = self._parse_entry(key, entry)
+            if message:
+                messages.append(message)
+        return messages
+
+    @staticmethod
+    def _parse_entry(key: str, entry: bytes) -> Optional[Message]:
+        try:
+            item = json.loads(entry)
+            return item["role"], item["content"]
+        except (ValueError, KeyError, TypeError):
+            logger.warning(f"[ChatMemory] 跳过无法解析的消息: key={key}")
+            return None
+
+    def append(self, user_id: str, chat_id: str, *messages: Message) -> None:
+        """追加消息并裁剪到最近 max_messages 条，同时续期"""
+        if not chat_id or not messages:
+            return
+        key = self.key(user_id, chat_id)
+        now = int(time.time())
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.rpush(key, *[
+            json.dumps({"role": role, "content": content, "ts": now}, ensure_ascii=False)
+            for role, content in messages
+        ])
+        pipe.ltrim(key, -self.max_messages, -1)
+        pipe.expire(key, self.ttl_seconds)
+        pipe.execute()
+
+    def clear(self, user_id: str, chat_id: str) -> None:
+        """删除会话记忆（含摘要与旧格式的键）"""
+        self.redis.delete(
+            self.key(user_id, chat_id),
+            self.summary_key(user_id, chat_id),
+            self.legacy_key(user_id, chat_id)
+        )
+
+    @staticmethod
+    def window(messages: List[Message], token_budget: int) -> List[Message]:
+        """从最新的消息往前累计，保留不超过 token 预算的最近消息；窗口从 human 消息开始"""
+        kept: List[Message] = []
+        used = 0
+        for role, content in reversed(messages):
+            used += estimate_tokens(content)
+            if used > token_budget:
+                break
+            kept.append((role, content))
+        kept.reverse()
+        while kept and kept[0][0] != "human":
+            kept.pop(0)
+        return kept
+
+    def migrate_legacy(self, user_id: str, chat_id: str) -> List[Message]:
+        """把旧格式的会话迁移到列表结构，返回迁移后的消息；没有旧数据时返回空列表"""
+        legacy_key = self.legacy_key(user_id, chat_id)
+        raw = self.redis.get(legacy_key)
+        if raw is None:
+            return []
+        try:
+            messages = parse_legacy_history(raw)[-self.max_messages:]
+        except (ValueError, SyntaxError) as e:
+            logger.warning(f"[ChatMemory] 旧格式会话无法解析，已忽略: key={legacy_key}, error={str(e)}")
+            return []
+
+        if messages:
+            self.append(user_id, chat_id, *messages)
+        self.redis.delete(legacy_key)
+        logger.info(f"[ChatMemory] 已迁移旧格式会话: key={legacy_key}, messages={len(messages)}")
+        return messages
+
+    def migrate_all_legacy(self, batch_size: int = 500) -> int:
+        """批量迁移所有旧格式会话，返回迁移的会话数"""
+        migrated = 0
+        for legacy_key in self._scan_legacy_keys(batch_size):
+            _, user_id, chat_id = legacy_key.decode("utf-8").split(":", 2)
+            # 新键已有数据时说明已按新格式写入过，旧数据直接丢弃
+            if self.redis.exists(self.key(user_id, chat_id)):
+                self.redis.delete(legacy_key)
+                continue
+            if self.redis.type(legacy_key) != b"string":
+                continue
+            self.migrate_legacy(user_id, chat_id)
+            migrated += 1
+        return migrated
+
+    def _scan_legacy_keys(self, batch_size: int) -> Iterable[bytes]:
+        # chat_history:{user_id}:{chat_id}，至少两个冒号，排除计数缓存等其他键
+        for key in self.redis.scan_iter(match=f"{LEGACY_KEY_PREFIX}:*:*", count=batch_size):
+            yield key
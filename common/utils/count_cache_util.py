@@ -0,0 +1,155 @@
+# common/utils/count_cache_util.py
+"""
+分页总数缓存
+
+列表接口每翻一页都会执行一次与数据查询条件相同的 COUNT(*)，关键词搜索时还是
+`LIKE '%kw%'` 全表扫描。总数只用于展示页码，允许几十秒的延迟，因此按
+"命名空间 + 规范化后的筛选条件" 缓存到 Redis（多个 worker 共享），并在写入/删除时
+按命名空间失效。
+
+- 命名空间：同一张表（或同一个用户/资源下的数据）共用一个命名空间，写操作调用
+  invalidate_count(namespace) 即可让该命名空间下所有筛选条件的缓存失效
+- 失效方式：命名空间带版本号，失效时版本号 +1，旧版本的键由 TTL 自然过期，无需 SCAN
+- Redis 不可用时直接查询数据库，不影响接口
+
+使用示例:
+    music_list, total = await fetch_page_with_total(
+        lambda: repository.get_music_list_by_classify_id(...),
+        namespace="music_classify",
+        filters={"classify_id": classify_id},
+        count=lambda db: MusicRepository(db).count_music_by_classify_id(classify_id),
+        with_total=with_total
+    )
+
+环境变量:
+    COUNT_CACHE_TTL   缓存秒数，默认 30，设为 0 关闭缓存
+"""
+import os
+import json
+import asyncio
+import hashlib
+import logging
+from typing import Any, Callable, Dict, Optional, Tuple, TypeVar
+
+from sqlalchemy.orm import Session
+
+from common.config.common_database import SessionLocal
+from common.utils.redis_util import get_redis
+
+logger = logging.getLogger(__name__)
+
+COUNT_CACHE_TTL = int(os.getenv("COUNT_CACHE_TTL", "30"))
+
+KEY_PREFIX = "count_cache"
+
+T = TypeVar("T")
+
+
+def _normalize_filters(filters: Optional[Dict[str, Any]]) -> str:
+    """
+    规范化筛选条件：去掉空值、按键排序，保证等价条件得到同一个键
+
+    字符串不去首尾空白：仓储按原值拼 `LIKE '%kw%'`，" 周杰伦" 与 "周杰伦" 命中的行数不同，不能共用一个总数
+    """
+    normalized = {}
+    for key, value in (filters or {}).items():
+        if value is None or value == "":
+            continue
+        normalized[key] = value
+    return json.dumps(normalized, sort_keys=True, ensure_ascii=False, default=str)
+
+
+def _version_key(namespace: str) -> str:
+    return f"{KEY_PREFIX}:ver:{namespace}"
+
+
+def _count_key(namespace: str, version: int, filters: Optional[Dict[str, Any]]) -> str:
+    digest = hashlib.md5(_normalize_filters(filters).encode("utf-8")).hexdigest()
+    return f"{KEY_PREFIX}:{namespace}:{version}:{digest}"
+
+
+def get_cached_count(namespace: str, filters: Optional[Dict[str, Any]], compute: Callable[[], int]) -> int:
+    """
+    读取缓存的总数，未命中时调用 compute() 计算并写入缓存
+
+    Args:
+        namespace: 命名空间（失效粒度）
+        filters: 影响总数的全部筛选条件
+        compute: 实际执行 COUNT 的函数
+    """
+    if COUNT_CACHE_TTL <= 0:
+        return compute()
+
+    try:
+        redis_client = get_redis()
+        version = int(redis_client.get(_version_key(namespace)) or 0)
+        key = _count_key(namespace, version, filters)
+        cached = redis_client.get(key)
+        if cached is not None:
+            return int(cached)
+    except Exception as e:
+        logger.warning(f"[CountCache] 读取缓存失败，直接查询: {str(e)}")
+        return compute()
+
+    total = compute()
+    try:
+        redis_client.set(key, total, ex=COUNT_CACHE_TTL)
+    except Exception as e:
+        logger.warning(f"[CountCache] 写入缓存失败: {str(e)}")
+    return total
+
+
+def invalidate_count(*namespaces: str) -> None:
+    """使命名空间下的全部总数缓存失效（写入、删除数据后调用）"""
+    if COUNT_CACHE_TTL <= 0 or not namespaces:
+        return
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        for namespace in namespaces:
+            pipe.incr(_version_key(namespace))
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"[CountCache] 失效缓存失败: {str(e)}")
+
+
+def count_in_new_session(count: Callable[[Session], int]) -> int:
+    """
+    在独立的数据库会话中执行 COUNT
+
+    Session 不是线程安全的，与数据查询并行执行的 COUNT 不能复用请求的会话。
+    """
+    db = SessionLocal()
+    try:
+        return count(db)
+    finally:
+        db.close()
+
+
+async def fetch_page_with_total(
+        fetch_page: Callable[[], T],
+        namespace: str,
+        filters: Optional[Dict[str, Any]],
+        count: Callable[[Session], int],
+        with_total: bool = True
+) -> Tuple[T, Optional[int]]:
+    """
+    并行执行数据查询与总数统计
+
+    Args:
+        fetch_page: 查询当前页数据（使用请求的会话，在线程池执行）
+        namespace: 总数缓存的命名空间
+        filters: 影响总数的全部筛选条件
+        count: 接收独立会话并返回总数的函数
+        with_total: 为 False 时不统计总数，返回的 total 为 None
+
+    Returns:
+        (当前页数据, 总数)
+    """
+    if not with_total:
+        return await asyncio.to_thread(fetch_page), None
+
+    page, total = await asyncio.gather(
+        asyncio.to_thread(fetch_page),
+        asyncio.to_thread(get_cached_count, namespace, filters, lambda: count_in_new_session(count))
+    )
+    return page, total
@@ -0,0 +1,192 @@
+# common/utils/llm_client_util.py
+"""
+大模型客户端池与模型配置缓存（chat / agent 服务共用）
+
+原先每轮对话都要查询一次模型配置（数据库），再新建一个 OllamaLLM / ChatOpenAI 对象，
+每个对象各自创建 HTTP 客户端，连接用完即弃，每轮都要重新建立 TCP（在线模型还有 TLS）连接。
+
+- 客户端池：按模型配置（模型ID、类型、模型名、base_url、api_key 哈希、showThink）缓存模型对象，
+  同一配置的请求共用一个对象及其 HTTP 连接池；配置变更后键随之变化，旧对象按 LRU 淘汰
+- 配置缓存：进程内缓存模型配置，Redis 中维护全局版本号 `llm:model_config_version`，
+  新增 / 更新 / 删除模型时版本号加一，所有服务进程的缓存随之失效（Redis 不可用时按 MODEL_CONFIG_CACHE_SECONDS 过期）
+
+环境变量:
+    LLM_CLIENT_POOL_SIZE          客户端池最多缓存的模型对象数，默认 32
+    MODEL_CONFIG_CACHE_SECONDS    模型配置在进程内的最长缓存时间（秒），默认 300
+    OLLAMA_KEEP_ALIVE             Ollama 模型在显存中的保留时间（如 30m），默认不设置（使用 Ollama 的默认值）
+"""
+import os
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from langchain_community.chat_models import ChatOpenAI
+from langchain_ollama import OllamaLLM
+
+from common.utils.redis_util import get_redis
+from common.utils.service_container import service_container
+
+logger = logging.getLogger(__name__)
+
+LLM_CLIENT_POOL_SIZE = int(os.getenv("LLM_CLIENT_POOL_SIZE", "32"))
+MODEL_CONFIG_CACHE_SECONDS = int(os.getenv("MODEL_CONFIG_CACHE_SECONDS", "300"))
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE")
+
+MODEL_CONFIG_VERSION_KEY = "llm:model_config_version"
+
+DEFAULT_BASE_URLS = {
+    "ollama": "http://localhost:11434",
+    "deepseek": "https://api.deepseek.com/v1",
+    "tongyi": "https://dashscope.aliyuncs.com/compatible-mode/v1",
+}
+
+LLM_CLIENTS = "llm.clients"
+MODEL_CONFIGS = "llm.model_configs"
+
+
+def create_chat_model(model_config, show_think: bool) -> Optional[Any]:
+    """根据模型配置创建聊天模型实例，不支持的模型类型返回 None"""
+    base_url = model_config.base_url or DEFAULT_BASE_URLS.get(model_config.type)
+    if model_config.type == "ollama":
+        logger.info(f"[LLMClientPool] 创建Ollama模型: {model_config.model_name}")
+        kwargs = {"keep_alive": OLLAMA_KEEP_ALIVE} if OLLAMA_KEEP_ALIVE else {}
+        return OllamaLLM(
+            model=model_config.model_name,
+            base_url=base_url,
+            model_kwargs={"options": {"think": show_think}},
+            **kwargs
+        )
+    if model_config.type in ["deepseek", "tongyi"]:
+        logger.info(f"[LLMClientPool] 创建在线模型: {model_config.type}, base_url={base_url}")
+        return ChatOpenAI(
+            model=model_config.model_name,
+            api_key=model_config.api_key,
+            base_url=base_url,
+            streaming=True,
+            temperature=0.7
+        )
+    logger.error(f"[LLMClientPool] 不支持的模型类型: {model_config.type}")
+    return None
+
+
+class LLMClientPool:
+    """
+    按模型配置复用聊天模型对象（进程级共享，通过 service_container 获取）
+
+    使用示例:
+        chat_model = service_container.get(LLM_CLIENTS).get(model_config, show_think)
+    """
+
+    def __init__(self, max_size: int = LLM_CLIENT_POOL_SIZE):
+        self.max_size = max_size
+        self._clients: "OrderedDict[Tuple, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(model_config, show_think: bool) -> Tuple:
+        api_key_hash = hashlib.sha1((model_config.api_key or "").encode("utf-8")).hexdigest()
+        return (
+            model_config.id, model_config.type, model_config.model_name,
+            model_config.base_url or "", api_key_hash, bool(show_think)
+        )
+
+    def get(self, model_config, show_think: bool = False) -> Optional[Any]:
+        key = self.key(model_config, show_think)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is not None:
+                self._clients.move_to_end(key)
+                return client
+
+        client = create_chat_model(model_config, show_think)
+        if client is None:
+            return None
+        with self._lock:
+            # 并发创建时保留先放入的对象
+            client = self._clients.setdefault(key, client)
+            self._clients.move_to_end(key)
+            while len(self._clients) > self.max_size:
+                self._clients.popitem(last=False)
+        return client
+
+    def invalidate(self, model_id: Optional[str] = None) -> None:
+        """丢弃模型（不传时为全部模型）的客户端"""
+        with self._lock:
+            for key in [key for key in self._clients if model_id is None or key[0] == model_id]:
+                del self._clients[key]
+
+
+class ModelConfigCache:
+    """
+    模型配置的进程内缓存，按 Redis 中的全局版本号跨进程失效
+
+    使用示例:
+        configs = service_container.get(MODEL_CONFIGS)
+        model_config = configs.get((model_id, company_id))
+        if model_config is None:
+            model_config = repository.get_model_by_id(model_id, company_id)
+            configs.put((model_id, company_id), model_config)
+        configs.invalidate()                                    # 新增 / 更新 / 删除模型后
+    """
+
+    def __init__(self, ttl_seconds: int = MODEL_CONFIG_CACHE_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        # key -> (配置, 版本号, 过期时间)
+        self._items: Dict[Hashable, Tuple[Any, Optional[bytes], float]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _version() -> Optional[bytes]:
+        try:
+            return get_redis().get(MODEL_CONFIG_VERSION_KEY) or b"0"
+        except Exception as e:
+            logger.warning(f"[ModelConfigCache] 读取配置版本号失败: {str(e)}")
+            return None
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        item = self._items.get(key)
+        if item is None:
+            return None
+        config, version, expires_at = item
+        if expires_at < time.monotonic():
+            return None
+        current = self._version()
+        # Redis 不可用时只按过期时间判断
+        if current is not None and current != version:
+            return None
+        return config
+
+    def put(self, key: Hashable, config: Any) -> None:
+        """缓存配置（不缓存查询不到的配置，新增模型后可立即使用）"""
+        if config is None:
+            return
+        with self._lock:
+            self._items[key] = (config, self._version(), time.monotonic() + self.ttl_seconds)
+
+    def invalidate(self) -> None:
+        """清空本进程缓存并递增全局版本号（其他进程的缓存在下次读取时失效）"""
+        with self._lock:
+            self._items.clear()
+        try:
+            get_redis().incr(MODEL_CONFIG_VERSION_KEY)
+        except Exception as e:
+            logger.warning(f"[ModelConfigCache] 递增配置版本号失败: {str(e)}")
+
+
+def invalidate_model(model_id: Optional[str] = None) -> None:
+    """
+    模型新增 / 更新 / 删除后调用：配置缓存跨进程失效，本进程丢弃该模型的客户端
+
+    Args:
+        model_id: 更新 / 删除的模型ID；新增模型时不传（没有需要丢弃的客户端）
+    """
+    service_container.get(MODEL_CONFIGS).invalidate()
+    if model_id:
+        service_container.get(LLM_CLIENTS).invalidate(model_id)
+
+
+service_container.register(LLM_CLIENTS, LLMClientPool)
+service_container.register(MODEL_CONFIGS, ModelConfigCache)
@@ -0,0 +1,179 @@
+# common/utils/metrics_util.py
+"""
+进程内指标（计数器 / 仪表 / 直方图）
+
+不依赖 prometheus_client，输出 Prometheus 文本格式，便于直接被 Prometheus 抓取或用 curl 查看。
+每个 uvicorn worker 进程各自统计，多 worker 部署时需按实例汇总。
+
+使用示例:
+    PROMPT_TOKENS = histogram("chat_prompt_tokens", "每次请求发送给模型的 prompt token 数",
+                              buckets=(256, 1024, 4096, 16384))
+    PROMPT_TOKENS.observe(1234, model="qwen3:8b")
+
+    setup_metrics(app, "chat")   # 注册 GET /service/chat/metrics
+"""
+import bisect
+import threading
+from typing import Dict, Optional, Sequence, Tuple
+
+from fastapi import APIRouter, FastAPI
+from fastapi.responses import PlainTextResponse
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def _label_key(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    items = list(key) + ([extra] if extra else [])
+    if not items:
+        return ""
+    escaped = (f'{k}="{v.replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"' for k, v in items)
+    return "{" + ",".join(escaped) + "}"
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self._lock = threading.Lock()
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+    def _samples(self):
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """只增不减的计数器"""
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str):
+        super().__init__(name, documentation)
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(_label_key(labels), 0)
+
+    def _samples(self):
+        for key, value in list(self._values.items()):
+            yield f"{self.name}{_format_labels(key)} {value}"
+
+
+class Gauge(_Metric):
+    """可增可减的当前值"""
+    type_name = "gauge"
+
+    def __init__(self, name: str, documentation: str):
+        super().__init__(name, documentation)
+        self._values: Dict[LabelKey, float] = {}
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[_label_key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def value(self, **labels) -> float:
+        return self._values.get(_label_key(labels), 0)
+
+    def _samples(self):
+        for key, value in list(self._values.items()):
+            yield f"{self.name}{_format_labels(key)} {value}"
+
+
+class Histogram(_Metric):
+    """分桶直方图（累计桶 + 总和 + 次数）"""
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation)
+        self.buckets = tuple(sorted(buckets))
+        # 每个标签组合: [各桶计数..., +Inf 计数, 总和]
+        self._values: Dict[LabelKey, list] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = _label_key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            state[index] += 1
+            state[-1] += value
+
+    def _samples(self):
+        for key, state in list(self._values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, state):
+                cumulative += count
+                yield f"{self.name}_bucket{_format_labels(key, ('le', str(bound)))} {cumulative}"
+            cumulative += state[len(self.buckets)]
+            yield f"{self.name}_bucket{_format_labels(key, ('le', '+Inf'))} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(key)} {state[-1]}"
+            yield f"{self.name}_count{_format_labels(key)} {cumulative}"
+
+
+_registry: Dict[str, _Metric] = {}
+_registry_lock = threading.Lock()
+
+
+def _get_or_create(name: str, factory):
+    with _registry_lock:
+        metric = _registry.get(name)
+        if metric is None:
+            metric = _registry[name] = factory()
+        return metric
+
+
+def counter(name: str, documentation: str) -> Counter:
+    """获取（或创建）计数器，同名指标在进程内只有一个"""
+    return _get_or_create(name, lambda: Counter(name, documentation))
+
+
+def gauge(name: str, documentation: str) -> Gauge:
+    """获取（或创建）仪表"""
+    return _get_or_create(name, lambda: Gauge(name, documentation))
+
+
+def histogram(name: str, documentation: str, buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+    """获取（或创建）直方图"""
+    return _get_or_create(name, lambda: Histogram(name, documentation, buckets))
+
+
+def render_metrics() -> str:
+    """输出全部指标（Prometheus 文本格式）"""
+    with _registry_lock:
+        metrics = list(_registry.values())
+    return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+def setup_metrics(app: FastAPI, service_name: str) -> None:
+    """注册指标接口 GET /service/{service_name}/metrics（可经网关访问）"""
+    router = APIRouter(prefix=f"/service/{service_name}", tags=["metrics"])
+
+    @router.get("/metrics")
+    async def metrics():
+        return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+    app.include_router(router)
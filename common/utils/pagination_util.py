@@ -0,0 +1,200 @@
+# common/utils/pagination_util.py
+"""
+游标（keyset）分页
+
+OFFSET 分页越往后越慢（数据库要先扫描并丢弃前面的全部行），
+游标分页把上一页最后一行的排序键编码成不透明的 cursor，下一页直接用
+`WHERE (k1, k2, ...) < (v1, v2, ...)` 定位，任何一页的代价都与第一页相同。
+
+使用示例（ORM）:
+    keys = [SortKey(MusicModel.create_time), SortKey(MusicModel.id)]
+    scope = f"music.search:{keyword}"
+    values = decode_cursor(cursor, scope, len(keys))
+    rows = apply_keyset(query, keys, values).limit(page_size + 1).all()
+    rows, next_cursor = build_page(rows, page_size, keys, lambda m: [m.create_time, m.id], scope)
+
+使用示例（原生 SQL）:
+    where_sql, params = keyset_where_sql(keys, values)   # keys 的 column 为 SQL 片段字符串
+    sql = f"... WHERE c.type = :type {'AND ' + where_sql if where_sql else ''} ORDER BY {order_by_sql(keys)} LIMIT :limit"
+
+注意：排序键的最后一列必须唯一（通常是主键），否则相同排序值的行可能被跳过或重复。
+排序列应为 NOT NULL，并建 (等值筛选列, 排序列..., id) 联合索引，数据库才能按索引顺序取满一页即停止；
+null_value 会把列包进 COALESCE，索引随之失效，只用于暂时无法改为 NOT NULL 的列。
+"""
+import base64
+import hashlib
+import json
+from datetime import date, datetime
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from sqlalchemy import and_, func, or_
+
+# 可为空的时间排序列统一用该值代替 NULL，保证比较语义确定
+EPOCH = datetime(1970, 1, 1)
+
+
+class CursorError(ValueError):
+    """游标无法解析或与当前接口不匹配"""
+
+
+class SortKey(NamedTuple):
+    """
+    排序键
+
+    Attributes:
+        column: ORM 列/表达式，或原生 SQL 片段（如 "c.create_time"）
+        desc: 是否降序
+        null_value: 列可能为 NULL 时的替代值（排序与比较都使用 COALESCE(column, null_value)）
+    """
+    column: Any
+    desc: bool = True
+    null_value: Any = None
+
+
+# ==================== 游标编解码 ====================
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    if isinstance(value, date):
+        return {"d": value.isoformat()}
+    return value
+
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict):
+        if "dt" in value:
+            return datetime.fromisoformat(value["dt"])
+        if "d" in value:
+            return date.fromisoformat(value["d"])
+    return value
+
+
+def _scope_digest(scope: str) -> str:
+    return hashlib.md5(scope.encode("utf-8")).hexdigest()[:8]
+
+
+def encode_cursor(values: Sequence[Any], scope: str) -> str:
+    """
+    把排序键的值编码为不透明游标
+
+    scope 标识接口及其筛选条件（如 "music.search:关键词"），只以摘要形式写入游标，
+    防止游标被用到别的接口或换了筛选条件的查询上。
+    """
+    payload = json.dumps(
+        {"s": _scope_digest(scope), "v": [_encode_value(v) for v in values]},
+        separators=(",", ":")
+    )
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str], scope: str, size: int) -> Optional[List[Any]]:
+    """解析游标，空游标返回 None（表示第一页）"""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8"))
+        values = [_decode_value(v) for v in payload["v"]]
+    except Exception:
+        raise CursorError("无效的游标")
+    if payload.get("s") != _scope_digest(scope) or len(values) != size:
+        raise CursorError("游标与当前查询不匹配")
+    return values
+
+
+# ==================== ORM 查询 ====================
+
+def _sort_expression(key: SortKey):
+    return func.coalesce(key.column, key.null_value) if key.null_value is not None else key.column
+
+
+def keyset_condition(keys: Sequence[SortKey], values: Sequence[Any]):
+    """
+    生成 "位于游标之后" 的条件:
+        (k1 < v1) OR (k1 = v1 AND k2 < v2) OR ...（升序列使用 >）
+    """
+    clauses = []
+    for i, key in enumerate(keys):
+        equals = [_sort_expression(keys[j]) == values[j] for j in range(i)]
+        expression = _sort_expression(key)
+        after = expression < values[i] if key.desc else expression > values[i]
+        clauses.append(and_(*equals, after) if equals else after)
+    return or_(*clauses)
+
+
+def apply_keyset(query, keys: Sequence[SortKey], values: Optional[Sequence[Any]]):
+    """为 ORM 查询追加游标条件与排序（不含 limit）"""
+    if values is not None:
+        query = query.filter(keyset_condition(keys, values))
+    return query.order_by(*[
+        _sort_expression(key).desc() if key.desc else _sort_expression(key).asc() for key in keys
+    ])
+
+
+# ==================== 原生 SQL ====================
+
+def _sort_sql(key: SortKey, params: Dict[str, Any], index: int) -> str:
+    if key.null_value is None:
+        return key.column
+    params[f"ks_null_{index}"] = key.null_value
+    return f"COALESCE({key.column}, :ks_null_{index})"
+
+
+def keyset_where_sql(keys: Sequence[SortKey], values: Optional[Sequence[Any]]) -> Tuple[str, Dict[str, Any]]:
+    """生成原生 SQL 的游标条件（不含 WHERE/AND 前缀）及参数，第一页返回空串"""
+    params: Dict[str, Any] = {}
+    if values is None:
+        return "", params
+    expressions = [_sort_sql(key, params, i) for i, key in enumerate(keys)]
+    clauses = []
+    for i, key in enumerate(keys):
+        params[f"ks_{i}"] = values[i]
+        parts = [f"{expressions[j]} = :ks_{j}" for j in range(i)]
+        parts.append(f"{expressions[i]} {'<' if key.desc else '>'} :ks_{i}")
+        clauses.append("(" + " AND ".join(parts) + ")")
+    return "(" + " OR ".join(clauses) + ")", params
+
+
+def order_by_sql(keys: Sequence[SortKey]) -> str:
+    """生成原生 SQL 的 ORDER BY 子句内容"""
+    parts = []
+    for key in keys:
+        expression = key.column if key.null_value is None else f"COALESCE({key.column}, {_literal(key.null_value)})"
+        parts.append(f"{expression} {'DESC' if key.desc else 'ASC'}")
+    return ", ".join(parts)
+
+
+def _literal(value: Any) -> str:
+    """ORDER BY 中的 COALESCE 默认值（仅限代码内定义的常量，不接受用户输入）"""
+    if isinstance(value, (datetime, date)):
+        return f"'{value.isoformat(sep=' ') if isinstance(value, datetime) else value.isoformat()}'"
+    if isinstance(value, (int, float)):
+        return str(value)
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+# ==================== 结果封装 ====================
+
+def build_page(
+        rows: List[Any],
+        page_size: int,
+        keys: Sequence[SortKey],
+        value_getter: Callable[[Any], Sequence[Any]],
+        scope: str
+) -> Tuple[List[Any], Optional[str]]:
+    """
+    截取一页数据并生成下一页游标
+
+    查询时应多取一行（limit = page_size + 1），多出的那行只用于判断是否还有下一页。
+    没有下一页时游标为 None。
+    """
+    if len(rows) <= page_size:
+        return rows, None
+    rows = rows[:page_size]
+    raw_values = value_getter(rows[-1])
+    values = [
+        key.null_value if value is None and key.null_value is not None else value
+        for key, value in zip(keys, raw_values)
+    ]
+    return rows, encode_cursor(values, scope)
@@ -0,0 +1,291 @@
+# common/utils/profiler_util.py
+"""
+内置的挂钟（wall-clock）采样分析器
+
+- 进程级采样：管理员通过接口开始/停止，停止时返回 folded stacks 文本
+- 单请求采样：管理员请求携带 `X-Profile: 1` 时，对该请求处理期间的进程采样，
+  结果保存到 PROFILE_DIR，响应头 `X-Profile-Id` 返回文件编号，可通过接口下载
+
+输出为 Brendan Gregg 的 folded stacks 格式（每行 `线程;帧;帧 次数`），
+可直接用于 flamegraph.pl、speedscope、inferno 等工具生成火焰图。
+
+默认关闭：未设置 ENABLE_PROFILER=True 时 setup_profiler 不注册任何中间件和路由，零开销。
+
+环境变量:
+    ENABLE_PROFILER          是否启用，默认 False
+    PROFILER_ADMIN_USER_IDS  允许使用分析器的用户ID（逗号分隔，对应网关透传的 X-User-Id）
+    PROFILER_INTERVAL_MS     采样间隔（毫秒），默认 5
+    PROFILER_MAX_SECONDS     进程级采样的最长时间（秒），超时自动停止，默认 300
+    PROFILE_DIR              采样结果保存目录，默认系统临时目录下的 profiles
+"""
+import os
+import sys
+import time
+import uuid
+import logging
+import tempfile
+import threading
+from collections import Counter
+from typing import Dict, Optional
+
+from fastapi import APIRouter, FastAPI, Header, HTTPException, Query, Request
+from fastapi.responses import PlainTextResponse
+
+from common.utils.result_util import ResultEntity, ResultUtil
+
+logger = logging.getLogger(__name__)
+
+ENABLE_PROFILER = os.getenv("ENABLE_PROFILER", "False").lower() == "true"
+PROFILER_ADMIN_USER_IDS = {
+    user_id.strip() for user_id in os.getenv("PROFILER_ADMIN_USER_IDS", "").split(",") if user_id.strip()
+}
+PROFILER_INTERVAL_MS = float(os.getenv("PROFILER_INTERVAL_MS", "5"))
+PROFILER_MAX_SECONDS = float(os.getenv("PROFILER_MAX_SECONDS", "300"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(tempfile.gettempdir(), "profiles"))
+
+# 同时进行的单请求采样上限，避免多个采样线程互相放大开销
+MAX_CONCURRENT_REQUEST_PROFILES = 2
+MAX_STACK_DEPTH = 128
+
+
+class SamplingProfiler:
+    """
+    基于 sys._current_frames() 的采样分析器
+
+    在独立线程中按固定间隔抓取所有线程的调用栈并聚合计数，
+    不依赖 sys.setprofile，被采样代码本身不受影响。
+    """
+
+    def __init__(self, interval: float = PROFILER_INTERVAL_MS / 1000, max_seconds: Optional[float] = None):
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.started_at: Optional[float] = None
+        self.stopped_at: Optional[float] = None
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        self.started_at = time.time()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> str:
+        """停止采样并返回 folded stacks 文本"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self.stopped_at = self.stopped_at or time.time()
+        return self.folded()
+
+    def folded(self) -> str:
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common())
+
+    def _run(self) -> None:
+        own_ident = threading.get_ident()
+        deadline = self.started_at + self.max_seconds if self.max_seconds else None
+        while not self._stop_event.is_set():
+            if deadline and time.time() >= deadline:
+                logger.warning(f"[Profiler] 已达到最长采样时间 {self.max_seconds}s，自动停止")
+                break
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                self.stacks[self._fold(names.get(ident, str(ident)), frame)] += 1
+            self.samples += 1
+            self._stop_event.wait(self.interval)
+        self.stopped_at = time.time()
+
+    @staticmethod
+    def _fold(thread_name: str, frame) -> str:
+        frames = []
+        while frame is not None and len(frames) < MAX_STACK_DEPTH:
+            code = frame.f_code
+            frames.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+            frame = frame.f_back
+        frames.append(thread_name)
+        # folded 格式中分号是帧分隔符，空格用于分隔计数
+        return ";".join(reversed(frames)).replace(" ", "_")
+
+
+def _new_profile_id(service_name: str) -> str:
+    return f"{service_name}-{time.strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}"
+
+
+def _save_profile(profile_id: str, folded: str) -> None:
+    """保存 folded stacks 到 PROFILE_DIR/{profile_id}.folded"""
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    with open(os.path.join(PROFILE_DIR, f"{profile_id}.folded"), "w", encoding="utf-8") as f:
+        f.write(folded)
+
+
+def _is_admin(user_id: Optional[str]) -> bool:
+    return bool(user_id) and user_id in PROFILER_ADMIN_USER_IDS
+
+
+class RequestProfilerMiddleware:
+    """
+    单请求采样中间件（纯 ASGI 实现）
+
+    未携带 X-Profile 头的请求只做一次请求头查找就直接透传，
+    不经过 BaseHTTPMiddleware，也不影响流式响应。
+    """
+
+    def __init__(self, app, service_name: str):
+        self.app = app
+        self.service_name = service_name
+        self._active = 0
+        self._lock = threading.Lock()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        if headers.get(b"x-profile") != b"1":
+            await self.app(scope, receive, send)
+            return
+
+        # 网关场景下 user_id 由 AuthMiddleware 写入 state，业务服务从网关透传的请求头读取
+        user_id = (scope.get("state") or {}).get("user_id") or headers.get(b"x-user-id", b"").decode()
+        if not _is_admin(user_id):
+            await self.app(scope, receive, send)
+            return
+
+        with self._lock:
+            if self._active >= MAX_CONCURRENT_REQUEST_PROFILES:
+                busy = True
+            else:
+                self._active += 1
+                busy = False
+        if busy:
+            logger.warning("[Profiler] 单请求采样并发已满，本次请求不采样")
+            await self.app(scope, receive, send)
+            return
+
+        profiler = SamplingProfiler(max_seconds=PROFILER_MAX_SECONDS)
+        profile_id = _new_profile_id(self.service_name)
+
+        async def send_with_profile_id(message):
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(b"x-profile-id", profile_id.encode())]
+            await send(message)
+
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            folded = profiler.stop()
+            with self._lock:
+                self._active -= 1
+            try:
+                _save_profile(profile_id, folded)
+                logger.info(
+                    f"[Profiler] 请求 {scope.get('path')} 采样完成: samples={profiler.samples}, id={profile_id}")
+            except Exception as e:
+                logger.error(f"[Profiler] 保存采样结果失败: {str(e)}")
+
+
+def _create_router(prefix: str, service_name: str) -> APIRouter:
+    router = APIRouter(prefix=prefix, tags=["profiler"])
+    state: Dict[str, Optional[SamplingProfiler]] = {"profiler": None}
+
+    def check_admin(request: Request, x_user_id: Optional[str]):
+        user_id = getattr(request.state, "user_id", None) or x_user_id
+        if not _is_admin(user_id):
+            raise HTTPException(status_code=403, detail="无权使用性能分析器")
+
+    @router.post("/start", response_model=ResultEntity)
+    async def start_profiler(
+            request: Request,
+            intervalMs: float = Query(PROFILER_INTERVAL_MS, gt=0, description="采样间隔（毫秒）"),
+            maxSeconds: float = Query(PROFILER_MAX_SECONDS, gt=0, description="最长采样时间（秒）"),
+            x_user_id: Optional[str] = Header(None, alias="X-User-Id")
+    ) -> ResultEntity:
+        """开始进程级采样"""
+        check_admin(request, x_user_id)
+        current = state["profiler"]
+        if current is not None and current.running:
+            return ResultUtil.fail(None, "采样已在进行中")
+        profiler = SamplingProfiler(interval=intervalMs / 1000, max_seconds=min(maxSeconds, PROFILER_MAX_SECONDS))
+        profiler.start()
+        state["profiler"] = profiler
+        logger.info(f"[Profiler] 开始进程级采样: interval={intervalMs}ms")
+        return ResultUtil.success(msg="采样已开始")
+
+    @router.post("/stop")
+    async def stop_profiler(
+            request: Request,
+            x_user_id: Optional[str] = Header(None, alias="X-User-Id")
+    ):
+        """停止进程级采样，返回 folded stacks 文本并保存到 PROFILE_DIR"""
+        check_admin(request, x_user_id)
+        profiler = state["profiler"]
+        if profiler is None:
+            return ResultUtil.fail(None, "采样未开始")
+        state["profiler"] = None
+        folded = profiler.stop()
+        profile_id = _new_profile_id(service_name)
+        _save_profile(profile_id, folded)
+        logger.info(f"[Profiler] 停止进程级采样: samples={profiler.samples}, id={profile_id}")
+        return PlainTextResponse(folded, headers={"X-Profile-Id": profile_id})
+
+    @router.get("/status", response_model=ResultEntity)
+    async def profiler_status(
+            request: Request,
+            x_user_id: Optional[str] = Header(None, alias="X-User-Id")
+    ) -> ResultEntity:
+        """查询进程级采样状态"""
+        check_admin(request, x_user_id)
+        profiler = state["profiler"]
+        return ResultUtil.success(data={
+            "running": bool(profiler and profiler.running),
+            "samples": profiler.samples if profiler else 0,
+            "started_at": profiler.started_at if profiler else None,
+        })
+
+    @router.get("/profiles/{profileId}")
+    async def get_profile(
+            profileId: str,
+            request: Request,
+            x_user_id: Optional[str] = Header(None, alias="X-User-Id")
+    ):
+        """下载已保存的采样结果（folded stacks 文本）"""
+        check_admin(request, x_user_id)
+        # 只允许文件名，防止路径穿越
+        if os.path.basename(profileId) != profileId:
+            raise HTTPException(status_code=400, detail="非法的采样编号")
+        path = os.path.join(PROFILE_DIR, f"{profileId}.folded")
+        if not os.path.exists(path):
+            raise HTTPException(status_code=404, detail="采样结果不存在")
+        with open(path, encoding="utf-8") as f:
+            return PlainTextResponse(f.read())
+
+    return router
+
+
+def setup_profiler(app: FastAPI, service_name: str, prefix: Optional[str] = None) -> None:
+    """
+    为服务注册采样分析器（ENABLE_PROFILER 关闭时什么都不做）
+
+    Args:
+        app: FastAPI 应用
+        service_name: 服务名（用于采样文件命名）
+        prefix: 管理接口前缀，默认 /service/{service_name}/admin/profiler，可经网关访问
+    """
+    if not ENABLE_PROFILER:
+        return
+    if not PROFILER_ADMIN_USER_IDS:
+        logger.warning("[Profiler] 已启用但未配置 PROFILER_ADMIN_USER_IDS，所有请求都无权使用")
+
+    app.add_middleware(RequestProfilerMiddleware, service_name=service_name)
+    app.include_router(_create_router(prefix or f"/service/{service_name}/admin/profiler", service_name))
+    logger.info(f"[Profiler] 已启用: service={service_name}, dir={PROFILE_DIR}")
@@ -0,0 +1,33 @@
+# common/utils/redis_util.py
+import os
+import logging
+
+import redis
+
+from common.utils.service_container import service_container
+
+logger = logging.getLogger(__name__)
+
+REDIS = "redis"
+
+
+def _create_redis() -> redis.Redis:
+    """创建共享连接池的 Redis 客户端（每个 worker 进程一个连接池）"""
+    # 在首次使用时读取环境变量，保证 .env 已由 common_database 加载
+    redis_url = os.getenv("REDIS_URL")
+    max_connections = int(os.getenv("REDIS_MAX_CONNECTIONS", "50"))
+    pool = redis.ConnectionPool.from_url(redis_url, max_connections=max_connections)
+    logger.info(f"[Redis] 连接池初始化完成: max_connections={max_connections}")
+    return redis.Redis(connection_pool=pool)
+
+
+def _close_redis(client: redis.Redis) -> None:
+    client.connection_pool.disconnect()
+
+
+service_container.register(REDIS, _create_redis, _close_redis)
+
+
+def get_redis() -> redis.Redis:
+    """获取进程级共享的 Redis 客户端"""
+    return service_container.get(REDIS)
@@ -8,6 +8,7 @@ class ResultEntity(BaseModel):
     msg: Optional[str] = Field(None, description="信息")
     total: Optional[int] = Field(None, description="总页数")
     token: Optional[str] = Field(None, description="token")
+    cursor: Optional[str] = Field(None, description="下一页游标（游标分页接口使用，为空表示没有下一页）")
 
 class ResultUtil:
     @staticmethod
@@ -16,7 +17,8 @@ class ResultUtil:
         camel_data: Optional[Any] = None,# 驼峰写法
         msg: Optional[str] = None,
         total: Optional[int] = None,
-        token: Optional[str] = None
+        token: Optional[str] = None,
+        cursor: Optional[str] = None
     ) -> ResultEntity:
         """
         成功的返回数据
@@ -24,6 +26,7 @@ class ResultUtil:
         :param msg: 可选的消息
         :param total: 可选的总数
         :param token: 可选的token
+        :param cursor: 可选的下一页游标
         :return: ResultEntity
         """
         return ResultEntity(
@@ -31,7 +34,8 @@ class ResultUtil:
             status="SUCCESS",
             msg=msg,
             total=total,
-            token=token
+            token=token,
+            cursor=cursor
         )
 
     @staticmethod
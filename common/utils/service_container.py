@@ -0,0 +1,91 @@
+# common/utils/service_container.py
+import logging
+import threading
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ServiceContainer:
+    """
+    进程级服务容器
+
+    重量级协作对象（Redis连接池、Chroma客户端、嵌入模型、大模型客户端等）
+    在每个 worker 进程内只创建一次并在请求之间共享；
+    请求级对象（如数据库会话）仍由 FastAPI 依赖注入按请求创建。
+
+    使用示例:
+        service_container.register("redis", lambda: redis.Redis.from_url(REDIS_URL), lambda r: r.close())
+        client = service_container.get("redis")
+    """
+
+    def __init__(self):
+        self._factories: Dict[str, Callable[[], Any]] = {}
+        self._closers: Dict[str, Optional[Callable[[Any], None]]] = {}
+        self._instances: Dict[str, Any] = {}
+        self._lock = threading.RLock()
+
+    def register(
+            self,
+            name: str,
+            factory: Callable[[], Any],
+            closer: Optional[Callable[[Any], None]] = None
+    ) -> None:
+        """注册一个懒加载的单例工厂（重复注册时保留已创建的实例）"""
+        with self._lock:
+            self._factories[name] = factory
+            self._closers[name] = closer
+
+    def get(self, name: str) -> Any:
+        """获取单例实例，首次访问时创建（线程安全）"""
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+
+        with self._lock:
+            instance = self._instances.get(name)
+            if instance is None:
+                factory = self._factories.get(name)
+                if factory is None:
+                    raise KeyError(f"未注册的服务: {name}")
+                instance = factory()
+                self._instances[name] = instance
+                logger.info(f"[ServiceContainer] 已创建共享实例: {name}")
+            return instance
+
+    def reset(self, name: str) -> None:
+        """丢弃已创建的实例，下次访问时重新创建（用于连接失效后的重建）"""
+        with self._lock:
+            instance = self._instances.pop(name, None)
+        if instance is not None:
+            self._close(name, instance)
+
+    def warm_up(self, *names: str) -> None:
+        """预先创建指定实例，创建失败只记录日志，不影响服务启动"""
+        for name in names:
+            try:
+                self.get(name)
+            except Exception as e:
+                logger.warning(f"[ServiceContainer] 预热 {name} 失败: {str(e)}")
+
+    def shutdown(self) -> None:
+        """关闭所有已创建的实例（在应用 lifespan 结束时调用）"""
+        with self._lock:
+            instances = list(self._instances.items())
+            self._instances.clear()
+        for name, instance in reversed(instances):
+            self._close(name, instance)
+
+    def _close(self, name: str, instance: Any) -> None:
+        closer = self._closers.get(name)
+        if closer is None:
+            return
+        try:
+            closer(instance)
+            logger.info(f"[ServiceContainer] 已关闭共享实例: {name}")
+        except Exception as e:
+            logger.warning(f"[ServiceContainer] 关闭 {name} 失败: {str(e)}")
+
+
+# 全局服务容器（每个 worker 进程一份）
+service_container = ServiceContainer()
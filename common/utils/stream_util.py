@@ -0,0 +1,296 @@
+# common/utils/stream_util.py
+"""
+流式回答的客户端断开检测与上游取消（chat / agent 服务共用）
+
+原先客户端在回答中途断开（关闭页面、网络中断、HTTP 流式请求被取消）后，服务端的 astream 循环仍会读到最后一个 token：
+模型继续生成、占用推理名额，回答结束后还会当作完整回答写入会话记忆与聊天记录。这里：
+
+- 断开检测：WebSocket 在流式输出期间由 WebSocketDisconnectWatcher 持续读取连接消息，收到断开消息时设置取消事件；
+  HTTP 流式接口由 watch_http_disconnect 等待 http.disconnect 消息。两者都不轮询，断开后立即生效
+- 上游取消：cancellable 包装模型的流式输出，取消事件一旦设置，立即取消正在等待的下一个 token（CancelledError
+  抛入底层 HTTP 读取，连接随之关闭，Ollama / 在线模型停止生成）并关闭上游生成器，随后抛出 ClientDisconnected；
+  非流式调用（如 agent 的意图提取）用 until_cancelled 包装
+- 部分回答：中断时已生成的内容照常保存，末尾加上 PARTIAL_RESPONSE_MARKER，历史记录与后续轮次的上下文都能看出回答不完整
+- 错误消息：服务自身的错误（模型配置缺失、准入被拒、模型响应失败等）以 ErrorMessage 产出，
+  WebSocket 照常按原文发送，SSE 接口据类型（而不是文本前缀）发送 error 事件，模型输出的 "Error ..." 文本仍是回答
+- 分片合并：模型每个 token 单独产出，路由每个分片发一帧 WebSocket 消息，网关再逐帧转发，快模型一个回答就是上千个小帧。
+  coalesce 把分片缓冲后按时间（STREAM_COALESCE_MS）或大小（STREAM_COALESCE_BYTES）合并输出，
+  第一个分片立即输出，首字延迟不变；之后每个分片最多延迟 STREAM_COALESCE_MS
+
+环境变量:
+    STREAM_COALESCE_MS       合并分片的最长缓冲时间（毫秒），默认 50；<=0 时不合并
+    STREAM_COALESCE_BYTES    缓冲达到该字节数（UTF-8）时立即输出，默认 1024
+"""
+import os
+import asyncio
+import logging
+from collections import deque
+from typing import AsyncGenerator, AsyncIterable, Awaitable, Callable, Deque, List, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+STREAM_COALESCE_MS = float(os.getenv("STREAM_COALESCE_MS", "50"))
+STREAM_COALESCE_BYTES = int(os.getenv("STREAM_COALESCE_BYTES", "1024"))
+
+# 回答被中断时追加在已生成内容之后的标记
+PARTIAL_RESPONSE_MARKER = "\n\n[回答已中断]"
+
+
+class ClientDisconnected(Exception):
+    """客户端已断开，停止生成"""
+
+
+class ErrorMessage(str):
+    """服务自身的错误消息（区别于模型输出的回答文本），coalesce 不把它与回答分片合并"""
+
+
+def is_error_message(message: str) -> bool:
+    return isinstance(message, ErrorMessage)
+
+
+async def _aclose(iterator) -> None:
+    aclose = getattr(iterator, "aclose", None)
+    if aclose is not None:
+        try:
+            await aclose()
+        except Exception as e:
+            logger.debug(f"[Stream] 关闭上游流失败: {str(e)}")
+
+
+async def cancellable(source: AsyncIterable[T], cancel_event: Optional[asyncio.Event]) -> AsyncGenerator[T, None]:
+    """
+    逐个产出 source 的元素，cancel_event 被设置时立即停止上游
+
+    调用方应在 finally 中调用返回的生成器的 aclose()，确保提前退出（发送失败、生成器被关闭）时上游同样被关闭。
+
+    Raises:
+        ClientDisconnected: cancel_event 已设置（上游已取消并关闭）
+    """
+    iterator = source.__aiter__()
+    try:
+        if cancel_event is None:
+            async for item in iterator:
+                yield item
+            return
+
+        cancel_wait = asyncio.ensure_future(cancel_event.wait())
+        next_item: Optional[asyncio.Future] = None
+        try:
+            while True:
+                if cancel_event.is_set():
+                    raise ClientDisconnected()
+                next_item = asyncio.ensure_future(iterator.__anext__())
+                await asyncio.wait({next_item, cancel_wait}, return_when=asyncio.FIRST_COMPLETED)
+                if not next_item.done():
+                    raise ClientDisconnected()
+                try:
+                    item = next_item.result()
+                except StopAsyncIteration:
+                    return
+                yield item
+        finally:
+            cancel_wait.cancel()
+            if next_item is not None and not next_item.done():
+                # CancelledError 抛入上游正在进行的 HTTP 读取，连接随之关闭
+                next_item.cancel()
+                await asyncio.gather(next_item, return_exceptions=True)
+    finally:
+        await _aclose(iterator)
+
+
+async def coalesce(
+        source: AsyncIterable[str],
+        interval_ms: float = STREAM_COALESCE_MS,
+        max_bytes: int = STREAM_COALESCE_BYTES
+) -> AsyncGenerator[str, None]:
+    """
+    合并流式输出的小分片：第一个分片立即输出，之后距上次输出满 interval_ms 毫秒或缓冲达到 max_bytes 字节时输出，
+    上游暂停（如长时间思考）时缓冲中的内容也会按时输出
+
+    与 cancellable 一样，调用方应在 finally 中调用返回的生成器的 aclose()。
+    """
+    iterator = source.__aiter__()
+    if interval_ms <= 0:
+        try:
+            async for chunk in iterator:
+                yield chunk
+        finally:
+            await _aclose(iterator)
+        return
+
+    loop = asyncio.get_running_loop()
+    interval = interval_ms / 1000
+    buffer: List[str] = []
+    buffered_bytes = 0
+    last_flush: Optional[float] = None
+    # 缓冲非空时在任务中等待下一个分片，以便到时间先输出缓冲
+    next_chunk: Optional[asyncio.Future] = None
+    try:
+        while True:
+            try:
+                if buffer:
+                    if next_chunk is None:
+                        next_chunk = asyncio.ensure_future(iterator.__anext__())
+                    timeout = last_flush + interval - loop.time()
+                    if timeout > 0:
+                        await asyncio.wait({next_chunk}, timeout=timeout)
+                    if not next_chunk.done():
+                        yield "".join(buffer)
+                        buffer.clear()
+                        buffered_bytes = 0
+                        last_flush = loop.time()
+                        continue
+                    chunk = next_chunk.result()
+                    next_chunk = None
+                elif next_chunk is not None:
+                    chunk = await next_chunk
+                    next_chunk = None
+                else:
+                    chunk = await iterator.__anext__()
+            except StopAsyncIteration:
+                next_chunk = None
+                break
+
+            if not chunk:
+                continue
+            if is_error_message(chunk):
+                # 错误消息单独输出（先输出已缓冲的分片），保留类型供下游识别
+                if buffer:
+                    yield "".join(buffer)
+                    buffer.clear()
+                    buffered_bytes = 0
+                yield chunk
+                last_flush = loop.time()
+                continue
+            buffer.append(chunk)
+            buffered_bytes += len(chunk.encode("utf-8"))
+            if last_flush is None or buffered_bytes >= max_bytes or loop.time() - last_flush >= interval:
+                yield "".join(buffer)
+                buffer.clear()
+                buffered_bytes = 0
+                last_flush = loop.time()
+
+        if buffer:
+            yield "".join(buffer)
+    finally:
+        if next_chunk is not None and not next_chunk.done():
+            next_chunk.cancel()
+            await asyncio.gather(next_chunk, return_exceptions=True)
+        await _aclose(iterator)
+
+
+async def until_cancelled(awaitable: Awaitable[T], cancel_event: Optional[asyncio.Event]) -> T:
+    """
+    等待非流式调用完成，cancel_event 被设置时立即取消该调用
+
+    Raises:
+        ClientDisconnected: cancel_event 已设置（调用已取消）
+    """
+    if cancel_event is None:
+        return await awaitable
+    if cancel_event.is_set():
+        if asyncio.iscoroutine(awaitable):
+            awaitable.close()
+        raise ClientDisconnected()
+    task = asyncio.ensure_future(awaitable)
+    cancel_wait = asyncio.ensure_future(cancel_event.wait())
+    try:
+        await asyncio.wait({task, cancel_wait}, return_when=asyncio.FIRST_COMPLETED)
+        if not task.done():
+            raise ClientDisconnected()
+        return task.result()
+    finally:
+        cancel_wait.cancel()
+        if not task.done():
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+
+async def watch_http_disconnect(request, cancel_event: asyncio.Event) -> None:
+    """等待 HTTP 客户端断开（请求体已读取完，之后只会收到 http.disconnect），断开时设置 cancel_event"""
+    try:
+        while True:
+            message = await request.receive()
+            if message.get("type") == "http.disconnect":
+                cancel_event.set()
+                return
+    except Exception as e:
+        logger.debug(f"[Stream] 等待 HTTP 断开失败: {str(e)}")
+
+
+async def stream_until_disconnect(
+        request,
+        make_stream: Callable[[asyncio.Event], AsyncGenerator[str, None]]
+) -> AsyncGenerator[str, None]:
+    """
+    HTTP 流式响应：客户端断开时通过取消事件停止生成
+
+    使用示例:
+        return StreamingResponse(stream_until_disconnect(
+            request, lambda cancel_event: chat_service.chat_with_websocket(..., cancel_event=cancel_event)
+        ))
+    """
+    cancel_event = asyncio.Event()
+    watcher = asyncio.create_task(watch_http_disconnect(request, cancel_event))
+    stream = make_stream(cancel_event)
+    try:
+        async for chunk in stream:
+            yield chunk
+    finally:
+        watcher.cancel()
+        await stream.aclose()
+
+
+class WebSocketDisconnectWatcher:
+    """
+    WebSocket 流式输出期间读取连接消息：收到断开消息时设置 cancel_event，其他消息（如回答结束前发来的下一个问题）
+    保存在 pending 中，由路由在本轮结束后按顺序处理
+
+    使用示例:
+        pending = deque()
+        async with WebSocketDisconnectWatcher(websocket, pending) as watcher:
+            stream = service.chat_with_websocket(..., cancel_event=watcher.cancel_event)
+            ...
+        if watcher.disconnected:
+            return
+    """
+
+    def __init__(self, websocket, pending: Optional[Deque[str]] = None):
+        self.websocket = websocket
+        self.pending: Deque[str] = pending if pending is not None else deque()
+        self.cancel_event = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def disconnected(self) -> bool:
+        return self.cancel_event.is_set()
+
+    async def _watch(self) -> None:
+        try:
+            while True:
+                message = await self.websocket.receive()
+                if message.get("type") == "websocket.disconnect":
+                    self.cancel_event.set()
+                    return
+                text = message.get("text")
+                if text is None and message.get("bytes") is not None:
+                    text = message["bytes"].decode("utf-8")
+                if text is not None:
+                    self.pending.append(text)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # 连接已不可读，按断开处理
+            logger.debug(f"[Stream] 读取 WebSocket 消息失败: {str(e)}")
+            self.cancel_event.set()
+
+    async def __aenter__(self) -> "WebSocketDisconnectWatcher":
+        self._task = asyncio.create_task(self._watch())
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
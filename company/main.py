@@ -5,6 +5,7 @@ from company.routers import company_router
 from company.models.company_model import Base
 from common.config.common_database import engine
 from common.utils.service_registry import service_registry
+from common.utils.profiler_util import setup_profiler
 
 # 创建数据库表
 Base.metadata.create_all(bind=engine)
@@ -21,6 +22,9 @@ app.add_middleware(
 
 app.include_router(company_router.router)
 
+# 采样分析器（ENABLE_PROFILER=True 时启用）
+setup_profiler(app, "company")
+
 
 @app.get("/")
 async def root():
@@ -14,6 +14,8 @@ from company.schemas.company_schema import (
 )
 from fastapi.logger import logger
 
+from common.utils.count_cache_util import get_cached_count, invalidate_count
+
 
 class CompanyRepository:
     """企业数据访问层"""
@@ -180,15 +182,19 @@ class CompanyRepository:
                 END
             """
             
-            total_result = self.db.execute(
-                text(count_sql),
-                {
-                    "company_id": company_id,
-                    "current_user_id": current_user_id,
-                    "keyword": search_value
-                }
+            # 总数含权限判断，缓存键需包含当前用户；企业成员变化时按企业失效
+            total = get_cached_count(
+                f"company_user:{company_id}",
+                {"current_user_id": current_user_id, "keyword": search_value},
+                lambda: self.db.execute(
+                    text(count_sql),
+                    {
+                        "company_id": company_id,
+                        "current_user_id": current_user_id,
+                        "keyword": search_value
+                    }
+                ).scalar() or 0
             )
-            total = total_result.scalar() or 0
             
             # 如果没有记录，直接返回空列表
             if total == 0:
@@ -336,13 +342,16 @@ class CompanyRepository:
                 END
             """
             
-            total_result = self.db.execute(
-                text(count_sql),
-                {
-                    "keyword": search_value
-                }
+            total = get_cached_count(
+                "user",
+                {"scope": "company", "keyword": search_value},
+                lambda: self.db.execute(
+                    text(count_sql),
+                    {
+                        "keyword": search_value
+                    }
+                ).scalar() or 0
             )
-            total = total_result.scalar() or 0
             
             # 如果没有记录，直接返回空列表
             if total == 0:
@@ -469,6 +478,7 @@ class CompanyRepository:
                         existing.position_id = position_id
                     self.db.commit()
                     self.db.refresh(existing)
+                    invalidate_count(f"company_user:{company_id}")
                     return CompanyUserSchema.model_validate(existing)
                 return None
 
@@ -486,6 +496,7 @@ class CompanyRepository:
             self.db.add(db_company_user)
             self.db.commit()
             self.db.refresh(db_company_user)
+            invalidate_count(f"company_user:{company_id}")
             return CompanyUserSchema.model_validate(db_company_user)
 
         except Exception as e:
@@ -522,6 +533,8 @@ class CompanyRepository:
 
             company_user.role = new_role
             self.db.commit()
+            # 角色影响总数查询中的权限判断
+            invalidate_count(f"company_user:{company_id}")
             return True
 
         except Exception as e:
@@ -556,6 +569,7 @@ class CompanyRepository:
 
             company_user.status = 0
             self.db.commit()
+            invalidate_count(f"company_user:{company_id}")
             return True
 
         except Exception as e:
@@ -2,9 +2,9 @@
 import os
 from fastapi import FastAPI, Request, HTTPException, status, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import Response
+from fastapi.responses import Response, StreamingResponse
 import httpx
-from typing import Optional, Callable, Awaitable
+from typing import AsyncIterator, Optional, Callable, Awaitable
 import logging
 from contextlib import asynccontextmanager
 import json
@@ -20,6 +20,7 @@ from gateway.middleware.auth_middleware import AuthMiddleware
 from gateway.middleware.log_middleware import LogMiddleware
 from gateway.services.route_service import RouteService
 from common.utils.service_registry import service_registry
+from common.utils.profiler_util import setup_profiler
 
 logger = logging.getLogger(__name__)
 
@@ -49,6 +50,10 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 采样分析器（ENABLE_PROFILER=True 时启用）：须在鉴权中间件之前注册（内层），
+# 才能读取到 AuthMiddleware 写入的 user_id；路由须在通配转发路由之前注册
+setup_profiler(app, "gateway")
+
 # 注意顺序：Starlette 中后注册的中间件是外层、先执行。
 # AuthMiddleware 必须后注册（外层、先执行）注入 request.state.user_id，
 # 否则 LogMiddleware 先执行时读取到的 user_id 为空。
@@ -329,37 +334,75 @@ async def gateway(request: Request, path: str):
     if hasattr(request.state, "user_id") and request.state.user_id:
         headers["X-User-Id"] = request.state.user_id
 
-    async with httpx.AsyncClient(timeout=60.0) as client:
-        try:
-            response = await client.request(
+    client = httpx.AsyncClient(timeout=60.0)
+    streaming = False
+    try:
+        response = await client.send(
+            client.build_request(
                 method=request.method,
                 url=target_url,
                 headers=headers,
                 content=body,
                 params=request.query_params
-            )
-
-            # 供日志中间件读取响应体：Starlette 的 BaseHTTPMiddleware 会把响应包装成
-            # _StreamingResponse（无 .body 属性），因此在这里把上游响应体挂到 request.state
-            # （基于同一 scope，中间件可通过 request.state.response_body 读取）
-            request.state.response_body = response.content
+            ),
+            stream=True
+        )
 
-            return Response(
-                content=response.content,
+        if response.headers.get("content-type", "").startswith("text/event-stream"):
+            # SSE：逐块转发，不缓冲整个响应（60 秒超时是两次读取之间的间隔，上游按心跳保持连接）
+            streaming = True
+            request.state.response_body = b"[event-stream]"
+            response_headers = {
+                key: value for key, value in response.headers.items()
+                if key.lower() not in ("content-length", "transfer-encoding")
+            }
+            return StreamingResponse(
+                _relay_upstream(response, client),
                 status_code=response.status_code,
-                headers=dict(response.headers)
+                headers=response_headers
             )
 
-        except httpx.TimeoutException:
-            raise HTTPException(
-                status_code=status.HTTP_504_GATEWAY_TIMEOUT,
-                detail="上游服务响应超时"
-            )
-        except Exception as e:
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"网关内部错误: {str(e)}"
-            )
+        content = await response.aread()
+
+        # 供日志中间件读取响应体：Starlette 的 BaseHTTPMiddleware 会把响应包装成
+        # _StreamingResponse（无 .body 属性），因此在这里把上游响应体挂到 request.state
+        # （基于同一 scope，中间件可通过 request.state.response_body 读取）
+        request.state.response_body = content
+
+        return Response(
+            content=content,
+            status_code=response.status_code,
+            headers=dict(response.headers)
+        )
+
+    except httpx.TimeoutException:
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail="上游服务响应超时"
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"网关内部错误: {str(e)}"
+        )
+    finally:
+        if not streaming:
+            await client.aclose()
+
+
+async def _relay_upstream(response: httpx.Response, client: httpx.AsyncClient) -> AsyncIterator[bytes]:
+    """
+    逐块转发上游 SSE 响应，结束时关闭上游响应与客户端
+
+    在生成器的 finally 中关闭而不是用 BackgroundTask：客户端断开时 StreamingResponse 抛出 ClientDisconnect /
+    取消转发任务，后台任务不会执行；可续传 SSE 的客户端会频繁断开重连，否则每次都泄漏一个上游连接
+    """
+    try:
+        async for chunk in response.aiter_raw():
+            yield chunk
+    finally:
+        await response.aclose()
+        await client.aclose()
 
 
 @service_registry.register(
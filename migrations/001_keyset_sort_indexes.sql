@@ -0,0 +1,44 @@
+-- ----------------------------
+-- 游标分页排序列改为 NOT NULL，并补充 (筛选列, 排序列, id) 联合索引
+--
+-- 适用于按旧版 play.sql 建的库（MySQL 8.0.13+），新库直接按 play.sql 建表即可。
+-- 排序列不再包 COALESCE 后，MySQL 才能按索引顺序扫描、取满一页即停止，而不是 filesort 全部命中行；
+-- 因此先把空值回填为原 COALESCE 的替代值（时间 1970-01-01、热门/排名 0），空值行仍排在末尾。
+-- MODIFY 会重建表，大表请在低峰期执行。
+-- ----------------------------
+
+-- music：关键词搜索按 (is_hot, create_time, id) 排序
+-- create_time 原定义带 ON UPDATE，回填时显式赋值 create_time，避免被改成当前时间
+UPDATE `music`
+SET `is_hot` = COALESCE(`is_hot`, 0), `create_time` = COALESCE(`create_time`, '1970-01-01 00:00:00')
+WHERE `is_hot` IS NULL OR `create_time` IS NULL;
+ALTER TABLE `music`
+  MODIFY `is_hot` int(0) NOT NULL DEFAULT 0 COMMENT '是否热门',
+  MODIFY `create_time` datetime(0) NOT NULL DEFAULT CURRENT_TIMESTAMP(0) COMMENT '创建时间',
+  ADD INDEX `idx_music_hot_time`(`is_hot`, `create_time`, `id`);
+
+-- music_classify：分类歌曲按 classify_id 过滤、(audio_rank, id) 排序
+UPDATE `music_classify` SET `audio_rank` = 0, `create_time` = `create_time` WHERE `audio_rank` IS NULL;
+ALTER TABLE `music_classify`
+  MODIFY `audio_rank` int(0) NOT NULL DEFAULT 0 COMMENT '歌曲排名，数值越大越靠前',
+  ADD INDEX `idx_music_classify_rank`(`classify_id`, `audio_rank`, `id`);
+
+-- movie：搜索按 (update_time, id) 排序，常用 classify 等值过滤
+-- 从未更新过的电影以创建日期作为更新时间
+UPDATE `movie` SET `update_time` = COALESCE(DATE(`create_time`), '1970-01-01') WHERE `update_time` IS NULL;
+ALTER TABLE `movie`
+  MODIFY `update_time` date NOT NULL DEFAULT (CURRENT_DATE) COMMENT '更新时间',
+  ADD INDEX `idx_movie_update`(`update_time`, `id`),
+  ADD INDEX `idx_movie_classify_update`(`classify`, `update_time`, `id`);
+
+-- circle：按 type、permission 过滤，(create_time, id) 排序
+UPDATE `circle` SET `create_time` = '1970-01-01 00:00:00' WHERE `create_time` IS NULL;
+ALTER TABLE `circle`
+  MODIFY `create_time` datetime(0) NOT NULL DEFAULT CURRENT_TIMESTAMP(0) COMMENT '创建时间',
+  ADD INDEX `idx_circle_type_time`(`type`, `permission`, `create_time`, `id`);
+
+-- social_comment：一级评论按 relation_id、type、parent_id IS NULL 过滤，(create_time, id) 排序
+UPDATE `social_comment` SET `create_time` = '1970-01-01 00:00:00' WHERE `create_time` IS NULL;
+ALTER TABLE `social_comment`
+  MODIFY `create_time` datetime(0) NOT NULL DEFAULT CURRENT_TIMESTAMP(0) COMMENT '创建时间',
+  ADD INDEX `idx_relation_type_parent_time`(`relation_id`, `type`, `parent_id`, `create_time`, `id`);
@@ -0,0 +1,53 @@
+-- ----------------------------
+-- chat_history.create_time 改为 NOT NULL 并补充游标分页索引；建会话汇总表 chat_conversation 并按已有聊天记录回填
+--
+-- 适用于按旧版 play.sql 建的库（MySQL 8.0），新库直接按 play.sql 建表即可。
+-- 历史记录与会话列表的游标分页直接按 create_time / last_message_time 排序（不包 COALESCE，才能走索引），
+-- 空值先回填为 1970-01-01（与原 COALESCE 的替代值一致，旧记录仍排在最早）。
+-- 可在新版本上线后执行：回填结果覆盖写入线程已生成的会话汇总（按完整聊天记录重新统计）。
+-- ----------------------------
+
+UPDATE `chat_history` SET `create_time` = '1970-01-01 00:00:00' WHERE `create_time` IS NULL;
+ALTER TABLE `chat_history`
+  MODIFY `create_time` datetime(0) NOT NULL DEFAULT CURRENT_TIMESTAMP(0) COMMENT '创建时间';
+-- 已按带索引的 play.sql 建表的库跳过这一句
+ALTER TABLE `chat_history`
+  ADD INDEX `idx_chat_history_user_tenant_time`(`user_id`, `tenant_id`, `create_time`),
+  ADD INDEX `idx_chat_history_user_time`(`user_id`, `create_time`),
+  ADD INDEX `idx_chat_history_user_chat_time`(`user_id`, `chat_id`, `create_time`);
+
+CREATE TABLE IF NOT EXISTS `chat_conversation`  (
+  `id` int(0) NOT NULL AUTO_INCREMENT COMMENT '主键',
+  `user_id` varchar(64) CHARACTER SET utf8mb4 COLLATE utf8mb4_general_ci NOT NULL COMMENT '用户id',
+  `tenant_id` varchar(255) CHARACTER SET utf8mb4 COLLATE utf8mb4_general_ci NULL DEFAULT NULL COMMENT '租户id',
+  `chat_id` varchar(128) CHARACTER SET utf8mb4 COLLATE utf8mb4_general_ci NOT NULL COMMENT '会话id',
+  `title` varchar(255) CHARACTER SET utf8mb4 COLLATE utf8mb4_general_ci NULL DEFAULT NULL COMMENT '标题（会话第一个问题）',
+  `model_id` varchar(64) CHARACTER SET utf8mb4 COLLATE utf8mb4_general_ci NULL DEFAULT NULL COMMENT '最近一轮使用的模型ID',
+  `turn_count` int(0) NOT NULL DEFAULT 0 COMMENT '对话轮数',
+  `create_time` datetime(0) NULL DEFAULT NULL COMMENT '第一条消息时间',
+  `last_message_time` datetime(0) NOT NULL COMMENT '最后一条消息时间',
+  PRIMARY KEY (`id`) USING BTREE,
+  UNIQUE INDEX `uk_chat_conversation_user_chat`(`user_id`, `chat_id`) USING BTREE,
+  INDEX `idx_chat_conversation_user_tenant_time`(`user_id`, `tenant_id`, `last_message_time`, `id`) USING BTREE,
+  INDEX `idx_chat_conversation_user_time`(`user_id`, `last_message_time`, `id`) USING BTREE
+) ENGINE = InnoDB CHARACTER SET = utf8mb4 COLLATE = utf8mb4_general_ci COMMENT = '会话汇总' ROW_FORMAT = Dynamic;
+
+INSERT INTO `chat_conversation` (`user_id`, `tenant_id`, `chat_id`, `title`, `model_id`, `turn_count`, `create_time`, `last_message_time`)
+SELECT h.`user_id`, MIN(h.`tenant_id`), h.`chat_id`,
+  (SELECT NULLIF(LEFT(TRIM(f.`prompt`), 100), '') FROM `chat_history` f
+    WHERE f.`user_id` = h.`user_id` AND f.`chat_id` = h.`chat_id`
+    ORDER BY f.`create_time`, f.`id` LIMIT 1),
+  (SELECT l.`model_id` FROM `chat_history` l
+    WHERE l.`user_id` = h.`user_id` AND l.`chat_id` = h.`chat_id`
+    ORDER BY l.`create_time` DESC, l.`id` DESC LIMIT 1),
+  COUNT(*), MIN(h.`create_time`), MAX(h.`create_time`)
+FROM `chat_history` h
+WHERE h.`user_id` IS NOT NULL AND h.`chat_id` IS NOT NULL
+GROUP BY h.`user_id`, h.`chat_id`
+ON DUPLICATE KEY UPDATE
+  `tenant_id` = VALUES(`tenant_id`),
+  `title` = VALUES(`title`),
+  `model_id` = VALUES(`model_id`),
+  `turn_count` = VALUES(`turn_count`),
+  `create_time` = VALUES(`create_time`),
+  `last_message_time` = VALUES(`last_message_time`);
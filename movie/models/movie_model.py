@@ -1,17 +1,21 @@
 # movie/models/movie_model.py
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, DateTime, Text, Double, func
+from sqlalchemy import Column, Integer, String, DateTime, Text, Double, Index, func
 from common.config.common_database import Base
 
 
 class MovieModel(Base):
     """电影主表（对应 movie 和 movie_network 表）"""
     __tablename__ = "movie"
-    __table_args__ = {
-        "comment": "电影主表",
-        "mysql_charset": "utf8mb4",
-        "mysql_collate": "utf8mb4_general_ci"
-    }
+    __table_args__ = (
+        Index("idx_movie_update", "update_time", "id"),
+        Index("idx_movie_classify_update", "classify", "update_time", "id"),
+        {
+            "comment": "电影主表",
+            "mysql_charset": "utf8mb4",
+            "mysql_collate": "utf8mb4_general_ci"
+        }
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True, comment="主键")
     movie_id = Column(Integer, nullable=True, comment="电影id")
@@ -22,7 +26,7 @@ class MovieModel(Base):
     viewing_state = Column(String(255), nullable=True, comment="观看状态")
     release_time = Column(String(255), nullable=True, comment="上映时间")
     plot = Column(Text, nullable=True, comment="剧情")
-    update_time = Column(DateTime, nullable=True, onupdate=func.now(), comment="更新时间")
+    update_time = Column(DateTime, nullable=False, server_default=func.now(), onupdate=func.now(), comment="更新时间")
     movie_name = Column(String(255), nullable=True, comment="电影名称")
     is_recommend = Column(String(255), nullable=True, comment="是否推荐，0:不推荐，1:推荐")
     img = Column(String(1000), nullable=True, comment="电影海报")
@@ -11,6 +11,7 @@ from movie.models.movie_star_model import MovieStarModel
 from movie.models.movie_url_model import MovieUrlModel
 from movie.models.movie_record_model import MoviePlayRecordModel, MovieViewRecordModel, MovieFavoriteModel
 from movie.models.search_history_model import SearchHistoryModel
+from common.utils.pagination_util import SortKey, apply_keyset, build_page
 
 
 class MovieRepository:
@@ -158,6 +159,37 @@ class MovieRepository:
 
     # ==================== 搜索 ====================
 
+    @staticmethod
+    def _build_search_filters(
+        classify: Optional[str],
+        category: Optional[str],
+        label: Optional[str],
+        star: Optional[str],
+        director: Optional[str],
+        keyword: Optional[str]
+    ) -> list:
+        """构建搜索条件（列表查询与总数统计共用）"""
+        filters = [MovieModel.id.isnot(None)]
+        if classify:
+            filters.append(MovieModel.classify == classify)
+        if category:
+            filters.append(MovieModel.category == category)
+        if label:
+            filters.append(MovieModel.label.like(f'%{label}%'))
+        if star:
+            filters.append(MovieModel.star.like(f'%{star}%'))
+        if director:
+            filters.append(MovieModel.director.like(f'%{director}%'))
+        if keyword:
+            keyword_filter = or_(
+                MovieModel.movie_name.like(f'%{keyword}%'),
+                MovieModel.star.like(f'%{keyword}%'),
+                MovieModel.director.like(f'%{keyword}%'),
+                MovieModel.type.like(f'%{keyword}%')
+            )
+            filters.append(keyword_filter)
+        return filters
+
     def search(
         self,
         classify: Optional[str],
@@ -171,25 +203,7 @@ class MovieRepository:
     ) -> List[Dict[str, Any]]:
         """搜索电影"""
         try:
-            filters = [MovieModel.id.isnot(None)]
-            if classify:
-                filters.append(MovieModel.classify == classify)
-            if category:
-                filters.append(MovieModel.category == category)
-            if label:
-                filters.append(MovieModel.label.like(f'%{label}%'))
-            if star:
-                filters.append(MovieModel.star.like(f'%{star}%'))
-            if director:
-                filters.append(MovieModel.director.like(f'%{director}%'))
-            if keyword:
-                keyword_filter = or_(
-                    MovieModel.movie_name.like(f'%{keyword}%'),
-                    MovieModel.star.like(f'%{keyword}%'),
-                    MovieModel.director.like(f'%{keyword}%'),
-                    MovieModel.type.like(f'%{keyword}%')
-                )
-                filters.append(keyword_filter)
+            filters = self._build_search_filters(classify, category, label, star, director, keyword)
 
             results = (
                 self.db.query(MovieModel)
@@ -204,6 +218,37 @@ class MovieRepository:
             logger.error(f"搜索电影失败: {str(e)}", exc_info=True)
             return []
 
+    # 游标分页排序键：更新时间降序，主键保证唯一（对应索引 idx_movie_update / idx_movie_classify_update）
+    SEARCH_SORT_KEYS = [
+        SortKey(MovieModel.update_time),
+        SortKey(MovieModel.id),
+    ]
+
+    def search_by_cursor(
+        self,
+        classify: Optional[str],
+        category: Optional[str],
+        label: Optional[str],
+        star: Optional[str],
+        director: Optional[str],
+        keyword: Optional[str],
+        cursor_values: Optional[List[Any]],
+        page_size: int,
+        scope: str
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """游标分页搜索电影，返回 (电影列表, 下一页游标)"""
+        try:
+            filters = self._build_search_filters(classify, category, label, star, director, keyword)
+            query = self.db.query(MovieModel).filter(*filters)
+            results = apply_keyset(query, self.SEARCH_SORT_KEYS, cursor_values).limit(page_size + 1).all()
+            results, next_cursor = build_page(
+                results, page_size, self.SEARCH_SORT_KEYS, lambda m: [m.update_time, m.id], scope
+            )
+            return [self._movie_to_dict(m) for m in results], next_cursor
+        except Exception as e:
+            logger.error(f"游标搜索电影失败: {str(e)}", exc_info=True)
+            return [], None
+
     def search_total(
         self,
         classify: Optional[str],
@@ -215,25 +260,7 @@ class MovieRepository:
     ) -> int:
         """搜索电影总数"""
         try:
-            filters = [MovieModel.id.isnot(None)]
-            if classify:
-                filters.append(MovieModel.classify == classify)
-            if category:
-                filters.append(MovieModel.category == category)
-            if label:
-                filters.append(MovieModel.label.like(f'%{label}%'))
-            if star:
-                filters.append(MovieModel.star.like(f'%{star}%'))
-            if director:
-                filters.append(MovieModel.director.like(f'%{director}%'))
-            if keyword:
-                keyword_filter = or_(
-                    MovieModel.movie_name.like(f'%{keyword}%'),
-                    MovieModel.star.like(f'%{keyword}%'),
-                    MovieModel.director.like(f'%{keyword}%'),
-                    MovieModel.type.like(f'%{keyword}%')
-                )
-                filters.append(keyword_filter)
+            filters = self._build_search_filters(classify, category, label, star, director, keyword)
 
             return (
                 self.db.query(func.count(MovieModel.id))
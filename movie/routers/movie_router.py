@@ -100,6 +100,7 @@ async def search(
     keyword: Optional[str] = Query(None, description="关键词"),
     pageNum: int = Query(1, ge=1, description="页码，从1开始"),
     pageSize: int = Query(20, ge=1, le=500, description="每页数量，最大500"),
+    withTotal: bool = Query(True, description="是否返回总数，不需要时传 false 省去一次统计"),
     movie_service: MovieService = Depends()
 ) -> ResultEntity:
     """搜索电影（支持多条件分页）"""
@@ -111,7 +112,35 @@ async def search(
         director=director,
         keyword=keyword,
         page_num=pageNum,
-        page_size=pageSize
+        page_size=pageSize,
+        with_total=withTotal
+    )
+
+
+@router.get("/searchCursor", response_model=ResultEntity)
+async def search_cursor(
+    classify: Optional[str] = Query(None, description="分类"),
+    category: Optional[str] = Query(None, description="类目"),
+    label: Optional[str] = Query(None, description="标签"),
+    star: Optional[str] = Query(None, description="主演"),
+    director: Optional[str] = Query(None, description="导演"),
+    keyword: Optional[str] = Query(None, description="关键词"),
+    cursor: Optional[str] = Query(None, description="上一页返回的游标，第一页不传"),
+    pageSize: int = Query(20, ge=1, le=500, description="每页数量，最大500"),
+    withTotal: bool = Query(True, description="是否返回总数（仅第一页生效）"),
+    movie_service: MovieService = Depends()
+) -> ResultEntity:
+    """搜索电影（游标分页，翻页时传入上一页返回的 cursor）"""
+    return await movie_service.search_by_cursor(
+        classify=classify,
+        category=category,
+        label=label,
+        star=star,
+        director=director,
+        keyword=keyword,
+        cursor=cursor,
+        page_size=pageSize,
+        with_total=withTotal
     )
 
 
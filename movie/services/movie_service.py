@@ -7,6 +7,8 @@ from fastapi.logger import logger
 
 from common.config.common_database import get_db
 from common.utils.result_util import ResultEntity, ResultUtil
+from common.utils.pagination_util import CursorError, decode_cursor
+from common.utils.count_cache_util import fetch_page_with_total
 from movie.repositories.movie_repository import MovieRepository
 
 
@@ -102,7 +104,8 @@ class MovieService:
         director: Optional[str],
         keyword: Optional[str],
         page_num: int,
-        page_size: int
+        page_size: int,
+        with_total: bool = True
     ) -> ResultEntity:
         """搜索电影"""
         try:
@@ -110,17 +113,67 @@ class MovieService:
                 page_size = 500
             start = (page_num - 1) * page_size
 
-            data = self.movie_repository.search(
-                classify, category, label, star, director, keyword, start, page_size
-            )
-            total = self.movie_repository.search_total(
-                classify, category, label, star, director, keyword
+            data, total = await fetch_page_with_total(
+                lambda: self.movie_repository.search(
+                    classify, category, label, star, director, keyword, start, page_size
+                ),
+                **self._search_total_args(classify, category, label, star, director, keyword),
+                with_total=with_total
             )
             return ResultUtil.success(data=data, total=total)
         except Exception as e:
             logger.error(f"搜索电影失败: {str(e)}", exc_info=True)
             return ResultUtil.fail(data=None, msg=f"搜索失败: {str(e)}")
 
+    @staticmethod
+    def _search_total_args(classify, category, label, star, director, keyword) -> Dict[str, Any]:
+        """搜索总数的缓存命名空间、筛选条件与统计函数"""
+        return {
+            "namespace": "movie",
+            "filters": {
+                "classify": classify, "category": category, "label": label,
+                "star": star, "director": director, "keyword": keyword
+            },
+            "count": lambda db: MovieRepository(db).search_total(
+                classify, category, label, star, director, keyword
+            ),
+        }
+
+    async def search_by_cursor(
+        self,
+        classify: Optional[str],
+        category: Optional[str],
+        label: Optional[str],
+        star: Optional[str],
+        director: Optional[str],
+        keyword: Optional[str],
+        cursor: Optional[str],
+        page_size: int,
+        with_total: bool = True
+    ) -> ResultEntity:
+        """游标分页搜索电影（总数只在第一页统计）"""
+        try:
+            page_size = min(max(page_size, 1), 500)
+            # 游标绑定筛选条件，换了条件的旧游标会被拒绝
+            scope = "movie.search:" + "|".join(
+                v or "" for v in (classify, category, label, star, director, keyword)
+            )
+            cursor_values = decode_cursor(cursor, scope, len(self.movie_repository.SEARCH_SORT_KEYS))
+
+            (data, next_cursor), total = await fetch_page_with_total(
+                lambda: self.movie_repository.search_by_cursor(
+                    classify, category, label, star, director, keyword, cursor_values, page_size, scope
+                ),
+                **self._search_total_args(classify, category, label, star, director, keyword),
+                with_total=with_total and cursor_values is None
+            )
+            return ResultUtil.success(data=data, total=total, cursor=next_cursor)
+        except CursorError as e:
+            return ResultUtil.fail(data=None, msg=str(e))
+        except Exception as e:
+            logger.error(f"游标搜索电影失败: {str(e)}", exc_info=True)
+            return ResultUtil.fail(data=None, msg=f"搜索失败: {str(e)}")
+
     async def get_star(self, movie_id: int) -> ResultEntity:
         """获取电影演员列表"""
         try:
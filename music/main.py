@@ -4,6 +4,7 @@ from fastapi.middleware.cors import CORSMiddleware
 from music.routers import music_router
 from common.config.common_database import engine, Base
 from common.utils.service_registry import service_registry
+from common.utils.profiler_util import setup_profiler
 
 # 创建数据库表（如果表不存在）
 Base.metadata.create_all(bind=engine)
@@ -21,6 +22,9 @@ app.add_middleware(
 # 注册路由
 app.include_router(music_router.router)
 
+# 采样分析器（ENABLE_PROFILER=True 时启用）
+setup_profiler(app, "music")
+
 
 @app.get("/")
 async def root():
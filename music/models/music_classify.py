@@ -1,20 +1,23 @@
-from sqlalchemy import Column, Integer, DateTime
+from sqlalchemy import Column, Integer, DateTime, Index, text
 from common.config.common_database import Base
 
 
 class MusicClassifyModel(Base):
     """音乐分类关联表"""
     __tablename__ = "music_classify"
-    __table_args__ = {
-        "comment": "音乐分类关联表",
-        "mysql_charset": "utf8mb4",
-        "mysql_collate": "utf8mb4_general_ci"
-    }
+    __table_args__ = (
+        Index("idx_music_classify_rank", "classify_id", "audio_rank", "id"),
+        {
+            "comment": "音乐分类关联表",
+            "mysql_charset": "utf8mb4",
+            "mysql_collate": "utf8mb4_general_ci"
+        }
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True, comment="主键")
     classify_id = Column(Integer, nullable=True, comment="分类ID")
     music_id = Column(Integer, nullable=True, comment="歌曲id")
-    audio_rank = Column(Integer, nullable=True, comment="歌曲排名，数值越大越靠前")
+    audio_rank = Column(Integer, nullable=False, server_default=text("0"), comment="歌曲排名，数值越大越靠前")
     create_time = Column(DateTime, nullable=True, comment="创建时间")
     update_time = Column(DateTime, nullable=True, comment="更新时间")
 
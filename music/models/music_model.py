@@ -1,17 +1,20 @@
 # music/models/music_model.py
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, DateTime, Text, func
+from sqlalchemy import Column, Integer, String, DateTime, Text, Index, func, text
 from common.config.common_database import Base
 
 
 class MusicModel(Base):
     """音乐主表"""
     __tablename__ = "music"
-    __table_args__ = {
-        "comment": "音乐主表",
-        "mysql_charset": "utf8mb4",
-        "mysql_collate": "utf8mb4_general_ci"
-    }
+    __table_args__ = (
+        Index("idx_music_hot_time", "is_hot", "create_time", "id"),
+        {
+            "comment": "音乐主表",
+            "mysql_charset": "utf8mb4",
+            "mysql_collate": "utf8mb4_general_ci"
+        }
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True, comment="主键")
     album_id = Column(Integer, nullable=True, comment="专辑id")
@@ -28,7 +31,7 @@ class MusicModel(Base):
     final_id = Column(Integer, nullable=True, comment="最终id")
     audio_id = Column(Integer, nullable=True, comment="音频id")
     similar_audio_id = Column(Integer, nullable=True, comment="相似的音乐id")
-    is_hot = Column(Integer, nullable=True, comment="是否热门")
+    is_hot = Column(Integer, nullable=False, server_default=text("0"), comment="是否热门")
     album_audio_id = Column(Integer, nullable=True, comment="歌曲音频id")
     audio_group_id = Column(Integer, nullable=True, comment="专辑id")
     cover = Column(String(255), nullable=True, comment="歌曲图片")
@@ -36,7 +39,7 @@ class MusicModel(Base):
     local_play_url = Column(String(255), nullable=True, comment="本地播放地址")
     source_name = Column(String(255), nullable=True, comment="播放源")
     source_url = Column(String(1000), nullable=True, comment="播放地址")
-    create_time = Column(DateTime, nullable=True, server_default=func.now(), comment="创建时间")
+    create_time = Column(DateTime, nullable=False, server_default=func.now(), comment="创建时间")
     update_time = Column(DateTime, nullable=True, onupdate=func.now(), comment="更新时间")
     label = Column(String(255), nullable=True, comment="标签")
     lyrics = Column(Text, nullable=True, comment="歌词")
@@ -16,6 +16,7 @@ from music.models.music_record import MusicRecordModel
 from music.schemas.music_author_category_schema import MusicAuthorCategorySchema
 from music.schemas.music_favorite_schema import MusicFavoriteDirectorySchema
 from music.schemas.music_record_schema import MusicRecordResponseSchema
+from common.utils.pagination_util import SortKey, apply_keyset, build_page
 
 
 class MusicRepository:
@@ -142,9 +143,9 @@ class MusicRepository:
             user_id: str,
             page_num: int = 1,
             page_size: int = 10
-    ) -> Tuple[List[Dict[str, Any]], int]:
+    ) -> List[Dict[str, Any]]:
         """
-        根据分类ID分页查询音乐列表，并获取当前用户的点赞状态
+        根据分类ID分页查询音乐列表，并获取当前用户的点赞状态（总数见 count_music_by_classify_id）
 
         Args:
             classify_id: 分类ID
@@ -153,21 +154,11 @@ class MusicRepository:
             page_size: 每页数量
 
         Returns:
-            Tuple[List[Dict[str, Any]], int]: (音乐列表, 总记录数)
+            List[Dict[str, Any]]: 音乐列表
         """
         try:
             offset = (page_num - 1) * page_size
 
-            # ==================== 查询总数 ====================
-            total_stmt = (
-                self.db.query(func.count(MusicClassifyModel.id))
-                .filter(MusicClassifyModel.classify_id == classify_id)
-            )
-            total = total_stmt.scalar() or 0
-
-            if total == 0:
-                return [], 0
-
             # ==================== 查询音乐列表 ====================
             # 主查询：通过 music_classify 关联 music 表，并 LEFT JOIN 点赞表
             results = (
@@ -233,11 +224,87 @@ class MusicRepository:
                 }
                 music_list.append(music_dict)
 
-            return music_list, total
+            return music_list
 
         except Exception as e:
             logger.error(f"根据分类ID查询音乐列表失败: {str(e)}", exc_info=True)
-            return [], 0
+            return []
+
+    def count_music_by_classify_id(self, classify_id: int) -> int:
+        """统计分类下的音乐总数"""
+        return (
+            self.db.query(func.count(MusicClassifyModel.id))
+            .filter(MusicClassifyModel.classify_id == classify_id)
+            .scalar()
+        ) or 0
+
+    # 游标分页排序键：排名降序，分类关联表主键保证唯一
+    # 排序列都在 music_classify 上，按 idx_music_classify_rank (classify_id, audio_rank, id) 顺序扫描，无需 filesort
+    CLASSIFY_SORT_KEYS = [
+        SortKey(MusicClassifyModel.audio_rank),
+        SortKey(MusicClassifyModel.id),
+    ]
+
+    def get_music_list_by_classify_id_by_cursor(
+            self,
+            classify_id: int,
+            user_id: str,
+            cursor_values: Optional[List[Any]],
+            scope: str,
+            page_size: int = 10
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        根据分类ID游标分页查询音乐列表（含点赞状态）
+
+        Args:
+            classify_id: 分类ID
+            user_id: 当前用户ID
+            cursor_values: 已解析的游标值，None 表示第一页
+            scope: 游标作用域（由 service 按筛选条件生成）
+            page_size: 每页数量
+
+        Returns:
+            Tuple[List[Dict[str, Any]], Optional[str]]: (音乐列表, 下一页游标)
+        """
+        try:
+            query = (
+                self.db.query(
+                    MusicModel,
+                    MusicClassifyModel.audio_rank,
+                    MusicClassifyModel.id,
+                    func.if_(MusicLikeModel.id.isnot(None), 1, 0).label('is_like')
+                )
+                .join(
+                    MusicClassifyModel,
+                    MusicModel.id == MusicClassifyModel.music_id
+                )
+                .outerjoin(
+                    MusicLikeModel,
+                    (MusicModel.id == MusicLikeModel.music_id) &
+                    (MusicLikeModel.user_id == user_id)
+                )
+                .filter(MusicClassifyModel.classify_id == classify_id)
+            )
+            results = apply_keyset(query, self.CLASSIFY_SORT_KEYS, cursor_values).limit(page_size + 1).all()
+            results, next_cursor = build_page(
+                results, page_size, self.CLASSIFY_SORT_KEYS,
+                lambda row: [row[1], row[2]],
+                scope
+            )
+
+            music_list = []
+            for music_obj, audio_rank, _, is_like in results:
+                music_dict = self._music_to_dict(music_obj)
+                music_dict["audio_rank"] = audio_rank
+                music_dict["is_like"] = is_like
+                music_dict["times"] = 0
+                music_list.append(music_dict)
+
+            return music_list, next_cursor
+
+        except Exception as e:
+            logger.error(f"根据分类ID游标查询音乐列表失败: {str(e)}", exc_info=True)
+            return [], None
 
     def get_author_list_by_category_id(
             self,
@@ -1047,9 +1114,9 @@ class MusicRepository:
         user_id: str,
         page_num: int = 1,
         page_size: int = 20
-    ) -> Tuple[List[Dict[str, Any]], int]:
+    ) -> List[Dict[str, Any]]:
         """
-        根据关键词搜索音乐
+        根据关键词搜索音乐（总数见 count_music_by_keyword）
 
         在 song_name、author_name、album_name 三个字段上执行模糊匹配
         左连接 music_like 表，判断当前用户是否已收藏该音乐
@@ -1061,28 +1128,11 @@ class MusicRepository:
             page_size: 每页数量
 
         Returns:
-            Tuple[List[Dict[str, Any]], int]: (音乐列表, 总记录数)
+            List[Dict[str, Any]]: 音乐列表
         """
         try:
 
             offset = (page_num - 1) * page_size
-            search_pattern = f"%{keyword}%"
-
-            # ==================== 查询总数 ====================
-            total_stmt = (
-                self.db.query(func.count(MusicModel.id))
-                .filter(
-                    or_(
-                        MusicModel.song_name.like(search_pattern),
-                        MusicModel.author_name.like(search_pattern),
-                        MusicModel.album_name.like(search_pattern)
-                    )
-                )
-            )
-            total = total_stmt.scalar() or 0
-
-            if total == 0:
-                return [], 0
 
             # ==================== 查询音乐列表（含收藏状态） ====================
             results = (
@@ -1095,13 +1145,7 @@ class MusicRepository:
                     (MusicModel.id == MusicLikeModel.music_id) &
                     (MusicLikeModel.user_id == user_id)
                 )
-                .filter(
-                    or_(
-                        MusicModel.song_name.like(search_pattern),
-                        MusicModel.author_name.like(search_pattern),
-                        MusicModel.album_name.like(search_pattern)
-                    )
-                )
+                .filter(self._keyword_filter(keyword))
                 .order_by(desc(MusicModel.is_hot), desc(MusicModel.create_time))
                 .offset(offset)
                 .limit(page_size)
@@ -1115,11 +1159,89 @@ class MusicRepository:
                 music_dict["is_favorite"] = int(is_favorite) if is_favorite is not None else 0
                 music_list.append(music_dict)
 
-            return music_list, total
+            return music_list
 
         except Exception as e:
             logger.error(f"搜索音乐失败: {str(e)}", exc_info=True)
-            return [], 0
+            return []
+
+    @staticmethod
+    def _keyword_filter(keyword: str):
+        """歌曲名、歌手名、专辑名模糊匹配条件"""
+        search_pattern = f"%{keyword}%"
+        return or_(
+            MusicModel.song_name.like(search_pattern),
+            MusicModel.author_name.like(search_pattern),
+            MusicModel.album_name.like(search_pattern)
+        )
+
+    def count_music_by_keyword(self, keyword: str) -> int:
+        """统计关键词匹配的音乐总数"""
+        return (
+            self.db.query(func.count(MusicModel.id))
+            .filter(self._keyword_filter(keyword))
+            .scalar()
+        ) or 0
+
+    # 游标分页排序键：热门、创建时间降序，主键保证唯一（对应索引 idx_music_hot_time）
+    KEYWORD_SORT_KEYS = [
+        SortKey(MusicModel.is_hot),
+        SortKey(MusicModel.create_time),
+        SortKey(MusicModel.id),
+    ]
+
+    def search_music_by_keyword_by_cursor(
+        self,
+        keyword: str,
+        user_id: str,
+        cursor_values: Optional[List[Any]],
+        scope: str,
+        page_size: int = 20
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        根据关键词游标分页搜索音乐（含收藏状态）
+
+        Args:
+            keyword: 搜索关键词
+            user_id: 当前用户ID（用于判断收藏状态）
+            cursor_values: 已解析的游标值，None 表示第一页
+            scope: 游标作用域（由 service 按筛选条件生成）
+            page_size: 每页数量
+
+        Returns:
+            Tuple[List[Dict[str, Any]], Optional[str]]: (音乐列表, 下一页游标)
+        """
+        try:
+            query = (
+                self.db.query(
+                    MusicModel,
+                    func.if_(MusicLikeModel.id.isnot(None), 1, 0).label('is_favorite')
+                )
+                .outerjoin(
+                    MusicLikeModel,
+                    (MusicModel.id == MusicLikeModel.music_id) &
+                    (MusicLikeModel.user_id == user_id)
+                )
+                .filter(self._keyword_filter(keyword))
+            )
+            results = apply_keyset(query, self.KEYWORD_SORT_KEYS, cursor_values).limit(page_size + 1).all()
+            results, next_cursor = build_page(
+                results, page_size, self.KEYWORD_SORT_KEYS,
+                lambda row: [row[0].is_hot, row[0].create_time, row[0].id],
+                scope
+            )
+
+            music_list = []
+            for music_obj, is_favorite in results:
+                music_dict = self._music_to_dict(music_obj)
+                music_dict["is_favorite"] = int(is_favorite) if is_favorite is not None else 0
+                music_list.append(music_dict)
+
+            return music_list, next_cursor
+
+        except Exception as e:
+            logger.error(f"游标搜索音乐失败: {str(e)}", exc_info=True)
+            return [], None
 
     def query_music_by_conditions(
         self,
@@ -71,6 +71,7 @@ async def get_music_list_by_classify_id(
         classifyId: int = Query(..., description="分类ID"),
         pageNum: int = Query(1, ge=1, description="页码，从1开始"),
         pageSize: int = Query(10, ge=1, le=100, description="每页数量，最大100"),
+        withTotal: bool = Query(True, description="是否返回总数，不需要时传 false 省去一次统计"),
         current_user_id: str = Depends(get_user_id_from_header),
         music_service: MusicService = Depends()
 ) -> ResultEntity:
@@ -85,6 +86,7 @@ async def get_music_list_by_classify_id(
         classifyId: 分类ID
         pageNum: 页码，从1开始
         pageSize: 每页数量，最大100
+        withTotal: 是否返回总数
         current_user_id: 当前登录用户ID（由网关透传）
         music_service: 音乐服务实例
 
@@ -95,7 +97,31 @@ async def get_music_list_by_classify_id(
         classify_id=classifyId,
         user_id=current_user_id,
         page_num=pageNum,
-        page_size=pageSize
+        page_size=pageSize,
+        with_total=withTotal
+    )
+
+@router.get("/getMusicListByClassifyIdCursor", response_model=ResultEntity)
+async def get_music_list_by_classify_id_cursor(
+        classifyId: int = Query(..., description="分类ID"),
+        cursor: Optional[str] = Query(None, description="上一页返回的游标，第一页不传"),
+        pageSize: int = Query(10, ge=1, le=100, description="每页数量，最大100"),
+        withTotal: bool = Query(True, description="是否返回总数（仅第一页生效）"),
+        current_user_id: str = Depends(get_user_id_from_header),
+        music_service: MusicService = Depends()
+) -> ResultEntity:
+    """
+    根据分类ID游标分页获取音乐列表
+
+    与 getMusicListByClassifyId 返回相同的数据结构，翻页时传入上一页返回的 cursor，
+    任何一页的查询代价都与第一页相同；cursor 为空表示没有下一页
+    """
+    return await music_service.get_music_list_by_classify_id_by_cursor(
+        classify_id=classifyId,
+        user_id=current_user_id,
+        cursor=cursor,
+        page_size=pageSize,
+        with_total=withTotal
     )
 
 @router.get("/getMusicAuthorListByCategoryId", response_model=ResultEntity)
@@ -387,6 +413,7 @@ async def search_music(
     keyword: str = Query(..., description="搜索关键词（支持歌曲名、歌手名、专辑名模糊匹配）"),
     pageNum: int = Query(1, ge=1, description="页码，从1开始"),
     pageSize: int = Query(20, ge=1, le=500, description="每页数量，最大500"),
+    withTotal: bool = Query(True, description="是否返回总数，不需要时传 false 省去一次统计"),
     current_user_id: str = Depends(get_user_id_from_header),
     music_service: MusicService = Depends()
 ) -> ResultEntity:
@@ -400,6 +427,7 @@ async def search_music(
         keyword: 搜索关键词
         pageNum: 页码，从1开始
         pageSize: 每页数量，最大500
+        withTotal: 是否返回总数
         current_user_id: 当前登录用户ID（由网关透传）
         music_service: 音乐服务实例
 
@@ -410,7 +438,30 @@ async def search_music(
         user_id=current_user_id,
         keyword=keyword,
         page_num=pageNum,
-        page_size=pageSize
+        page_size=pageSize,
+        with_total=withTotal
+    )
+
+@router.get("/searchMusicCursor", response_model=ResultEntity)
+async def search_music_cursor(
+    keyword: str = Query(..., description="搜索关键词（支持歌曲名、歌手名、专辑名模糊匹配）"),
+    cursor: Optional[str] = Query(None, description="上一页返回的游标，第一页不传"),
+    pageSize: int = Query(20, ge=1, le=500, description="每页数量，最大500"),
+    withTotal: bool = Query(True, description="是否返回总数（仅第一页生效）"),
+    current_user_id: str = Depends(get_user_id_from_header),
+    music_service: MusicService = Depends()
+) -> ResultEntity:
+    """
+    根据关键词游标分页搜索音乐
+
+    与 searchMusic 返回相同的数据结构，翻页时传入上一页返回的 cursor
+    """
+    return await music_service.search_music_by_cursor(
+        user_id=current_user_id,
+        keyword=keyword,
+        cursor=cursor,
+        page_size=pageSize,
+        with_total=withTotal
     )
 
 @router.get("/queryMusic", response_model=ResultEntity)
@@ -6,6 +6,8 @@ from fastapi.logger import logger
 
 from common.config.common_database import get_db
 from common.utils.result_util import ResultEntity, ResultUtil
+from common.utils.pagination_util import CursorError, decode_cursor
+from common.utils.count_cache_util import fetch_page_with_total
 from music.repositories.music_repository import MusicRepository
 from music.schemas.music_favorite_schema import FavoriteDirectoryUpdateSchema
 from music.schemas.music_query_schema import MusicQuerySchema
@@ -73,7 +75,8 @@ class MusicService:
             classify_id: int,
             user_id: str,
             page_num: int = 1,
-            page_size: int = 10
+            page_size: int = 10,
+            with_total: bool = True
     ) -> ResultEntity:
         """
         根据分类ID分页查询音乐列表
@@ -83,6 +86,7 @@ class MusicService:
             user_id: 当前用户ID
             page_num: 页码，从1开始
             page_size: 每页数量
+            with_total: 是否返回总数
 
         Returns:
             ResultEntity: 音乐列表（含点赞状态）
@@ -100,12 +104,18 @@ class MusicService:
             if page_size > 100:
                 page_size = 100
 
-            # 查询音乐列表
-            music_list, total = self.music_repository.get_music_list_by_classify_id(
-                classify_id=classify_id,
-                user_id=user_id,
-                page_num=page_num,
-                page_size=page_size
+            # 查询音乐列表，总数（带缓存）并行统计
+            music_list, total = await fetch_page_with_total(
+                lambda: self.music_repository.get_music_list_by_classify_id(
+                    classify_id=classify_id,
+                    user_id=user_id,
+                    page_num=page_num,
+                    page_size=page_size
+                ),
+                namespace="music_classify",
+                filters={"classify_id": classify_id},
+                count=lambda db: MusicRepository(db).count_music_by_classify_id(classify_id),
+                with_total=with_total
             )
 
             # 使用 ResultUtil 返回数据（自动转换驼峰）
@@ -115,6 +125,57 @@ class MusicService:
             logger.error(f"获取分类音乐列表失败: {str(e)}", exc_info=True)
             return ResultUtil.fail(msg=f"获取分类音乐列表失败: {str(e)}", data=None)
 
+    async def get_music_list_by_classify_id_by_cursor(
+            self,
+            classify_id: int,
+            user_id: str,
+            cursor: Optional[str] = None,
+            page_size: int = 10,
+            with_total: bool = True
+    ) -> ResultEntity:
+        """
+        根据分类ID游标分页查询音乐列表
+
+        Args:
+            classify_id: 分类ID
+            user_id: 当前用户ID
+            cursor: 上一页返回的游标，None 表示第一页
+            page_size: 每页数量
+            with_total: 是否返回总数（只在第一页统计）
+
+        Returns:
+            ResultEntity: 音乐列表（含点赞状态）及下一页游标
+        """
+        try:
+            if classify_id is None or classify_id <= 0:
+                return ResultUtil.fail(msg="分类ID不能为空", data=None)
+
+            page_size = min(max(page_size, 1), 100)
+            scope = f"music.classify:{classify_id}"
+            cursor_values = decode_cursor(cursor, scope, len(self.music_repository.CLASSIFY_SORT_KEYS))
+
+            (music_list, next_cursor), total = await fetch_page_with_total(
+                lambda: self.music_repository.get_music_list_by_classify_id_by_cursor(
+                    classify_id=classify_id,
+                    user_id=user_id,
+                    cursor_values=cursor_values,
+                    scope=scope,
+                    page_size=page_size
+                ),
+                namespace="music_classify",
+                filters={"classify_id": classify_id},
+                count=lambda db: MusicRepository(db).count_music_by_classify_id(classify_id),
+                with_total=with_total and cursor_values is None
+            )
+
+            return ResultUtil.success(data=music_list, total=total, cursor=next_cursor)
+
+        except CursorError as e:
+            return ResultUtil.fail(msg=str(e), data=None)
+        except Exception as e:
+            logger.error(f"游标获取分类音乐列表失败: {str(e)}", exc_info=True)
+            return ResultUtil.fail(msg=f"获取分类音乐列表失败: {str(e)}", data=None)
+
     async def get_author_list_by_category_id(
             self,
             category_id: int,
@@ -569,7 +630,8 @@ class MusicService:
         user_id: str,
         keyword: str,
         page_num: int = 1,
-        page_size: int = 20
+        page_size: int = 20,
+        with_total: bool = True
     ) -> ResultEntity:
         """
         根据关键词搜索音乐
@@ -582,6 +644,7 @@ class MusicService:
             keyword: 搜索关键词
             page_num: 页码，从1开始
             page_size: 每页数量
+            with_total: 是否返回总数
 
         Returns:
             ResultEntity: 搜索结果列表
@@ -607,12 +670,18 @@ class MusicService:
             if page_size > 500:
                 page_size = 500
 
-            # 执行搜索
-            music_list, total = self.music_repository.search_music_by_keyword(
-                keyword=keyword,
-                user_id=user_id,
-                page_num=page_num,
-                page_size=page_size
+            # 执行搜索，总数（带缓存）并行统计
+            music_list, total = await fetch_page_with_total(
+                lambda: self.music_repository.search_music_by_keyword(
+                    keyword=keyword,
+                    user_id=user_id,
+                    page_num=page_num,
+                    page_size=page_size
+                ),
+                namespace="music",
+                filters={"keyword": keyword},
+                count=lambda db: MusicRepository(db).count_music_by_keyword(keyword),
+                with_total=with_total
             )
 
             # 使用 ResultUtil 返回数据（自动转换驼峰）
@@ -622,6 +691,64 @@ class MusicService:
             logger.error(f"搜索音乐失败: {str(e)}", exc_info=True)
             return ResultUtil.fail(msg=f"搜索音乐失败: {str(e)}", data=None)
 
+    async def search_music_by_cursor(
+        self,
+        user_id: str,
+        keyword: str,
+        cursor: Optional[str] = None,
+        page_size: int = 20,
+        with_total: bool = True
+    ) -> ResultEntity:
+        """
+        根据关键词游标分页搜索音乐
+
+        Args:
+            user_id: 当前用户ID
+            keyword: 搜索关键词
+            cursor: 上一页返回的游标，None 表示第一页
+            page_size: 每页数量
+            with_total: 是否返回总数（只在第一页统计）
+
+        Returns:
+            ResultEntity: 搜索结果列表及下一页游标
+        """
+        try:
+            if not user_id:
+                return ResultUtil.fail(msg="用户ID不能为空", data=None)
+
+            if not keyword or not keyword.strip():
+                return ResultUtil.fail(msg="搜索关键词不能为空", data=None)
+
+            keyword = keyword.strip()
+            if len(keyword) > 100:
+                return ResultUtil.fail(msg="搜索关键词不能超过100个字符", data=None)
+
+            page_size = min(max(page_size, 1), 500)
+            scope = f"music.search:{keyword}"
+            cursor_values = decode_cursor(cursor, scope, len(self.music_repository.KEYWORD_SORT_KEYS))
+
+            (music_list, next_cursor), total = await fetch_page_with_total(
+                lambda: self.music_repository.search_music_by_keyword_by_cursor(
+                    keyword=keyword,
+                    user_id=user_id,
+                    cursor_values=cursor_values,
+                    scope=scope,
+                    page_size=page_size
+                ),
+                namespace="music",
+                filters={"keyword": keyword},
+                count=lambda db: MusicRepository(db).count_music_by_keyword(keyword),
+                with_total=with_total and cursor_values is None
+            )
+
+            return ResultUtil.success(data=music_list, total=total, cursor=next_cursor)
+
+        except CursorError as e:
+            return ResultUtil.fail(msg=str(e), data=None)
+        except Exception as e:
+            logger.error(f"游标搜索音乐失败: {str(e)}", exc_info=True)
+            return ResultUtil.fail(msg=f"搜索音乐失败: {str(e)}", data=None)
+
     async def query_music(
         self,
         user_id: str,
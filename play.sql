@@ -28,12 +28,21 @@ CREATE TABLE `chat_doc`  (
   `name` varchar(255) CHARACTER SET utf8mb4 COLLATE utf8mb4_general_ci NULL DEFAULT NULL COMMENT '文档原标题',
   `ext` varchar(255) CHARACTER SET utf8mb4 COLLATE utf8mb4_general_ci NULL DEFAULT NULL COMMENT '文档格式',
   `user_id` varchar(32) CHARACTER SET utf8mb4 COLLATE utf8mb4_general_ci NULL DEFAULT NULL COMMENT '用户id',
+  `content_hash` varchar(64) CHARACTER SET utf8mb4 COLLATE utf8mb4_general_ci NULL DEFAULT NULL COMMENT '文件内容SHA-256（磁盘路径按哈希命名，同一文件只存一份）',
+  `source_doc_id` varchar(32) CHARACTER SET utf8mb4 COLLATE utf8mb4_general_ci NULL DEFAULT NULL COMMENT '向量所属文档id（内容相同的文档共用一份向量）',
   `create_time` datetime(0) NULL DEFAULT NULL ON UPDATE CURRENT_TIMESTAMP(0) COMMENT '更新时间',
   `update_time` datetime(0) NULL DEFAULT NULL ON UPDATE CURRENT_TIMESTAMP(0) COMMENT '修改时间',
   PRIMARY KEY (`id`) USING BTREE,
-  INDEX `idx_tenant`(`tenant_id`) USING BTREE
+  INDEX `idx_tenant`(`tenant_id`) USING BTREE,
+  INDEX `ix_chat_doc_content_hash`(`content_hash`) USING BTREE,
+  INDEX `ix_chat_doc_source_doc_id`(`source_doc_id`) USING BTREE
 ) ENGINE = InnoDB CHARACTER SET = utf8mb4 COLLATE = utf8mb4_general_ci COMMENT = '用户上传的RAG文档' ROW_FORMAT = Dynamic;
 
+-- 已有库升级：
+-- ALTER TABLE `chat_doc` ADD COLUMN `content_hash` varchar(64) NULL DEFAULT NULL COMMENT '文件内容SHA-256',
+--   ADD COLUMN `source_doc_id` varchar(32) NULL DEFAULT NULL COMMENT '向量所属文档id',
+--   ADD INDEX `ix_chat_doc_content_hash`(`content_hash`), ADD INDEX `ix_chat_doc_source_doc_id`(`source_doc_id`);
+
 -- ----------------------------
 -- Table structure for chat_doc_directory
 -- ----------------------------
@@ -55,17 +64,46 @@ DROP TABLE IF EXISTS `chat_history`;
 CREATE TABLE `chat_history`  (
   `id` int(0) NOT NULL AUTO_INCREMENT COMMENT '主键',
   `user_id` varchar(64) CHARACTER SET utf8mb4 COLLATE utf8mb4_general_ci NULL DEFAULT NULL COMMENT '用户id',
-  `model_name` varchar(64) CHARACTER SET utf8mb4 COLLATE utf8mb4_general_ci NULL DEFAULT NULL COMMENT '模型名称',
+  `tenant_id` varchar(255) CHARACTER SET utf8mb4 COLLATE utf8mb4_general_ci NULL DEFAULT NULL COMMENT '租户id',
+  `model_id` varchar(64) CHARACTER SET utf8mb4 COLLATE utf8mb4_general_ci NULL DEFAULT NULL COMMENT '模型ID',
   `files` varchar(1000) CHARACTER SET utf8mb4 COLLATE utf8mb4_general_ci NULL DEFAULT NULL COMMENT '文件',
   `chat_id` varchar(128) CHARACTER SET utf8mb4 COLLATE utf8mb4_general_ci NULL DEFAULT NULL COMMENT '会话id',
-  `prompt` varchar(10000) CHARACTER SET utf8mb4 COLLATE utf8mb4_general_ci NULL DEFAULT NULL COMMENT '问题',
+  `prompt` text CHARACTER SET utf8mb4 COLLATE utf8mb4_general_ci NULL COMMENT '问题',
+  `system_prompt` text CHARACTER SET utf8mb4 COLLATE utf8mb4_general_ci NULL COMMENT '系统提示词',
   `think_content` text CHARACTER SET utf8mb4 COLLATE utf8mb4_general_ci NULL COMMENT '思考内容',
   `response_content` text CHARACTER SET utf8mb4 COLLATE utf8mb4_general_ci NULL COMMENT '正文',
   `content` text CHARACTER SET utf8mb4 COLLATE utf8mb4_general_ci NULL COMMENT '回复内容',
-  `create_time` datetime(0) NULL DEFAULT NULL COMMENT '创建时间',
-  PRIMARY KEY (`id`) USING BTREE
+  `create_time` datetime(0) NOT NULL DEFAULT CURRENT_TIMESTAMP(0) COMMENT '创建时间',
+  PRIMARY KEY (`id`) USING BTREE,
+  INDEX `idx_chat_history_user_tenant_time`(`user_id`, `tenant_id`, `create_time`) USING BTREE,
+  INDEX `idx_chat_history_user_time`(`user_id`, `create_time`) USING BTREE,
+  INDEX `idx_chat_history_user_chat_time`(`user_id`, `chat_id`, `create_time`) USING BTREE
 ) ENGINE = InnoDB AUTO_INCREMENT = 186 CHARACTER SET = utf8mb4 COLLATE = utf8mb4_general_ci COMMENT = 'ai会话记录' ROW_FORMAT = Dynamic;
 
+-- 已有库升级：执行 migrations/002_chat_history_conversation.sql
+
+-- ----------------------------
+-- Table structure for chat_conversation
+-- ----------------------------
+DROP TABLE IF EXISTS `chat_conversation`;
+CREATE TABLE `chat_conversation`  (
+  `id` int(0) NOT NULL AUTO_INCREMENT COMMENT '主键',
+  `user_id` varchar(64) CHARACTER SET utf8mb4 COLLATE utf8mb4_general_ci NOT NULL COMMENT '用户id',
+  `tenant_id` varchar(255) CHARACTER SET utf8mb4 COLLATE utf8mb4_general_ci NULL DEFAULT NULL COMMENT '租户id',
+  `chat_id` varchar(128) CHARACTER SET utf8mb4 COLLATE utf8mb4_general_ci NOT NULL COMMENT '会话id',
+  `title` varchar(255) CHARACTER SET utf8mb4 COLLATE utf8mb4_general_ci NULL DEFAULT NULL COMMENT '标题（会话第一个问题）',
+  `model_id` varchar(64) CHARACTER SET utf8mb4 COLLATE utf8mb4_general_ci NULL DEFAULT NULL COMMENT '最近一轮使用的模型ID',
+  `turn_count` int(0) NOT NULL DEFAULT 0 COMMENT '对话轮数',
+  `create_time` datetime(0) NULL DEFAULT NULL COMMENT '第一条消息时间',
+  `last_message_time` datetime(0) NOT NULL COMMENT '最后一条消息时间',
+  PRIMARY KEY (`id`) USING BTREE,
+  UNIQUE INDEX `uk_chat_conversation_user_chat`(`user_id`, `chat_id`) USING BTREE,
+  INDEX `idx_chat_conversation_user_tenant_time`(`user_id`, `tenant_id`, `last_message_time`, `id`) USING BTREE,
+  INDEX `idx_chat_conversation_user_time`(`user_id`, `last_message_time`, `id`) USING BTREE
+) ENGINE = InnoDB CHARACTER SET = utf8mb4 COLLATE = utf8mb4_general_ci COMMENT = '会话汇总' ROW_FORMAT = Dynamic;
+
+-- 已有库升级：执行 migrations/002_chat_history_conversation.sql（建表并按已有聊天记录回填）
+
 -- ----------------------------
 -- Table structure for chat_model
 -- ----------------------------
@@ -89,12 +127,15 @@ CREATE TABLE `circle`  (
   `imgs` varchar(1000) CHARACTER SET utf8mb4 COLLATE utf8mb4_general_ci NULL DEFAULT NULL COMMENT '图片，多张用分号隔开',
   `type` varchar(255) CHARACTER SET utf8mb4 COLLATE utf8mb4_general_ci NULL DEFAULT NULL COMMENT '类型',
   `user_id` varchar(32) CHARACTER SET utf8mb4 COLLATE utf8mb4_general_ci NULL DEFAULT NULL COMMENT '用户id',
-  `create_time` datetime(0) NULL DEFAULT NULL COMMENT '创建时间',
+  `create_time` datetime(0) NOT NULL DEFAULT CURRENT_TIMESTAMP(0) COMMENT '创建时间',
   `update_time` datetime(0) NULL DEFAULT NULL COMMENT '更新时间',
   `permission` int(0) NULL DEFAULT NULL COMMENT '权限，0私密，1公开',
-  PRIMARY KEY (`id`) USING BTREE
+  PRIMARY KEY (`id`) USING BTREE,
+  INDEX `idx_circle_type_time`(`type`, `permission`, `create_time`, `id`) USING BTREE
 ) ENGINE = InnoDB AUTO_INCREMENT = 85 CHARACTER SET = utf8mb4 COLLATE = utf8mb4_general_ci ROW_FORMAT = Dynamic;
 
+-- 已有库升级：执行 migrations/001_keyset_sort_indexes.sql
+
 -- ----------------------------
 -- Table structure for circle_record
 -- ----------------------------
@@ -548,7 +589,7 @@ CREATE TABLE `movie`  (
   `viewing_state` varchar(255) CHARACTER SET utf8 COLLATE utf8_bin NULL DEFAULT NULL COMMENT '观看状态	',
   `release_time` varchar(255) CHARACTER SET utf8 COLLATE utf8_bin NULL DEFAULT NULL COMMENT '上映时间',
   `plot` text CHARACTER SET utf8 COLLATE utf8_bin NULL COMMENT '剧情',
-  `update_time` date NULL DEFAULT NULL COMMENT '更新时间',
+  `update_time` date NOT NULL DEFAULT (CURRENT_DATE) COMMENT '更新时间',
   `is_recommend` varchar(4) CHARACTER SET utf8 COLLATE utf8_bin NULL DEFAULT NULL COMMENT '是否推荐，0:不推荐，1:推荐',
   `big_img` varchar(255) CHARACTER SET utf8 COLLATE utf8_bin NULL DEFAULT NULL COMMENT '网络大图',
   `img` varchar(255) CHARACTER SET utf8 COLLATE utf8_bin NULL DEFAULT NULL COMMENT '电影海报',
@@ -570,9 +611,13 @@ CREATE TABLE `movie`  (
   `duration` varchar(16) CHARACTER SET utf8 COLLATE utf8_bin NULL DEFAULT NULL COMMENT '播放时长',
   `
 privilege_id` int(0) NULL DEFAULT 0 COMMENT '权限',
-  PRIMARY KEY (`id`) USING BTREE
+  PRIMARY KEY (`id`) USING BTREE,
+  INDEX `idx_movie_update`(`update_time`, `id`) USING BTREE,
+  INDEX `idx_movie_classify_update`(`classify`, `update_time`, `id`) USING BTREE
 ) ENGINE = InnoDB AUTO_INCREMENT = 119049 CHARACTER SET = utf8 COLLATE = utf8_bin ROW_FORMAT = Compact;
 
+-- 已有库升级：执行 migrations/001_keyset_sort_indexes.sql
+
 -- ----------------------------
 -- Table structure for movie_category
 -- ----------------------------
@@ -823,7 +868,7 @@ CREATE TABLE `music`  (
   `final_id` int(0) NULL DEFAULT NULL COMMENT '最终id',
   `audio_id` int(0) NULL DEFAULT NULL COMMENT '音频id',
   `similar_audio_id` int(0) NULL DEFAULT NULL COMMENT '相似的音乐id',
-  `is_hot` int(0) NULL DEFAULT NULL COMMENT '是否热门',
+  `is_hot` int(0) NOT NULL DEFAULT 0 COMMENT '是否热门',
   `album_audio_id` int(0) NULL DEFAULT NULL COMMENT '歌曲音频id',
   `audio_group_id` int(0) NULL DEFAULT NULL COMMENT '专辑id',
   `cover` varchar(255) CHARACTER SET utf8mb4 COLLATE utf8mb4_general_ci NULL DEFAULT NULL COMMENT '歌曲图片',
@@ -831,14 +876,17 @@ CREATE TABLE `music`  (
   `local_play_url` varchar(255) CHARACTER SET utf8mb4 COLLATE utf8mb4_general_ci NULL DEFAULT NULL COMMENT '本地播放地址',
   `source_name` varchar(255) CHARACTER SET utf8mb4 COLLATE utf8mb4_general_ci NULL DEFAULT NULL COMMENT '播放源',
   `source_url` varchar(1000) CHARACTER SET utf8mb4 COLLATE utf8mb4_general_ci NULL DEFAULT NULL COMMENT '播放地址',
-  `create_time` datetime(0) NULL DEFAULT NULL ON UPDATE CURRENT_TIMESTAMP(0) COMMENT '创建时间',
+  `create_time` datetime(0) NOT NULL DEFAULT CURRENT_TIMESTAMP(0) COMMENT '创建时间',
   `update_time` datetime(0) NULL DEFAULT NULL ON UPDATE CURRENT_TIMESTAMP(0) COMMENT '更新时间',
   `label` varchar(255) CHARACTER SET utf8mb4 COLLATE utf8mb4_general_ci NULL DEFAULT NULL COMMENT '标签',
   `lyrics` text CHARACTER SET utf8mb4 COLLATE utf8mb4_general_ci NULL COMMENT '歌词',
   `permission` int(0) NULL DEFAULT NULL COMMENT '播放权限',
-  PRIMARY KEY (`id`) USING BTREE
+  PRIMARY KEY (`id`) USING BTREE,
+  INDEX `idx_music_hot_time`(`is_hot`, `create_time`, `id`) USING BTREE
 ) ENGINE = InnoDB AUTO_INCREMENT = 100001 CHARACTER SET = utf8mb4 COLLATE = utf8mb4_general_ci COMMENT = '音乐主表id' ROW_FORMAT = Dynamic;
 
+-- 已有库升级：执行 migrations/001_keyset_sort_indexes.sql
+
 -- ----------------------------
 -- Table structure for music_author_category
 -- ----------------------------
@@ -936,12 +984,15 @@ CREATE TABLE `music_classify`  (
   `id` int(0) NOT NULL AUTO_INCREMENT COMMENT '主键',
   `classify_id` int(0) NULL DEFAULT NULL,
   `music_id` int(0) NULL DEFAULT NULL COMMENT '歌曲id',
-  `audio_rank` int(0) NULL DEFAULT NULL COMMENT '歌曲排名，数值越大越靠前',
+  `audio_rank` int(0) NOT NULL DEFAULT 0 COMMENT '歌曲排名，数值越大越靠前',
   `create_time` datetime(0) NULL DEFAULT NULL ON UPDATE CURRENT_TIMESTAMP(0) COMMENT '创建时间',
   `update_time` datetime(0) NULL DEFAULT NULL ON UPDATE CURRENT_TIMESTAMP(0) COMMENT '更新时间',
-  PRIMARY KEY (`id`) USING BTREE
+  PRIMARY KEY (`id`) USING BTREE,
+  INDEX `idx_music_classify_rank`(`classify_id`, `audio_rank`, `id`) USING BTREE
 ) ENGINE = InnoDB AUTO_INCREMENT = 2172 CHARACTER SET = utf8mb4 COLLATE = utf8mb4_general_ci ROW_FORMAT = Dynamic;
 
+-- 已有库升级：执行 migrations/001_keyset_sort_indexes.sql
+
 -- ----------------------------
 -- Table structure for music_classify_relation
 -- ----------------------------
@@ -1120,11 +1171,14 @@ CREATE TABLE `social_comment`  (
   `relation_id` int(0) NOT NULL COMMENT '文章id',
   `type` varchar(32) CHARACTER SET utf8mb4 COLLATE utf8mb4_general_ci NULL DEFAULT NULL COMMENT '类型',
   `user_id` varchar(32) CHARACTER SET utf8mb4 COLLATE utf8mb4_general_ci NULL DEFAULT NULL COMMENT '用户id',
-  `create_time` datetime(0) NULL DEFAULT NULL COMMENT '创建时间',
+  `create_time` datetime(0) NOT NULL DEFAULT CURRENT_TIMESTAMP(0) COMMENT '创建时间',
   `udate_time` datetime(0) NULL DEFAULT NULL COMMENT '更新时间',
-  PRIMARY KEY (`id`) USING BTREE
+  PRIMARY KEY (`id`) USING BTREE,
+  INDEX `idx_relation_type_parent_time`(`relation_id`, `type`, `parent_id`, `create_time`, `id`) USING BTREE
 ) ENGINE = InnoDB AUTO_INCREMENT = 185 CHARACTER SET = utf8mb4 COLLATE = utf8mb4_general_ci COMMENT = '社交评论' ROW_FORMAT = Dynamic;
 
+-- 已有库升级：执行 migrations/001_keyset_sort_indexes.sql
+
 -- ----------------------------
 -- Table structure for social_like
 -- ----------------------------
@@ -1149,6 +1203,7 @@ CREATE TABLE `tenant`  (
   `code` varchar(50) CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci NOT NULL COMMENT '租户编码',
   `description` varchar(255) CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci NULL DEFAULT NULL COMMENT '租户描述',
   `status` tinyint(0) NOT NULL DEFAULT 1 COMMENT '状态：0-禁用，1-启用',
+  `semantic_cache` tinyint(0) NOT NULL DEFAULT 1 COMMENT '语义回答缓存：0-关闭，1-启用',
   `create_date` datetime(0) NOT NULL COMMENT '创建时间',
   `update_date` datetime(0) NULL DEFAULT NULL COMMENT '更新时间',
   `created_by` varchar(32) CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci NOT NULL COMMENT '创建人ID',
@@ -1157,6 +1212,9 @@ CREATE TABLE `tenant`  (
   UNIQUE INDEX `uk_code`(`code`) USING BTREE
 ) ENGINE = InnoDB CHARACTER SET = utf8mb4 COLLATE = utf8mb4_0900_ai_ci COMMENT = '租户表' ROW_FORMAT = Dynamic;
 
+-- 已有库升级：
+-- ALTER TABLE `tenant` ADD COLUMN `semantic_cache` tinyint(0) NOT NULL DEFAULT 1 COMMENT '语义回答缓存：0-关闭，1-启用' AFTER `status`;
+
 -- ----------------------------
 -- Table structure for tenant_user
 -- ----------------------------
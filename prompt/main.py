@@ -3,6 +3,7 @@ from fastapi.middleware.cors import CORSMiddleware
 from prompt.routers import prompt_router
 from common.config.common_database import engine, Base
 from common.utils.service_registry import service_registry
+from common.utils.profiler_util import setup_profiler
 
 Base.metadata.create_all(bind=engine)
 
@@ -18,6 +19,9 @@ app.add_middleware(
 
 app.include_router(prompt_router.router)
 
+# 采样分析器（ENABLE_PROFILER=True 时启用）
+setup_profiler(app, "prompt")
+
 @app.get("/")
 async def root():
     return {"message": "Prompt Service is running"}
@@ -4,6 +4,7 @@ from fastapi.middleware.cors import CORSMiddleware
 from social.routers import social_router
 from common.config.common_database import engine, Base
 from common.utils.service_registry import service_registry
+from common.utils.profiler_util import setup_profiler
 
 # 创建数据库表
 Base.metadata.create_all(bind=engine)
@@ -20,6 +21,9 @@ app.add_middleware(
 
 app.include_router(social_router.router)
 
+# 采样分析器（ENABLE_PROFILER=True 时启用）
+setup_profiler(app, "social")
+
 
 @app.get("/")
 async def root():
@@ -12,6 +12,7 @@ class SocialComment(Base):
         Index("idx_top_id", "top_id"),
         Index("idx_parent_id", "parent_id"),
         Index("idx_user_id", "user_id"),
+        Index("idx_relation_type_parent_time", "relation_id", "type", "parent_id", "create_time", "id"),
         {
             "comment": "社交评论表",
             "mysql_charset": "utf8mb4",
@@ -6,10 +6,17 @@ from sqlalchemy import func, desc, and_, or_, select, text
 from fastapi.logger import logger
 
 from common.models.common_model import UserMode
+from common.utils.pagination_util import SortKey, apply_keyset, build_page
+from common.utils.count_cache_util import invalidate_count
 from social.models.social_model import SocialComment, SocialLike
 from social.schemas.social_schema import CommentSchema, LikeSchema, InsertCommentSchema
 
 
+def comment_count_namespace(type: str, relation_id: int) -> str:
+    """评论总数缓存的命名空间（按资源失效）"""
+    return f"social_comment:{type}:{relation_id}"
+
+
 class SocialRepository:
     """社交数据访问层"""
 
@@ -39,15 +46,67 @@ class SocialRepository:
             logger.error(f"获取评论总数失败: {str(e)}", exc_info=True)
             return 0
 
+    def _top_comment_query(self, relation_id: int, type: str):
+        """一级评论（parent_id IS NULL）基础查询，关联评论者信息"""
+        return self.db.query(
+            SocialComment,
+            UserMode.username,
+            UserMode.avater
+        ).outerjoin(
+            UserMode,
+            SocialComment.user_id == UserMode.id
+        ).filter(
+            SocialComment.relation_id == relation_id,
+            SocialComment.type == type,
+            SocialComment.parent_id.is_(None)
+        )
+
+    def count_top_comments(self, relation_id: int, type: str) -> int:
+        """获取一级评论总数"""
+        return self.db.query(func.count(SocialComment.id)).filter(
+            SocialComment.relation_id == relation_id,
+            SocialComment.type == type,
+            SocialComment.parent_id.is_(None)
+        ).scalar() or 0
+
+    def _build_top_comment_list(self, results) -> List[Dict[str, Any]]:
+        """为一级评论附加回复总数和前5条回复"""
+        comment_list = []
+        for comment, username, avater in results:
+            # 获取回复总数
+            reply_count = self.get_reply_count(comment.id)
+
+            # 获取前5条回复
+            reply_list, _ = self.get_reply_list_by_top_id(comment.id, page_size=5)
+
+            comment_dict = {
+                "id": comment.id,
+                "content": comment.content,
+                "parent_id": comment.parent_id,
+                "top_id": comment.top_id,
+                "relation_id": comment.relation_id,
+                "type": comment.type,
+                "user_id": comment.user_id,
+                "username": username,
+                "avater": avater,
+                "reply_count": reply_count,
+                "reply_list": reply_list,
+                "reply_user_name": None,
+                "create_time": comment.create_time,
+                "update_time": comment.update_time
+            }
+            comment_list.append(comment_dict)
+        return comment_list
+
     def get_top_comments_with_pagination(
             self,
             relation_id: int,
             type: str,
             page_num: int = 1,
             page_size: int = 10
-    ) -> Tuple[List[Dict[str, Any]], int]:
+    ) -> List[Dict[str, Any]]:
         """
-        获取一级评论列表（根评论），包含回复统计和回复列表
+        获取一级评论列表（根评论），包含回复统计和回复列表（总数见 count_top_comments）
 
         Args:
             relation_id: 关联资源ID
@@ -56,70 +115,63 @@ class SocialRepository:
             page_size: 每页数量
 
         Returns:
-            Tuple[List[Dict], int]: (评论列表, 总记录数)
+            List[Dict]: 评论列表
         """
         try:
             offset = (page_num - 1) * page_size
 
-            # 构建基础查询：一级评论（parent_id IS NULL）
-            query = self.db.query(
-                SocialComment,
-                UserMode.username,
-                UserMode.avater
-            ).outerjoin(
-                UserMode,
-                SocialComment.user_id == UserMode.id
-            ).filter(
-                SocialComment.relation_id == relation_id,
-                SocialComment.type == type,
-                SocialComment.parent_id.is_(None)
-            )
-
-            # 查询总数
-            total_query = self.db.query(func.count(SocialComment.id)).filter(
-                SocialComment.relation_id == relation_id,
-                SocialComment.type == type,
-                SocialComment.parent_id.is_(None)
-            )
-            total = total_query.scalar() or 0
-
-            # 分页查询
-            results = query.order_by(
+            results = self._top_comment_query(relation_id, type).order_by(
                 desc(SocialComment.create_time)
             ).offset(offset).limit(page_size).all()
 
-            # 构建结果列表
-            comment_list = []
-            for comment, username, avater in results:
-                # 获取回复总数
-                reply_count = self.get_reply_count(comment.id)
+            return self._build_top_comment_list(results)
 
-                # 获取前5条回复
-                reply_list = self.get_reply_list_by_top_id(comment.id, limit=5)
+        except Exception as e:
+            logger.error(f"获取一级评论列表失败: {str(e)}", exc_info=True)
+            return []
 
-                comment_dict = {
-                    "id": comment.id,
-                    "content": comment.content,
-                    "parent_id": comment.parent_id,
-                    "top_id": comment.top_id,
-                    "relation_id": comment.relation_id,
-                    "type": comment.type,
-                    "user_id": comment.user_id,
-                    "username": username,
-                    "avater": avater,
-                    "reply_count": reply_count,
-                    "reply_list": reply_list,
-                    "reply_user_name": None,
-                    "create_time": comment.create_time,
-                    "update_time": comment.update_time
-                }
-                comment_list.append(comment_dict)
+    # 游标分页的排序键：id 保证唯一（对应索引 idx_relation_type_parent_time）
+    TOP_COMMENT_SORT_KEYS = [
+        SortKey(SocialComment.create_time),
+        SortKey(SocialComment.id),
+    ]
+
+    def get_top_comments_by_cursor(
+            self,
+            relation_id: int,
+            type: str,
+            cursor_values: Optional[List[Any]],
+            scope: str,
+            page_size: int = 10
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        游标分页获取一级评论列表，包含回复统计和回复列表
 
-            return comment_list, total
+        Args:
+            relation_id: 关联资源ID
+            type: 资源类型
+            cursor_values: 已解析的游标值，None 表示第一页
+            scope: 游标作用域（由 service 按筛选条件生成）
+            page_size: 每页数量
+
+        Returns:
+            Tuple[List[Dict], Optional[str]]: (评论列表, 下一页游标)
+        """
+        try:
+            query = self._top_comment_query(relation_id, type)
+            results = apply_keyset(query, self.TOP_COMMENT_SORT_KEYS, cursor_values).limit(page_size + 1).all()
+            results, next_cursor = build_page(
+                results,
+                page_size,
+                self.TOP_COMMENT_SORT_KEYS,
+                lambda row: [row[0].create_time, row[0].id],
+                scope
+            )
+            return self._build_top_comment_list(results), next_cursor
 
         except Exception as e:
-            logger.error(f"获取一级评论列表失败: {str(e)}", exc_info=True)
-            return [], 0
+            logger.error(f"游标获取一级评论列表失败: {str(e)}", exc_info=True)
+            return [], None
 
     def get_reply_count(self, top_id: int) -> int:
         """
@@ -286,6 +338,7 @@ class SocialRepository:
             self.db.add(db_comment)
             self.db.commit()
             self.db.refresh(db_comment)
+            invalidate_count(comment_count_namespace(type, relation_id))
 
             return db_comment
 
@@ -306,11 +359,14 @@ class SocialRepository:
             int: 删除的行数
         """
         try:
+            comment = self.get_comment_by_id(comment_id)
             result = self.db.query(SocialComment).filter(
                 SocialComment.id == comment_id,
                 SocialComment.user_id == user_id
             ).delete()
             self.db.commit()
+            if result and comment:
+                invalidate_count(comment_count_namespace(comment.type, comment.relation_id))
             return result
         except Exception as e:
             self.db.rollback()
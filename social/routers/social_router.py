@@ -40,6 +40,7 @@ async def get_top_comment_list(
         type: str = Query(..., description="资源类型（movie/article/music等）"),
         pageNum: int = Query(1, ge=1, description="页码，从1开始"),
         pageSize: int = Query(10, ge=1, le=100, description="每页数量，最大100"),
+        withTotal: bool = Query(True, description="是否返回总数，不需要时传 false 省去一次统计"),
         social_service: SocialService = Depends()
 ) -> ResultEntity:
     """
@@ -50,7 +51,30 @@ async def get_top_comment_list(
         relation_id=relationId,
         type=type,
         page_num=pageNum,
-        page_size=pageSize
+        page_size=pageSize,
+        with_total=withTotal
+    )
+
+
+@router.get("/getTopCommentListCursor", response_model=ResultEntity)
+async def get_top_comment_list_cursor(
+        relationId: int = Query(..., description="关联资源ID"),
+        type: str = Query(..., description="资源类型（movie/article/music等）"),
+        cursor: Optional[str] = Query(None, description="上一页返回的游标，第一页不传"),
+        pageSize: int = Query(10, ge=1, le=100, description="每页数量，最大100"),
+        withTotal: bool = Query(True, description="是否返回总数（仅第一页生效）"),
+        social_service: SocialService = Depends()
+) -> ResultEntity:
+    """
+    游标分页获取一级评论列表（根评论）
+    与 getTopCommentList 返回相同的数据结构，翻页时传入上一页返回的 cursor
+    """
+    return await social_service.get_top_comment_list_by_cursor(
+        relation_id=relationId,
+        type=type,
+        cursor=cursor,
+        page_size=pageSize,
+        with_total=withTotal
     )
 
 
@@ -6,7 +6,9 @@ from fastapi.logger import logger
 
 from common.config.common_database import get_db
 from common.utils.result_util import ResultEntity, ResultUtil
-from social.repositories.social_repository import SocialRepository
+from common.utils.pagination_util import CursorError, decode_cursor
+from common.utils.count_cache_util import fetch_page_with_total, get_cached_count
+from social.repositories.social_repository import SocialRepository, comment_count_namespace
 from social.schemas.social_schema import InsertCommentSchema, CommentSchema, LikeRequestSchema
 
 
@@ -36,7 +38,11 @@ class SocialService:
             if not type or not type.strip():
                 return ResultUtil.fail(msg="资源类型不能为空", data=None)
 
-            count = self.repository.get_comment_count(relation_id, type)
+            count = get_cached_count(
+                comment_count_namespace(type, relation_id),
+                {"level": "all"},
+                lambda: self.repository.get_comment_count(relation_id, type)
+            )
 
             return ResultUtil.success(data=count)
 
@@ -49,7 +55,8 @@ class SocialService:
             relation_id: int,
             type: str,
             page_num: int = 1,
-            page_size: int = 10
+            page_size: int = 10,
+            with_total: bool = True
     ) -> ResultEntity:
         """
         获取一级评论列表（根评论）
@@ -59,6 +66,7 @@ class SocialService:
             type: 资源类型
             page_num: 页码
             page_size: 每页数量
+            with_total: 是否返回总数
 
         Returns:
             ResultEntity: 评论列表
@@ -78,11 +86,15 @@ class SocialService:
             if page_size > 100:
                 page_size = 100
 
-            comment_list, total = self.repository.get_top_comments_with_pagination(
-                relation_id=relation_id,
-                type=type,
-                page_num=page_num,
-                page_size=page_size
+            comment_list, total = await fetch_page_with_total(
+                lambda: self.repository.get_top_comments_with_pagination(
+                    relation_id=relation_id,
+                    type=type,
+                    page_num=page_num,
+                    page_size=page_size
+                ),
+                **self._top_comment_total_args(relation_id, type),
+                with_total=with_total
             )
 
             return ResultUtil.success(data=comment_list, total=total)
@@ -91,6 +103,68 @@ class SocialService:
             logger.error(f"获取一级评论列表失败: {str(e)}", exc_info=True)
             return ResultUtil.fail(msg=f"获取评论列表失败: {str(e)}", data=None)
 
+    @staticmethod
+    def _top_comment_total_args(relation_id: int, type: str) -> Dict[str, Any]:
+        """一级评论总数的缓存命名空间、筛选条件与统计函数"""
+        return {
+            "namespace": comment_count_namespace(type, relation_id),
+            "filters": {"level": "top"},
+            "count": lambda db: SocialRepository(db).count_top_comments(relation_id, type),
+        }
+
+    async def get_top_comment_list_by_cursor(
+            self,
+            relation_id: int,
+            type: str,
+            cursor: Optional[str] = None,
+            page_size: int = 10,
+            with_total: bool = True
+    ) -> ResultEntity:
+        """
+        游标分页获取一级评论列表（总数只在第一页统计）
+
+        Args:
+            relation_id: 关联资源ID
+            type: 资源类型
+            cursor: 上一页返回的游标，None 表示第一页
+            page_size: 每页数量
+            with_total: 是否返回总数
+
+        Returns:
+            ResultEntity: 评论列表，cursor 为下一页游标
+        """
+        try:
+            if relation_id <= 0:
+                return ResultUtil.fail(msg="关联资源ID不能为空", data=None)
+
+            if not type or not type.strip():
+                return ResultUtil.fail(msg="资源类型不能为空", data=None)
+
+            page_size = min(max(page_size, 1), 100)
+
+            scope = f"social.top_comment:{type}:{relation_id}"
+            cursor_values = decode_cursor(cursor, scope, len(self.repository.TOP_COMMENT_SORT_KEYS))
+
+            (comment_list, next_cursor), total = await fetch_page_with_total(
+                lambda: self.repository.get_top_comments_by_cursor(
+                    relation_id=relation_id,
+                    type=type,
+                    cursor_values=cursor_values,
+                    scope=scope,
+                    page_size=page_size
+                ),
+                **self._top_comment_total_args(relation_id, type),
+                with_total=with_total and cursor_values is None
+            )
+
+            return ResultUtil.success(data=comment_list, total=total, cursor=next_cursor)
+
+        except CursorError as e:
+            return ResultUtil.fail(msg=str(e), data=None)
+        except Exception as e:
+            logger.error(f"游标获取一级评论列表失败: {str(e)}", exc_info=True)
+            return ResultUtil.fail(msg=f"获取评论列表失败: {str(e)}", data=None)
+
     async def get_reply_comment_list(
             self,
             top_id: int,
@@ -1,14 +1,33 @@
 # tenant/main.py
+import logging
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from tenant.routers import tenants_router
 from common.config.common_database import engine, Base
 from common.utils.service_registry import service_registry
+from common.utils.profiler_util import setup_profiler
+from common.utils.redis_util import REDIS  # 注册进程级共享 Redis 连接池
+from common.utils.service_container import service_container
+
+logger = logging.getLogger(__name__)
 
 # 创建数据库表
 Base.metadata.create_all(bind=engine)
 
-app = FastAPI(title="Tenant Service", version="1.0.0")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    logger.info("Tenant Service启动中...")
+    service_container.warm_up(REDIS)
+    yield
+    # 释放进程级共享资源
+    service_container.shutdown()
+    logger.info("Tenant Service关闭...")
+
+
+app = FastAPI(title="Tenant Service", version="1.0.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -20,6 +39,9 @@ app.add_middleware(
 
 app.include_router(tenants_router.router)
 
+# 采样分析器（ENABLE_PROFILER=True 时启用）
+setup_profiler(app, "tenant")
+
 @app.get("/")
 async def root():
     return {"message": "Tenant Service is running"}
@@ -16,6 +16,7 @@ class TenantModel(Base):
     code = Column(String(50), nullable=False, comment='租户编码')
     description = Column(String(255), comment='租户描述')
     status = Column(SmallInteger, default=1, comment='状态：0-禁用，1-启用')
+    semantic_cache = Column(SmallInteger, default=1, comment='语义回答缓存：0-关闭，1-启用')
     create_date = Column(DateTime, nullable=False, comment='创建时间')
     update_date = Column(DateTime, comment='更新时间')
     created_by = Column(String(32), nullable=False, comment='创建人ID')
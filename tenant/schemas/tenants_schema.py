@@ -10,6 +10,7 @@ class TenantSchema(BaseModel):
     code: str
     description: Optional[str] = None
     status: int = 1
+    semantic_cache: Optional[int] = 1
     create_date: Optional[datetime] = None
     update_date: Optional[datetime] = None
     role: Optional[int] = None
@@ -51,6 +52,7 @@ class TenantUpdateSchema(BaseModel):
     name: Optional[str] = None
     code: Optional[str] = None
     description: Optional[str] = None
+    semantic_cache: Optional[int] = Field(None, ge=0, le=1, description="语义回答缓存：0-关闭，1-启用")
 
 
 class TenantUserRoleSchema(BaseModel):
@@ -6,17 +6,14 @@ from sqlalchemy.orm import Session
 from tenant.repositories.tenants_repository import TenantsRepository
 from tenant.schemas.tenants_schema import TenantUpdateSchema, TenantCreateSchema, TenantUserSchema
 from common.config.common_database import get_db
-import redis
 from fastapi.logger import logger
 from common.utils.result_util import ResultEntity, ResultUtil
-import os
-
-REDIS_URL = os.getenv("REDIS_URL")
+from common.utils.redis_util import get_redis
 
 class TenantsService:
     def __init__(self, db: Session = Depends(get_db)):
         self.tenants_repository = TenantsRepository(db)
-        self.redis = redis.Redis.from_url(REDIS_URL)
+        self.redis = get_redis()
 
     async def get_tenant_list(self, user_id: str, company_id: str = None) -> ResultEntity:
         """获取用户所属的所有租户，支持按企业ID筛选"""
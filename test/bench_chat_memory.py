@@ -0,0 +1,120 @@
+# test/bench_chat_memory.py
+"""
+会话记忆读写基准测试
+
+对比两种方式在不同历史长度、消息长度下每轮对话的读取与保存耗时：
+- before: 整段历史 str(list) 存入字符串键，读取时 eval，每轮整段重写（旧实现）
+- after:  ChatMemory，JSON 消息追加到 Redis 列表，RPUSH + LTRIM / LRANGE 各一次 pipeline
+
+运行方式（默认连接 REDIS_URL；没有 Redis 时加 --fake 使用 fakeredis）:
+    python test/bench_chat_memory.py --iterations 200
+    python test/bench_chat_memory.py --fake --sizes 10,20,50,100 --message-chars 200,2000
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+import uuid
+from pathlib import Path
+
+# ============ 重要：添加项目根目录到 Python 路径 ============
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+# ============================================================
+
+import redis
+from dotenv import load_dotenv
+
+# chat_memory_util 在导入时读取 CHAT_MEMORY_* 配置，需先加载 .env
+load_dotenv(project_root / ".env")
+from common.utils.chat_memory_util import ChatMemory  # noqa: E402
+
+
+def legacy_turn(client, key, max_messages, prompt, answer):
+    """旧实现：读取整段历史 eval，再整段写回"""
+    raw = client.get(key)
+    messages = [("system", "system prompt")]
+    if raw:
+        messages.extend(eval(raw.decode("utf-8")))
+    messages.append(("human", prompt))
+    load_done = time.perf_counter()
+    messages.append(("ai", answer))
+    messages = messages[-max_messages:]
+    client.setex(key, 180 * 86400, str(messages))
+    return load_done
+
+
+def memory_turn(memory, user_id, chat_id, prompt, answer):
+    """新实现：LRANGE 读取，RPUSH + LTRIM 追加本轮问答"""
+    memory.load(user_id, chat_id)
+    load_done = time.perf_counter()
+    memory.append(user_id, chat_id, ("human", prompt), ("ai", answer))
+    return load_done
+
+
+def summarize(label, loads, saves):
+    def p95(values):
+        ordered = sorted(values)
+        return ordered[max(int(len(ordered) * 0.95) - 1, 0)]
+
+    print(
+        f"  {label:<7} load p50={statistics.median(loads):7.3f}ms p95={p95(loads):7.3f}ms   "
+        f"save p50={statistics.median(saves):7.3f}ms p95={p95(saves):7.3f}ms"
+    )
+
+
+def run_case(client, history_size, message_chars, iterations):
+    prompt = "问" * (message_chars // 2)
+    answer = "答" * message_chars
+    user_id = "bench-" + uuid.uuid4().hex[:8]
+    chat_id = uuid.uuid4().hex
+    memory = ChatMemory("bench", client, max_messages=history_size)
+    legacy_key = f"bench_chat_history:{user_id}:{chat_id}"
+
+    # 预热到满窗口，测量稳定状态下每轮的开销
+    for _ in range(history_size // 2 + 1):
+        legacy_turn(client, legacy_key, history_size, prompt, answer)
+        memory_turn(memory, user_id, chat_id, prompt, answer)
+
+    results = {}
+    for label, turn in (
+            ("before", lambda: legacy_turn(client, legacy_key, history_size, prompt, answer)),
+            ("after", lambda: memory_turn(memory, user_id, chat_id, prompt, answer)),
+    ):
+        loads, saves = [], []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            load_done = turn()
+            end = time.perf_counter()
+            loads.append((load_done - start) * 1000)
+            saves.append((end - load_done) * 1000)
+        results[label] = (loads, saves)
+
+    client.delete(legacy_key, memory.key(user_id, chat_id))
+    print(f"history={history_size} messages, message={message_chars} chars")
+    for label, (loads, saves) in results.items():
+        summarize(label, loads, saves)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="会话记忆读写基准测试")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--sizes", default="10,20,50,100", help="历史消息条数，逗号分隔")
+    parser.add_argument("--message-chars", default="200,2000", help="单条回答字符数，逗号分隔")
+    parser.add_argument("--fake", action="store_true", help="使用进程内 fakeredis（结果不含网络往返）")
+    args = parser.parse_args()
+
+    if args.fake:
+        import fakeredis
+        client = fakeredis.FakeRedis()
+    else:
+        client = redis.Redis.from_url(os.getenv("REDIS_URL"))
+
+    for size in [int(v) for v in args.sizes.split(",")]:
+        for chars in [int(v) for v in args.message_chars.split(",")]:
+            run_case(client, size, chars, args.iterations)
+
+
+if __name__ == "__main__":
+    main()
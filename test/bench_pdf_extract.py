@@ -0,0 +1,150 @@
+# test/bench_pdf_extract.py
+"""
+PDF 文本提取基准测试
+
+对比同一份 PDF（默认生成 500 页）在不同方式下的提取耗时与父进程内存峰值：
+- before:   PdfReader 逐页提取，full_text += 拼接（旧实现）
+- serial:   iter_pdf_text 单进程按区间提取（PDF_EXTRACT_WORKERS=1 的行为）
+- parallel: iter_pdf_text 进程池并行提取，--workers 指定进程数
+- plumber:  pdfplumber 并行提取（已安装 pdfplumber 且指定 --plumber 时）
+
+加 --memory 时额外统计父进程 tracemalloc 的 Python 对象峰值（不含子进程），
+parallel 方式逐段消费，只统计字符数不保留文本，对应入库流水线的真实用法。
+
+运行方式:
+    python test/bench_pdf_extract.py                       # 生成 500 页测试 PDF
+    python test/bench_pdf_extract.py --pages 1000 --workers 2,4,8
+    python test/bench_pdf_extract.py --file /path/to/real.pdf --plumber
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+
+# ============ 重要：添加项目根目录到 Python 路径 ============
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+# ============================================================
+
+from pypdf import PdfReader
+
+from chat.utils import pdf_util
+
+LOREM = (
+    "Retrieval augmented generation splits documents into chunks and embeds them. "
+    "Each page of this synthetic document contains several lines of plain text "
+    "so that text extraction has realistic work to do. "
+)
+
+
+def generate_pdf(path: str, pages: int, lines_per_page: int = 45) -> None:
+    """生成 N 页纯文本 PDF（Helvetica 字体，不依赖第三方写 PDF 的库）"""
+    objects = []
+
+    def add(body: bytes) -> int:
+        objects.append(body)
+        return len(objects)
+
+    font_id = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    pages_id = len(objects) + 1 + pages * 2
+    page_ids = []
+    for page_num in range(1, pages + 1):
+        lines = [f"Page {page_num} line {i}: {LOREM[(i * 7) % 60:][:90]}" for i in range(lines_per_page)]
+        text_ops = "\n".join(f"({line}) Tj T*" for line in lines)
+        stream = f"BT /F1 10 Tf 12 TL 40 800 Td\n{text_ops}\nET".encode("latin-1")
+        content_id = add(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        page_ids.append(add(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>" % (pages_id, font_id, content_id)
+        ))
+    kids = b" ".join(b"%d 0 R" % page_id for page_id in page_ids)
+    add(b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, pages))
+    catalog_id = add(b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id)
+
+    with open(path, "wb") as f:
+        f.write(b"%PDF-1.4\n")
+        offsets = []
+        for index, body in enumerate(objects, start=1):
+            offsets.append(f.tell())
+            f.write(b"%d 0 obj\n" % index + body + b"\nendobj\n")
+        xref = f.tell()
+        f.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+        for offset in offsets:
+            f.write(b"%010d 00000 n \n" % offset)
+        f.write(b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+            len(objects) + 1, catalog_id, xref))
+
+
+def legacy_extract(path: str) -> int:
+    """旧实现：逐页提取，字符串累加"""
+    pdf_reader = PdfReader(path)
+    full_text = ""
+    for page_num, page in enumerate(pdf_reader.pages, start=1):
+        page_text = page.extract_text()
+        if page_text:
+            full_text += f"Page {page_num}:\n{page_text}\n\n"
+    return len(full_text)
+
+
+def streamed_extract(path: str, extractor: str, executor=None) -> int:
+    return sum(len(part) for part in pdf_util.iter_pdf_text(path, extractor=extractor, executor=executor))
+
+
+def measure(label: str, func, memory: bool):
+    start = time.perf_counter()
+    chars = func()
+    elapsed = time.perf_counter() - start
+    line = f"  {label:<14} {elapsed * 1000:9.1f}ms   chars={chars:>9}"
+    if memory:
+        # tracemalloc 会明显拖慢父进程内的提取，单独再跑一遍只统计内存峰值
+        tracemalloc.start()
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        line += f"   peak={peak / 1024 / 1024:7.1f}MB"
+    print(line)
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PDF 文本提取基准测试")
+    parser.add_argument("--file", help="使用已有的 PDF（默认生成测试文件）")
+    parser.add_argument("--pages", type=int, default=500, help="生成的测试 PDF 页数")
+    parser.add_argument("--workers", default="2,4", help="并行进程数，逗号分隔")
+    parser.add_argument("--plumber", action="store_true", help="同时测试 pdfplumber")
+    parser.add_argument("--memory", action="store_true", help="额外统计父进程内存峰值（每种方式多跑一遍）")
+    args = parser.parse_args()
+
+    path = args.file
+    if not path:
+        path = os.path.join(tempfile.mkdtemp(prefix="bench_pdf_"), f"bench_{args.pages}.pdf")
+        generate_pdf(path, args.pages)
+    print(f"file={path}, pages={pdf_util.count_pages(path)}, size={os.path.getsize(path) / 1024:.0f}KB")
+
+    # 并行阈值设为 0，保证任意页数都走进程池
+    pdf_util.PDF_PARALLEL_MIN_PAGES = 0
+
+    before = measure("before", lambda: legacy_extract(path), args.memory)
+    pdf_util.PDF_EXTRACT_WORKERS = 1
+    measure("serial", lambda: streamed_extract(path, "pypdf"), args.memory)
+
+    extractors = ["pypdf"] + (["pdfplumber"] if args.plumber and pdf_util.pdfplumber else [])
+    for extractor in extractors:
+        for workers in [int(v) for v in args.workers.split(",")]:
+            pdf_util.PDF_EXTRACT_WORKERS = workers
+            with ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn")) as executor:
+                # 预热：进程启动与模块导入不计入耗时
+                list(executor.map(pdf_util.count_pages, [path] * workers))
+                label = f"{'parallel' if extractor == 'pypdf' else 'plumber'} x{workers}"
+                elapsed = measure(label, lambda: streamed_extract(path, extractor, executor), args.memory)
+            if extractor == "pypdf":
+                print(f"  {'':<14} speedup vs before: {before / elapsed:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
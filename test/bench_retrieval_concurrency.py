@@ -0,0 +1,130 @@
+# test/bench_retrieval_concurrency.py
+"""
+文档检索并发测试
+
+模拟 N 个文档对话同时检索，对比：
+- before: 在 async 方法中直接同步调用 similarity_search_with_score（旧实现，阻塞事件循环）
+- after:  VectorRetriever（嵌入与查询在检索线程池 / 异步客户端中执行）
+
+嵌入模型替换为固定延迟的同步实现（模拟请求 Ollama 的网络往返），向量库使用内存 Chroma，
+同时运行一个每 10ms 醒来一次的心跳协程，统计事件循环的最大延迟。
+旧实现的总耗时约为 N × 嵌入延迟，事件循环被阻塞；新实现应接近单次耗时，心跳不受影响。
+
+运行方式:
+    python test/bench_retrieval_concurrency.py
+    python test/bench_retrieval_concurrency.py --concurrency 16 --embed-ms 200 --workers 8
+"""
+import argparse
+import asyncio
+import hashlib
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# ============ 重要：添加项目根目录到 Python 路径 ============
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+# ============================================================
+
+import chromadb
+from langchain_chroma import Chroma
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from chat.utils.chroma_util import EMBEDDING, VECTOR_STORE
+from chat.utils.retrieval_util import VectorRetriever
+from common.utils.service_container import service_container
+
+DIM = 64
+
+
+class SlowEmbeddings(Embeddings):
+    """同步阻塞的伪嵌入模型，每次调用固定延迟"""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+
+    @staticmethod
+    def _vector(text: str):
+        digest = hashlib.sha256(text.encode("utf-8")).digest()
+        return [digest[i % len(digest)] / 255.0 for i in range(DIM)]
+
+    def embed_documents(self, texts):
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text):
+        time.sleep(self.delay)
+        return self._vector(text)
+
+
+async def heartbeat(stop: asyncio.Event, lags: list):
+    """每 10ms 醒来一次，记录实际醒来时间与预期的偏差"""
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(0.01)
+        lags.append(time.perf_counter() - start - 0.01)
+
+
+async def run(label: str, search, concurrency: int):
+    stop = asyncio.Event()
+    lags = []
+    beat = asyncio.create_task(heartbeat(stop, lags))
+    await asyncio.sleep(0.05)
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(search(f"问题{i}") for i in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    await beat
+    assert all(results), "检索结果为空"
+    print(f"  {label:<7} total={elapsed * 1000:8.1f}ms  max_loop_lag={max(lags) * 1000:8.1f}ms")
+    return elapsed, max(lags)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="文档检索并发测试")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--embed-ms", type=float, default=100)
+    parser.add_argument("--workers", type=int, default=8, help="检索线程池大小")
+    args = parser.parse_args()
+
+    embedding = SlowEmbeddings(args.embed_ms / 1000)
+    vector_store = Chroma(
+        client=chromadb.EphemeralClient(),
+        collection_name="bench_retrieval",
+        embedding_function=embedding,
+        collection_metadata={"hnsw:space": "cosine"}
+    )
+    vector_store.add_documents([
+        Document(page_content=f"片段{i}", metadata={"user_id": "bench", "doc_id": str(i % 5)})
+        for i in range(200)
+    ])
+    service_container.register(EMBEDDING, lambda: embedding)
+    service_container.register(VECTOR_STORE, lambda: vector_store)
+
+    async def blocking_search(query):
+        return vector_store.similarity_search_with_score(query, k=5, filter={"user_id": "bench"})
+
+    retriever = VectorRetriever(ThreadPoolExecutor(max_workers=args.workers), use_async_client=False)
+
+    async def retriever_search(query):
+        timer = retriever.timer()
+        vector = await retriever.embed(query, timer)
+        return await retriever.search(vector, k=5, where={"user_id": "bench"}, timer=timer)
+
+    print(f"concurrency={args.concurrency}, embed={args.embed_ms}ms, workers={args.workers}")
+    before, _ = await run("before", blocking_search, args.concurrency)
+    after, after_lag = await run("after", retriever_search, args.concurrency)
+
+    # 线程池足够时，N 个检索应并行完成，而不是串行累加
+    batches = -(-args.concurrency // args.workers)
+    expected = batches * args.embed_ms / 1000
+    assert after < max(expected * 2, before * 0.6), f"并发检索仍被串行执行: {after:.3f}s"
+    assert after_lag < args.embed_ms / 1000, f"事件循环被阻塞: {after_lag * 1000:.1f}ms"
+    print("OK: 并发检索未被串行化，事件循环未被阻塞")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,98 @@
+# test/bench_service_overhead.py
+"""
+ChatService 每请求构造开销基准测试
+
+对比两种方式：
+- before: 每个请求重新创建 Redis 客户端、嵌入模型、Chroma 客户端与向量存储（旧实现）
+- after:  每个请求只构造轻量的 ChatService，重量级对象从进程级 service_container 获取
+
+运行方式（需本地可用的 Redis；Chroma 无 HTTP 服务时回退到本地持久化目录）:
+    python test/bench_service_overhead.py --iterations 200
+"""
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+# ============ 重要：添加项目根目录到 Python 路径 ============
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+# ============================================================
+
+from common.config.common_database import SessionLocal
+from common.utils.redis_util import REDIS, _close_redis, _create_redis
+from common.utils.service_container import ServiceContainer, service_container
+from chat.utils import chroma_util
+from chat.services.chat_service import ChatService
+
+
+def per_request_before(db):
+    """模拟旧实现：每个请求各自创建全部协作对象"""
+    container = ServiceContainer()
+    container.register(REDIS, _create_redis, _close_redis)
+    container.register(chroma_util.CHROMA_CLIENT, chroma_util.create_chroma_client)
+    container.register(chroma_util.EMBEDDING, chroma_util.create_embedding_model)
+    redis_client = container.get(REDIS)
+    client = container.get(chroma_util.CHROMA_CLIENT)
+    embedding = container.get(chroma_util.EMBEDDING)
+    from langchain_chroma import Chroma
+    vector_store = Chroma(
+        client=client,
+        collection_name=chroma_util.CHROMA_COLLECTION_NAME,
+        embedding_function=embedding,
+        collection_metadata={"hnsw:space": "cosine"}
+    )
+    try:
+        redis_client.ping()
+        return vector_store
+    finally:
+        # 旧实现的每请求连接池在请求结束后随对象回收；这里显式断开，避免连接池与 socket 在循环中累积
+        container.shutdown()
+
+
+def per_request_after(db):
+    """新实现：ChatService 按请求构造，重量级对象进程内共享"""
+    chat_service = ChatService(db)
+    chat_service.redis.ping()
+    return chat_service._get_chroma_store()
+
+
+def run(label, func, iterations):
+    db = SessionLocal()
+    timings = []
+    try:
+        for _ in range(iterations):
+            start = time.perf_counter()
+            func(db)
+            timings.append((time.perf_counter() - start) * 1000)
+    finally:
+        db.close()
+
+    timings.sort()
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    print(
+        f"{label:<8} n={iterations:<5} "
+        f"mean={statistics.mean(timings):8.3f}ms  "
+        f"p50={statistics.median(timings):8.3f}ms  "
+        f"p95={p95:8.3f}ms  "
+        f"max={timings[-1]:8.3f}ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ChatService 每请求构造开销基准测试")
+    parser.add_argument("--iterations", type=int, default=100, help="每种方式的请求次数")
+    args = parser.parse_args()
+
+    # 预热共享实例，避免首次创建计入 after 的统计
+    service_container.warm_up(REDIS, chroma_util.VECTOR_STORE)
+
+    run("before", per_request_before, args.iterations)
+    run("after", per_request_after, args.iterations)
+
+    service_container.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+# test/chroma_maintenance.py
+"""
+向量库维护命令行（实现见 chat/utils/vector_maintenance_util.py，chat 服务的定时维护使用同一套逻辑）
+
+合并了原来的 chroma_backup.py / chroma_recovery.py / chroma_delete.py / chroma_query.py：
+
+    stats      各集合与各租户的向量数、文档数、磁盘占用
+    orphans    检测孤儿向量（chat_doc 中已不存在的文档的片段），加 --delete 批量删除
+    compact    对本地持久化目录的 chroma.sqlite3 执行 VACUUM（需先停止 Chroma 服务与 chat 服务）
+    rebuild    复制后替换集合，重建向量索引（完成后需重启 chat 服务）
+    backup     把集合完整复制到备份集合（--delete-source 复制后删除源集合）
+    restore    从备份集合恢复（默认先删除已存在的目标集合）
+    drop       删除集合
+    query      查看集合中的片段，或按文本语义检索（使用 chat 服务的嵌入模型）
+
+运行方式:
+    python test/chroma_maintenance.py stats
+    python test/chroma_maintenance.py --path ./chroma_db stats
+    python test/chroma_maintenance.py orphans
+    python test/chroma_maintenance.py orphans --delete
+    python test/chroma_maintenance.py --path ./chroma_db compact
+    python test/chroma_maintenance.py rebuild chat_t_personal
+    python test/chroma_maintenance.py backup chat_vector_collection chat_vector_collection_backup
+    python test/chroma_maintenance.py restore chat_vector_collection_backup chat_vector_collection
+    python test/chroma_maintenance.py drop chat_vector_collection
+    python test/chroma_maintenance.py query chat_t_personal --text 准考证 --limit 5
+
+连接方式：传 --path 时使用本地持久化目录，否则连接 --host/--port（默认 CHROMA_HOST/CHROMA_PORT）的 Chroma 服务；
+stats 的磁盘占用与 compact 需要能访问持久化目录（HTTP 服务时用 --path 指向服务端的持久化目录，只读统计）。
+"""
+import argparse
+import json
+import logging
+import sys
+from pathlib import Path
+
+# ============ 重要：添加项目根目录到 Python 路径 ============
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+# ============================================================
+
+import chromadb
+
+from chat.utils.chroma_util import CHROMA_HOST, CHROMA_PORT, EMBEDDING
+from chat.utils.vector_maintenance_util import VectorMaintenance, copy_collection, list_collection_names
+from common.utils.service_container import service_container
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def _size(value) -> str:
+    if value is None:
+        return "-"
+    for unit in ("B", "KB", "MB", "GB"):
+        if value < 1024 or unit == "GB":
+            return f"{value:.0f}{unit}" if unit == "B" else f"{value:.1f}{unit}"
+        value /= 1024
+
+
+def cmd_stats(maintenance: VectorMaintenance, args) -> int:
+    stats = maintenance.collection_stats(args.collection or None)
+    tenants = maintenance.tenant_stats(stats)
+    if args.json:
+        print(json.dumps({"collections": stats, "tenants": tenants, "sqlite_bytes": maintenance.sqlite_size()},
+                         ensure_ascii=False, indent=2))
+        return 0
+    print(f"{'collection':<48}{'tenant':<20}{'vectors':>10}{'docs':>8}{'size':>10}")
+    print("-" * 96)
+    for item in stats:
+        print(f"{item['collection']:<48}{item['tenant_id'] or '-':<20}{item['vectors']:>10}{item['docs']:>8}"
+              f"{_size(item['bytes']):>10}")
+    print()
+    print(f"{'tenant':<20}{'collections':>12}{'vectors':>10}{'docs':>8}{'size':>10}")
+    print("-" * 60)
+    for item in tenants:
+        print(f"{item['tenant_id'] or '-':<20}{item['collections']:>12}{item['vectors']:>10}{item['docs']:>8}"
+              f"{_size(item['bytes']):>10}")
+    print(f"\nchroma.sqlite3: {_size(maintenance.sqlite_size())}")
+    return 0
+
+
+def cmd_orphans(maintenance: VectorMaintenance, args) -> int:
+    reports = maintenance.delete_orphans(args.collection or None, dry_run=not args.delete, force=args.force)
+    skipped = False
+    for report in reports:
+        status = "skipped(ratio)" if report.skipped else f"deleted {report.deleted}" if args.delete else "dry-run"
+        print(f"{report.collection}: total={report.total}, orphan_docs={len(report.orphan_docs)}, "
+              f"orphan_vectors={len(report.orphan_ids)} ({report.ratio:.1%}), unlabeled={report.unlabeled}, {status}")
+        for doc_id, count in sorted(report.orphan_docs.items(), key=lambda item: -item[1])[:args.show]:
+            print(f"    {doc_id}: {count}")
+        skipped = skipped or report.skipped
+    if not args.delete and any(report.orphan_ids for report in reports):
+        print("\n加 --delete 删除以上孤儿向量")
+    return 1 if skipped else 0
+
+
+def cmd_compact(maintenance: VectorMaintenance, args) -> int:
+    result = maintenance.compact()
+    print(f"chroma.sqlite3: {_size(result['before'])} -> {_size(result['after'])}")
+    return 0
+
+
+def cmd_rebuild(maintenance: VectorMaintenance, args) -> int:
+    for name in args.collection:
+        count = maintenance.rebuild(name)
+        print(f"{name}: 已重建 {count} 条")
+    print("集合 id 已变化，请重启 chat 服务")
+    return 0
+
+
+def cmd_backup(maintenance: VectorMaintenance, args) -> int:
+    client = maintenance.client
+    source = client.get_collection(args.source)
+    expected = source.count()
+    copied = copy_collection(client, source, args.target, page_size=maintenance.batch_size)
+    if copied != expected:
+        logger.error(f"复制条数 {copied} 与源集合 {expected} 不一致，保留源集合")
+        return 1
+    if args.delete_source:
+        client.delete_collection(args.source)
+        logger.info(f"源集合 '{args.source}' 已删除")
+    return 0
+
+
+def cmd_restore(maintenance: VectorMaintenance, args) -> int:
+    client = maintenance.client
+    backup = client.get_collection(args.backup)
+    if not args.keep_target and args.target in list_collection_names(client):
+        client.delete_collection(args.target)
+        logger.info(f"目标集合 '{args.target}' 已存在，已将其删除准备重建")
+    copied = copy_collection(client, backup, args.target, page_size=maintenance.batch_size)
+    return 0 if copied == backup.count() else 1
+
+
+def cmd_drop(maintenance: VectorMaintenance, args) -> int:
+    for name in args.collection:
+        maintenance.client.delete_collection(name)
+        logger.info(f"集合 '{name}' 已删除")
+    return 0
+
+
+def cmd_query(maintenance: VectorMaintenance, args) -> int:
+    collection = maintenance.client.get_collection(args.collection)
+    where = {"doc_id": args.doc_id} if args.doc_id else None
+    if args.text:
+        # 与入库使用同一个嵌入模型，集合自带的默认嵌入函数与入库时的向量不在同一空间
+        vector = service_container.get(EMBEDDING).embed_query(args.text)
+        results = collection.query(
+            query_embeddings=[vector], n_results=args.limit, where=where,
+            include=["documents", "metadatas", "distances"]
+        )
+        rows = zip(results["documents"][0], results["metadatas"][0], results["distances"][0])
+    else:
+        results = collection.get(limit=args.limit, where=where, include=["documents", "metadatas"])
+        rows = ((doc, metadata, None) for doc, metadata in zip(results["documents"], results["metadatas"]))
+    for i, (doc, metadata, distance) in enumerate(rows, 1):
+        print(f"{i}. {metadata}" + (f"  distance={distance:.4f}" if distance is not None else ""))
+        print(f"   {(doc or '')[:200]}")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="向量库维护")
+    parser.add_argument("--host", default=CHROMA_HOST or "localhost", help="ChromaDB 服务地址")
+    parser.add_argument("--port", type=int, default=CHROMA_PORT, help="ChromaDB 端口")
+    parser.add_argument("--path", help="本地持久化目录（传入时不连接 HTTP 服务）")
+    parser.add_argument("--batch-size", type=int, default=None, help="分页读取与批量删除的条数")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("stats", help="各集合与各租户的统计")
+    p.add_argument("collection", nargs="*", help="集合名，默认全部")
+    p.add_argument("--json", action="store_true", help="以 JSON 输出")
+    p.set_defaults(handler=cmd_stats)
+
+    p = sub.add_parser("orphans", help="检测（--delete 删除）孤儿向量")
+    p.add_argument("collection", nargs="*", help="集合名，默认全部")
+    p.add_argument("--delete", action="store_true", help="删除检测到的孤儿向量")
+    p.add_argument("--force", action="store_true", help="孤儿占比超过 VECTOR_ORPHAN_MAX_RATIO 时仍然删除")
+    p.add_argument("--show", type=int, default=10, help="每个集合列出的孤儿文档数")
+    p.set_defaults(handler=cmd_orphans)
+
+    p = sub.add_parser("compact", help="VACUUM chroma.sqlite3（需 --path）")
+    p.set_defaults(handler=cmd_compact)
+
+    p = sub.add_parser("rebuild", help="复制后替换集合，重建向量索引")
+    p.add_argument("collection", nargs="+", help="集合名")
+    p.set_defaults(handler=cmd_rebuild)
+
+    p = sub.add_parser("backup", help="把集合完整复制到备份集合")
+    p.add_argument("source", help="源集合名")
+    p.add_argument("target", help="备份集合名")
+    p.add_argument("--delete-source", action="store_true", help="复制并校验条数后删除源集合")
+    p.set_defaults(handler=cmd_backup)
+
+    p = sub.add_parser("restore", help="从备份集合恢复")
+    p.add_argument("backup", help="备份集合名")
+    p.add_argument("target", help="恢复到的集合名")
+    p.add_argument("--keep-target", action="store_true", help="目标集合已存在时不删除，直接 upsert")
+    p.set_defaults(handler=cmd_restore)
+
+    p = sub.add_parser("drop", help="删除集合")
+    p.add_argument("collection", nargs="+", help="集合名")
+    p.set_defaults(handler=cmd_drop)
+
+    p = sub.add_parser("query", help="查看或语义检索集合中的片段")
+    p.add_argument("collection", help="集合名")
+    p.add_argument("--text", help="检索文本，不传时按存储顺序列出片段")
+    p.add_argument("--doc-id", help="只看该文档的片段")
+    p.add_argument("--limit", type=int, default=5, help="返回条数")
+    p.set_defaults(handler=cmd_query)
+
+    args = parser.parse_args()
+    client = chromadb.PersistentClient(path=args.path) if args.path else chromadb.HttpClient(host=args.host, port=args.port)
+    options = {"client": client, "persist_dir": args.path}
+    if args.batch_size:
+        options["batch_size"] = args.batch_size
+    sys.exit(args.handler(VectorMaintenance(**options), args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+# test/chroma_shard_migrate.py
+"""
+把全局集合中的片段迁移到按租户分片的集合（见 chat/utils/collection_util.py）
+
+在整集合复制（chroma_maintenance.py backup）的基础上：
+- 分页读取源集合（不一次性读入全部向量），按片段元数据中的 tenant_id / user_id 写入对应的分片集合
+- 写入使用 upsert，中断后重新执行不会产生重复数据
+- 可先把源集合完整复制到备份集合（--backup），迁移出错时用 chroma_maintenance.py restore 恢复
+- 校验各分片写入条数与源集合一致后，才会按 --delete-source 删除源集合；
+  源集合保留期间，chat 服务检索时会同时查询它（过渡期）
+
+运行方式:
+    python test/chroma_shard_migrate.py --source rag_docs --dry-run
+    python test/chroma_shard_migrate.py --source rag_docs --backup rag_docs_backup
+    python test/chroma_shard_migrate.py --source rag_docs --delete-source
+    python test/chroma_shard_migrate.py --path ./chroma_db --source rag_docs --sharding user_tenant
+"""
+import argparse
+import logging
+import sys
+from collections import Counter, defaultdict
+from pathlib import Path
+
+# ============ 重要：添加项目根目录到 Python 路径 ============
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+# ============================================================
+
+import chromadb
+
+from chat.utils.collection_util import CHROMA_SHARDING, DEFAULT_TENANT, collection_name
+from chat.utils.vector_maintenance_util import copy_collection, iter_pages
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def migrate(client, source_name: str, sharding: str, dry_run: bool = False) -> Counter:
+    """按租户分片迁移，返回各分片集合写入的条数"""
+    source = client.get_collection(name=source_name)
+    logger.info(f"源集合 '{source_name}' 共 {source.count()} 条数据，分片方式: {sharding}")
+
+    written = Counter()
+    targets = {}
+    for data in iter_pages(source):
+        groups = defaultdict(list)
+        for index, metadata in enumerate(data["metadatas"]):
+            metadata = metadata or {}
+            groups[(metadata.get("tenant_id") or DEFAULT_TENANT, metadata.get("user_id"))].append(index)
+
+        for (tenant_id, user_id), indexes in groups.items():
+            name = collection_name(tenant_id, user_id, sharding)
+            written[name] += len(indexes)
+            if dry_run:
+                continue
+            if name not in targets:
+                shard_metadata = {"hnsw:space": "cosine", "tenant_id": tenant_id}
+                if sharding == "user_tenant" and user_id:
+                    shard_metadata["user_id"] = user_id
+                targets[name] = client.get_or_create_collection(name=name, metadata=shard_metadata)
+            targets[name].upsert(
+                ids=[data["ids"][i] for i in indexes],
+                embeddings=[data["embeddings"][i] for i in indexes],
+                metadatas=[data["metadatas"][i] for i in indexes],
+                documents=[data["documents"][i] for i in indexes]
+            )
+        logger.info(f"已处理 {sum(written.values())} 条")
+    return written
+
+
+def verify(client, written: Counter) -> bool:
+    """分片集合的条数不少于本次写入的条数（分片中可能已有迁移后新上传的片段）"""
+    ok = True
+    for name, expected in sorted(written.items()):
+        actual = client.get_collection(name=name).count()
+        status = "OK" if actual >= expected else "MISSING"
+        ok = ok and actual >= expected
+        logger.info(f"  {name}: 写入 {expected}，集合中 {actual} [{status}]")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="全局向量集合按租户分片迁移")
+    parser.add_argument("--source", required=True, help="源集合名（即 CHROMA_COLLECTION_NAME）")
+    parser.add_argument("--sharding", default=CHROMA_SHARDING, choices=["tenant", "user_tenant"], help="分片方式")
+    parser.add_argument("--host", default="localhost", help="ChromaDB 服务地址")
+    parser.add_argument("--port", type=int, default=8000, help="ChromaDB 端口")
+    parser.add_argument("--path", help="使用本地持久化目录而不是 HTTP 服务")
+    parser.add_argument("--backup", help="迁移前把源集合完整复制到该备份集合")
+    parser.add_argument("--dry-run", action="store_true", help="只统计各分片的条数，不写入")
+    parser.add_argument("--delete-source", action="store_true", help="校验通过后删除源集合")
+    args = parser.parse_args()
+
+    client = chromadb.PersistentClient(path=args.path) if args.path else chromadb.HttpClient(host=args.host, port=args.port)
+
+    if args.backup and not args.dry_run:
+        copy_collection(client, client.get_collection(name=args.source), args.backup)
+
+    written = migrate(client, args.source, args.sharding, dry_run=args.dry_run)
+    logger.info(f"共 {len(written)} 个分片集合，{sum(written.values())} 条记录")
+    if args.dry_run:
+        for name, count in sorted(written.items()):
+            logger.info(f"  {name}: {count}")
+        return
+
+    if not verify(client, written):
+        logger.error("校验未通过，保留源集合")
+        sys.exit(1)
+    if args.delete_source:
+        client.delete_collection(name=args.source)
+        logger.info(f"源集合 '{args.source}' 已删除")
+    else:
+        logger.info("源集合已保留（检索时仍会查询它），确认无误后加 --delete-source 删除")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+# test/eval_retrieval.py
+"""
+文档检索离线评估：在固定的本地语料上对比各检索方式的召回质量与各阶段耗时
+
+在 test_build_context.py 单次查询的基础上：
+- 语料与标注固定（test/retrieval_eval_corpus.json），结果可复现、可在改动前后对比
+- 在临时目录中建立 Chroma 集合与 SQLite 关键词索引，不依赖 MySQL / Redis，不影响线上数据
+- 检索流程与 ChatService.build_context 一致（向量召回 → BM25 召回 → RRF 融合 → 重排 → 按 token 预算装填），
+  分别评估 vector / hybrid / hybrid+rerank 三种方式
+- 指标：recall@1、recall@k、MRR，以及 embed / search / lexical / fuse / rerank / pack 各阶段的平均耗时
+
+运行方式:
+    python test/eval_retrieval.py                                  # 使用 .env 中配置的 Ollama 嵌入模型
+    python test/eval_retrieval.py --embedding hash                 # 不连接 Ollama，用字符哈希向量（只看流程与关键词召回）
+    python test/eval_retrieval.py --reranker cross_encoder         # 需安装 sentence-transformers
+    python test/eval_retrieval.py --reranker llm --llm-model qwen3:8b --json eval_result.json
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import statistics
+import sys
+import tempfile
+from pathlib import Path
+from typing import Dict, List
+
+# ============ 重要：添加项目根目录到 Python 路径 ============
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+# ============================================================
+
+import chromadb
+from langchain_core.documents import Document
+from langchain_ollama import OllamaLLM
+
+from chat.utils.chroma_util import EMBEDDING
+from chat.utils.ingestion_util import chunk_hash
+from chat.utils.lexical_util import SqliteLexicalIndex, chunk_key, reciprocal_rank_fusion
+from chat.utils.rerank_util import CHAT_RERANK_CANDIDATES, CrossEncoderReranker, LLMReranker, pack_documents, rerank
+from chat.utils.retrieval_util import CHAT_RETRIEVAL_CANDIDATES, CHAT_RETRIEVAL_TOP_K, StageTimer
+from common.utils.service_container import service_container
+
+logging.basicConfig(level=logging.WARNING)
+logger = logging.getLogger(__name__)
+
+DEFAULT_CORPUS = Path(__file__).parent / "retrieval_eval_corpus.json"
+EVAL_USER_ID = "eval-user"
+EVAL_TENANT_ID = "eval"
+STAGES = ("embed", "search", "lexical", "fuse", "rerank", "pack")
+
+
+class HashEmbeddings:
+    """字符二元组哈希向量：不需要嵌入服务，只用于离线检查流程（语义召回能力接近关键词匹配）"""
+
+    def __init__(self, dimensions: int = 256):
+        self.dimensions = dimensions
+
+    def embed_query(self, text: str) -> List[float]:
+        vector = [0.0] * self.dimensions
+        for i in range(len(text) - 1):
+            digest = hashlib.md5(text[i:i + 2].encode("utf-8")).digest()
+            vector[int.from_bytes(digest[:4], "little") % self.dimensions] += 1.0
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self.embed_query(text) for text in texts]
+
+
+def build_indexes(corpus: Dict, embeddings, workdir: str):
+    """在临时目录中建立向量集合与关键词索引"""
+    chunks = corpus["chunks"]
+    ids = [chunk["id"] for chunk in chunks]
+    texts = [chunk["text"] for chunk in chunks]
+    metadatas = [
+        {
+            "doc_id": chunk["doc_id"],
+            "filename": chunk["filename"],
+            "page": int(chunk["id"].rsplit("-", 1)[1]) + 1,
+            "user_id": EVAL_USER_ID,
+            "tenant_id": EVAL_TENANT_ID,
+            "chunk_hash": chunk_hash(chunk["text"]),
+        }
+        for chunk in chunks
+    ]
+
+    client = chromadb.PersistentClient(path=str(Path(workdir) / "chroma"))
+    collection = client.create_collection(name="retrieval_eval", metadata={"hnsw:space": "cosine"})
+    collection.upsert(ids=ids, embeddings=embeddings.embed_documents(texts), documents=texts, metadatas=metadatas)
+
+    lexical = SqliteLexicalIndex(str(Path(workdir) / "lexical.db"))
+    lexical.add(list(zip(ids, texts, metadatas)))
+    return collection, lexical
+
+
+def vector_search(collection, vector: List[float], k: int):
+    result = collection.query(
+        query_embeddings=[vector], n_results=k, where={"user_id": EVAL_USER_ID},
+        include=["documents", "metadatas", "distances"]
+    )
+    return [
+        (Document(id=chunk_id, page_content=text, metadata=metadata), distance)
+        for chunk_id, text, metadata, distance in zip(
+            result["ids"][0], result["documents"][0], result["metadatas"][0], result["distances"][0]
+        )
+    ]
+
+
+async def run_query(mode: str, query: str, embeddings, collection, lexical, reranker, top_k: int, candidates: int):
+    """按 build_context 的流程检索一次，返回排序后的片段ID与各阶段耗时"""
+    timer = StageTimer("eval")
+    use_rerank = mode == "hybrid+rerank"
+    k = max(candidates, CHAT_RERANK_CANDIDATES) if use_rerank else candidates
+    fuse_limit = k if use_rerank else top_k
+
+    vector = embeddings.embed_query(query)
+    timer.mark("embed")
+    results = vector_search(collection, vector, k)
+    timer.mark("search")
+
+    if mode != "vector":
+        lexical_results = lexical.search(query, k, EVAL_USER_ID, EVAL_TENANT_ID)
+        timer.mark("lexical")
+        results = reciprocal_rank_fusion([results, lexical_results], limit=fuse_limit)
+        timer.mark("fuse")
+    else:
+        results = results[:top_k]
+
+    if use_rerank:
+        results = await rerank(reranker, query, results, top_k)
+        timer.mark("rerank")
+
+    pack_documents(results)
+    timer.mark("pack")
+    return [chunk_key(doc) for doc, _ in results], timer.stages
+
+
+def score(ranked: List[str], relevant: List[str], k: int) -> Dict[str, float]:
+    relevant_set = set(relevant)
+    first = next((rank for rank, chunk_id in enumerate(ranked, start=1) if chunk_id in relevant_set), None)
+    return {
+        "recall@1": len(relevant_set & set(ranked[:1])) / len(relevant_set),
+        f"recall@{k}": len(relevant_set & set(ranked[:k])) / len(relevant_set),
+        "mrr": 1.0 / first if first else 0.0,
+    }
+
+
+async def evaluate(mode: str, corpus: Dict, embeddings, collection, lexical, reranker, args) -> Dict:
+    metrics: Dict[str, List[float]] = {}
+    stages: Dict[str, List[float]] = {stage: [] for stage in STAGES}
+    totals: List[float] = []
+    misses = []
+    for _ in range(args.repeat):
+        for item in corpus["queries"]:
+            ranked, timings = await run_query(
+                mode, item["query"], embeddings, collection, lexical, reranker, args.top_k, args.candidates
+            )
+            for name, value in score(ranked, item["relevant"], args.top_k).items():
+                metrics.setdefault(name, []).append(value)
+            for stage, seconds in timings.items():
+                stages[stage].append(seconds * 1000)
+            totals.append(sum(timings.values()) * 1000)
+            if not set(item["relevant"]) & set(ranked) and item["query"] not in misses:
+                misses.append(item["query"])
+
+    return {
+        "mode": mode,
+        **{name: round(statistics.mean(values), 4) for name, values in metrics.items()},
+        "stages_ms": {stage: round(statistics.mean(values), 2) for stage, values in stages.items() if values},
+        "total_ms_p50": round(statistics.median(totals), 2),
+        "total_ms_p95": round(sorted(totals)[max(0, math.ceil(len(totals) * 0.95) - 1)], 2),
+        "misses": misses,
+    }
+
+
+def create_reranker(args):
+    if args.reranker == "cross_encoder":
+        return CrossEncoderReranker(args.rerank_model) if args.rerank_model else CrossEncoderReranker()
+    if args.reranker == "llm":
+        return LLMReranker(OllamaLLM(model=args.llm_model, base_url=args.llm_base_url))
+    return None
+
+
+def print_report(reports: List[Dict], top_k: int) -> None:
+    print()
+    print(f"{'mode':<16}{'recall@1':>10}{f'recall@{top_k}':>10}{'mrr':>8}{'p50(ms)':>10}{'p95(ms)':>10}  stages(ms)")
+    print("-" * 100)
+    for report in reports:
+        stages = " ".join(f"{stage}={ms}" for stage, ms in report["stages_ms"].items())
+        print(
+            f"{report['mode']:<16}{report['recall@1']:>10.3f}{report[f'recall@{top_k}']:>10.3f}{report['mrr']:>8.3f}"
+            f"{report['total_ms_p50']:>10.1f}{report['total_ms_p95']:>10.1f}  {stages}"
+        )
+    for report in reports:
+        if report["misses"]:
+            print(f"[{report['mode']}] 未召回: {', '.join(report['misses'])}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="文档检索离线评估（recall@k / MRR / 各阶段耗时）")
+    parser.add_argument("--corpus", default=str(DEFAULT_CORPUS), help="语料与标注文件")
+    parser.add_argument("--top-k", type=int, default=CHAT_RETRIEVAL_TOP_K, help="最终放入上下文的片段数")
+    parser.add_argument("--candidates", type=int, default=CHAT_RETRIEVAL_CANDIDATES, help="每路召回的候选数")
+    parser.add_argument("--embedding", default="ollama", choices=["ollama", "hash"], help="嵌入方式")
+    parser.add_argument("--reranker", default="none", choices=["none", "cross_encoder", "llm"], help="重排方式")
+    parser.add_argument("--rerank-model", help="cross_encoder 模型（默认 CHAT_RERANK_MODEL）")
+    parser.add_argument("--llm-model", default="qwen3:8b", help="llm 重排使用的 Ollama 模型")
+    parser.add_argument("--llm-base-url", default="http://localhost:11434", help="Ollama 地址")
+    parser.add_argument("--repeat", type=int, default=1, help="每个问题重复查询的次数（用于稳定耗时统计）")
+    parser.add_argument("--json", help="把结果写入 JSON 文件，便于改动前后对比")
+    args = parser.parse_args()
+
+    corpus = json.loads(Path(args.corpus).read_text(encoding="utf-8"))
+    embeddings = HashEmbeddings() if args.embedding == "hash" else service_container.get(EMBEDDING)
+    reranker = create_reranker(args)
+    modes = ["vector", "hybrid"] + (["hybrid+rerank"] if reranker else [])
+    print(f"语料: {len(corpus['chunks'])} 个片段, {len(corpus['queries'])} 个问题, 嵌入: {args.embedding}, "
+          f"重排: {args.reranker}, top_k={args.top_k}, candidates={args.candidates}")
+
+    with tempfile.TemporaryDirectory(prefix="retrieval_eval_") as workdir:
+        collection, lexical = build_indexes(corpus, embeddings, workdir)
+        try:
+            reports = [await evaluate(mode, corpus, embeddings, collection, lexical, reranker, args) for mode in modes]
+        finally:
+            lexical.close()
+
+    print_report(reports, args.top_k)
+    if args.json:
+        Path(args.json).write_text(json.dumps(reports, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"结果已写入 {args.json}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,46 @@
+# test/migrate_chat_memory.py
+"""
+会话记忆批量迁移
+
+把旧格式 `chat_history:{user_id}:{chat_id}`（str(list) 字符串）迁移为
+`chat_memory:chat:{user_id}:{chat_id}`（JSON 消息列表）。
+未迁移的会话在首次读取时也会自动迁移，本脚本用于上线后一次性清理存量数据。
+
+运行方式:
+    python test/migrate_chat_memory.py            # 统计旧格式键数量（不修改数据）
+    python test/migrate_chat_memory.py --apply    # 执行迁移
+"""
+import argparse
+import sys
+from pathlib import Path
+
+# ============ 重要：添加项目根目录到 Python 路径 ============
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+# ============================================================
+
+from dotenv import load_dotenv
+
+# chat_memory_util 在导入时读取 CHAT_MEMORY_* 配置，需先加载 .env
+load_dotenv(project_root / ".env")
+from common.utils.chat_memory_util import ChatMemory  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="会话记忆批量迁移")
+    parser.add_argument("--apply", action="store_true", help="执行迁移（默认只统计）")
+    parser.add_argument("--batch-size", type=int, default=500, help="SCAN 每批数量")
+    args = parser.parse_args()
+
+    memory = ChatMemory("chat")
+    if not args.apply:
+        count = sum(1 for _ in memory._scan_legacy_keys(args.batch_size))
+        print(f"旧格式会话键: {count} 个（加 --apply 执行迁移）")
+        return
+
+    migrated = memory.migrate_all_legacy(args.batch_size)
+    print(f"迁移完成: {migrated} 个会话")
+
+
+if __name__ == "__main__":
+    main()
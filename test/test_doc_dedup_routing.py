@@ -0,0 +1,98 @@
+# test/test_doc_dedup_routing.py
+"""
+内容去重文档的检索路由测试：原文档删除、只保留复用其向量的重复文档时，
+不传 tenantId 对话仍能路由到向量所在的租户分片集合，并按向量所属文档ID过滤
+
+不依赖 MySQL / Chroma：chat_doc 表建在内存 SQLite 中，向量集合只做路由（不查询）
+
+运行方式:
+    python test/test_doc_dedup_routing.py
+    python -m pytest test/test_doc_dedup_routing.py
+"""
+import asyncio
+import sys
+from pathlib import Path
+
+# ============ 重要：添加项目根目录到 Python 路径 ============
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+# ============================================================
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from chat.models.chat_model import ChatDocModel
+from chat.repositories.chat_repository import ChatRepository
+from chat.services.chat_service import ChatService
+from chat.utils.collection_util import CollectionRouter
+
+USER_ID = "u1"
+TENANT_ID = "t1"
+
+
+class FakeRetriever:
+    """只提供路由用到的 run_in_executor：旧的全局集合视为没有数据"""
+
+    async def run_in_executor(self, func, *args):
+        return None
+
+
+def make_service(session) -> ChatService:
+    router = CollectionRouter("tenant")
+    service = ChatService.__new__(ChatService)
+    service.db = session
+    service.chat_repository = ChatRepository(session)
+    service._get_collection_router = lambda: router
+    service._get_retriever = lambda: FakeRetriever()
+    return service
+
+
+def make_session():
+    engine = create_engine("sqlite://")
+    ChatDocModel.__table__.create(engine)
+    return sessionmaker(bind=engine)()
+
+
+def add_doc(session, doc_id: str, source_doc_id: str) -> None:
+    session.add(ChatDocModel(
+        id=doc_id, name=f"{doc_id}.pdf", ext="pdf", user_id=USER_ID, tenant_id=TENANT_ID,
+        content_hash="hash", source_doc_id=source_doc_id
+    ))
+    session.commit()
+
+
+def test_duplicate_routes_after_original_deleted():
+    session = make_session()
+    service = make_service(session)
+    add_doc(session, "docA", "docA")
+    add_doc(session, "docB", "docA")  # 重复上传，复用 docA 的向量
+    assert service.chat_repository.delete_doc("docA", USER_ID)
+
+    doc_ids, collections = asyncio.run(service._retrieval_scope(USER_ID, None, ["docB"]))
+
+    assert doc_ids == ["docA"]
+    assert collections == [CollectionRouter("tenant").name(TENANT_ID, USER_ID)]
+
+
+def test_original_and_duplicate_route_to_same_collection():
+    session = make_session()
+    service = make_service(session)
+    add_doc(session, "docA", "docA")
+    add_doc(session, "docB", "docA")
+
+    doc_ids, collections = asyncio.run(service._retrieval_scope(USER_ID, None, ["docA", "docB"]))
+
+    assert doc_ids == ["docA"]
+    assert collections == [CollectionRouter("tenant").name(TENANT_ID, USER_ID)]
+
+
+if __name__ == "__main__":
+    failed = 0
+    for case in (test_duplicate_routes_after_original_deleted, test_original_and_duplicate_route_to_same_collection):
+        try:
+            case()
+            print(f"{case.__name__}: PASS")
+        except AssertionError as e:
+            failed += 1
+            print(f"{case.__name__}: FAIL {e}")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,114 @@
+# test/test_semantic_cache_scope.py
+"""
+语义回答缓存的作用域测试（chat/utils/semantic_cache_util.py）
+
+文档对话的检索只命中当前用户自己的文档，同一租户的另一个用户传入相同的 docIds 时不能复用缓存的回答
+
+不依赖 Redis / 模型 / 数据库：Redis 使用 fakeredis，问题向量、会话记忆与租户开关均为假实现
+
+运行方式:
+    python test/test_semantic_cache_scope.py
+    python -m pytest test/test_semantic_cache_scope.py
+"""
+import asyncio
+import sys
+from pathlib import Path
+
+# ============ 重要：添加项目根目录到 Python 路径 ============
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+# ============================================================
+
+import fakeredis
+
+from chat.schemas.chat_schema import ChatParamsEntity
+from chat.services import chat_service
+from chat.services.chat_service import ChatService
+from chat.utils import semantic_cache_util
+from chat.utils.semantic_cache_util import SemanticCache, cache_scope
+
+TENANT_ID = "t1"
+DOC_IDS = ["doc1", "doc2"]
+SYSTEM_PROMPT = "你是助手"
+
+
+class FakeRetriever:
+    async def embed(self, text):
+        return [1.0, 0.0, 0.0]
+
+
+class FakeMemory:
+    def load_with_summary(self, user_id, chat_id):
+        return "", []
+
+
+class FakeRepository:
+    def is_semantic_cache_enabled(self, tenant_id):
+        return True
+
+
+def make_service(cache: SemanticCache) -> ChatService:
+    service = ChatService.__new__(ChatService)
+    service.chat_memory = FakeMemory()
+    service.chat_repository = FakeRepository()
+    service._get_retriever = lambda: FakeRetriever()
+    service._get_semantic_cache = lambda: cache
+    return service
+
+
+def make_params(chat_type: str = "document") -> ChatParamsEntity:
+    return ChatParamsEntity(
+        prompt="文档讲了什么", docIds=DOC_IDS, chatId="c1", modelId="m1", type=chat_type,
+        companyId="co1", tenantId=TENANT_ID
+    )
+
+
+def test_document_scope_includes_user():
+    scope_a = cache_scope("m1", SYSTEM_PROMPT, TENANT_ID, DOC_IDS, "userA", "document")
+    scope_b = cache_scope("m1", SYSTEM_PROMPT, TENANT_ID, DOC_IDS, "userB", "document")
+    assert scope_a != scope_b
+    # 文档ID顺序不影响作用域
+    assert scope_a == cache_scope("m1", SYSTEM_PROMPT, TENANT_ID, list(reversed(DOC_IDS)), "userA", "document")
+    # 普通对话不依赖用户数据，不同用户共用作用域
+    assert cache_scope("m1", SYSTEM_PROMPT, TENANT_ID, None, "userA", None) == \
+        cache_scope("m1", SYSTEM_PROMPT, TENANT_ID, None, "userB", None)
+
+
+def test_other_user_with_same_doc_ids_misses():
+    async def run():
+        client = fakeredis.FakeRedis()
+        semantic_cache_util.get_redis = lambda: client
+        chat_service.SEMANTIC_CACHE_ENABLED = True
+        service = make_service(SemanticCache())
+
+        # userA 的第一轮回答写入缓存
+        scope, vector, hit = await service._lookup_semantic_cache("userA", make_params(), SYSTEM_PROMPT)
+        assert scope is not None and hit is None
+        await service._get_semantic_cache().store(scope, vector, "文档讲了什么", "userA 私有文档的内容")
+
+        # 同一用户再次提问命中
+        _, _, hit = await service._lookup_semantic_cache("userA", make_params(), SYSTEM_PROMPT)
+        assert hit is not None and hit.answer == "userA 私有文档的内容"
+
+        # 同一租户的 userB 传入相同的 docIds 不能命中 userA 的回答
+        _, _, hit = await service._lookup_semantic_cache("userB", make_params(), SYSTEM_PROMPT)
+        assert hit is None
+    asyncio.run(run())
+
+
+CASES = [
+    test_document_scope_includes_user,
+    test_other_user_with_same_doc_ids_misses,
+]
+
+
+if __name__ == "__main__":
+    failed = 0
+    for case in CASES:
+        try:
+            case()
+            print(f"{case.__name__}: PASS")
+        except AssertionError as e:
+            failed += 1
+            print(f"{case.__name__}: FAIL {e}")
+    sys.exit(1 if failed else 0)
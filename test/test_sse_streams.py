@@ -0,0 +1,249 @@
+# test/test_sse_streams.py
+"""
+可续传 SSE 对话流测试（chat/utils/sse_util.py）
+
+不依赖 Redis / 模型：Redis 使用 fakeredis，回答由假生成器产出（与 chat_with_websocket 一样响应取消事件）:
+- classify：模型输出的 "Error ..." 文本是 message 事件，只有服务产出的 ErrorMessage 是 error 事件；
+  coalesce 合并分片时不把 ErrorMessage 并入回答分片
+- resume：带 Last-Event-ID（序号 N）重连时只补发 N 之后的事件
+- remote：另一个 worker（独立的 SSEStreams，本进程内没有该流）从 Redis 回放，并跟随生成直到 completed
+- grace：读者全部断开且宽限期内无人重连时取消生成，补发 error / completed；其他 worker 的读者心跳可阻止取消
+- owner：流不属于当前用户时 subscribe 抛出 StreamNotFound，续传接口返回 404
+
+运行方式:
+    python test/test_sse_streams.py
+    python -m pytest test/test_sse_streams.py
+"""
+import asyncio
+import sys
+from pathlib import Path
+from typing import List, Optional
+
+# ============ 重要：添加项目根目录到 Python 路径 ============
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+# ============================================================
+
+import fakeredis
+
+from chat.utils import sse_util
+from chat.utils.sse_util import SSEStreams, StreamEvent, StreamNotFound, classify
+from common.utils.stream_util import ErrorMessage, coalesce, is_error_message
+
+USER_ID = "u1"
+
+
+def use_fake_redis() -> fakeredis.FakeRedis:
+    """所有 SSEStreams 实例共用同一个 fakeredis，模拟多个 worker 连接同一个 Redis"""
+    client = fakeredis.FakeRedis()
+    sse_util.get_redis = lambda: client
+    sse_util.SSE_POLL_MS = 10
+    return client
+
+
+def fake_answer(chunks: List[str], gate: Optional[asyncio.Event] = None):
+    """假回答：先产出第一个分片，gate 设置后再产出其余分片；取消事件设置后立即停止（不产出 [completed]）"""
+    def make_stream(cancel_event: asyncio.Event):
+        async def generate():
+            for i, chunk in enumerate(chunks):
+                if i == 1 and gate is not None:
+                    waiters = {asyncio.ensure_future(gate.wait()), asyncio.ensure_future(cancel_event.wait())}
+                    _, pending = await asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED)
+                    for task in pending:
+                        task.cancel()
+                if cancel_event.is_set():
+                    return
+                yield chunk
+            yield "[completed]"
+        return generate()
+    return make_stream
+
+
+async def collect(events, limit: int = 100) -> List[StreamEvent]:
+    items = []
+    async for item in events:
+        items.append(item)
+        if len(items) >= limit:
+            break
+    return items
+
+
+def test_classify():
+    assert classify("Error handling in Python 需要注意") == ("message", "Error handling in Python 需要注意")
+    assert classify(ErrorMessage("模型响应错误: timeout")) == ("error", "模型响应错误: timeout")
+    assert classify(ErrorMessage("Error: 未找到模型配置 m1")) == ("error", "Error: 未找到模型配置 m1")
+    assert classify("[queue:3]") == ("queue", "3")
+    assert classify("[completed]") == ("completed", "")
+
+
+def test_coalesce_keeps_error_message_separate():
+    async def source():
+        for chunk in ("a", "b", ErrorMessage("模型响应错误: timeout"), "c"):
+            yield chunk
+
+    async def run():
+        stream = coalesce(source(), interval_ms=1000)
+        try:
+            return [chunk async for chunk in stream]
+        finally:
+            await stream.aclose()
+
+    chunks = asyncio.run(run())
+    assert chunks == ["a", "b", "模型响应错误: timeout", "c"]
+    assert [is_error_message(chunk) for chunk in chunks] == [False, False, True, False]
+
+
+def test_resume_after_seq():
+    async def run():
+        use_fake_redis()
+        streams = SSEStreams()
+        buffered = streams.start(USER_ID, fake_answer(["a", "b", "c"]))
+        await buffered._produce_task
+
+        # 事件: 1 stream, 2 a, 3 b, 4 c, 5 completed
+        items = await collect(await streams.subscribe(buffered.stream_id, USER_ID, 2))
+        assert [(item.seq, item.event, item.data) for item in items] == [
+            (3, "message", "b"), (4, "message", "c"), (5, "completed", "")
+        ]
+        assert items[0].to_sse(buffered.stream_id)["id"] == f"{buffered.stream_id}:3"
+    asyncio.run(run())
+
+
+def test_remote_replay_follows_live_stream():
+    async def run():
+        use_fake_redis()
+        worker_a, worker_b = SSEStreams(), SSEStreams()
+        gate = asyncio.Event()
+        buffered = worker_a.start(USER_ID, fake_answer(["a", "b", "c"], gate))
+
+        # 首个分片写入 Redis 后，在另一个 worker 上从序号 1（stream 事件）之后续传
+        while len(buffered.events) < 2:
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.05)
+        reader = asyncio.ensure_future(collect(await worker_b.subscribe(buffered.stream_id, USER_ID, 1)))
+        await asyncio.sleep(0.05)
+        assert not reader.done()
+        gate.set()
+
+        items = await asyncio.wait_for(reader, timeout=5)
+        assert [(item.seq, item.event, item.data) for item in items] == [
+            (2, "message", "a"), (3, "message", "b"), (4, "message", "c"), (5, "completed", "")
+        ]
+        assert not buffered.cancel_event.is_set()
+    asyncio.run(run())
+
+
+def test_cancel_after_grace_without_reader():
+    async def run():
+        use_fake_redis()
+        sse_util.SSE_RESUME_GRACE_SECONDS = 0.05
+        streams = SSEStreams()
+        gate = asyncio.Event()
+        buffered = streams.start(USER_ID, fake_answer(["a", "b"], gate))
+
+        # 读到第一个分片后断开，之后没有任何读者
+        events = await streams.subscribe(buffered.stream_id, USER_ID)
+        async for item in events:
+            if item.event == "message":
+                break
+        await events.aclose()
+
+        await asyncio.wait_for(buffered._produce_task, timeout=5)
+        assert buffered.cancel_event.is_set()
+        assert [(item.event, item.data) for item in buffered.events[-2:]] == [("error", "回答已中断"), ("completed", "")]
+    asyncio.run(run())
+
+
+def test_remote_reader_heartbeat_prevents_cancel():
+    async def run():
+        client = use_fake_redis()
+        sse_util.SSE_RESUME_GRACE_SECONDS = 0.05
+        streams = SSEStreams()
+        gate = asyncio.Event()
+        buffered = streams.start(USER_ID, fake_answer(["a", "b"], gate))
+
+        events = await streams.subscribe(buffered.stream_id, USER_ID)
+        async for item in events:
+            if item.event == "message":
+                break
+        # 本进程的读者断开，但另一个 worker 上的读者仍在刷新心跳
+        client.set(streams.reader_key(buffered.stream_id), 1, ex=60)
+        await events.aclose()
+        await asyncio.sleep(0.2)
+        assert not buffered.cancel_event.is_set()
+
+        gate.set()
+        await asyncio.wait_for(buffered._produce_task, timeout=5)
+        assert buffered.events[-1].event == "completed"
+        assert all(item.event != "error" for item in buffered.events)
+    asyncio.run(run())
+
+
+def test_other_user_gets_not_found():
+    async def run():
+        use_fake_redis()
+        worker_a, worker_b = SSEStreams(), SSEStreams()
+        buffered = worker_a.start(USER_ID, fake_answer(["a"]))
+        await buffered._produce_task
+
+        for streams in (worker_a, worker_b):
+            try:
+                await streams.subscribe(buffered.stream_id, "intruder")
+            except StreamNotFound:
+                pass
+            else:
+                raise AssertionError("其他用户不应能订阅该流")
+        try:
+            await worker_b.subscribe("missing", USER_ID)
+        except StreamNotFound:
+            pass
+        else:
+            raise AssertionError("不存在的流应抛出 StreamNotFound")
+    asyncio.run(run())
+
+
+def test_resume_route_returns_404_for_other_user():
+    from fastapi import HTTPException
+
+    from chat.routers.chat_router import resume_chat_sse
+    from chat.utils.sse_util import SSE_STREAMS
+    from common.utils.service_container import service_container
+
+    async def run():
+        use_fake_redis()
+        streams = service_container.get(SSE_STREAMS)
+        buffered = streams.start(USER_ID, fake_answer(["a"]))
+        await buffered._produce_task
+        try:
+            await resume_chat_sse(
+                streamId=buffered.stream_id, lastEventId=None, current_user_id="intruder", last_event_id=None
+            )
+        except HTTPException as e:
+            assert e.status_code == 404
+        else:
+            raise AssertionError("其他用户续传应返回 404")
+    asyncio.run(run())
+
+
+CASES = [
+    test_classify,
+    test_coalesce_keeps_error_message_separate,
+    test_resume_after_seq,
+    test_remote_replay_follows_live_stream,
+    test_cancel_after_grace_without_reader,
+    test_remote_reader_heartbeat_prevents_cancel,
+    test_other_user_gets_not_found,
+    test_resume_route_returns_404_for_other_user,
+]
+
+
+if __name__ == "__main__":
+    failed = 0
+    for case in CASES:
+        try:
+            case()
+            print(f"{case.__name__}: PASS")
+        except AssertionError as e:
+            failed += 1
+            print(f"{case.__name__}: FAIL {e}")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,237 @@
+# test/test_stream_cancel.py
+"""
+流式回答取消测试：客户端断开后，上游模型的流式请求是否在毫秒级内停止
+
+前三个场景不依赖 MySQL / Redis / 真实模型，使用内置的假流式后端（按固定间隔产出 token，记录被关闭的时间）:
+- cancellable：token 流进行中设置取消事件（chat 服务的流式输出）
+- websocket：假 WebSocket 在回答中途发来断开消息，走 断开检测 → 取消事件 → 关闭上游 的完整链路
+- until_cancelled：非流式调用进行中断开（agent 服务的意图提取）
+第四个场景（--fake-llm）通过 langchain_ollama 连接 benchmark/fake_llm_server.py，
+断开后轮询服务端的 /stats，确认服务端的生成已经中止（真实 HTTP 连接被关闭）
+
+运行方式:
+    python test/test_stream_cancel.py
+    python -m benchmark.fake_llm_server --port 11500 --tokens-per-sec 50 &
+    python test/test_stream_cancel.py --fake-llm http://127.0.0.1:11500
+"""
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# ============ 重要：添加项目根目录到 Python 路径 ============
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+# ============================================================
+
+from common.utils.stream_util import ClientDisconnected, WebSocketDisconnectWatcher, cancellable, until_cancelled
+
+
+class FakeStreamingBackend:
+    """假流式后端：每隔 interval 秒产出一个 token，记录被关闭 / 取消的时间"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.tokens = 0
+        self.cancelled_at: Optional[float] = None
+        self.tokens_at_cancel = 0
+        self.closed_at: Optional[float] = None
+
+    def mark_cancel(self) -> None:
+        self.cancelled_at = time.perf_counter()
+        self.tokens_at_cancel = self.tokens
+
+    async def astream(self):
+        try:
+            while True:
+                # 模拟等待模型的下一个 token（真实场景中是 HTTP 响应的读取）
+                await asyncio.sleep(self.interval)
+                self.tokens += 1
+                yield f"token{self.tokens} "
+        finally:
+            self.closed_at = time.perf_counter()
+
+    async def ainvoke(self) -> str:
+        try:
+            await asyncio.sleep(self.interval * 1000)
+            return "done"
+        finally:
+            self.closed_at = time.perf_counter()
+
+    def result(self, name: str) -> Dict:
+        latency_ms = None
+        if self.closed_at is not None and self.cancelled_at is not None:
+            latency_ms = (self.closed_at - self.cancelled_at) * 1000
+        return {
+            "name": name,
+            "latency_ms": latency_ms,
+            "tokens_after_cancel": self.tokens - self.tokens_at_cancel,
+        }
+
+
+class FakeWebSocket:
+    """假 WebSocket：disconnect() 之后 receive() 返回断开消息"""
+
+    def __init__(self):
+        self.sent: List[str] = []
+        self._disconnect = asyncio.get_running_loop().create_future()
+
+    def disconnect(self) -> None:
+        self._disconnect.set_result(True)
+
+    async def receive(self) -> Dict:
+        await self._disconnect
+        return {"type": "websocket.disconnect", "code": 1001}
+
+    async def send_text(self, text: str) -> None:
+        self.sent.append(text)
+
+
+async def answer(backend: FakeStreamingBackend, cancel_event: asyncio.Event):
+    """与 ChatService.chat_with_websocket 的流式部分相同的用法"""
+    stream = cancellable(backend.astream(), cancel_event)
+    try:
+        async for chunk in stream:
+            yield chunk
+    except ClientDisconnected:
+        return
+    finally:
+        await stream.aclose()
+
+
+async def scenario_cancellable(args) -> Dict:
+    backend = FakeStreamingBackend(args.interval)
+    cancel_event = asyncio.Event()
+
+    async def consume():
+        async for _ in answer(backend, cancel_event):
+            pass
+
+    task = asyncio.create_task(consume())
+    await asyncio.sleep(args.interval * (args.tokens_before_cancel + 0.5))
+    backend.mark_cancel()
+    cancel_event.set()
+    await task
+    return backend.result("cancellable")
+
+
+async def scenario_websocket(args) -> Dict:
+    backend = FakeStreamingBackend(args.interval)
+    websocket = FakeWebSocket()
+
+    async def route():
+        # 与 chat_router.websocket_chat 的单轮处理相同
+        async with WebSocketDisconnectWatcher(websocket) as watcher:
+            stream = answer(backend, watcher.cancel_event)
+            try:
+                async for chunk in stream:
+                    if watcher.disconnected:
+                        break
+                    await websocket.send_text(chunk)
+            finally:
+                await stream.aclose()
+
+    task = asyncio.create_task(route())
+    await asyncio.sleep(args.interval * (args.tokens_before_cancel + 0.5))
+    backend.mark_cancel()
+    websocket.disconnect()
+    await task
+    return backend.result("websocket")
+
+
+async def scenario_until_cancelled(args) -> Dict:
+    backend = FakeStreamingBackend(args.interval)
+    cancel_event = asyncio.Event()
+
+    async def call():
+        try:
+            await until_cancelled(backend.ainvoke(), cancel_event)
+        except ClientDisconnected:
+            pass
+
+    task = asyncio.create_task(call())
+    await asyncio.sleep(args.interval * (args.tokens_before_cancel + 0.5))
+    backend.mark_cancel()
+    cancel_event.set()
+    await task
+    return backend.result("until_cancelled")
+
+
+async def scenario_fake_llm(args) -> Dict:
+    """通过真实 HTTP 连接 fake_llm_server，断开后确认服务端的流式生成已中止"""
+    import httpx
+    from langchain_ollama import OllamaLLM
+
+    llm = OllamaLLM(model="bench-llm", base_url=args.fake_llm)
+    async with httpx.AsyncClient(base_url=args.fake_llm) as client:
+        before = (await client.get("/stats")).json()
+        cancel_event = asyncio.Event()
+        received = 0
+        cancelled_at = None
+
+        stream = cancellable(llm.astream("流式取消测试"), cancel_event)
+        try:
+            async for _ in stream:
+                received += 1
+                if received == args.tokens_before_cancel:
+                    cancelled_at = time.perf_counter()
+                    cancel_event.set()
+        except ClientDisconnected:
+            pass
+        finally:
+            await stream.aclose()
+
+        # 服务端在连接关闭后取消生成，aborted 加一、active 回到断开前的值
+        stopped_at = None
+        deadline = time.perf_counter() + 2
+        while time.perf_counter() < deadline:
+            stats = (await client.get("/stats")).json()
+            if stats["aborted"] > before["aborted"] and stats["active"] <= before["active"]:
+                stopped_at = time.perf_counter()
+                break
+            await asyncio.sleep(0.001)
+
+    tokens_after = None
+    if stopped_at is not None:
+        tokens_after = stats["tokens"] - before["tokens"] - args.tokens_before_cancel
+    return {
+        "name": "fake_llm(http)",
+        "latency_ms": (stopped_at - cancelled_at) * 1000 if stopped_at and cancelled_at else None,
+        "tokens_after_cancel": tokens_after,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="流式回答取消测试（断开后上游停止的延迟）")
+    parser.add_argument("--interval", type=float, default=0.05, help="假后端产出 token 的间隔（秒）")
+    parser.add_argument("--tokens-before-cancel", type=int, default=5, help="收到多少个 token 后断开")
+    parser.add_argument("--max-ms", type=float, default=20, help="断开到上游关闭的最大允许延迟（毫秒）")
+    parser.add_argument("--fake-llm", help="fake_llm_server 地址（如 http://127.0.0.1:11500），不传时跳过 HTTP 场景")
+    args = parser.parse_args()
+
+    results = [
+        await scenario_cancellable(args),
+        await scenario_websocket(args),
+        await scenario_until_cancelled(args),
+    ]
+    if args.fake_llm:
+        # 真实 HTTP 场景包含服务端发现断开与 /stats 轮询的时间，允许更长的延迟
+        results.append(await scenario_fake_llm(args))
+
+    failed = False
+    print(f"{'scenario':<18}{'cancel->closed(ms)':>20}{'tokens after cancel':>22}  result")
+    print("-" * 70)
+    for result in results:
+        latency = result["latency_ms"]
+        limit = args.max_ms * 5 if result["name"].endswith("(http)") else args.max_ms
+        ok = latency is not None and latency <= limit and (result["tokens_after_cancel"] or 0) <= 1
+        failed = failed or not ok
+        latency_text = f"{latency:.2f}" if latency is not None else "-"
+        print(f"{result['name']:<18}{latency_text:>20}{str(result['tokens_after_cancel']):>22}  {'PASS' if ok else 'FAIL'}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -3,6 +3,7 @@ from sqlalchemy.orm import Session
 from common.models.common_model import UserMode
 from tenant.models.tenants_model import TenantUserModel
 from user.schemas.user_schema import UserCreate, UserUpdate
+from common.utils.count_cache_util import invalidate_count
 from typing import Optional, Any
 
 
@@ -120,6 +121,7 @@ class UserRepository:
         self.db.add(db_user)
         self.db.commit()
         self.db.refresh(db_user)
+        invalidate_count("user")
         return db_user
 
     def update_user(self, user_id: str, user: UserUpdate) -> Optional[UserMode]:
@@ -130,6 +132,7 @@ class UserRepository:
                 setattr(db_user, key, value)
             self.db.commit()
             self.db.refresh(db_user)
+            invalidate_count("user")
         return db_user
 
     def update_password(self, user_id: str, new_password: str) -> bool:
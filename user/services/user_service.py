@@ -1,7 +1,6 @@
 # user/services/user_service.py
 import os
 import random
-import redis
 from datetime import timedelta
 from fastapi import Depends, HTTPException, status, UploadFile, File
 from fastapi.logger import logger
@@ -13,9 +12,10 @@ from user.schemas.user_schema import UserCreate, UserUpdate, PasswordChange, Res
 from common.config.common_database import get_db
 from common.utils.jwt_util import create_access_token
 from common.utils.result_util import ResultEntity, ResultUtil
+from common.utils.redis_util import get_redis
+from common.utils.count_cache_util import fetch_page_with_total
 
 # 直接从环境变量读取配置
-REDIS_URL = os.getenv("REDIS_URL")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES"))
 # 头像存储：URL 前缀（返回给前端）与文件系统保存目录
 AVATER_URL_PREFIX = os.getenv("AVATER_PATH", "/static/user/avater")
@@ -25,7 +25,7 @@ AVATER_UPLOAD_PATH = os.getenv("AVATER_UPLOAD_PATH", "/Users/wuwenqiang/Document
 class UserService:
     def __init__(self, db: Session = Depends(get_db)):
         self.user_repository = UserRepository(db)
-        self.redis = redis.Redis.from_url(REDIS_URL)
+        self.redis = get_redis()
 
     async def register_user(self, user: UserCreate) -> ResultEntity:
         if self.user_repository.get_user_by_user_account(user.user_account):
@@ -158,8 +158,12 @@ class UserService:
         :return: 用户列表和总数（包含租户关联标识）
         """
         # 查询用户列表（包含租户标识）
-        users_with_flag = self.user_repository.search_tenant_users(keyword, tenant_id, skip, limit)
-        total = self.user_repository.count_search_users(keyword)
+        users_with_flag, total = await fetch_page_with_total(
+            lambda: self.user_repository.search_tenant_users(keyword, tenant_id, skip, limit),
+            namespace="user",
+            filters={"keyword": keyword},
+            count=lambda db: UserRepository(db).count_search_users(keyword)
+        )
 
         # 构建返回数据
         user_list = []